@@ -6,6 +6,9 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 AUTONOMY_DIR="$(dirname "$SCRIPT_DIR")"
 STATE_DIR="$AUTONOMY_DIR/state"
 WATCHERS_FILE="$STATE_DIR/watchers.json"
+FS_WATCHER="$AUTONOMY_DIR/lib/fs-watcher.py"
+TREE_MANIFEST="$AUTONOMY_DIR/lib/tree-manifest.py"
+MANIFESTS_DIR="$STATE_DIR/manifests"
 
 mkdir -p "$STATE_DIR"
 
@@ -53,13 +56,11 @@ watcher_add() {
         return 1
     fi
     
-    # Get initial checksum
+    # Record the tree; its root hash is the watcher's checksum
+    local manifest="$MANIFESTS_DIR/watcher-${name//[^A-Za-z0-9._-]/_}.json"
+    python3 "$TREE_MANIFEST" check "$manifest" "$path" >/dev/null
     local checksum
-    if [[ -d "$path" ]]; then
-        checksum=$(find "$path" -type f -exec md5sum {} + 2>/dev/null | md5sum | cut -d' ' -f1)
-    else
-        checksum=$(md5sum "$path" 2>/dev/null | cut -d' ' -f1)
-    fi
+    checksum=$(python3 "$TREE_MANIFEST" hash "$manifest")
     
     local new_watcher
     new_watcher=$(jq -n \
@@ -84,6 +85,7 @@ watcher_remove() {
     watchers=$(get_watchers)
     watchers=$(echo "$watchers" | jq "map(select(.name != \"$name\"))")
     save_watchers "$watchers"
+    rm -f "$MANIFESTS_DIR/watcher-${name//[^A-Za-z0-9._-]/_}.json"
     
     echo "✓ Watcher '$name' removed"
 }
@@ -143,25 +145,29 @@ watcher_check() {
     
     # Check each watcher
     for ((i=0; i<count; i++)); do
-        local w_path w_action w_name w_checksum new_checksum
+        local w_path w_action w_name new_checksum
         
         w_path=$(echo "$to_check" | jq -r ".[$i].path")
         w_action=$(echo "$to_check" | jq -r ".[$i].action")
         w_name=$(echo "$to_check" | jq -r ".[$i].name")
-        w_checksum=$(echo "$to_check" | jq -r ".[$i].checksum")
         
-        # Calculate new checksum
-        if [[ -d "$w_path" ]]; then
-            new_checksum=$(find "$w_path" -type f -exec md5sum {} + 2>/dev/null | md5sum | cut -d' ' -f1)
+        # While the inotify watcher covers this path, an empty queue means
+        # nothing changed; otherwise the manifest re-hashes only files whose
+        # stat changed (the queued paths, or whatever a stat walk turns up)
+        local changes manifest="$MANIFESTS_DIR/watcher-${w_name//[^A-Za-z0-9._-]/_}.json"
+        if changes=$(python3 "$FS_WATCHER" take "watcher:$w_name" 2>/dev/null); then
+            [[ -z "$changes" ]] && continue
+            changes=$(echo "$changes" | python3 "$TREE_MANIFEST" check "$manifest" "$w_path" --paths -)
         else
-            new_checksum=$(md5sum "$w_path" 2>/dev/null | cut -d' ' -f1)
+            changes=$(python3 "$TREE_MANIFEST" check "$manifest" "$w_path")
         fi
         
-        if [[ "$new_checksum" != "$w_checksum" ]]; then
+        if [[ -n "$changes" ]]; then
             # Change detected!
             triggered+=("$w_name")
             
             # Update checksum
+            new_checksum=$(python3 "$TREE_MANIFEST" hash "$manifest")
             watchers=$(echo "$watchers" | jq \
                 "map(if .name == \"$w_name\" then .checksum = \"$new_checksum\" | .last_triggered = \"$(date -Iseconds)\" else . end)")
             
@@ -170,6 +176,7 @@ watcher_check() {
             
             # Execute action
             echo "[$w_name] Change detected in $w_path"
+            echo "$changes" | head -5 | sed "s|^|[$w_name]   |"
             echo "[$w_name] Executing: $w_action"
             eval "$w_action" 2>&1 | while read line; do echo "[$w_name] $line"; done
             echo ""
@@ -218,11 +225,15 @@ watcher_daemon_start() {
         fi
     fi
     
+    # Queue changes with inotify; the loop then wakes as soon as a
+    # watcher's queue fills and only polls every interval as a fallback
+    bash "$AUTONOMY_DIR/lib/event-triggers.sh" watch start >/dev/null 2>&1 || true
+    
     # Start daemon
     (
         while true; do
             watcher_check >/dev/null 2>&1
-            sleep "$interval"
+            python3 "$FS_WATCHER" wait watcher: --timeout "$interval" >/dev/null 2>&1 || sleep "$interval"
         done
     ) &
     
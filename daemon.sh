@@ -78,6 +78,8 @@ flag_next_task() {
         # Skip anything not simply pending
         [[ "$completed" == "true" || "$status" == "completed" ]] && continue
         [[ "$status" == "needs_ai_attention" || "$status" == "ai_processing" ]] && continue
+        # Parked until its sub-agents' join resolves (sub-agents.sh join)
+        [[ "$status" == "waiting_on_agents" ]] && continue
         [[ "$task_name" == "continuous-improvement" ]] && continue
 
         # Skip tasks that exceeded max attempts
@@ -257,6 +259,28 @@ ensure_webui() {
     fi
 }
 
+# Keep the resident AI client (keep-alive connection pool) alive
+ensure_ai_client() {
+    [[ "$(get_config '.ai.persistent_client')" == "false" ]] && return 0
+    # The socket file outlives a crashed client; only a live pid counts
+    local pid
+    pid=$(cat "$AUTONOMY_DIR/state/ai-client.pid" 2>/dev/null)
+    [[ -n "$pid" ]] && kill -0 "$pid" 2>/dev/null && return 0
+    log "AI client not running — starting"
+    bash "$AUTONOMY_DIR/lib/ai-engine.sh" client start >> "$LOG_FILE" 2>&1 || true
+}
+
+# Keep the inotify change watcher alive while anything is watched
+ensure_fs_watcher() {
+    [[ "$(get_config '.triggers.inotify')" == "false" ]] && return 0
+    python3 "$AUTONOMY_DIR/lib/fs-watcher.py" status >/dev/null 2>&1 && return 0
+    jq -e '[.triggers[]? | select(.type == "file_change" and .enabled != false)] | length > 0' \
+        "$AUTONOMY_DIR/state/triggers.json" >/dev/null 2>&1 ||
+        jq -e 'length > 0' "$AUTONOMY_DIR/state/watchers.json" >/dev/null 2>&1 || return 0
+    log "File watcher not running — starting"
+    bash "$AUTONOMY_DIR/lib/event-triggers.sh" watch start >> "$LOG_FILE" 2>&1 || true
+}
+
 # Release stale heartbeat locks
 check_heartbeat_lock() {
     if command -v check_status >/dev/null 2>&1; then
@@ -380,6 +404,7 @@ run_cycle() {
 
     # Check event-driven triggers
     if [[ -f "$AUTONOMY_DIR/lib/event-triggers.sh" ]]; then
+        ensure_fs_watcher
         bash "$AUTONOMY_DIR/lib/event-triggers.sh" check >/dev/null 2>&1 || true
     fi
 
@@ -390,6 +415,8 @@ run_cycle() {
         local ai_status
         ai_status=$(bash "$AUTONOMY_DIR/lib/ai-engine.sh" status 2>/dev/null)
         if echo "$ai_status" | jq -e '.configured == true' >/dev/null 2>&1; then
+            ensure_ai_client
+
             # Find the flagged task and run AI analysis
             local attention_file="$AUTONOMY_DIR/state/needs_attention.json"
             if [[ -f "$attention_file" ]]; then
@@ -487,14 +514,38 @@ start_daemon() {
 
             run_cycle
 
-            # Interruptible sleep (check stop signal every 5 seconds)
+            # Interruptible sleep (check stop and wake signals every 5 seconds),
+            # cut short when the next schedule falls due or a held trigger
+            # window settles (lib/scheduler.py and lib/trigger-windows.py
+            # keep those epochs in state/schedule.next and state/triggers.next)
             local interval
             interval=$(get_interval_seconds)
-            local slept=0
+            local slept=0 next_due due_file due
             while [[ $slept -lt $interval ]]; do
                 [[ -f "$AUTONOMY_DIR/state/daemon.stop" ]] && break
-                sleep 5
-                slept=$((slept + 5))
+                if [[ -f "$AUTONOMY_DIR/state/daemon.wake" ]]; then
+                    local reason
+                    reason=$(head -1 "$AUTONOMY_DIR/state/daemon.wake" 2>/dev/null)
+                    rm -f "$AUTONOMY_DIR/state/daemon.wake"
+                    log "Woken early (${reason:-wake signal})"
+                    break
+                fi
+                next_due=""
+                for due_file in schedule.next triggers.next; do
+                    [[ -f "$AUTONOMY_DIR/state/$due_file" ]] || continue
+                    due=$(< "$AUTONOMY_DIR/state/$due_file")
+                    if [[ "$due" =~ ^[0-9]+$ ]] && [[ -z "$next_due" || $due -lt $next_due ]]; then
+                        next_due=$due
+                    fi
+                done
+                if [[ -n "$next_due" ]] && (( next_due <= EPOCHSECONDS )); then
+                    log "Woken early (schedule or trigger window due)"
+                    break
+                fi
+                local step=$(( interval - slept < 5 ? interval - slept : 5 ))
+                [[ -n "$next_due" ]] && (( next_due - EPOCHSECONDS < step )) && step=$(( next_due - EPOCHSECONDS ))
+                sleep "$step"
+                slept=$((slept + step))
             done
         done
     ) &
@@ -0,0 +1,701 @@
+#!/usr/bin/env python3
+"""Agent supervisor — a fixed pool of worker slots fed from a persistent
+job queue.
+
+Listens on a Unix socket (state/agent-supervisor.sock) and speaks plain
+HTTP like ai-client.py, so sub-agents.sh reaches it with
+`curl --unix-socket`. A job is an argv list; up to AGENT_SUPERVISOR_SLOTS
+run at once, highest priority first, each in its own process group with
+output appended to its log. Every exit is reaped here. A job that
+overruns its timeout has its whole group killed, and failures are queued
+again with exponential backoff until max_retries is spent (exit codes in
+no_retry are final). Once a job is finished for good its on_done command
+runs with AGENT_JOB_ID, AGENT_JOB_STATUS, AGENT_JOB_EXIT, AGENT_JOB_REASON
+and AGENT_JOB_ATTEMPTS set.
+
+The queue is kept in state/agent-jobs.json and rewritten on every
+change. On shutdown running jobs are stopped and queued again, and a
+restarted supervisor resumes the queue.
+
+Agents report progress by POSTing events to /events; jobs get the socket
+in AGENT_EVENT_SOCK and their id in AGENT_ID. An event names its agent
+and carries any of phase, percent, step, steps, message, status, name
+and parent, which replace the previous values, and tokens, which is
+added to the running total. The resulting live view is kept in memory
+only (seeded from state/sub_agents.json at startup) and served from
+/agents, so readers never touch the filesystem.
+
+A join is a barrier over the sub-agents of one parent task: all of them
+finished, any one completed, a quorum of k completed, optionally capped
+by a deadline. Children are the agents whose events name that parent
+(plus any listed when the join is declared); their last status is kept
+in the join so it survives a restart. Joins are checked every tick, and
+once one resolves (met, unmet when every child finished short of the
+quorum, or deadline) its on_ready command runs with AGENT_JOIN_ID,
+AGENT_JOIN_PARENT and AGENT_JOIN_STATUS set.
+
+Endpoints:
+    POST /jobs               Submit {name, command, [id, cwd, env, log,
+                             timeout, max_retries, priority, no_retry,
+                             on_done]}
+    GET  /jobs[/<id>]        Job records
+    POST /jobs/<id>/cancel   Stop a queued or running job
+    POST /events             Progress event {agent, ...}
+    GET  /agents             Live view of every agent plus /status
+    POST /joins              Declare {parent, [mode, k, deadline_seconds,
+                             children, on_ready, cwd, log]}
+    GET  /joins[/<id>]       Join records
+    POST /joins/<id>/cancel  Drop a waiting join
+    GET  /status             Slots, queue depth and counters
+
+Usage:
+    agent-supervisor.py serve [--socket PATH]   Run in the foreground
+    agent-supervisor.py status [--socket PATH]  Print pool status
+"""
+
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler
+
+AUTONOMY_DIR = os.environ.get("AUTONOMY_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATE_DIR = f"{AUTONOMY_DIR}/state"
+DEFAULT_SOCKET = f"{STATE_DIR}/agent-supervisor.sock"
+JOBS_FILE = f"{STATE_DIR}/agent-jobs.json"
+AGENTS_FILE = f"{STATE_DIR}/sub_agents.json"
+
+SLOTS = int(os.environ.get("AGENT_SUPERVISOR_SLOTS", "3"))
+DEFAULT_TIMEOUT = float(os.environ.get("AGENT_SUPERVISOR_TIMEOUT", "7200"))
+DEFAULT_RETRIES = int(os.environ.get("AGENT_SUPERVISOR_RETRIES", "2"))
+RETRY_BASE = float(os.environ.get("AGENT_SUPERVISOR_RETRY_BASE", "30"))
+RETRY_MAX_DELAY = float(os.environ.get("AGENT_SUPERVISOR_RETRY_MAX_DELAY", "600"))
+
+# Seconds between SIGTERM and SIGKILL when a job is stopped
+KILL_GRACE = 5
+# How often running jobs are polled for exit and timeout
+TICK = 0.2
+# Finished jobs kept in the queue file
+KEEP_FINISHED = 200
+# Finished agents kept in the live view
+KEEP_FINISHED_VIEWS = 20
+# Event fields that replace the agent's previous value
+PROGRESS_FIELDS = ("name", "parent", "status", "phase", "percent", "step", "steps", "message")
+
+PRIORITIES = {"critical": 0, "high": 1, "normal": 2, "low": 3}
+JOIN_MODES = ("all", "any", "quorum", "deadline")
+FINAL = ("completed", "failed", "cancelled")
+ACTIVE = ("queued", "running", "pending", "active")
+
+
+def now_iso():
+    return datetime.now().astimezone().isoformat(timespec="seconds")
+
+
+def retry_delay(attempt):
+    """Seconds before retry number attempt (0-based)."""
+    return min(RETRY_MAX_DELAY, RETRY_BASE * (2 ** attempt))
+
+
+def signal_name(sig):
+    """SIGTERM for 15; realtime signals other than SIGRTMIN/SIGRTMAX have no
+    enum member, so they come out as SIG<n>."""
+    try:
+        return signal.Signals(sig).name
+    except ValueError:
+        return f"SIG{sig}"
+
+
+def kill_group(pid, sig):
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class Supervisor:
+    """Job table, worker slots, the reaper loop, the live agent view and
+    joins. Persisted fields live in self.jobs and self.joins; process
+    handles and kill deadlines in self.running; progress in self.views."""
+
+    def __init__(self, jobs_file=JOBS_FILE, slots=SLOTS, sock_path=None, agents_file=AGENTS_FILE):
+        self.jobs_file = jobs_file
+        self.slots = max(1, slots)
+        self.sock_path = sock_path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.running = {}
+        self.views = {}
+        self.joins = {}
+        self.hooks = []
+        self.seq = itertools.count()
+        self.counters = {"started": 0, "completed": 0, "failed": 0, "retried": 0,
+                         "timed_out": 0, "cancelled": 0, "agents": 0, "agents_completed": 0, "events": 0,
+                         "joins_resolved": 0}
+        self.load()
+        self.seed_views(agents_file)
+
+    # ── persistence ──
+
+    def load(self):
+        try:
+            with open(self.jobs_file) as f:
+                data = json.load(f)
+            jobs, joins = data.get("jobs", []), data.get("joins", [])
+        except (OSError, ValueError, AttributeError):
+            jobs, joins = [], []
+        self.joins = {j["id"]: j for j in joins if j.get("id")}
+        for job in sorted(jobs, key=lambda j: j.get("seq", 0)):
+            job["seq"] = next(self.seq)
+            if job.get("status") == "running":
+                # Left over from a supervisor that did not shut down cleanly
+                if job.get("pid"):
+                    kill_group(job["pid"], signal.SIGKILL)
+                self.settle(job, None, "supervisor restarted")
+            self.jobs[job["id"]] = job
+        self.save()
+
+    def save(self):
+        finished = [j for j in self.jobs.values() if j["status"] in FINAL]
+        for job in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job["id"]]
+        resolved = [j for j in self.joins.values() if j["status"] != "waiting"]
+        for join in resolved[:max(0, len(resolved) - KEEP_FINISHED)]:
+            del self.joins[join["id"]]
+        tmp = f"{self.jobs_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"jobs": list(self.jobs.values()), "joins": list(self.joins.values())}, f, indent=1)
+        os.replace(tmp, self.jobs_file)
+
+    def seed_views(self, agents_file):
+        """Start the live view from the agents already registered."""
+        try:
+            with open(agents_file) as f:
+                data = json.load(f)
+            agents, done = data.get("agents", []), data.get("completed", [])
+        except (OSError, ValueError, AttributeError):
+            agents, done = [], []
+        for agent in agents:
+            if agent.get("id") and agent.get("status") in ACTIVE:
+                self.view(agent["id"]).update(name=agent.get("name"), parent=agent.get("parent_task"),
+                                              status=agent["status"])
+        # Children that finished while no supervisor was listening
+        for join in self.joins.values():
+            if join["status"] == "waiting":
+                join["children"].update((a["id"], a.get("status") or "pending") for a in agents + done
+                                        if a.get("id") and a.get("parent_task") == join["parent"])
+        for job in self.jobs.values():
+            if job["status"] not in FINAL:
+                self.view(job["id"]).setdefault("name", job["name"])
+
+    # ── live view ──
+
+    def view(self, agent_id):
+        if agent_id not in self.views:
+            self.views[agent_id] = {"id": agent_id, "tokens": 0, "events": 0, "updated": now_iso()}
+            self.counters["agents"] += 1
+        return self.views[agent_id]
+
+    def effective(self, view):
+        """A view merged with its job, whose state wins when there is one."""
+        entry = dict(view)
+        job = self.jobs.get(view["id"])
+        if job:
+            entry.setdefault("name", job["name"])
+            entry.update(status=job["status"], attempts=job["attempts"], pid=job["pid"], reason=job["reason"])
+        return entry
+
+    def event(self, ev):
+        """Fold one progress event into the live view."""
+        agent_id = str(ev.get("agent") or "")
+        if not agent_id:
+            raise ValueError("event needs an agent")
+        with self.lock:
+            view = self.view(agent_id)
+            if ev.get("status") == "completed" and view.get("status") != "completed":
+                self.counters["agents_completed"] += 1
+            view.update((k, ev[k]) for k in PROGRESS_FIELDS if k in ev)
+            view["tokens"] += int(ev.get("tokens") or 0)
+            view["events"] += 1
+            view["updated"] = now_iso()
+            self.counters["events"] += 1
+            finished = [v["id"] for v in self.views.values() if self.effective(v).get("status") not in ACTIVE]
+            for old in finished[:max(0, len(finished) - KEEP_FINISHED_VIEWS)]:
+                del self.views[old]
+            return dict(view)
+
+    def agents(self):
+        with self.lock:
+            return [self.effective(v) for v in self.views.values()]
+
+    # ── joins ──
+
+    def declare_join(self, spec):
+        parent = str(spec.get("parent") or "")
+        mode = spec.get("mode") or "all"
+        if not parent:
+            raise ValueError("join needs a parent")
+        if mode not in JOIN_MODES:
+            raise ValueError(f"mode must be one of {', '.join(JOIN_MODES)}")
+        k = int(spec.get("k") or (1 if mode == "any" else 0))
+        if mode == "quorum" and k < 1:
+            raise ValueError("quorum needs k >= 1")
+        deadline_seconds = float(spec.get("deadline_seconds") or 0)
+        if mode == "deadline" and deadline_seconds <= 0:
+            raise ValueError("deadline mode needs deadline_seconds")
+        on_ready = spec.get("on_ready")
+        if on_ready is not None and not (isinstance(on_ready, list) and all(isinstance(a, str) for a in on_ready)):
+            raise ValueError("on_ready must be a list of strings")
+        with self.lock:
+            join_id = str(spec.get("id") or f"join-{parent}")
+            for other in self.joins.values():
+                if other["parent"] == parent and other["status"] == "waiting":
+                    raise KeyError(f"{parent} already has a waiting join ({other['id']})")
+            join = {
+                "id": join_id,
+                "parent": parent,
+                "mode": mode,
+                "k": k,
+                "deadline": time.time() + deadline_seconds if deadline_seconds > 0 else None,
+                "children": {str(a): str(st) for a, st in (spec.get("children") or {}).items()},
+                "on_ready": on_ready,
+                "cwd": spec.get("cwd"),
+                "log": spec.get("log"),
+                "status": "waiting",
+                "declared": now_iso(),
+                "resolved": None,
+            }
+            self.joins[join_id] = join
+            self.check_join(join)
+            self.save()
+            return dict(join)
+
+    def cancel_join(self, join_id):
+        with self.lock:
+            join = self.joins.get(join_id)
+            if join and join["status"] == "waiting":
+                join.update(status="cancelled", resolved=now_iso())
+                self.save()
+            return dict(join) if join else None
+
+    def check_join(self, join):
+        """Refresh a waiting join's children and resolve it if its
+        condition holds. Returns True when it resolved."""
+        for view in self.views.values():
+            if view.get("parent") == join["parent"] and view.get("status"):
+                join["children"][view["id"]] = view["status"]
+        states = list(join["children"].values())
+        finished = sum(1 for st in states if st in FINAL)
+        completed = states.count("completed")
+        need = join["k"] if join["mode"] in ("any", "quorum") else len(states)
+
+        if states and finished == len(states) and join["mode"] in ("all", "deadline"):
+            outcome = "met"
+        elif join["mode"] in ("any", "quorum") and completed >= need:
+            outcome = "met"
+        elif join["mode"] in ("any", "quorum") and states and finished == len(states):
+            outcome = "unmet"
+        elif join["deadline"] and time.time() >= join["deadline"]:
+            outcome = "deadline"
+        else:
+            return False
+
+        join.update(status=outcome, resolved=now_iso(),
+                    counts={"children": len(states), "completed": completed, "failed": finished - completed,
+                            "unfinished": len(states) - finished})
+        self.counters["joins_resolved"] += 1
+        if join.get("on_ready"):
+            self.run_hook(join["on_ready"], join.get("cwd"), join.get("log"),
+                          {"AGENT_JOIN_ID": join["id"], "AGENT_JOIN_PARENT": join["parent"],
+                           "AGENT_JOIN_STATUS": outcome})
+        return True
+
+    def list_joins(self):
+        with self.lock:
+            return [dict(j) for j in self.joins.values()]
+
+    def get_join(self, join_id):
+        with self.lock:
+            join = self.joins.get(join_id)
+            return dict(join) if join else None
+
+    # ── API ──
+
+    def submit(self, spec):
+        command = spec.get("command")
+        if not (isinstance(command, list) and command and all(isinstance(a, str) for a in command)):
+            raise ValueError("command must be a non-empty list of strings")
+        with self.lock:
+            job_id = str(spec.get("id") or f"job-{int(time.time())}-{len(self.jobs)}")
+            if job_id in self.jobs and self.jobs[job_id]["status"] not in FINAL:
+                raise KeyError(f"job {job_id} is already {self.jobs[job_id]['status']}")
+            job = {
+                "id": job_id,
+                "name": spec.get("name") or job_id,
+                "command": command,
+                "cwd": spec.get("cwd"),
+                "env": {str(k): str(v) for k, v in (spec.get("env") or {}).items()},
+                "log": spec.get("log"),
+                "timeout": float(spec.get("timeout") or DEFAULT_TIMEOUT),
+                "max_retries": int(spec.get("max_retries", DEFAULT_RETRIES)),
+                "priority": spec.get("priority") if spec.get("priority") in PRIORITIES else "normal",
+                "no_retry": [int(c) for c in spec.get("no_retry") or []],
+                "on_done": spec.get("on_done"),
+                "status": "queued",
+                "attempts": 0,
+                "submitted": now_iso(),
+                "started": None,
+                "finished": None,
+                "not_before": 0,
+                "pid": None,
+                "exit_code": None,
+                "signal": None,
+                "reason": None,
+                "history": [],
+                "seq": next(self.seq),
+            }
+            self.jobs[job_id] = job
+            self.view(job_id).setdefault("name", job["name"])
+            self.save()
+            return dict(job)
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "queued":
+                job["status"] = "cancelled"
+                job["reason"] = "cancelled"
+                job["finished"] = now_iso()
+                self.counters["cancelled"] += 1
+                self.on_done(job)
+                self.save()
+            elif job["status"] == "running":
+                run = self.running[job_id]
+                run["cancelled"] = True
+                self.stop(run)
+            return dict(job)
+
+    def snapshot(self):
+        with self.lock:
+            queued = [j for j in self.jobs.values() if j["status"] == "queued"]
+            return {
+                "running": True,
+                "pid": os.getpid(),
+                "slots": self.slots,
+                "busy": len(self.running),
+                "queued": len(queued),
+                "waiting_retry": sum(1 for j in queued if j["not_before"] > time.time()),
+                "joins_waiting": sum(1 for j in self.joins.values() if j["status"] == "waiting"),
+                "counters": dict(self.counters),
+            }
+
+    def list(self):
+        with self.lock:
+            return [dict(j, progress=self.views.get(j["id"])) for j in self.jobs.values()]
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job, progress=self.views.get(job_id)) if job else None
+
+    # ── worker slots ──
+
+    def launch(self, job):
+        env = dict(os.environ, **job["env"], AGENT_ID=job["id"])
+        if self.sock_path:
+            env["AGENT_EVENT_SOCK"] = self.sock_path
+        log = open(job["log"], "ab") if job.get("log") else subprocess.DEVNULL
+        job["attempts"] += 1
+        job["started"] = now_iso()
+        try:
+            proc = subprocess.Popen(job["command"], cwd=job.get("cwd") or None, env=env,
+                                    stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                    start_new_session=True)
+        except OSError as e:
+            job["status"] = "running"
+            self.settle(job, 127, f"{job['command'][0]}: {e.strerror}")
+            return
+        finally:
+            if log is not subprocess.DEVNULL:
+                log.close()
+        job["status"] = "running"
+        job["pid"] = proc.pid
+        self.running[job["id"]] = {"proc": proc, "started": time.monotonic(),
+                                   "kill_at": None, "timed_out": False, "cancelled": False}
+        self.counters["started"] += 1
+
+    def stop(self, run):
+        """SIGTERM the job's process group; SIGKILL follows after KILL_GRACE."""
+        if run["kill_at"] is None:
+            kill_group(run["proc"].pid, signal.SIGTERM)
+            run["kill_at"] = time.monotonic() + KILL_GRACE
+
+    def settle(self, job, status, reason=None, timed_out=False, cancelled=False):
+        """Record one attempt's outcome (status is the waitpid result, None
+        if unknown) and queue a retry or finish the job."""
+        sig = -status if status is not None and status < 0 else None
+        exit_code = 128 + sig if sig else status
+        job["pid"] = None
+        job["exit_code"] = exit_code
+        job["signal"] = signal_name(sig) if sig else None
+        if reason is None:
+            if timed_out:
+                reason = f"timed out after {job['timeout']:g}s"
+            elif sig:
+                reason = f"killed by {job['signal']}"
+            elif exit_code:
+                reason = f"exit {exit_code}"
+        job["reason"] = reason
+        job["history"] = (job["history"] + [{"attempt": job["attempts"], "exit_code": exit_code,
+                                             "signal": job["signal"], "reason": reason,
+                                             "started": job["started"], "finished": now_iso()}])[-10:]
+        if timed_out:
+            self.counters["timed_out"] += 1
+
+        if cancelled:
+            job["status"] = "cancelled"
+            self.counters["cancelled"] += 1
+        elif exit_code == 0:
+            job["status"] = "completed"
+            self.counters["completed"] += 1
+        elif exit_code not in job["no_retry"] and job["attempts"] <= job["max_retries"]:
+            job["status"] = "queued"
+            job["not_before"] = time.time() + retry_delay(job["attempts"] - 1)
+            self.counters["retried"] += 1
+            return
+        else:
+            job["status"] = "failed"
+            self.counters["failed"] += 1
+        job["finished"] = now_iso()
+        self.on_done(job)
+
+    def on_done(self, job):
+        if not job.get("on_done"):
+            return
+        self.run_hook(job["on_done"], job.get("cwd"), job.get("log"), dict(
+            job["env"], AGENT_JOB_ID=job["id"], AGENT_JOB_STATUS=job["status"],
+            AGENT_JOB_EXIT=str(job["exit_code"] if job["exit_code"] is not None else ""),
+            AGENT_JOB_REASON=job["reason"] or "", AGENT_JOB_ATTEMPTS=str(job["attempts"])))
+
+    def run_hook(self, command, cwd, log_path, env):
+        """Start a callback in the background; the reaper collects it."""
+        log = open(log_path, "ab") if log_path else subprocess.DEVNULL
+        try:
+            self.hooks.append(subprocess.Popen(command, cwd=cwd or None, env=dict(os.environ, **env),
+                                               stdin=subprocess.DEVNULL, stdout=log,
+                                               stderr=subprocess.STDOUT, start_new_session=True))
+        except OSError:
+            pass
+        finally:
+            if log is not subprocess.DEVNULL:
+                log.close()
+
+    def tick(self):
+        changed = False
+        with self.lock:
+            now = time.monotonic()
+            for job_id, run in list(self.running.items()):
+                job = self.jobs[job_id]
+                status = run["proc"].poll()
+                if status is None:
+                    if run["kill_at"] is not None and now >= run["kill_at"]:
+                        kill_group(run["proc"].pid, signal.SIGKILL)
+                    elif job["timeout"] > 0 and now - run["started"] >= job["timeout"]:
+                        run["timed_out"] = True
+                        self.stop(run)
+                    continue
+                # The leader is gone; take the rest of its group with it
+                kill_group(run["proc"].pid, signal.SIGKILL)
+                del self.running[job_id]
+                self.settle(job, status, timed_out=run["timed_out"], cancelled=run["cancelled"])
+                changed = True
+
+            while len(self.running) < self.slots:
+                ready = [j for j in self.jobs.values()
+                         if j["status"] == "queued" and j["not_before"] <= time.time()]
+                if not ready:
+                    break
+                self.launch(min(ready, key=lambda j: (PRIORITIES[j["priority"]], j["seq"])))
+                changed = True
+
+            for join in self.joins.values():
+                if join["status"] == "waiting" and self.check_join(join):
+                    changed = True
+
+            self.hooks = [h for h in self.hooks if h.poll() is None]
+            if changed:
+                self.save()
+
+    def shutdown(self):
+        """Stop running jobs and queue them again for the next supervisor."""
+        with self.lock:
+            for run in self.running.values():
+                kill_group(run["proc"].pid, signal.SIGTERM)
+            deadline = time.monotonic() + KILL_GRACE
+            for job_id, run in self.running.items():
+                try:
+                    run["proc"].wait(max(0, deadline - time.monotonic()))
+                except subprocess.TimeoutExpired:
+                    kill_group(run["proc"].pid, signal.SIGKILL)
+                    run["proc"].wait()
+                job = self.jobs[job_id]
+                job.update(status="queued", pid=None, not_before=0, attempts=job["attempts"] - 1)
+            self.running.clear()
+            self.save()
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    supervisor = None
+
+    def log_message(self, format, *args): pass
+
+    def address_string(self):
+        return "unix"
+
+    def send_json(self, data, status=200):
+        out = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(self.supervisor.snapshot())
+        elif self.path == "/agents":
+            self.send_json(dict(self.supervisor.snapshot(), agents=self.supervisor.agents()))
+        elif self.path == "/jobs":
+            self.send_json(self.supervisor.list())
+        elif self.path.startswith("/jobs/"):
+            job = self.supervisor.get(self.path[len("/jobs/"):])
+            self.send_json(job if job else {"error": "Unknown job"}, 200 if job else 404)
+        elif self.path == "/joins":
+            self.send_json(self.supervisor.list_joins())
+        elif self.path.startswith("/joins/"):
+            join = self.supervisor.get_join(self.path[len("/joins/"):])
+            self.send_json(join if join else {"error": "Unknown join"}, 200 if join else 404)
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length > 0 else b""
+        if self.path == "/jobs":
+            try:
+                self.send_json(self.supervisor.submit(json.loads(body or b"{}")), 201)
+            except KeyError as e:
+                self.send_json({"error": e.args[0]}, 409)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.send_json({"error": str(e)}, 400)
+        elif self.path == "/events":
+            try:
+                self.send_json(self.supervisor.event(json.loads(body or b"{}")))
+            except (ValueError, TypeError, AttributeError) as e:
+                self.send_json({"error": str(e)}, 400)
+        elif self.path.startswith("/jobs/") and self.path.endswith("/cancel"):
+            job = self.supervisor.cancel(self.path[len("/jobs/"):-len("/cancel")])
+            self.send_json(job if job else {"error": "Unknown job"}, 200 if job else 404)
+        elif self.path == "/joins":
+            try:
+                self.send_json(self.supervisor.declare_join(json.loads(body or b"{}")), 201)
+            except KeyError as e:
+                self.send_json({"error": e.args[0]}, 409)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.send_json({"error": str(e)}, 400)
+        elif self.path.startswith("/joins/") and self.path.endswith("/cancel"):
+            join = self.supervisor.cancel_join(self.path[len("/joins/"):-len("/cancel")])
+            self.send_json(join if join else {"error": "Unknown join"}, 200 if join else 404)
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+
+def serve(sock_path):
+    os.makedirs(os.path.dirname(sock_path), exist_ok=True)
+    if os.path.exists(sock_path):
+        os.unlink(sock_path)
+
+    pid_file = os.path.splitext(sock_path)[0] + ".pid"
+    supervisor = Supervisor(sock_path=sock_path)
+    Handler.supervisor = supervisor
+    server = UnixHTTPServer(sock_path, Handler)
+    os.chmod(sock_path, 0o600)
+    with open(pid_file, "w") as f:
+        f.write(str(os.getpid()))
+
+    stopping = threading.Event()
+
+    def reaper():
+        while not stopping.is_set():
+            supervisor.tick()
+            stopping.wait(TICK)
+
+    def _shutdown(signum, frame):
+        stopping.set()
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    loop = threading.Thread(target=reaper, daemon=True)
+    loop.start()
+    try:
+        server.serve_forever()
+    finally:
+        stopping.set()
+        loop.join()
+        supervisor.shutdown()
+        server.server_close()
+        for path in (sock_path, pid_file):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def status(sock_path):
+    """Query the running supervisor over its socket; exit 1 if it is not up."""
+    try:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(2)
+        s.connect(sock_path)
+        s.sendall(b"GET /status HTTP/1.1\r\nHost: agent-supervisor\r\nConnection: close\r\n\r\n")
+        raw = b""
+        while chunk := s.recv(65536):
+            raw += chunk
+        s.close()
+        print(raw.split(b"\r\n\r\n", 1)[1].decode())
+        return 0
+    except (OSError, IndexError):
+        print(json.dumps({"running": False}))
+        return 1
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    sock_path = DEFAULT_SOCKET
+    if "--socket" in args:
+        i = args.index("--socket")
+        sock_path = args[i + 1]
+        del args[i:i + 2]
+    cmd = args[0] if args else "status"
+
+    if cmd == "serve":
+        serve(sock_path)
+    elif cmd == "status":
+        sys.exit(status(sock_path))
+    else:
+        print(__doc__.strip())
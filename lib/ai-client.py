@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""Resident AI client — keep-alive HTTPS connection pool for ai_call.
+
+Listens on a Unix socket (state/ai-client.sock) and speaks plain HTTP, so
+bash callers reach it with `curl --unix-socket`. Each POST /forward names
+its upstream in X-Upstream-URL; the request is replayed on a pooled
+keep-alive connection to that host, saving DNS/TCP/TLS setup per call.
+
+Because every caller goes through this process it also schedules them:
+at most AI_CLIENT_MAX_CONCURRENT requests per upstream are in flight,
+waiting callers are served by priority lane (X-Priority: interactive,
+normal, background), an optional per-minute token-rate limit holds
+requests back, and 429/529/5xx answers are retried with jittered
+exponential backoff that honours retry-after.
+
+Usage:
+    ai-client.py serve [--socket PATH]   Run in the foreground
+    ai-client.py status [--socket PATH]  Print pool statistics
+"""
+
+import heapq
+import http.client
+import itertools
+import json
+import os
+import random
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+AUTONOMY_DIR = os.environ.get("AUTONOMY_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATE_DIR = f"{AUTONOMY_DIR}/state"
+DEFAULT_SOCKET = f"{STATE_DIR}/ai-client.sock"
+
+MAX_IDLE_PER_HOST = int(os.environ.get("AI_CLIENT_MAX_IDLE", "4"))
+IDLE_TIMEOUT = int(os.environ.get("AI_CLIENT_IDLE_TIMEOUT", "90"))
+DEFAULT_UPSTREAM_TIMEOUT = 60
+
+MAX_CONCURRENT = int(os.environ.get("AI_CLIENT_MAX_CONCURRENT", "4"))
+TOKENS_PER_MINUTE = int(os.environ.get("AI_CLIENT_TOKENS_PER_MINUTE", "0"))
+MAX_RETRIES = int(os.environ.get("AI_CLIENT_MAX_RETRIES", "4"))
+RETRY_BASE = float(os.environ.get("AI_CLIENT_RETRY_BASE", "1"))
+RETRY_MAX_DELAY = float(os.environ.get("AI_CLIENT_RETRY_MAX_DELAY", "60"))
+QUEUE_TIMEOUT = float(os.environ.get("AI_CLIENT_QUEUE_TIMEOUT", "120"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504, 529}
+LANES = {"interactive": 0, "normal": 1, "background": 2}
+
+# Headers that belong to the hop between curl and this process
+HOP_HEADERS = {"host", "connection", "keep-alive", "content-length", "transfer-encoding",
+               "proxy-connection", "te", "upgrade", "x-upstream-url", "x-upstream-timeout",
+               "x-priority", "x-max-retries"}
+
+
+def retry_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number attempt (0-based): the server's
+    retry-after if it sent one, else full-jitter exponential backoff."""
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE * (2 ** attempt)))
+
+
+def estimate_tokens(body):
+    """Rough token cost of a request: prompt size plus the requested output."""
+    try:
+        max_tokens = int(json.loads(body).get("max_tokens", 0))
+    except (ValueError, AttributeError, TypeError):
+        max_tokens = 0
+    return len(body) // 4 + max_tokens
+
+
+def usage_tokens(data):
+    """Total tokens from a provider JSON response, or None if it has no usage."""
+    try:
+        usage = json.loads(data).get("usage") or {}
+    except (ValueError, AttributeError):
+        return None
+    total = sum(v for k, v in usage.items()
+                if k in ("input_tokens", "output_tokens", "prompt_tokens", "completion_tokens")
+                and isinstance(v, int))
+    return total or None
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class Scheduler:
+    """Admission control per upstream host.
+
+    A caller may start when it is the best-ranked waiter for its host
+    (lane first, then arrival order), a concurrency slot is free, and the
+    token spend over the last minute leaves room for its estimate.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.max_concurrent = max(1, max_concurrent)
+        self.tokens_per_minute = tokens_per_minute
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting = {}    # host -> heap of (lane, seq)
+        self._active = {}     # host -> in-flight count
+        self._spend = {}      # host -> deque of [timestamp, tokens]
+        self._waits = deque(maxlen=500)
+        self.stats = {"admitted": 0, "retries": 0, "rate_limited": 0, "queue_timeouts": 0}
+        self._lane_depth = {lane: 0 for lane in LANES}
+
+    def _window_tokens(self, host, now):
+        spend = self._spend.setdefault(host, deque())
+        while spend and now - spend[0][0] >= 60:
+            spend.popleft()
+        return sum(t for _, t in spend), spend
+
+    def _token_wait(self, host, estimate, now):
+        """Seconds until the token window has room for estimate (0 if it has)."""
+        if self.tokens_per_minute <= 0:
+            return 0
+        used, spend = self._window_tokens(host, now)
+        if not spend or used + estimate <= self.tokens_per_minute:
+            return 0
+        for ts, tokens in spend:
+            used -= tokens
+            if used + estimate <= self.tokens_per_minute:
+                return max(0.01, ts + 60 - now)
+        return max(0.01, spend[-1][0] + 60 - now)
+
+    def acquire(self, host, lane, estimate, timeout=QUEUE_TIMEOUT):
+        """Block until the request may start; returns a ticket for release()."""
+        lane = lane if lane in LANES else "normal"
+        ticket = (LANES[lane], next(self._seq))
+        enqueued = time.time()
+        deadline = enqueued + timeout
+        with self._cond:
+            heap = self._waiting.setdefault(host, [])
+            heapq.heappush(heap, ticket)
+            self._lane_depth[lane] += 1
+            try:
+                while True:
+                    now = time.time()
+                    wait = None
+                    if heap[0] == ticket and self._active.get(host, 0) < self.max_concurrent:
+                        wait = self._token_wait(host, estimate, now)
+                        if wait == 0:
+                            break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        heap.remove(ticket)
+                        heapq.heapify(heap)
+                        self.stats["queue_timeouts"] += 1
+                        self._cond.notify_all()
+                        raise QueueTimeout(f"waited {timeout:.0f}s for an upstream slot")
+                    self._cond.wait(min(remaining, wait) if wait else remaining)
+            finally:
+                self._lane_depth[lane] -= 1
+            heapq.heappop(heap)
+            self._active[host] = self._active.get(host, 0) + 1
+            entry = [time.time(), estimate]
+            self._spend.setdefault(host, deque()).append(entry)
+            self.stats["admitted"] += 1
+            self._waits.append(time.time() - enqueued)
+            self._cond.notify_all()
+        return host, entry
+
+    def release(self, ticket, tokens=None):
+        """Free the slot; tokens replaces the estimate once usage is known."""
+        host, entry = ticket
+        with self._cond:
+            self._active[host] -= 1
+            if tokens is not None:
+                entry[1] = tokens
+            self._cond.notify_all()
+
+    def count(self, key):
+        with self._cond:
+            self.stats[key] += 1
+
+    def snapshot(self):
+        with self._cond:
+            now = time.time()
+            waits = sorted(self._waits)
+            out = dict(self.stats)
+            out["queue_depth"] = dict(self._lane_depth)
+            out["in_flight"] = {h: n for h, n in self._active.items() if n}
+            out["tokens_last_minute"] = {h: self._window_tokens(h, now)[0] for h in list(self._spend)}
+            out["wait_ms"] = {
+                "avg": int(sum(waits) / len(waits) * 1000) if waits else 0,
+                "p95": int(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000) if waits else 0,
+                "max": int(waits[-1] * 1000) if waits else 0,
+            }
+            out["max_concurrent"] = self.max_concurrent
+            out["tokens_per_minute"] = self.tokens_per_minute
+        return out
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), reused LIFO."""
+
+    def __init__(self, max_idle=MAX_IDLE_PER_HOST, idle_timeout=IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "connections_opened": 0,
+                      "connections_reused": 0, "streams": 0, "streams_aborted": 0,
+                      "started_at": time.time()}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def acquire(self, scheme, host, port, timeout):
+        key = (scheme, host, port)
+        now = time.time()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used < self.idle_timeout:
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    self.stats["connections_reused"] += 1
+                    return conn, True
+                conn.close()
+            self.stats["connections_opened"] += 1
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def release(self, scheme, host, port, conn):
+        key = (scheme, host, port)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def snapshot(self):
+        with self._lock:
+            out = dict(self.stats, running=True, pid=os.getpid())
+            out["uptime_seconds"] = int(time.time() - out.pop("started_at"))
+            out["idle"] = {f"{s}://{h}:{p}": len(v) for (s, h, p), v in self._idle.items()}
+        return out
+
+    def open(self, url, body, headers, timeout):
+        """Send one request upstream, retrying once if a reused socket went stale.
+
+        Returns (key, conn, resp) with the response body still unread; hand
+        the connection back with finish() once the body has been consumed.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        host = parts.hostname
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        self._count("requests")
+        for attempt in range(2):
+            conn, reused = self.acquire(scheme, host, port, timeout)
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                return (scheme, host, port), conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError,
+                    BrokenPipeError, http.client.CannotSendRequest):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                self._count("errors")
+                raise
+            except Exception:
+                conn.close()
+                self._count("errors")
+                raise
+
+    def finish(self, key, conn, resp, ok=True):
+        if ok and not resp.will_close:
+            self.release(*key, conn)
+        else:
+            conn.close()
+
+    def request(self, url, body, headers, timeout):
+        key, conn, resp = self.open(url, body, headers, timeout)
+        try:
+            data = resp.read()
+        except Exception:
+            self.finish(key, conn, resp, ok=False)
+            self._count("errors")
+            raise
+        self.finish(key, conn, resp)
+        return resp.status, resp.getheader("Content-Type", "application/json"), data
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    pool = None
+    scheduler = None
+
+    def log_message(self, format, *args): pass
+
+    def address_string(self):
+        return "unix"
+
+    def send_body(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, data, status=200):
+        self.send_body(status, "application/json", json.dumps(data).encode())
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(dict(self.pool.snapshot(), scheduler=self.scheduler.snapshot()))
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+    def do_POST(self):
+        if self.path != "/forward":
+            self.send_json({"error": "Not found"}, 404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length > 0 else b""
+        url = self.headers.get("X-Upstream-URL", "")
+        if not url.startswith(("http://", "https://")):
+            self.send_json({"error": {"type": "ai_client", "message": "X-Upstream-URL required"}}, 400)
+            return
+        try:
+            timeout = float(self.headers.get("X-Upstream-Timeout", DEFAULT_UPSTREAM_TIMEOUT))
+        except ValueError:
+            timeout = DEFAULT_UPSTREAM_TIMEOUT
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS}
+        host = urlsplit(url).netloc
+        lane = self.headers.get("X-Priority", "normal")
+        estimate = estimate_tokens(body)
+        try:
+            max_retries = min(MAX_RETRIES, int(self.headers.get("X-Max-Retries", MAX_RETRIES)))
+        except ValueError:
+            max_retries = MAX_RETRIES
+
+        for attempt in range(max_retries + 1):
+            try:
+                ticket = self.scheduler.acquire(host, lane, estimate)
+            except QueueTimeout as e:
+                self.send_json({"error": {"type": "ai_client", "message": str(e)}}, 503)
+                return
+            try:
+                key, conn, resp = self.pool.open(url, body, headers, timeout)
+            except Exception as e:
+                self.scheduler.release(ticket, 0)
+                if attempt < max_retries:
+                    self.scheduler.count("retries")
+                    time.sleep(retry_delay(attempt))
+                    continue
+                self.send_json({"error": {"type": "ai_client", "message": f"{type(e).__name__}: {e}"}}, 502)
+                return
+
+            if resp.status in RETRY_STATUSES and attempt < max_retries:
+                delay = retry_delay(attempt, resp.getheader("Retry-After"))
+                try:
+                    resp.read()
+                    self.pool.finish(key, conn, resp)
+                except Exception:
+                    self.pool.finish(key, conn, resp, ok=False)
+                self.scheduler.release(ticket, 0)
+                self.scheduler.count("retries")
+                if resp.status in (429, 529):
+                    self.scheduler.count("rate_limited")
+                time.sleep(delay)
+                continue
+            break
+
+        content_type = resp.getheader("Content-Type", "application/json")
+        if content_type.startswith("text/event-stream"):
+            try:
+                self.relay_stream(key, conn, resp, content_type)
+            finally:
+                self.scheduler.release(ticket)
+            return
+        try:
+            data = resp.read()
+        except Exception as e:
+            self.pool.finish(key, conn, resp, ok=False)
+            self.scheduler.release(ticket, 0)
+            self.send_json({"error": {"type": "ai_client", "message": f"{type(e).__name__}: {e}"}}, 502)
+            return
+        self.pool.finish(key, conn, resp)
+        self.scheduler.release(ticket, usage_tokens(data))
+        self.send_body(resp.status, content_type, data)
+
+    def relay_stream(self, key, conn, resp, content_type):
+        """Relay an SSE body chunk by chunk. If the caller hangs up early (for
+        example once it has parsed enough), drop the upstream connection so
+        the provider stops generating."""
+        self.pool._count("streams")
+        self.send_response(resp.status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while chunk := resp.read1(65536):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.pool._count("streams_aborted")
+            self.pool.finish(key, conn, resp, ok=False)
+            self.close_connection = True
+            return
+        except Exception:
+            self.pool.finish(key, conn, resp, ok=False)
+            self.close_connection = True
+            return
+        self.pool.finish(key, conn, resp)
+
+
+def serve(sock_path):
+    os.makedirs(os.path.dirname(sock_path), exist_ok=True)
+    if os.path.exists(sock_path):
+        os.unlink(sock_path)
+
+    pid_file = os.path.splitext(sock_path)[0] + ".pid"
+    Handler.pool = ConnectionPool()
+    Handler.scheduler = Scheduler()
+    server = UnixHTTPServer(sock_path, Handler)
+    os.chmod(sock_path, 0o600)
+    with open(pid_file, "w") as f:
+        f.write(str(os.getpid()))
+
+    def _shutdown(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        for path in (sock_path, pid_file):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def status(sock_path):
+    """Query the running client over its socket; exit 1 if it is not up."""
+    try:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(2)
+        s.connect(sock_path)
+        s.sendall(b"GET /status HTTP/1.1\r\nHost: ai-client\r\nConnection: close\r\n\r\n")
+        raw = b""
+        while chunk := s.recv(65536):
+            raw += chunk
+        s.close()
+        print(raw.split(b"\r\n\r\n", 1)[1].decode())
+        return 0
+    except (OSError, IndexError):
+        print(json.dumps({"running": False}))
+        return 1
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    sock_path = DEFAULT_SOCKET
+    if "--socket" in args:
+        i = args.index("--socket")
+        sock_path = args[i + 1]
+        del args[i:i + 2]
+    cmd = args[0] if args else "status"
+
+    if cmd == "serve":
+        serve(sock_path)
+    elif cmd == "status":
+        sys.exit(status(sock_path))
+    else:
+        print(__doc__.strip())
+        sys.exit(1)
@@ -8,14 +8,24 @@
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 AUTONOMY_DIR="$(dirname "$SCRIPT_DIR")"
+# Where commands, commits and content hashes run. Parallel sub-agents
+# point this at their own git worktree; state and logs stay here.
+WORKSPACE_DIR="${AUTONOMY_WORKSPACE:-$AUTONOMY_DIR}"
 CONFIG_FILE="$AUTONOMY_DIR/config.json"
 STATE_DIR="$AUTONOMY_DIR/state"
 LOGS_DIR="$AUTONOMY_DIR/logs"
 AI_LOG="$LOGS_DIR/ai-engine.jsonl"
 TERMINAL_LOG="$STATE_DIR/terminal_history.jsonl"
+AI_CLIENT_SOCK="$STATE_DIR/ai-client.sock"
+AI_CLIENT_PID="$STATE_DIR/ai-client.pid"
+AI_CACHE_DIR="$STATE_DIR/ai-cache"
+AI_PROGRESS_DIR="$STATE_DIR/ai_progress"
 
 mkdir -p "$STATE_DIR" "$LOGS_DIR"
 
+# Token ledger writer (append_usage); defines functions only
+source "$SCRIPT_DIR/token-budget.sh"
+
 # ── Configuration ────────────────────────────────────────────
 
 _get_config() {
@@ -79,69 +89,719 @@ get_provider() {
     echo "${provider:-openai}"
 }
 
+# ── HTTP Transport ───────────────────────────────────────────
+
+# Scheduler settings (ai.scheduler.*), shared by the resident client and
+# the direct-curl fallback. AI_RETRY_LIMIT lowers the retry count for one
+# call (ai_call does this when another endpoint can take over).
+_retry_limit() {
+    local n="${AI_RETRY_LIMIT:-}"
+    [[ -n "$n" ]] || n=$(_get_config '.ai.scheduler.max_retries // 4')
+    [[ "$n" =~ ^[0-9]+$ ]] || n=4
+    echo "$n"
+}
+
+# _retry_delay <attempt> <header_file>
+# Seconds before the next try: retry-after if the provider sent one,
+# otherwise full-jitter exponential backoff (1s, 2s, 4s ... capped at 60s)
+_retry_delay() {
+    local attempt="$1" header_file="$2" retry_after
+    retry_after=$(grep -i '^retry-after:' "$header_file" 2>/dev/null | tail -1 | tr -dc '0-9')
+    if [[ -n "$retry_after" ]]; then
+        (( retry_after > 60 )) && retry_after=60
+        echo "$retry_after"
+        return
+    fi
+    local cap=$(( 1 << attempt ))
+    (( cap > 60 )) && cap=60
+    awk -v cap="$cap" -v r="$RANDOM" 'BEGIN { printf "%.2f", cap * r / 32767 }'
+}
+
+# A crashed client leaves its socket behind: only a live pid counts
+_ai_client_alive() {
+    local pid
+    pid=$(cat "$AI_CLIENT_PID" 2>/dev/null)
+    [[ -S "$AI_CLIENT_SOCK" && -n "$pid" ]] && kill -0 "$pid" 2>/dev/null
+}
+
+# _ai_post <url> <json_body> [header...]
+# POSTs via the resident AI client (keep-alive connection pool and request
+# scheduler) when its socket is up; falls back to a one-shot curl
+# otherwise, retrying 429/529/5xx answers itself. AI_PRIORITY picks the
+# client's lane: interactive, normal (default) or background.
+_ai_post() {
+    local url="$1" body="$2"
+    shift 2
+    local headers=() h
+    for h in "$@"; do headers+=(-H "$h"); done
+
+    if [[ "${AI_DIRECT:-0}" != "1" ]] && _ai_client_alive; then
+        local out rc=0
+        # Generous ceiling: the client may queue the request and retry it
+        out=$(curl -s --max-time 600 --unix-socket "$AI_CLIENT_SOCK" "http://ai-client/forward" \
+            -H "X-Upstream-URL: $url" -H "X-Upstream-Timeout: 60" \
+            -H "X-Priority: ${AI_PRIORITY:-normal}" -H "X-Max-Retries: $(_retry_limit)" "${headers[@]}" \
+            --data-binary @- <<< "$body" 2>/dev/null) || rc=$?
+        case "$rc" in
+            0) echo "$out"; return 0 ;;
+            # Socket unreachable (7) or dropped (56): the client never took
+            # the request, so sending it directly cannot duplicate it
+            7|56) ;;
+            # Anything else (e.g. a timeout after the client forwarded and
+            # retried it) must not be replayed against the provider
+            *) return 1 ;;
+        esac
+    fi
+
+    local header_file attempt=0 max_retries out status rc
+    header_file=$(mktemp)
+    max_retries=$(_retry_limit)
+    while :; do
+        rc=0
+        out=$(curl -s --max-time 60 -D "$header_file" -w '\n%{http_code}' "$url" "${headers[@]}" \
+            --data-binary @- <<< "$body" 2>/dev/null) || rc=$?
+        status="${out##*$'\n'}"
+        out="${out%$'\n'*}"
+        case "$status" in
+            429|500|502|503|504|529) ;;
+            # No answer: retry only if the connection never opened (DNS,
+            # refused, TLS handshake). A timeout (28) means the provider may
+            # still be serving the request; sending it again doubles the cost.
+            000) [[ "$rc" == 6 || "$rc" == 7 || "$rc" == 35 ]] || break ;;
+            *) break ;;
+        esac
+        (( attempt >= max_retries )) && break
+        sleep "$(_retry_delay "$attempt" "$header_file")"
+        attempt=$((attempt + 1))
+    done
+    rm -f "$header_file"
+    echo "$out"
+}
+
+# _ai_stream <url> <json_body> [header...]
+# Like _ai_post but unbuffered (curl -N) so SSE events flow through as they
+# arrive. The reader may hang up early; curl then exits on SIGPIPE.
+_ai_stream() {
+    local url="$1" body="$2"
+    shift 2
+    local headers=() h
+    for h in "$@"; do headers+=(-H "$h"); done
+
+    if [[ "${AI_DIRECT:-0}" != "1" ]] && _ai_client_alive; then
+        curl -sN --max-time 600 --unix-socket "$AI_CLIENT_SOCK" "http://ai-client/forward" \
+            -H "X-Upstream-URL: $url" -H "X-Upstream-Timeout: 60" \
+            -H "X-Priority: ${AI_PRIORITY:-normal}" -H "X-Max-Retries: $(_retry_limit)" "${headers[@]}" \
+            --data-binary @- <<< "$body" 2>/dev/null
+        return
+    fi
+
+    curl -sN --max-time 120 "$url" "${headers[@]}" --data-binary @- <<< "$body" 2>/dev/null
+}
+
+# Stream when working on a task (AI_TASK set) unless ai.stream is false
+_stream_enabled() {
+    [[ -n "${AI_TASK:-}" ]] && [[ "$(_get_config '.ai.stream')" != "false" ]]
+}
+
+# ai_client {start|stop|status}
+# Manage the resident AI client (lib/ai-client.py)
+ai_client() {
+    case "${1:-status}" in
+        start)
+            if [[ -S "$AI_CLIENT_SOCK" ]] && python3 "$SCRIPT_DIR/ai-client.py" status --socket "$AI_CLIENT_SOCK" >/dev/null 2>&1; then
+                echo "AI client already running (PID: $(cat "$AI_CLIENT_PID" 2>/dev/null))"
+                return 0
+            fi
+            # A crashed client leaves its socket behind; don't mistake it for the new one
+            rm -f "$AI_CLIENT_SOCK"
+            AI_CLIENT_MAX_CONCURRENT="$(_get_config '.ai.scheduler.max_concurrent // 4')" \
+            AI_CLIENT_TOKENS_PER_MINUTE="$(_get_config '.ai.scheduler.tokens_per_minute // 0')" \
+            AI_CLIENT_MAX_RETRIES="$(_retry_limit)" \
+                nohup python3 "$SCRIPT_DIR/ai-client.py" serve --socket "$AI_CLIENT_SOCK" >> "$LOGS_DIR/ai-client.log" 2>&1 &
+            local i
+            for i in 1 2 3 4 5 6 7 8 9 10; do
+                [[ -S "$AI_CLIENT_SOCK" ]] && break
+                sleep 0.2
+            done
+            if [[ -S "$AI_CLIENT_SOCK" ]]; then
+                echo "AI client started (PID: $(cat "$AI_CLIENT_PID" 2>/dev/null))"
+            else
+                echo "ERROR: AI client failed to start — check logs/ai-client.log"
+                return 1
+            fi
+            ;;
+        stop)
+            local pid
+            pid=$(cat "$AI_CLIENT_PID" 2>/dev/null)
+            if [[ -n "$pid" ]] && kill -0 "$pid" 2>/dev/null; then
+                kill "$pid" 2>/dev/null
+                echo "AI client stopped"
+            else
+                echo "AI client not running"
+            fi
+            rm -f "$AI_CLIENT_SOCK" "$AI_CLIENT_PID"
+            ;;
+        status)
+            python3 "$SCRIPT_DIR/ai-client.py" status --socket "$AI_CLIENT_SOCK"
+            ;;
+        *)
+            echo "Usage: ai-engine.sh client {start|stop|status}"
+            return 1
+            ;;
+    esac
+}
+
+# ── Response Cache ───────────────────────────────────────────
+# Opt-in via ai.cache.enabled. Entries are content-addressed by provider,
+# model, system prompt, user prompt and max_tokens. Callers set
+# AI_CALL_TYPE to pick a TTL from ai.cache.ttl_seconds, or AI_NO_CACHE=1
+# for calls that must always reach the provider. Verdicts on the code
+# (AI_CACHE_WORKSPACE_TYPES) are also keyed on the workspace content, so
+# an edit invalidates them; they are not cached when it cannot be hashed.
+
+declare -A AI_CACHE_DEFAULT_TTL=(
+    [default]=3600 [analyze]=1800 [verify]=86400 [criteria]=86400 [failure]=86400 [commit]=600
+)
+declare -A AI_CACHE_WORKSPACE_TYPES=( [verify]=1 [criteria]=1 )
+
+_cache_enabled() {
+    [[ "${AI_NO_CACHE:-0}" != "1" ]] && [[ "$(_get_config '.ai.cache.enabled // false')" == "true" ]]
+}
+
+_cache_key() {
+    printf '%s\0' "$@" | sha256sum | cut -d' ' -f1
+}
+
+_cache_ttl() {
+    local call_type="$1" ttl
+    ttl=$(_get_config ".ai.cache.ttl_seconds[\"$call_type\"] // .ai.cache.ttl_seconds.default // empty")
+    [[ "$ttl" =~ ^[0-9]+$ ]] || ttl="${AI_CACHE_DEFAULT_TTL[$call_type]:-${AI_CACHE_DEFAULT_TTL[default]}}"
+    echo "$ttl"
+}
+
+_cache_event() {
+    mkdir -p "$AI_CACHE_DIR"
+    echo "$(date +%s) $1 ${2:-0} ${3:-default}" >> "$AI_CACHE_DIR/events.log"
+}
+
+# _cache_get <key> <call_type> — prints the cached response, returns 1 on miss
+_cache_get() {
+    local key="$1" call_type="$2"
+    local entry="$AI_CACHE_DIR/${key}.json"
+    if [[ ! -f "$entry" ]]; then
+        _cache_event miss 0 "$call_type"
+        return 1
+    fi
+
+    local created tokens ttl
+    read -r created tokens < <(jq -r '"\(.created_epoch // 0) \(.tokens // 0)"' "$entry" 2>/dev/null)
+    ttl=$(_cache_ttl "$call_type")
+    if [[ $(( $(date +%s) - ${created:-0} )) -ge "$ttl" ]]; then
+        rm -f "$entry"
+        _cache_event miss 0 "$call_type"
+        return 1
+    fi
+
+    touch "$entry"  # LRU recency is the file mtime
+    _cache_event hit "${tokens:-0}" "$call_type"
+    jq -r '.response' "$entry"
+}
+
+# _cache_put <key> <call_type> <response> <tokens>
+_cache_put() {
+    local key="$1" call_type="$2" response="$3" tokens="$4"
+    mkdir -p "$AI_CACHE_DIR"
+    local tmp="$AI_CACHE_DIR/.${key}.tmp.$$"
+    jq -n --arg r "$response" --arg t "$call_type" --argjson tok "${tokens:-0}" \
+        --argjson now "$(date +%s)" \
+        '{created_epoch:$now, call_type:$t, tokens:$tok, response:$r}' > "$tmp" \
+        && mv "$tmp" "$AI_CACHE_DIR/${key}.json"
+    _cache_evict
+}
+
+# Drop least-recently-used entries beyond ai.cache.max_entries / max_bytes,
+# and fold the hit/miss event log into totals once it grows large.
+_cache_evict() {
+    local max_entries max_bytes
+    max_entries=$(_get_config '.ai.cache.max_entries // 500')
+    max_bytes=$(_get_config '.ai.cache.max_bytes // 5242880')
+
+    find "$AI_CACHE_DIR" -maxdepth 1 -name '*.json' ! -name 'totals.json' -printf '%T@ %s %p\n' 2>/dev/null \
+        | sort -rn \
+        | awk -v me="$max_entries" -v mb="$max_bytes" '{ n++; total += $2; if (n > me || total > mb) print $3 }' \
+        | xargs -r rm -f
+
+    local events="$AI_CACHE_DIR/events.log"
+    if [[ -f "$events" && $(wc -l < "$events") -gt 5000 ]]; then
+        local folding="$events.fold.$$"
+        mv "$events" "$folding" 2>/dev/null || return 0
+        local totals
+        totals=$(_cache_totals "$folding")
+        echo "$totals" > "$AI_CACHE_DIR/totals.json"
+        rm -f "$folding"
+    fi
+}
+
+# _cache_totals [events_file] — folded totals plus the given (or live) event log
+_cache_totals() {
+    local events="${1:-$AI_CACHE_DIR/events.log}"
+    local base='{"hits":0,"misses":0,"tokens_saved":0}'
+    [[ -f "$AI_CACHE_DIR/totals.json" ]] && base=$(cat "$AI_CACHE_DIR/totals.json")
+    local counts
+    counts=$(awk '$2 == "hit" { h++; t += $3 } $2 == "miss" { m++ } END { printf "%d %d %d", h, m, t }' "$events" 2>/dev/null)
+    read -r h m t <<< "${counts:-0 0 0}"
+    echo "$base" | jq -c --argjson h "${h:-0}" --argjson m "${m:-0}" --argjson t "${t:-0}" \
+        '{hits: (.hits + $h), misses: (.misses + $m), tokens_saved: (.tokens_saved + $t)}'
+}
+
+ai_cache_stats() {
+    local enabled entries=0 bytes=0
+    enabled=$(_get_config '.ai.cache.enabled // false')
+    if [[ -d "$AI_CACHE_DIR" ]]; then
+        read -r entries bytes < <(find "$AI_CACHE_DIR" -maxdepth 1 -name '*.json' ! -name 'totals.json' -printf '%s\n' \
+            | awk '{ n++; b += $1 } END { printf "%d %d", n, b }')
+    fi
+    _cache_totals | jq --argjson enabled "${enabled:-false}" --argjson e "${entries:-0}" --argjson b "${bytes:-0}" \
+        '. + {enabled:$enabled, entries:$e, bytes:$b,
+              hit_rate: (if (.hits + .misses) > 0 then ((.hits * 1000 / (.hits + .misses)) | floor) / 1000 else 0 end)}'
+}
+
+ai_cache_clear() {
+    rm -rf "$AI_CACHE_DIR"
+    echo "AI response cache cleared"
+}
+
+# ── Provider Endpoints ───────────────────────────────────────
+# ai.providers is an ordered list of endpoints:
+#   [{"name": "primary", "provider": "anthropic", "api_url": "...",
+#     "model": "...", "api_key": "..." | "api_key_env": "VAR"}, ...]
+# Without it the single ai.provider/api_url/model/api_key is used. Each
+# request outcome is appended to state/ai-health.log; ai_call tries the
+# healthiest endpoint first and fails over down the list.
+
+AI_HEALTH_LOG="$STATE_DIR/ai-health.log"
+
+# Configured endpoints as a JSON array (entries without a key are skipped)
+_ai_endpoints() {
+    local count
+    count=$(_get_config '.ai.providers | if type == "array" then length else 0 end')
+    if [[ "${count:-0}" -gt 0 ]]; then
+        local fallback_key
+        fallback_key=$(get_api_key 2>/dev/null)
+        jq -c --arg key "$fallback_key" '
+            .ai.providers | to_entries | map(.key as $i | .value as $p
+              | ($p.provider // "openai") as $prov
+              | {
+                  index: $i,
+                  name: (($p.name // "\($prov)-\($i)") | gsub("\\s"; "_")),
+                  provider: $prov,
+                  api_url: ($p.api_url // (if $prov == "anthropic" then "https://api.anthropic.com/v1/messages"
+                                           else "https://api.openai.com/v1/chat/completions" end)),
+                  model: ($p.model // (if $prov == "anthropic" then "claude-sonnet-4-20250514" else "gpt-4o-mini" end)),
+                  api_key: ((if $p.api_key_env then env[$p.api_key_env] else null end) // $p.api_key // $key)
+                })
+            | map(select(.api_key != null and .api_key != ""))' "$CONFIG_FILE" 2>/dev/null || echo "[]"
+        return
+    fi
+
+    local key
+    key=$(get_api_key) || { echo "[]"; return; }
+    jq -nc --arg key "$key" --arg url "$(get_api_url)" --arg model "$(get_model)" --arg prov "$(get_provider)" \
+        '[{index: 0, name: "default", provider: $prov, api_url: $url, model: $model, api_key: $key}]'
+}
+
+# _health_record <endpoint> <ok|fail> <latency_ms> <call_type>
+_health_record() {
+    echo "$(date +%s) $1 $2 $3 ${4:-default}" >> "$AI_HEALTH_LOG"
+    # Keep the log bounded; health only looks at recent outcomes
+    if [[ $(wc -l < "$AI_HEALTH_LOG") -gt 5000 ]]; then
+        local tmp="${AI_HEALTH_LOG}.tmp.$$"
+        tail -n 1000 "$AI_HEALTH_LOG" > "$tmp" && mv "$tmp" "$AI_HEALTH_LOG"
+    fi
+}
+
+# Per-endpoint health from the last 1000 outcomes:
+# {name: {requests, failure_rate, consecutive_failures, last_failure,
+#         ewma_ms, p95_ms: {call_type: ms}}}
+# p95 is only reported once a call type has 5 successful samples.
+_health_stats() {
+    [[ -f "$AI_HEALTH_LOG" ]] || { echo "{}"; return; }
+    tail -n 1000 "$AI_HEALTH_LOG" | jq -R -s -c '
+        split("\n") | map(select(length > 0) | split(" ") | select(length >= 4)
+            | {ts: (.[0] | tonumber), name: .[1], ok: (.[2] == "ok"), ms: (.[3] | tonumber), type: (.[4] // "default")})
+        | group_by(.name)
+        | map(. as $ev | ($ev[-50:]) as $recent | {key: $ev[0].name, value: {
+            requests: ($ev | length),
+            failure_rate: (($recent | map(select(.ok | not)) | length) / ($recent | length) * 100 | round / 100),
+            consecutive_failures: (reduce $ev[] as $e (0; if $e.ok then 0 else . + 1 end)),
+            last_failure: ([$ev[] | select(.ok | not) | .ts] | max // 0),
+            ewma_ms: (reduce ($ev[] | select(.ok) | .ms) as $m (null; if . == null then $m else 0.8 * . + 0.2 * $m end)
+                      | if . == null then null else floor end),
+            p95_ms: ($ev | map(select(.ok)) | group_by(.type) | map(select(length >= 5)
+                     | (map(.ms)[-50:] | sort) as $s
+                     | {key: .[0].type, value: $s[([($s | length) * 0.95 | floor, ($s | length) - 1] | min)]})
+                     | from_entries)
+          }}) | from_entries'
+}
+
+# Endpoints ordered healthiest first. An endpoint with 3+ consecutive
+# failures cools down (30s, doubling up to 8min) and sorts last; the rest
+# sort by latency weighted by recent error rate, then config order.
+# Unmeasured endpoints score like the best measured one, so config order
+# decides between them.
+_ai_ordered_endpoints() {
+    local endpoints health
+    endpoints=$(_ai_endpoints)
+    health=$(_health_stats)
+    echo "$endpoints" | jq -c --argjson health "$health" --argjson now "$(date +%s)" '
+        map(. as $e | ($health[$e.name] // {}) as $h | $e + {
+            cooldown: ((($h.consecutive_failures // 0) >= 3)
+                       and (($now - ($h.last_failure // 0)) < (30 * pow(2; ([($h.consecutive_failures // 3) - 3, 4] | min))))),
+            ewma_ms: $h.ewma_ms,
+            failure_rate: ($h.failure_rate // 0),
+            p95_ms: ($h.p95_ms // {})
+        })
+        | ([.[] | .ewma_ms | select(. != null)] | min // 0) as $best
+        | sort_by([.cooldown, ((.ewma_ms // $best) * (1 + 4 * .failure_rate)), .index])'
+}
+
+_hedge_enabled() {
+    [[ "$(_get_config '.ai.hedge.enabled')" == "true" ]]
+}
+
+# _prompt_cache_system <system_prompt>
+# true when the system prompt should be sent as a cacheable block: it is
+# the stable prefix of every request (callers keep task-specific text in
+# the user prompt). Off with ai.prompt_cache.enabled=false; prefixes under
+# ai.prompt_cache.min_tokens (default 1024) are below what providers cache.
+_prompt_cache_system() {
+    local enabled min
+    IFS=$'\t' read -r enabled min \
+        < <(_get_config '.ai.prompt_cache // {} | [(.enabled | tostring), .min_tokens // 1024] | @tsv')
+    [[ "$min" =~ ^[0-9]+$ ]] || min=1024
+    if [[ "$enabled" != "false" ]] && (( ${#1} / 4 >= min )); then
+        echo true
+    else
+        echo false
+    fi
+}
+
+# _ai_attempt <endpoint_json> <system_prompt> <user_prompt> <max_tokens> <call_type>
+# One request to one endpoint. Prints {endpoint, provider, model, text,
+# input_tokens, output_tokens, cache_read_tokens, cache_write_tokens,
+# latency_ms, stream} and records the outcome in the health log. Returns
+# non-zero if no text came back. input_tokens excludes prompt-cache reads
+# and writes, which are reported apart.
+_ai_attempt() {
+    local endpoint="$1" system_prompt="$2" user_prompt="$3" max_tokens="$4" call_type="$5"
+
+    local name provider api_url api_key model
+    IFS=$'\t' read -r name provider api_url api_key model \
+        < <(echo "$endpoint" | jq -r '[.name, .provider, .api_url, .api_key, .model] | @tsv')
+
+    local body headers=()
+    if [[ "$provider" == "anthropic" ]]; then
+        body=$(jq -n \
+            --arg model "$model" \
+            --arg sys "$system_prompt" \
+            --arg usr "$user_prompt" \
+            --argjson mt "$max_tokens" \
+            --argjson cache "$(_prompt_cache_system "$system_prompt")" \
+            '{model:$model, max_tokens:$mt,
+              system:(if $cache then [{type:"text", text:$sys, cache_control:{type:"ephemeral"}}] else $sys end),
+              messages:[{role:"user",content:$usr}]}')
+        headers=("x-api-key: $api_key" "anthropic-version: 2023-06-01" "content-type: application/json")
+    else
+        # OpenAI-compatible (works with OpenAI, local LLMs, OpenRouter, etc.)
+        body=$(jq -n \
+            --arg model "$model" \
+            --arg sys "$system_prompt" \
+            --arg usr "$user_prompt" \
+            --argjson mt "$max_tokens" \
+            '{model:$model, max_tokens:$mt, messages:[{role:"system",content:$sys},{role:"user",content:$usr}]}')
+        headers=("Authorization: Bearer $api_key" "Content-Type: application/json")
+    fi
+
+    local response=""
+    local input_tokens=0 output_tokens=0 cache_read=0 cache_write=0
+    local stream_stats='{}'
+    local started
+    started=$(date +%s%N)
+
+    if _stream_enabled; then
+        # Stream deltas into the task's progress file as they arrive
+        local progress_file="$AI_PROGRESS_DIR/${AI_TASK:-adhoc}.log"
+        local metrics_file="$AI_PROGRESS_DIR/.metrics.$BASHPID"
+        mkdir -p "$AI_PROGRESS_DIR"
+        echo "--- ${call_type} $(date -Iseconds) ---" >> "$progress_file"
+
+        local stream_args=(--provider "$provider" --progress "$progress_file" --metrics "$metrics_file")
+        [[ "${AI_STOP_ON_JSON:-0}" == "1" ]] && stream_args+=(--stop-on-json-array)
+
+        if [[ "$provider" == "anthropic" ]]; then
+            body=$(echo "$body" | jq -c '.stream = true')
+        else
+            body=$(echo "$body" | jq -c '.stream = true | .stream_options = {include_usage: true}')
+        fi
+
+        response=$(_ai_stream "$api_url" "$body" "${headers[@]}" \
+            | python3 "$SCRIPT_DIR/ai-stream.py" "${stream_args[@]}" 2>/dev/null)
+
+        if [[ -f "$metrics_file" ]]; then
+            stream_stats=$(jq -c '{first_token_ms, tokens_per_sec, aborted_early, streamed}' "$metrics_file" 2>/dev/null || echo '{}')
+            read -r input_tokens output_tokens cache_read cache_write < <(jq -r \
+                '"\(.input_tokens // 0) \(.output_tokens // 0) \(.cache_read_tokens // 0) \(.cache_write_tokens // 0)"' \
+                "$metrics_file" 2>/dev/null)
+            rm -f "$metrics_file"
+        fi
+    else
+        local raw
+        raw=$(_ai_post "$api_url" "$body" "${headers[@]}")
+        if [[ "$provider" == "anthropic" ]]; then
+            response=$(echo "$raw" | jq -r '.content[0].text // ""' 2>/dev/null)
+            read -r input_tokens output_tokens cache_read cache_write < <(echo "$raw" | jq -r \
+                '.usage // {} | "\(.input_tokens // 0) \(.output_tokens // 0) \(.cache_read_input_tokens // 0) \(.cache_creation_input_tokens // 0)"' 2>/dev/null)
+        else
+            response=$(echo "$raw" | jq -r '.choices[0].message.content // ""' 2>/dev/null)
+            # prompt_tokens includes cached tokens here; keep input_tokens to the uncached part
+            read -r input_tokens output_tokens cache_read < <(echo "$raw" | jq -r \
+                '.usage // {} | (.prompt_tokens_details.cached_tokens // 0) as $c
+                 | "\((.prompt_tokens // 0) - $c) \(.completion_tokens // 0) \($c)"' 2>/dev/null)
+        fi
+    fi
+    [[ "$input_tokens" =~ ^[0-9]+$ ]] || input_tokens=0
+    [[ "$output_tokens" =~ ^[0-9]+$ ]] || output_tokens=0
+    [[ "$cache_read" =~ ^[0-9]+$ ]] || cache_read=0
+    [[ "$cache_write" =~ ^[0-9]+$ ]] || cache_write=0
+
+    local latency_ms=$(( ($(date +%s%N) - started) / 1000000 ))
+    if [[ -n "$response" ]]; then
+        _health_record "$name" ok "$latency_ms" "$call_type"
+    else
+        _health_record "$name" fail "$latency_ms" "$call_type"
+    fi
+
+    jq -nc \
+        --arg endpoint "$name" \
+        --arg provider "$provider" \
+        --arg model "$model" \
+        --arg text "$response" \
+        --argjson in_tok "$input_tokens" \
+        --argjson out_tok "$output_tokens" \
+        --argjson cache_read "$cache_read" \
+        --argjson cache_write "$cache_write" \
+        --argjson ms "$latency_ms" \
+        --argjson stream "$stream_stats" \
+        '{endpoint:$endpoint, provider:$provider, model:$model, text:$text, input_tokens:$in_tok,
+          output_tokens:$out_tok, cache_read_tokens:$cache_read, cache_write_tokens:$cache_write,
+          latency_ms:$ms, stream:$stream}'
+    [[ -n "$response" ]]
+}
+
+# Kill a process and its descendants
+_kill_tree() {
+    local child
+    for child in $(pgrep -P "$1" 2>/dev/null); do
+        _kill_tree "$child"
+    done
+    kill "$1" 2>/dev/null
+}
+
+# _cancel_curls <pid> — kill the curl processes below pid. Each leg of a
+# hedge talks to its provider directly (AI_DIRECT=1), so closing its curl
+# cancels the upstream request; the rest of the leg still reports the
+# usage that arrived before the cancel.
+_cancel_curls() {
+    local child
+    for child in $(pgrep -P "$1" 2>/dev/null); do
+        _cancel_curls "$child"
+        [[ "$(ps -o comm= -p "$child" 2>/dev/null)" == "curl" ]] && kill "$child" 2>/dev/null
+    done
+}
+
+# _ai_hedged <endpoints_json> <system_prompt> <user_prompt> <max_tokens> <call_type>
+# Send to the first endpoint. If it has not answered within its p95 latency
+# for this call type, or fails early, send the same request to the second
+# endpoint. Use whichever answers first and cancel the other. A hedge is
+# only sent when the remaining daily budget covers both requests. Both
+# legs bypass the resident client, which cannot cancel a relayed request;
+# the loser is charged the usage it reported, or its estimated input size
+# when it was cancelled before any arrived.
+# Returns non-zero (printing nothing) when it did not hedge or both failed.
+_ai_hedged() {
+    local endpoints="$1" system_prompt="$2" user_prompt="$3" max_tokens="$4" call_type="$5"
+
+    local primary secondary delay_ms
+    primary=$(echo "$endpoints" | jq -c '.[0]')
+    secondary=$(echo "$endpoints" | jq -c '.[1] | select(.cooldown | not)')
+    [[ -n "$secondary" ]] || return 1
+    delay_ms=$(echo "$primary" | jq -r --arg t "$call_type" '.p95_ms[$t] // empty')
+    [[ -n "$delay_ms" ]] || return 1
+    local min_delay
+    min_delay=$(_get_config '.ai.hedge.min_delay_ms // 200')
+    (( delay_ms < min_delay )) && delay_ms=$min_delay
+
+    local input_estimate=$(( (${#system_prompt} + ${#user_prompt}) / 4 ))
+    local estimate=$(( input_estimate + max_tokens ))
+    if [[ -f "$AUTONOMY_DIR/lib/token-budget.sh" ]]; then
+        local remaining
+        remaining=$(bash "$AUTONOMY_DIR/lib/token-budget.sh" remaining 2>/dev/null)
+        [[ "$remaining" =~ ^-?[0-9]+$ ]] && (( remaining < 2 * estimate )) && return 1
+    fi
+
+    local dir
+    dir=$(mktemp -d)
+    local pids=()
+    ( export AI_DIRECT=1
+      _ai_attempt "$primary" "$system_prompt" "$user_prompt" "$max_tokens" "$call_type"
+      echo $? > "$dir/0.rc" ) > "$dir/0.out" &
+    pids[0]=$!
+
+    local started hedged=false winner="" i
+    started=$(date +%s%N)
+    while :; do
+        for i in 0 1; do
+            [[ -f "$dir/$i.rc" && -z "$winner" && "$(cat "$dir/$i.rc")" == "0" ]] && winner=$i
+        done
+        [[ -n "$winner" ]] && break
+
+        if [[ "$hedged" == "false" ]]; then
+            if [[ -f "$dir/0.rc" ]] || (( ($(date +%s%N) - started) / 1000000 >= delay_ms )); then
+                ( export AI_DIRECT=1
+                  _ai_attempt "$secondary" "$system_prompt" "$user_prompt" "$max_tokens" "$call_type"
+                  echo $? > "$dir/1.rc" ) > "$dir/1.out" &
+                pids[1]=$!
+                hedged=true
+            fi
+        elif [[ -f "$dir/0.rc" && -f "$dir/1.rc" ]]; then
+            break
+        fi
+        sleep 0.05
+    done
+
+    if [[ -z "$winner" ]]; then
+        rm -rf "$dir"
+        return 1
+    fi
+
+    # Cancel the slower request and charge what it used
+    local loser=$(( 1 - winner )) loser_tokens=0
+    if [[ -n "${pids[$loser]:-}" ]]; then
+        local cancelled=false
+        if [[ ! -f "$dir/$loser.rc" ]]; then
+            cancelled=true
+            _cancel_curls "${pids[$loser]}"
+            # Let it report what arrived; one waiting out a retry delay has
+            # nothing in flight and is killed outright
+            for i in {1..20}; do
+                [[ -f "$dir/$loser.rc" ]] && break
+                sleep 0.05
+            done
+            [[ -f "$dir/$loser.rc" ]] || _kill_tree "${pids[$loser]}"
+        fi
+        wait "${pids[$loser]}" 2>/dev/null
+        loser_tokens=$(jq -r '.input_tokens + .output_tokens + .cache_read_tokens + .cache_write_tokens' \
+            "$dir/$loser.out" 2>/dev/null)
+        [[ "$loser_tokens" =~ ^[0-9]+$ ]] || loser_tokens=0
+        [[ "$cancelled" == "true" ]] && (( loser_tokens == 0 )) && loser_tokens=$input_estimate
+    fi
+    wait "${pids[$winner]}" 2>/dev/null
+    (( loser_tokens > 0 )) && _ledger_append "$loser_tokens" "$(echo "$endpoints" | jq -r ".[$loser].model")" "$call_type"
+
+    jq -c --argjson hedged "$hedged" --argjson delay "$delay_ms" --argjson extra "$loser_tokens" \
+        '. + {hedge: {hedged: $hedged, delay_ms: $delay, extra_tokens: $extra}}' "$dir/$winner.out"
+    rm -rf "$dir"
+}
+
+# _publish_progress <event_json> — when running as a supervised sub-agent
+# (AGENT_ID and AGENT_EVENT_SOCK set by agent-supervisor.py), send a
+# progress event to the parent's live view; a no-op otherwise
+_publish_progress() {
+    [[ -n "${AGENT_ID:-}" && -S "${AGENT_EVENT_SOCK:-}" ]] || return 0
+    echo "$1" | jq -c --arg a "$AGENT_ID" '. + {agent: $a}' 2>/dev/null |
+        curl -sf --max-time 2 --unix-socket "$AGENT_EVENT_SOCK" -H 'Content-Type: application/json' \
+            --data-binary @- http://agent-supervisor/events >/dev/null 2>&1 || true
+}
+
+# _ledger_append <tokens> <model> <call_type> [cache_read] [cache_write]
+# One O_APPEND line in the token ledger via token-budget.sh append_usage;
+# the budget rollup picks it up on the next check, so no state file is
+# rewritten here.
+_ledger_append() {
+    local tokens="$1"
+    [[ "$tokens" =~ ^[0-9]+$ ]] && (( tokens > 0 )) || return 0
+    append_usage "$tokens" "${2:--}" "${AI_TASK:--}" "${3:--}" "${4:-0}" "${5:-0}" 2>/dev/null
+    _publish_progress "{\"tokens\":$tokens}"
+}
+
 # ── Core API Call ────────────────────────────────────────────
 
 # ai_call <system_prompt> <user_prompt> [max_tokens]
 # Returns: response text on stdout, logs usage
+# Env: AI_CALL_TYPE (cache TTL class), AI_NO_CACHE=1 (bypass cache),
+#      AI_TASK (stream into state/ai_progress/<task>.log),
+#      AI_STOP_ON_JSON=1 (end the stream once a JSON array has arrived)
 ai_call() {
     local system_prompt="$1"
     local user_prompt="$2"
     local max_tokens="${3:-1024}"
 
-    local api_key api_url model provider
-    api_key=$(get_api_key) || {
+    local endpoints count
+    endpoints=$(_ai_ordered_endpoints)
+    count=$(echo "$endpoints" | jq 'length' 2>/dev/null)
+    if [[ "${count:-0}" -eq 0 ]]; then
         echo "ERROR: No API key configured. Set ai.api_key in config.json or AUTONOMY_AI_KEY env var."
         return 1
-    }
-    api_url=$(get_api_url)
-    model=$(get_model)
-    provider=$(get_provider)
+    fi
 
-    local response=""
-    local input_tokens=0 output_tokens=0
+    local call_type="${AI_CALL_TYPE:-default}" cache_key=""
+    if _cache_enabled; then
+        # Keyed on the primary endpoint so failover does not split the cache
+        local primary workspace=()
+        primary=$(_ai_endpoints | jq -c '.[0]')
+        if [[ -z "${AI_CACHE_WORKSPACE_TYPES[$call_type]:-}" ]] || workspace=("$(_workspace_hash)"); then
+            cache_key=$(_cache_key "$(echo "$primary" | jq -r '.provider')" "$(echo "$primary" | jq -r '.model')" \
+                "$system_prompt" "$user_prompt" "$max_tokens" "${workspace[@]}")
+            _cache_get "$cache_key" "$call_type" && return 0
+        fi
+    fi
 
-    if [[ "$provider" == "anthropic" ]]; then
-        response=$(curl -s --max-time 60 "$api_url" \
-            -H "x-api-key: $api_key" \
-            -H "anthropic-version: 2023-06-01" \
-            -H "content-type: application/json" \
-            -d "$(jq -n \
-                --arg model "$model" \
-                --arg sys "$system_prompt" \
-                --arg usr "$user_prompt" \
-                --argjson mt "$max_tokens" \
-                '{model:$model, max_tokens:$mt, system:$sys, messages:[{role:"user",content:$usr}]}'
-            )" 2>/dev/null)
-
-        local text
-        text=$(echo "$response" | jq -r '.content[0].text // ""' 2>/dev/null)
-        input_tokens=$(echo "$response" | jq -r '.usage.input_tokens // 0' 2>/dev/null)
-        output_tokens=$(echo "$response" | jq -r '.usage.output_tokens // 0' 2>/dev/null)
-        response="$text"
-    else
-        # OpenAI-compatible (works with OpenAI, local LLMs, OpenRouter, etc.)
-        local raw
-        raw=$(curl -s --max-time 60 "$api_url" \
-            -H "Authorization: Bearer $api_key" \
-            -H "Content-Type: application/json" \
-            -d "$(jq -n \
-                --arg model "$model" \
-                --arg sys "$system_prompt" \
-                --arg usr "$user_prompt" \
-                --argjson mt "$max_tokens" \
-                '{model:$model, max_tokens:$mt, messages:[{role:"system",content:$sys},{role:"user",content:$usr}]}'
-            )" 2>/dev/null)
-
-        response=$(echo "$raw" | jq -r '.choices[0].message.content // ""' 2>/dev/null)
-        input_tokens=$(echo "$raw" | jq -r '.usage.prompt_tokens // 0' 2>/dev/null)
-        output_tokens=$(echo "$raw" | jq -r '.usage.completion_tokens // 0' 2>/dev/null)
+    local result="" attempts=0 i
+    if (( count > 1 )) && ! _stream_enabled && _hedge_enabled; then
+        result=$(_ai_hedged "$endpoints" "$system_prompt" "$user_prompt" "$max_tokens" "$call_type") || result=""
+        [[ -n "$result" ]] && attempts=2
     fi
+    if [[ -z "$result" ]]; then
+        for ((i = 0; i < count; i++)); do
+            attempts=$((attempts + 1))
+            # Fail over quickly while another endpoint is left to try
+            local retry_limit="${AI_RETRY_LIMIT:-}"
+            (( i < count - 1 )) && retry_limit=1
+            result=$(AI_RETRY_LIMIT="$retry_limit" _ai_attempt "$(echo "$endpoints" | jq -c ".[$i]")" \
+                "$system_prompt" "$user_prompt" "$max_tokens" "$call_type") && break
+        done
+    fi
+
+    local response provider model input_tokens output_tokens cache_read cache_write
+    response=$(echo "$result" | jq -r '.text // ""')
+    IFS=$'\t' read -r provider model input_tokens output_tokens cache_read cache_write \
+        < <(echo "$result" | jq -r '[.provider // "", .model // "", .input_tokens // 0, .output_tokens // 0,
+                                     .cache_read_tokens // 0, .cache_write_tokens // 0] | @tsv')
+    [[ "$input_tokens" =~ ^[0-9]+$ ]] || input_tokens=0
+    [[ "$output_tokens" =~ ^[0-9]+$ ]] || output_tokens=0
+    [[ "$cache_read" =~ ^[0-9]+$ ]] || cache_read=0
+    [[ "$cache_write" =~ ^[0-9]+$ ]] || cache_write=0
+
+    # Prompt-cache reads and writes still pass through the model, so they
+    # count as input here and against the budget like any other token
+    local prompt_tokens=$((input_tokens + cache_read + cache_write))
+
+    # Callers that meter their own work (e.g. verify_task) collect usage here
+    [[ -n "${AI_USAGE_FILE:-}" ]] && echo "$prompt_tokens $output_tokens" >> "$AI_USAGE_FILE"
 
     # Record token usage
-    local total_tokens=$((input_tokens + output_tokens))
-    if [[ "$total_tokens" -gt 0 && -f "$AUTONOMY_DIR/lib/token-budget.sh" ]]; then
-        bash "$AUTONOMY_DIR/lib/token-budget.sh" record "$total_tokens" >/dev/null 2>&1
-    fi
+    local total_tokens=$((prompt_tokens + output_tokens))
+    _ledger_append "$total_tokens" "$model" "$call_type" "$cache_read" "$cache_write"
 
     # Log the call
     jq -n \
@@ -149,10 +809,23 @@ ai_call() {
         --arg model "$model" \
         --argjson in_tok "$input_tokens" \
         --argjson out_tok "$output_tokens" \
+        --argjson cache_read "$cache_read" \
+        --argjson cache_write "$cache_write" \
         --arg provider "$provider" \
-        '{timestamp:$ts, provider:$provider, model:$model, input_tokens:$in_tok, output_tokens:$out_tok, total:($in_tok+$out_tok)}' \
+        --argjson attempts "$attempts" \
+        --argjson result "${result:-{\}}" \
+        '{timestamp:$ts, provider:$provider, model:$model, input_tokens:$in_tok, output_tokens:$out_tok,
+          cache_read_tokens:$cache_read, cache_write_tokens:$cache_write,
+          total:($in_tok+$cache_read+$cache_write+$out_tok)}
+         + ($result.stream // {})
+         + {endpoint: $result.endpoint, latency_ms: $result.latency_ms, attempts: $attempts}
+         + (if $result.hedge then {hedge: $result.hedge} else {} end)' \
         >> "$AI_LOG" 2>/dev/null
 
+    if [[ -n "$cache_key" && -n "$response" && "$response" != "ERROR:"* ]]; then
+        _cache_put "$cache_key" "$call_type" "$response" "$total_tokens"
+    fi
+
     echo "$response"
 }
 
@@ -182,6 +855,26 @@ ai_analyze_task() {
 
 Be specific and actionable. Use the workspace context to tailor your plan."
 
+    # Fit description, workspace and task JSON (which grows with every
+    # attempt) into the analyze token ceiling
+    local packer="$SCRIPT_DIR/context-packer.sh"
+    if [[ -f "$packer" ]]; then
+        local pack_file packed reserved
+        pack_file=$(mktemp)
+        rm -f "$pack_file"
+        echo "$desc" | bash "$packer" add "$pack_file" description 1 600 head
+        echo "$task_json" | bash "$packer" add "$pack_file" task_json 2 1200 json
+        echo "$workspace_context" | bash "$packer" add "$pack_file" workspace 3 200 head
+        reserved=$(printf '%s\n%s' "$system" "$task_name" | bash "$packer" estimate)
+        packed=$(bash "$packer" pack "$pack_file" analyze "$((reserved + 32))")
+        rm -f "$pack_file"
+        if [[ -n "$packed" && "$packed" != "{}" ]]; then
+            desc=$(echo "$packed" | jq -r '.description')
+            task_json=$(echo "$packed" | jq -r '.task_json')
+            workspace_context=$(echo "$packed" | jq -r '.workspace')
+        fi
+    fi
+
     local prompt="Task: $task_name
 Description: $desc
 Workspace: $workspace_context
@@ -189,7 +882,7 @@ Current task JSON: $task_json
 
 Analyze this task and provide a structured plan."
 
-    ai_call "$system" "$prompt" 800
+    AI_CALL_TYPE=analyze ai_call "$system" "$prompt" 800
 }
 
 # ── Git Commit ───────────────────────────────────────────────
@@ -200,29 +893,29 @@ ai_commit() {
     local override_msg="$1"
 
     # Check we're in a git repo
-    if ! git -C "$AUTONOMY_DIR" rev-parse --is-inside-work-tree >/dev/null 2>&1; then
+    if ! git -C "$WORKSPACE_DIR" rev-parse --is-inside-work-tree >/dev/null 2>&1; then
         echo "ERROR: Not a git repository"
         return 1
     fi
 
     local diff
-    diff=$(git -C "$AUTONOMY_DIR" diff --cached --stat 2>/dev/null)
+    diff=$(git -C "$WORKSPACE_DIR" diff --cached --stat 2>/dev/null)
     if [[ -z "$diff" ]]; then
         # Nothing staged — auto-stage tracked changes
-        git -C "$AUTONOMY_DIR" add -u 2>/dev/null
-        diff=$(git -C "$AUTONOMY_DIR" diff --cached --stat 2>/dev/null)
+        git -C "$WORKSPACE_DIR" add -u 2>/dev/null
+        diff=$(git -C "$WORKSPACE_DIR" diff --cached --stat 2>/dev/null)
         [[ -z "$diff" ]] && { echo "Nothing to commit"; return 0; }
     fi
 
     local diff_content
-    diff_content=$(git -C "$AUTONOMY_DIR" diff --cached --no-color 2>/dev/null | head -200)
+    diff_content=$(git -C "$WORKSPACE_DIR" diff --cached --no-color 2>/dev/null | head -200)
 
     local commit_msg="$override_msg"
     if [[ -z "$commit_msg" ]]; then
         local api_key
         api_key=$(get_api_key 2>/dev/null)
         if [[ -n "$api_key" ]]; then
-            commit_msg=$(ai_call \
+            commit_msg=$(AI_CALL_TYPE=commit ai_call \
                 "Generate a concise, conventional git commit message for the following diff. Use format: type(scope): description. Only output the commit message, nothing else." \
                 "Files changed:
 $diff
@@ -239,7 +932,7 @@ $diff_content" \
     [[ -z "$commit_msg" || "$commit_msg" == "ERROR:"* ]] && \
         commit_msg="chore(autonomy): automated changes — $(date +%Y-%m-%d)"
 
-    git -C "$AUTONOMY_DIR" commit -m "$commit_msg" 2>&1
+    git -C "$WORKSPACE_DIR" commit -m "$commit_msg" 2>&1
     local exit_code=$?
 
     # Log the commit
@@ -255,18 +948,45 @@ $diff_content" \
 # ai_push — push to remote
 ai_push() {
     local branch
-    branch=$(git -C "$AUTONOMY_DIR" branch --show-current 2>/dev/null)
+    branch=$(git -C "$WORKSPACE_DIR" branch --show-current 2>/dev/null)
     [[ -z "$branch" ]] && { echo "ERROR: Not on a branch"; return 1; }
-    git -C "$AUTONOMY_DIR" push origin "$branch" 2>&1
+    git -C "$WORKSPACE_DIR" push origin "$branch" 2>&1
 }
 
 # ── Terminal Access ──────────────────────────────────────────
 
-# ai_terminal <command> [timeout_seconds]
-# Executes a command in a sandboxed subprocess, captures output
+# Bytes kept from each end of command output in excerpts
+TERMINAL_EXCERPT_BYTES=2000
+
+# _output_excerpt <file> [offset]
+# Output written to file past offset, or its first and last
+# TERMINAL_EXCERPT_BYTES with a note of what was left out
+_output_excerpt() {
+    local file="$1" offset="${2:-0}" size
+    size=$(stat -c %s "$file" 2>/dev/null || echo 0)
+    local len=$(( size - offset ))
+    if (( len <= 2 * TERMINAL_EXCERPT_BYTES )); then
+        tail -c +$((offset + 1)) "$file"
+        return
+    fi
+    local lines
+    lines=$(tail -c +$((offset + 1)) "$file" | wc -l)
+    tail -c +$((offset + 1)) "$file" | head -c "$TERMINAL_EXCERPT_BYTES"
+    printf '\n... [truncated — %s bytes, %s lines total]\n' "$len" "$lines"
+    tail -c "$TERMINAL_EXCERPT_BYTES" "$file"
+}
+
+# ai_terminal <command> [timeout_seconds] [log_file]
+# Executes a command in a sandboxed subprocess. Output streams to disk
+# (appended to log_file when given, else a temp file) and only a bounded
+# head/tail excerpt is printed, so noisy builds never pass through a
+# shell variable. Each run is metered (wall/CPU time, max RSS, block
+# I/O, exit signal); when AI_RESOURCE_FILE is set the measurements are
+# appended to it as one JSON line tagged with the command and AI_TASK.
 ai_terminal() {
     local cmd="$1"
     local timeout_sec="${2:-30}"
+    local log_file="${3:-}"
 
     # Safety: block obviously dangerous commands
     local blocked_patterns="rm -rf /|mkfs|dd if=|:(){ :|shutdown|reboot|halt|poweroff|format "
@@ -278,23 +998,41 @@ ai_terminal() {
     fi
 
     # Execute with timeout
-    local output exit_code
-    output=$(cd "$AUTONOMY_DIR" && timeout "$timeout_sec" bash -c "$cmd" 2>&1)
-    exit_code=$?
-
-    # Truncate output to 4KB for sanity
-    if [[ ${#output} -gt 4096 ]]; then
-        output="${output:0:4000}
-... [truncated — ${#output} bytes total]"
+    local output exit_code out_file="$log_file" offset=0
+    if [[ -n "$out_file" ]]; then
+        mkdir -p "$(dirname "$out_file")"
+        offset=$(stat -c %s "$out_file" 2>/dev/null || echo 0)
+    else
+        out_file=$(mktemp)
     fi
+    local metrics_file resources
+    metrics_file=$(mktemp)
+    ( cd "$WORKSPACE_DIR" && python3 "$SCRIPT_DIR/run-metered.py" \
+        --timeout "$timeout_sec" --metrics "$metrics_file" -- bash -c "$cmd" ) >> "$out_file" 2>&1
+    exit_code=$?
+    resources=$(jq -c 'del(.exit_code)' "$metrics_file" 2>/dev/null)
+    [[ -z "$resources" ]] && resources='{}'
+    rm -f "$metrics_file"
+    output=$(_output_excerpt "$out_file" "$offset")
+    [[ -z "$log_file" ]] && rm -f "$out_file"
 
     # Log
     jq -n --arg ts "$(date -Iseconds)" --arg cmd "$cmd" \
-        --argjson ec "$exit_code" --arg out "$output" \
-        '{timestamp:$ts, command:$cmd, exit_code:$ec, output:$out}' >> "$TERMINAL_LOG" 2>/dev/null
+        --argjson ec "$exit_code" --arg out "$output" --arg log "$log_file" \
+        --argjson res "$resources" \
+        '{timestamp:$ts, command:$cmd, exit_code:$ec, output:$out, resources:$res}
+         + (if $log != "" then {log:$log} else {} end)' >> "$TERMINAL_LOG" 2>/dev/null
 
     jq -n --arg ts "$(date -Iseconds)" --arg cmd "$cmd" --argjson ec "$exit_code" \
-        '{timestamp:$ts, action:"terminal_exec", command:$cmd, exit_code:$ec}' >> "$AI_LOG" 2>/dev/null
+        --argjson res "$resources" \
+        '{timestamp:$ts, action:"terminal_exec", command:$cmd, exit_code:$ec, resources:$res}' >> "$AI_LOG" 2>/dev/null
+
+    if [[ -n "${AI_RESOURCE_FILE:-}" ]]; then
+        jq -nc --arg ts "$(date -Iseconds)" --arg cmd "${cmd:0:500}" \
+            --arg task "${AI_TASK:-}" --argjson ec "$exit_code" --argjson res "$resources" \
+            '{timestamp:$ts, task:$task, command:$cmd, exit_code:$ec} + $res' \
+            >> "$AI_RESOURCE_FILE" 2>/dev/null
+    fi
 
     echo "$output"
     return $exit_code
@@ -310,27 +1048,114 @@ ai_terminal_history() {
     fi
 }
 
+# ── Verification Cache ───────────────────────────────────────
+# Passing verify commands are remembered per workspace state: the key is
+# the command plus a content hash of the workspace, or of the paths the
+# check declares. In a git work tree the hash is a tree written from a
+# scratch copy of the index, so only files changed since the last stat
+# are re-read; elsewhere file contents are hashed. The agent's own
+# runtime files are left out. Off with verification.cache.enabled=false.
+
+VERIFY_CACHE_DIR="$STATE_DIR/verify-cache"
+VERIFY_CACHE_MAX=500
+VERIFY_CACHE_EXCLUDE=(state logs tasks HEARTBEAT.md config.json)
+
+_verify_cache_enabled() {
+    [[ "$(_get_config '.verification.cache.enabled')" != "false" ]]
+}
+
+# _workspace_hash [path...] — content hash of the workspace or the given
+# paths (relative to WORKSPACE_DIR, where commands run). In a git checkout
+# it reads the index and hashes only files that differ from it, without
+# writing objects into the repository. Gitignored files count only under
+# paths named explicitly; the whole-workspace hash leaves them out.
+_workspace_hash() {
+    local paths=("$@") prefix p
+    if prefix=$(git -C "$WORKSPACE_DIR" rev-parse --show-prefix 2>/dev/null); then
+        local specs=() untracked=(--exclude-standard)
+        if (( ${#paths[@]} )); then specs=("${paths[@]}"); untracked=(); else specs=(":/"); fi
+        for p in "${VERIFY_CACHE_EXCLUDE[@]}"; do specs+=(":(top,exclude)${prefix}$p"); done
+        (
+            cd "$WORKSPACE_DIR" || exit 1
+            local git=(git -c core.quotePath=false) changed f
+            # Index entries first; worktree content overrides them where it differs
+            "${git[@]}" ls-files -s -- "${specs[@]}" | sed 's/^[0-7]* \([0-9a-f]*\) [0-3]\t/\1\t/'
+            changed=$("${git[@]}" ls-files -m -o "${untracked[@]}" -- "${specs[@]}" |
+                while IFS= read -r f; do [[ -f "$f" ]] && echo "$f"; done)
+            [[ -n "$changed" ]] && paste <(git hash-object --stdin-paths <<< "$changed") - <<< "$changed"
+            "${git[@]}" ls-files -d -- "${specs[@]}" | sed 's/^/deleted\t/'
+        ) | awk -F'\t' '{ sha[$2] = $1 } END { for (p in sha) print sha[p] "\t" p }' \
+          | LC_ALL=C sort | sha1sum | cut -d' ' -f1
+        return "${PIPESTATUS[0]}"
+    fi
+
+    local prune=(-name .git)
+    for p in "${VERIFY_CACHE_EXCLUDE[@]}"; do prune+=(-o -path "./$p"); done
+    (( ${#paths[@]} )) || paths=(.)
+    (cd "$WORKSPACE_DIR" && find "${paths[@]}" \( "${prune[@]}" \) -prune -o -type f -print0 2>/dev/null \
+        | sort -z | xargs -0 -r sha1sum) | sha1sum | cut -d' ' -f1
+}
+
+# ai_verify_command <command> [timeout_seconds] [path...]
+# Runs a verify command through ai_terminal unless it already passed on
+# the same workspace content. Prints {output, exit_code, cached} (plus
+# cached_at for reused passes) and returns the command's exit code.
+ai_verify_command() {
+    local cmd="$1" timeout_sec="${2:-30}"
+    shift $(( $# < 2 ? $# : 2 ))
+
+    local key="" hash
+    if _verify_cache_enabled && hash=$(_workspace_hash "$@"); then
+        key=$(printf '%s\n%s' "$cmd" "$hash" | sha1sum | cut -d' ' -f1)
+        local entry="$VERIFY_CACHE_DIR/$key.json"
+        if [[ -f "$entry" ]]; then
+            touch "$entry"
+            jq -n --arg ts "$(date -Iseconds)" --arg cmd "$cmd" \
+                '{timestamp:$ts, action:"verify_cached", command:$cmd}' >> "$AI_LOG" 2>/dev/null
+            jq -c '{output, exit_code: 0, cached: true, cached_at: .at}' "$entry"
+            return 0
+        fi
+    fi
+
+    local output exit_code
+    output=$(ai_terminal "$cmd" "$timeout_sec")
+    exit_code=$?
+
+    if [[ -n "$key" && $exit_code -eq 0 ]]; then
+        mkdir -p "$VERIFY_CACHE_DIR"
+        jq -n --arg cmd "$cmd" --arg out "$output" --arg at "$(date -Iseconds)" \
+            '{command:$cmd, output:$out, at:$at}' > "$VERIFY_CACHE_DIR/$key.json.tmp.$$" \
+            && mv "$VERIFY_CACHE_DIR/$key.json.tmp.$$" "$VERIFY_CACHE_DIR/$key.json"
+        # Keep the most recently used entries
+        ls -t "$VERIFY_CACHE_DIR"/*.json 2>/dev/null | tail -n +$((VERIFY_CACHE_MAX + 1)) | xargs -r rm -f
+    fi
+    jq -nc --arg out "$output" --argjson ec "$exit_code" '{output:$out, exit_code:$ec, cached:false}'
+    return $exit_code
+}
+
 # ── Evidence Gathering ───────────────────────────────────────
 
 # ai_gather_evidence <task_name> <verification_commands...>
-# Runs verification commands, captures output, attaches to task
+# Runs verification commands, captures output, attaches to task. Passes
+# reused from the verification cache are marked cached.
 ai_gather_evidence() {
     local task_name="$1"
     shift
     local task_file="$AUTONOMY_DIR/tasks/${task_name}.json"
     [[ ! -f "$task_file" ]] && { echo "ERROR: Task not found: $task_name"; return 1; }
 
+    local paths=()
+    mapfile -t paths < <(_get_config '.verification.cache.paths // [] | .[]')
+
     local evidence=()
     for cmd in "$@"; do
-        local output
-        output=$(ai_terminal "$cmd" 15)
-        local exit_code=$?
-        evidence+=("$(jq -n \
+        local run
+        run=$(ai_verify_command "$cmd" 15 "${paths[@]}")
+        evidence+=("$(echo "$run" | jq -c \
             --arg cmd "$cmd" \
-            --argjson ec "$exit_code" \
-            --arg out "$output" \
             --arg ts "$(date -Iseconds)" \
-            '{timestamp:$ts, command:$cmd, exit_code:$ec, output:$out, passed:($ec==0)}')")
+            '{timestamp:$ts, command:$cmd, exit_code, output, passed:(.exit_code==0), cached}
+             + (if .cached then {cached_at} else {} end)')")
     done
 
     # Build JSON array and merge into task
@@ -371,13 +1196,22 @@ ai_process_task() {
     local task_name
     task_name=$(jq -r '.name // "unknown"' "$task_file")
 
-    # Update status to processing
+    # Update status to processing, under the task's lock so an event
+    # being folded into it (lib/trigger-windows.py) is not overwritten
     local tmp="${task_file}.tmp.$$"
-    jq --arg ts "$(date -Iseconds)" \
-        '.status = "ai_processing" | .processing_started = $ts' \
-        "$task_file" > "$tmp" && mv "$tmp" "$task_file"
-
-    # Write activity state for web UI
+    mkdir -p "$STATE_DIR/task-locks"
+    (
+        flock 9
+        jq --arg ts "$(date -Iseconds)" \
+            '.status = "ai_processing" | .processing_started = $ts' \
+            "$task_file" > "$tmp" && mv "$tmp" "$task_file"
+    ) 9> "$STATE_DIR/task-locks/$(basename "$task_file" .json).lock"
+
+    # Write activity state for web UI; AI output streams into the task's
+    # progress file (state/ai_progress/<task>.log) as it is generated
+    export AI_TASK="$task_name"
+    mkdir -p "$AI_PROGRESS_DIR"
+    : > "$AI_PROGRESS_DIR/${task_name}.log"
     jq -n --arg ts "$(date -Iseconds)" --arg task "$task_name" \
         '{status:"processing", task:$task, started_at:$ts, progress:10, message:"Analyzing task..."}' \
         > "$STATE_DIR/ai_activity.json"
@@ -436,20 +1270,25 @@ ai_process_task() {
 # ── Status & Info ────────────────────────────────────────────
 
 ai_status() {
-    local api_key
-    api_key=$(get_api_key 2>/dev/null)
-    local configured="false"
-    [[ -n "$api_key" ]] && configured="true"
+    local configured endpoints
+    endpoints=$(_ai_ordered_endpoints)
+    configured=$(echo "$endpoints" | jq 'length > 0')
 
     local provider model api_url
     provider=$(get_provider)
     model=$(get_model)
     api_url=$(get_api_url)
 
+    local client_running="false"
+    _ai_client_alive && client_running="true"
+
     local total_calls total_tokens
     if [[ -f "$AI_LOG" ]]; then
-        total_calls=$(wc -l < "$AI_LOG" | tr -d ' ')
-        total_tokens=$(jq -s '[.[].total // 0] | add // 0' "$AI_LOG" 2>/dev/null)
+        # Provider calls only: other logged actions have no token counts
+        read -r total_calls total_tokens < <(jq -rs '[.[] | select(has("input_tokens"))]
+            | "\(length) \([.[].total // 0] | add // 0)"' "$AI_LOG" 2>/dev/null)
+        [[ "$total_calls" =~ ^[0-9]+$ ]] || total_calls=0
+        [[ "$total_tokens" =~ ^[0-9]+$ ]] || total_tokens=0
     else
         total_calls=0
         total_tokens=0
@@ -462,7 +1301,11 @@ ai_status() {
         --arg api_url "$api_url" \
         --argjson total_calls "$total_calls" \
         --argjson total_tokens "$total_tokens" \
-        '{configured:$configured, provider:$provider, model:$model, api_url:$api_url, total_calls:$total_calls, total_tokens:$total_tokens}'
+        --argjson client_running "$client_running" \
+        --argjson cache "$(ai_cache_stats)" \
+        --argjson endpoints "$endpoints" \
+        '{configured:$configured, provider:$provider, model:$model, api_url:$api_url, total_calls:$total_calls, total_tokens:$total_tokens, client_running:$client_running, cache:$cache,
+          endpoints: ($endpoints | map({name, provider, model, cooldown, ewma_ms, failure_rate, p95_ms}))}'
 }
 
 # ── CLI ──────────────────────────────────────────────────────
@@ -476,9 +1319,16 @@ case "${1:-status}" in
     term-hist)  shift; ai_terminal_history "$@" ;;
     evidence)   shift; ai_gather_evidence "$@" ;;
     process)    shift; ai_process_task "$1" ;;
+    client)     shift; ai_client "$@" ;;
+    cache)
+        case "${2:-stats}" in
+            clear) ai_cache_clear ;;
+            *)     ai_cache_stats ;;
+        esac
+        ;;
     status)     ai_status ;;
     *)
-        echo "Usage: ai-engine.sh {status|call|analyze|commit|push|terminal|term-hist|evidence|process}"
+        echo "Usage: ai-engine.sh {status|call|analyze|commit|push|terminal|term-hist|evidence|process|client|cache}"
         echo ""
         echo "  status              Show AI engine configuration"
         echo "  call <sys> <usr>    Raw API call"
@@ -489,5 +1339,7 @@ case "${1:-status}" in
         echo "  term-hist [n]       Show terminal history"
         echo "  evidence <task> <cmd...>  Run verification commands"
         echo "  process <task.json> Full AI processing cycle"
+        echo "  client {start|stop|status}  Resident keep-alive AI client"
+        echo "  cache [stats|clear] Response cache counters / wipe"
         ;;
 esac
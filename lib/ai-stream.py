@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""SSE reader for streamed AI completions.
+
+Reads a provider response from stdin (curl -N output), appends text deltas
+to a progress file as they arrive, and prints the full text on stdout when
+the stream ends. Understands Anthropic (content_block_delta) and
+OpenAI-compatible (choices[].delta) events; a plain JSON body from an
+endpoint that ignored "stream": true is handled too.
+
+Usage:
+    ai-stream.py --provider anthropic|openai [--progress FILE]
+                 [--metrics FILE] [--stop-on-json-array]
+
+--metrics writes {input_tokens, output_tokens, cache_read_tokens,
+cache_write_tokens, first_token_ms, tokens_per_sec, aborted_early} as
+JSON; input_tokens counts only input that was not read from the
+provider's prompt cache. --stop-on-json-array exits as soon
+as the text holds a complete top-level JSON array, which closes the pipe
+and makes curl drop the connection so the provider stops generating.
+"""
+
+import json
+import sys
+import time
+
+
+def parse_args(argv):
+    opts = {"provider": "openai", "progress": None, "metrics": None, "stop_on_json_array": False}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--stop-on-json-array":
+            opts["stop_on_json_array"] = True
+        elif arg in ("--provider", "--progress", "--metrics") and i + 1 < len(argv):
+            opts[arg[2:]] = argv[i + 1]
+            i += 1
+        i += 1
+    return opts
+
+
+def complete_json_array(text):
+    """Return the prefix of text ending with its first complete JSON array of
+    objects (a step plan), or None if none has fully arrived yet."""
+    decoder = json.JSONDecoder()
+    start = text.find("[")
+    while start >= 0:
+        try:
+            value, end = decoder.raw_decode(text, start)
+            if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+                return text[:end]
+        except ValueError:
+            pass
+        start = text.find("[", start + 1)
+    return None
+
+
+def extract_event(provider, event):
+    """Return (text_delta, input_tokens, output_tokens, error) for one SSE data payload."""
+    if provider == "anthropic":
+        kind = event.get("type")
+        if kind == "content_block_delta":
+            return event.get("delta", {}).get("text", ""), None, None, None
+        if kind == "message_start":
+            return "", event.get("message", {}).get("usage", {}).get("input_tokens"), None, None
+        if kind == "message_delta":
+            return "", None, event.get("usage", {}).get("output_tokens"), None
+        if kind == "error":
+            return "", None, None, event.get("error", {}).get("message", "stream error")
+        return "", None, None, None
+
+    text = ""
+    for choice in event.get("choices") or []:
+        text += (choice.get("delta") or {}).get("content") or ""
+    usage = event.get("usage") or {}
+    error = event.get("error", {}).get("message") if isinstance(event.get("error"), dict) else None
+    return text, usage.get("prompt_tokens"), usage.get("completion_tokens"), error
+
+
+def cache_usage(provider, usage):
+    """(cache_read, cache_write) token counts from a usage object, or None."""
+    if not isinstance(usage, dict):
+        return None
+    if provider == "anthropic":
+        if "cache_read_input_tokens" not in usage and "cache_creation_input_tokens" not in usage:
+            return None
+        return usage.get("cache_read_input_tokens") or 0, usage.get("cache_creation_input_tokens") or 0
+    details = usage.get("prompt_tokens_details") or {}
+    if "cached_tokens" not in details:
+        return None
+    return details.get("cached_tokens") or 0, 0
+
+
+def event_usage(provider, event):
+    if provider == "anthropic":
+        if event.get("type") == "message_start":
+            return event.get("message", {}).get("usage")
+        return event.get("usage")
+    return event.get("usage")
+
+
+def extract_plain(provider, body):
+    """Text, usage and cache usage from a non-streamed JSON body."""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return "", 0, 0, None
+    usage = data.get("usage") or {}
+    if provider == "anthropic":
+        content = data.get("content") or [{}]
+        return (content[0].get("text", ""), usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+                cache_usage(provider, usage))
+    choices = data.get("choices") or [{}]
+    text = (choices[0].get("message") or {}).get("content") or ""
+    return text, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), cache_usage(provider, usage)
+
+
+def main():
+    opts = parse_args(sys.argv[1:])
+    provider = "anthropic" if opts["provider"] == "anthropic" else "openai"
+    progress = open(opts["progress"], "a") if opts["progress"] else None
+
+    started = time.time()
+    first_token_at = None
+    text = ""
+    input_tokens = output_tokens = 0
+    cached = None
+    aborted = False
+    saw_sse = False
+    raw_lines = []
+
+    for raw in sys.stdin:
+        line = raw.rstrip("\r\n")
+        if not line.startswith("data:"):
+            if not saw_sse and line and not line.startswith(("event:", ":", "id:", "retry:")):
+                raw_lines.append(raw)
+            continue
+        saw_sse = True
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            break
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            continue
+
+        delta, in_tok, out_tok, error = extract_event(provider, event)
+        cached = cache_usage(provider, event_usage(provider, event)) or cached
+        if in_tok is not None:
+            input_tokens = in_tok
+        if out_tok is not None:
+            output_tokens = out_tok
+        if error:
+            sys.stderr.write(f"stream error: {error}\n")
+        if not delta:
+            continue
+
+        if first_token_at is None:
+            first_token_at = time.time()
+        text += delta
+        if progress:
+            progress.write(delta)
+            progress.flush()
+
+        if opts["stop_on_json_array"] and "]" in delta:
+            plan = complete_json_array(text)
+            if plan is not None:
+                text = plan
+                aborted = True
+                break
+
+    if not saw_sse and raw_lines:
+        text, input_tokens, output_tokens, cached = extract_plain(provider, "".join(raw_lines))
+        first_token_at = time.time()
+        if progress and text:
+            progress.write(text)
+
+    finished = time.time()
+    if progress:
+        progress.write("\n")
+        progress.close()
+
+    # Early aborts never see the final usage event; estimate output at ~4 chars/token
+    if not output_tokens and text:
+        output_tokens = max(1, len(text) // 4)
+
+    # OpenAI counts cached tokens inside prompt_tokens; Anthropic reports them apart
+    cache_read, cache_write = cached or (0, 0)
+    if provider == "openai":
+        input_tokens = max(0, (input_tokens or 0) - cache_read)
+
+    if opts["metrics"]:
+        gen_seconds = finished - (first_token_at or finished)
+        metrics = {
+            "input_tokens": input_tokens or 0,
+            "output_tokens": output_tokens or 0,
+            "cache_read_tokens": cache_read,
+            "cache_write_tokens": cache_write,
+            "first_token_ms": int(((first_token_at or finished) - started) * 1000),
+            "tokens_per_sec": round(output_tokens / gen_seconds, 1) if gen_seconds > 0 else 0,
+            "aborted_early": aborted,
+            "streamed": saw_sse,
+        }
+        with open(opts["metrics"], "w") as f:
+            json.dump(metrics, f)
+
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/bin/bash
+# Context Packer
+# Fits prompt context into a per-prompt-type token ceiling.
+#
+# Callers add named sections to a pack file, each with a priority
+# (0 = required, higher = less valuable), an optional per-section token
+# budget and a trim mode:
+#   head  keep the start, truncate the end
+#   tail  keep the end (journals, logs)
+#   json  summarize bulky fields of a task JSON before truncating
+#
+# Token counts are estimated locally (~4 characters per token). Sections
+# are first held to their own budget; if the pack still exceeds the
+# ceiling, the least valuable sections are trimmed and then dropped until
+# it fits. A report of what was cut is written to
+# state/context-reports/<prompt_type>.json.
+#
+# Usage:
+#   echo "$text" | context-packer.sh add <pack_file> <name> <priority> [budget] [mode]
+#   context-packer.sh pack <pack_file> <prompt_type> [reserved_tokens]
+#   context-packer.sh report [prompt_type]
+#   echo "$text" | context-packer.sh estimate
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+AUTONOMY_DIR="$(dirname "$SCRIPT_DIR")"
+CONFIG_FILE="$AUTONOMY_DIR/config.json"
+REPORT_DIR="$AUTONOMY_DIR/state/context-reports"
+
+# Default token ceilings per prompt type (override with .context.ceilings.<type>)
+declare -A CONTEXT_DEFAULT_CEILING=(
+    [heartbeat]=6000
+    [analyze]=2500
+    [default]=4000
+)
+
+# Sections trimmed below this many tokens are dropped instead
+CONTEXT_MIN_SECTION_TOKENS=48
+
+_ceiling() {
+    local prompt_type="$1"
+    local fallback="${CONTEXT_DEFAULT_CEILING[$prompt_type]:-${CONTEXT_DEFAULT_CEILING[default]}}"
+    local ceiling
+    ceiling=$(jq -r --arg t "$prompt_type" '.context.ceilings[$t] // empty' "$CONFIG_FILE" 2>/dev/null)
+    [[ "$ceiling" =~ ^[0-9]+$ ]] || ceiling="$fallback"
+    echo "$ceiling"
+}
+
+# estimate — token estimate for stdin
+estimate_tokens() {
+    local chars
+    chars=$(wc -c | tr -d ' ')
+    echo $(( (chars + 3) / 4 ))
+}
+
+# add <pack_file> <name> <priority> [budget] [mode] — section content on stdin
+add_section() {
+    local pack_file="$1" name="$2" priority="${3:-5}" budget="${4:-0}" mode="${5:-head}"
+    [[ -n "$pack_file" && -n "$name" ]] || { echo "Usage: add <pack_file> <name> <priority> [budget] [mode]" >&2; return 1; }
+    [[ "$priority" =~ ^[0-9]+$ ]] || priority=5
+    [[ "$budget" =~ ^[0-9]+$ ]] || budget=0
+
+    local content
+    content=$(cat)
+    [[ -s "$pack_file" ]] || echo "[]" > "$pack_file"
+
+    local tmp="${pack_file}.tmp.$$"
+    jq --arg name "$name" --argjson priority "$priority" --argjson budget "$budget" \
+        --arg mode "$mode" --arg content "$content" \
+        '. + [{name: $name, priority: $priority, budget: $budget, mode: $mode, content: $content}]' \
+        "$pack_file" > "$tmp" && mv "$tmp" "$pack_file"
+}
+
+# pack <pack_file> <prompt_type> [reserved_tokens]
+# Prints {"<name>": "<packed text>", ...}. reserved_tokens is taken off the
+# ceiling for fixed prompt text the caller adds around the sections.
+pack_sections() {
+    local pack_file="$1" prompt_type="${2:-default}" reserved="${3:-0}"
+    [[ "$reserved" =~ ^[0-9]+$ ]] || reserved=0
+
+    local sections="[]"
+    [[ -s "$pack_file" ]] && sections=$(cat "$pack_file")
+
+    local ceiling
+    ceiling=$(_ceiling "$prompt_type")
+
+    local result
+    result=$(echo "$sections" | jq \
+        --arg type "$prompt_type" \
+        --arg ts "$(date -Iseconds)" \
+        --argjson ceiling "$ceiling" \
+        --argjson reserved "$reserved" \
+        --argjson min_keep "$CONTEXT_MIN_SECTION_TOKENS" '
+        def est: ((length + 3) / 4 | floor);
+
+        def cut($mode; $tok):
+            ($tok * 4) as $c
+            | if length <= $c then .
+              elif $mode == "tail" then "[… \(((length - $c) / 4 | floor)) earlier tokens trimmed]\n" + .[length - $c:]
+              else .[:$c] + "\n[… \(((length - $c) / 4 | floor)) more tokens trimmed]" end;
+
+        # Keep the latest of each growing field and shorten long strings
+        def summarize_task:
+            (if (.evidence | type) == "array" then .evidence |= .[-3:] else . end)
+            | (if (.verification_results | type) == "array"
+               then .verification_results |= map(select(.passed == false)) else . end)
+            | walk(if type == "string" and length > 300 then .[:300] + "…" else . end);
+
+        def fit_budget:
+            .tokens_in = (.content | est)
+            | .text = .content
+            | .action = "kept"
+            | if .budget > 0 and .tokens_in > .budget then
+                (if .mode == "json" then
+                    .text as $t
+                    | .text = ($t | try (fromjson | summarize_task | tojson) catch $t)
+                    | .action = "summarized"
+                 else . end)
+                | if (.text | est) > .budget then
+                    .mode as $mode | .budget as $budget
+                    | .text |= cut($mode; $budget) | .action = "truncated"
+                  else . end
+              else . end;
+
+        (to_entries | map(.value + {order: .key} | fit_budget)) as $fitted
+        | ($ceiling - $reserved) as $limit
+        # Least valuable first: highest priority number, later sections first
+        | ($fitted | sort_by([-.priority, -.order]) | map(.order)) as $trim_order
+        | reduce $trim_order[] as $i ($fitted;
+            (map(.text | est) | add // 0) as $total
+            | if $total <= $limit or .[$i].priority == 0 then .
+              else
+                (.[$i].text | est) as $have
+                | ($have - ($total - $limit) - 12) as $keep
+                | if $keep < $min_keep then
+                    .[$i].text = "" | .[$i].action = "dropped"
+                  else
+                    .[$i].mode as $mode
+                    | .[$i].text |= cut($mode; $keep) | .[$i].action = "truncated"
+                  end
+              end)
+        | {
+            sections: (map({key: .name, value: .text}) | from_entries),
+            report: {
+                prompt_type: $type,
+                generated_at: $ts,
+                ceiling: $ceiling,
+                reserved: $reserved,
+                tokens_before: (map(.tokens_in) | add // 0),
+                tokens_after: (map(.text | est) | add // 0),
+                dropped: [.[] | select(.action == "dropped") | .name],
+                sections: map({name, priority, budget, tokens_in, tokens_out: (.text | est), action})
+            }
+          }')
+
+    [[ -n "$result" ]] || { echo "{}"; return 1; }
+
+    mkdir -p "$REPORT_DIR"
+    echo "$result" | jq '.report' > "$REPORT_DIR/${prompt_type}.json"
+    echo "$result" | jq '.sections'
+}
+
+# report [prompt_type] — last packing report(s)
+show_report() {
+    local prompt_type="$1"
+    if [[ -n "$prompt_type" ]]; then
+        [[ -f "$REPORT_DIR/${prompt_type}.json" ]] || { echo "No context report for: $prompt_type"; return 1; }
+        jq . "$REPORT_DIR/${prompt_type}.json"
+        return
+    fi
+    local reports=("$REPORT_DIR"/*.json)
+    [[ -f "${reports[0]}" ]] || { echo "[]"; return 0; }
+    jq -s 'map({prompt_type, generated_at, ceiling, tokens_before, tokens_after, dropped})' "${reports[@]}"
+}
+
+# ── CLI ─────────────────────────────────────────────────────
+
+case "${1:-}" in
+    add)      shift; add_section "$@" ;;
+    pack)     shift; pack_sections "$@" ;;
+    report)   shift; show_report "$@" ;;
+    estimate) estimate_tokens ;;
+    *)
+        echo "Context Packer — fit prompt sections into a token ceiling"
+        echo "Usage: $0 <command> [args...]"
+        echo ""
+        echo "Commands:"
+        echo "  add <pack> <name> <priority> [budget] [mode]  Add a section (content on stdin)"
+        echo "  pack <pack> <prompt_type> [reserved]          Pack sections, print JSON"
+        echo "  report [prompt_type]                          Show what was trimmed or dropped"
+        echo "  estimate                                      Estimate tokens for stdin"
+        ;;
+esac
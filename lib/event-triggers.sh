@@ -9,7 +9,15 @@ CONFIG_FILE="$AUTONOMY_DIR/config.json"
 STATE_DIR="$AUTONOMY_DIR/state"
 TASKS_DIR="$AUTONOMY_DIR/tasks"
 TRIGGERS_FILE="$STATE_DIR/triggers.json"
+TRIGGERS_LOCK="$STATE_DIR/.triggers.lock"
 TRIGGER_LOG="$AUTONOMY_DIR/logs/triggers.log"
+FS_WATCHER="$SCRIPT_DIR/fs-watcher.py"
+FS_WATCHER_PID="$STATE_DIR/fs-watcher.pid"
+TREE_MANIFEST="$SCRIPT_DIR/tree-manifest.py"
+GIT_REFS="$SCRIPT_DIR/git-refs.py"
+SCHEDULER="$SCRIPT_DIR/scheduler.py"
+TRIGGER_WINDOWS="$SCRIPT_DIR/trigger-windows.py"
+MANIFESTS_DIR="$STATE_DIR/manifests"
 
 mkdir -p "$STATE_DIR" "$AUTONOMY_DIR/logs" "$TASKS_DIR"
 
@@ -20,13 +28,28 @@ _trigger_log() {
 # ── Trigger Registry ───────────────────────────────────────
 
 init_triggers() {
-    [[ -f "$TRIGGERS_FILE" ]] || echo '{
-        "triggers": [],
-        "stats": {
-            "total_fired": 0,
-            "tasks_created": 0
-        }
-    }' > "$TRIGGERS_FILE"
+    [[ -f "$TRIGGERS_FILE" ]] && return 0
+    (
+        flock 9
+        [[ -f "$TRIGGERS_FILE" ]] || echo '{
+            "triggers": [],
+            "stats": {
+                "total_fired": 0,
+                "tasks_created": 0
+            }
+        }' > "$TRIGGERS_FILE"
+    ) 9>"$TRIGGERS_LOCK"
+}
+
+# _update_triggers <jq args...> <filter> — rewrite triggers.json through a
+# jq filter under state/.triggers.lock, so the daemon's checks, the webhook
+# consumer and the CLI never lose each other's changes
+_update_triggers() {
+    (
+        flock 9
+        local tmp="${TRIGGERS_FILE}.tmp.$$"
+        jq "$@" "$TRIGGERS_FILE" > "$tmp" && mv "$tmp" "$TRIGGERS_FILE"
+    ) 9>"$TRIGGERS_LOCK"
 }
 
 # Register a trigger
@@ -52,8 +75,7 @@ register_trigger() {
         *) echo "Invalid trigger type. Use: file_change, git_push, schedule, webhook, pattern"; return 1 ;;
     esac
 
-    local tmp="${TRIGGERS_FILE}.tmp.$$"
-    jq --arg name "$name" --arg type "$type" --arg cond "$condition" \
+    _update_triggers --arg name "$name" --arg type "$type" --arg cond "$condition" \
        --arg tpl "$task_template" --arg pri "$priority" --arg ts "$(date -Iseconds)" \
         '.triggers += [{
             name: $name,
@@ -65,8 +87,10 @@ register_trigger() {
             created: $ts,
             last_fired: null,
             fire_count: 0,
-            cooldown_seconds: 300
-        }]' "$TRIGGERS_FILE" > "$tmp" && mv "$tmp" "$TRIGGERS_FILE"
+            cooldown_seconds: 300,
+            debounce_seconds: 0,
+            max_pending_tasks: 3
+        }]'
 
     _trigger_log INFO "Registered trigger: $name (type=$type)"
     echo "Registered trigger: $name"
@@ -76,12 +100,40 @@ register_trigger() {
 unregister_trigger() {
     local name="$1"
     init_triggers
-    local tmp="${TRIGGERS_FILE}.tmp.$$"
-    jq --arg n "$name" '.triggers = [.triggers[] | select(.name != $n)]' \
-        "$TRIGGERS_FILE" > "$tmp" && mv "$tmp" "$TRIGGERS_FILE"
+    _update_triggers --arg n "$name" '.triggers = [.triggers[] | select(.name != $n)]'
+    rm -f "$MANIFESTS_DIR/trigger-${name//[^A-Za-z0-9._-]/_}.json"
     echo "Removed trigger: $name"
 }
 
+# Set a trigger's timing: tune <name> <setting>=<n>...
+# cooldown_seconds, debounce_seconds, max_wait_seconds, max_pending_tasks
+tune_trigger() {
+    local name="$1"
+    shift
+    [[ -z "$name" || $# -eq 0 ]] && {
+        echo "Usage: event-triggers.sh tune <name> <setting>=<n>... (cooldown_seconds, debounce_seconds, max_wait_seconds, max_pending_tasks)"
+        return 1
+    }
+    init_triggers
+    jq -e --arg n "$name" 'any(.triggers[]; .name == $n)' "$TRIGGERS_FILE" >/dev/null ||
+        { echo "Trigger not found: $name"; return 1; }
+
+    local setting field value updates="{}"
+    for setting in "$@"; do
+        field="${setting%%=*}"
+        value="${setting#*=}"
+        case "$field" in
+            cooldown_seconds|debounce_seconds|max_wait_seconds|max_pending_tasks) ;;
+            *) echo "Unknown setting: $field"; return 1 ;;
+        esac
+        [[ "$value" =~ ^[0-9]+$ ]] || { echo "$field must be a whole number"; return 1; }
+        updates=$(jq -c --arg f "$field" --argjson v "$value" '.[$f] = $v' <<< "$updates")
+    done
+
+    _update_triggers --arg n "$name" --argjson u "$updates" '(.triggers[] | select(.name == $n)) |= . + $u'
+    echo "Tuned trigger: $name $(jq -r 'to_entries | map("\(.key)=\(.value)") | join(" ")' <<< "$updates")"
+}
+
 # List triggers
 list_triggers() {
     init_triggers
@@ -92,32 +144,78 @@ list_triggers() {
 
 # ── Fire a trigger (create task) ───────────────────────────
 
+# fire_trigger <name> [event_data] [cooldown_key] [task_id] [paths]
+# Events go through the trigger's debounce/coalescing window
+# (lib/trigger-windows.py): the task is created once the window settles,
+# listing every event and changed path (newline-separated) folded into it,
+# or the events join the trigger's open task during cooldown or at its
+# max_pending_tasks cap. A cooldown key (e.g. a branch ref) gives that
+# event its own window and cooldown, so one trigger can fire for several
+# keys in the same cycle. A task id bypasses the window and makes the fire
+# idempotent instead: if that task exists it already fired (the
+# scheduler's slots stand in for the cooldown).
 fire_trigger() {
     local trigger_name="$1"
     local event_data="${2:-}"
+    local cooldown_key="${3:-}"
+    local fixed_id="${4:-}"
+    local paths="${5:-}"
 
     init_triggers
 
+    if [[ -n "$fixed_id" ]]; then
+        if [[ -f "$TASKS_DIR/${fixed_id}.json" ]]; then
+            jq -e --arg n "$trigger_name" 'any(.triggers[]; .name == $n and .enabled == true)' \
+                "$TRIGGERS_FILE" >/dev/null 2>&1 || { echo "Trigger not found or disabled: $trigger_name"; return 1; }
+            echo "Trigger already fired: $trigger_name → $fixed_id"
+            return 0
+        fi
+        _trigger_task "$trigger_name" "$event_data" "" "$fixed_id"
+        return
+    fi
+
+    local action detail coalesced
+    {
+        IFS= read -r -d '' action
+        IFS= read -r -d '' detail
+        IFS= read -r -d '' coalesced
+    } < <(printf '%s' "$paths" | python3 "$TRIGGER_WINDOWS" add "$trigger_name" "$cooldown_key" "$event_data" --paths - |
+        jq -j '.action, "\u0000", (.event // .task // "\(.events) event(s), settles \(.due // 0 | strflocaltime("%H:%M:%S"))"),
+               "\u0000", (.coalesced // null | tojson), "\u0000"')
+
+    case "$action" in
+        fire)
+            _trigger_task "$trigger_name" "$detail" "$cooldown_key" "" "$coalesced"
+            ;;
+        merge)
+            _trigger_log INFO "Coalesced trigger $trigger_name event into task $detail"
+            echo "Trigger coalesced: $trigger_name → $detail"
+            ;;
+        hold)
+            _trigger_log INFO "Trigger $trigger_name held: $detail"
+            echo "Trigger held: $trigger_name ($detail)"
+            ;;
+        *)
+            echo "Trigger not found or disabled: $trigger_name"
+            return 1
+            ;;
+    esac
+}
+
+# Create the task for a fired trigger and record the fire
+# _trigger_task <name> <event_data> [cooldown_key] [task_id] [coalesced_json]
+_trigger_task() {
+    local trigger_name="$1"
+    local event_data="${2:-}"
+    local cooldown_key="${3:-}"
+    local fixed_id="${4:-}"
+    local coalesced="${5:-null}"
+
     local trigger
     trigger=$(jq --arg n "$trigger_name" '.triggers[] | select(.name == $n and .enabled == true)' "$TRIGGERS_FILE" 2>/dev/null)
 
     [[ -z "$trigger" ]] && { echo "Trigger not found or disabled: $trigger_name"; return 1; }
 
-    # Check cooldown
-    local last_fired cooldown
-    last_fired=$(echo "$trigger" | jq -r '.last_fired // ""')
-    cooldown=$(echo "$trigger" | jq '.cooldown_seconds // 300')
-
-    if [[ -n "$last_fired" && "$last_fired" != "null" ]]; then
-        local last_epoch now_epoch
-        last_epoch=$(date -d "$last_fired" +%s 2>/dev/null || echo 0)
-        now_epoch=$(date +%s)
-        if [[ $((now_epoch - last_epoch)) -lt $cooldown ]]; then
-            _trigger_log INFO "Trigger $trigger_name in cooldown, skipping"
-            return 0
-        fi
-    fi
-
     # Get task template
     local task_template priority
     task_template=$(echo "$trigger" | jq -r '.task_template')
@@ -129,8 +227,19 @@ fire_trigger() {
     [[ -n "$event_data" ]] && task_desc="$task_desc (Event: $event_data)"
 
     local task_id
-    task_id=$(echo "$task_name" | tr '[:upper:]' '[:lower:]' | sed 's/[^a-z0-9-]/-/g' | cut -c1-60)
+    if [[ -n "$fixed_id" ]]; then
+        task_id="$fixed_id"
+        task_name="$fixed_id"
+    else
+        task_id=$(echo "$task_name" | tr '[:upper:]' '[:lower:]' | sed 's/[^a-z0-9-]/-/g' | cut -c1-60)
+    fi
 
+    # Written in full to a temp file, then hard-linked into place: the link
+    # fails if the id is taken, so two fires in the same second (or a
+    # repeated fixed id) never overwrite a task
+    local tmp_task
+    tmp_task=$(mktemp "$TASKS_DIR/.task.XXXXXX") || return 1
+    chmod a+r "$tmp_task"
     jq -n \
         --arg id "$task_id" \
         --arg name "$task_name" \
@@ -138,6 +247,7 @@ fire_trigger() {
         --arg pri "$priority" \
         --arg trigger "$trigger_name" \
         --arg ts "$(date -Iseconds)" \
+        --argjson coalesced "$coalesced" \
         '{
             id: $id,
             name: $name,
@@ -150,14 +260,25 @@ fire_trigger() {
             progress: 0,
             subtasks: [],
             tags: ["event-triggered"]
-        }' > "$TASKS_DIR/${task_id}.json"
+        } + (if $coalesced != null then {coalesced: $coalesced} else {} end)' > "$tmp_task"
+
+    local base_id="$task_id" n=1
+    until ln "$tmp_task" "$TASKS_DIR/${task_id}.json" 2>/dev/null; do
+        if [[ -n "$fixed_id" ]]; then
+            rm -f "$tmp_task"
+            echo "Trigger already fired: $trigger_name → $fixed_id"
+            return 0
+        fi
+        task_id="${base_id}-$((n++))"
+        jq --arg id "$task_id" '.id = $id' "$tmp_task" > "$tmp_task.id" && mv "$tmp_task.id" "$tmp_task"
+    done
+    rm -f "$tmp_task"
 
     # Update trigger stats
-    local tmp="${TRIGGERS_FILE}.tmp.$$"
-    jq --arg n "$trigger_name" --arg ts "$(date -Iseconds)" \
-        '(.triggers[] | select(.name == $n)) |= (.last_fired = $ts | .fire_count += 1) |
-         .stats.total_fired += 1 | .stats.tasks_created += 1' \
-        "$TRIGGERS_FILE" > "$tmp" && mv "$tmp" "$TRIGGERS_FILE"
+    _update_triggers --arg n "$trigger_name" --arg ts "$(date -Iseconds)" --arg k "$cooldown_key" \
+        '(.triggers[] | select(.name == $n)) |= (.last_fired = $ts | .fire_count += 1 |
+            if $k != "" then .cooldowns[$k] = $ts else . end) |
+         .stats.total_fired += 1 | .stats.tasks_created += 1'
 
     # Signal adaptive heartbeat for immediate processing
     if [[ -f "$AUTONOMY_DIR/lib/adaptive-heartbeat.sh" ]]; then
@@ -168,6 +289,19 @@ fire_trigger() {
     echo "Trigger fired: $trigger_name → $task_id"
 }
 
+# fire_batch: fire queued webhook events in order from one process
+# stdin: JSON array of {id, trigger, data}; prints {id, ok, message} per event
+fire_batch() {
+    init_triggers
+    local id name data out ok
+    while IFS= read -r -d '' id && IFS= read -r -d '' name && IFS= read -r -d '' data; do
+        if out=$(fire_trigger "$name" "$data"); then ok=true; else ok=false; fi
+        jq -nc --arg id "$id" --argjson ok "$ok" --arg msg "$out" \
+            '{id: $id, ok: $ok, message: $msg}'
+    done < <(jq -j '.[] | .id, "\u0000", .trigger, "\u0000",
+        (.data // "" | if type == "string" then . else tojson end), "\u0000"')
+}
+
 # ── Event Checkers ─────────────────────────────────────────
 
 # Check all file_change triggers
@@ -185,99 +319,193 @@ check_file_triggers() {
         path="$condition"
 
         if [[ -e "$path" ]]; then
-            # Use file-watcher checksum comparison
-            local checksum_file="$STATE_DIR/trigger_checksums/${name}.sum"
-            mkdir -p "$STATE_DIR/trigger_checksums"
-
-            local current_checksum
-            if [[ -d "$path" ]]; then
-                current_checksum=$(find "$path" -type f -exec md5sum {} + 2>/dev/null | md5sum | cut -d' ' -f1)
+            # The inotify watcher queues changes under this path; while it
+            # covers the trigger, an empty queue means nothing to look at
+            # once there is a baseline manifest to compare against
+            local changes covered
+            local manifest="$MANIFESTS_DIR/trigger-${name//[^A-Za-z0-9._-]/_}.json"
+            changes=$(python3 "$FS_WATCHER" take "trigger:$name" 2>/dev/null)
+            covered=$?
+            [[ $covered -eq 0 && -z "$changes" && -f "$manifest" ]] && continue
+            [[ -f "$manifest" ]] || covered=2
+
+            # The manifest re-hashes only files whose stat changed — just the
+            # queued paths when covered, else whatever a stat walk turns up
+            if [[ $covered -eq 0 ]]; then
+                changes=$(echo "$changes" | python3 "$TREE_MANIFEST" check "$manifest" "$path" --paths -)
             else
-                current_checksum=$(md5sum "$path" 2>/dev/null | cut -d' ' -f1)
-            fi
-
-            local previous_checksum=""
-            [[ -f "$checksum_file" ]] && previous_checksum=$(cat "$checksum_file")
-
-            if [[ "$current_checksum" != "$previous_checksum" ]]; then
-                echo "$current_checksum" > "$checksum_file"
-                [[ -n "$previous_checksum" ]] && fire_trigger "$name" "File changed: $path"
+                changes=$(python3 "$TREE_MANIFEST" check "$manifest" "$path")
             fi
+            [[ -n "$changes" ]] && fire_trigger "$name" "File changed: $path" "" "" "$changes"
         fi
     done
 }
 
+# ── Change Watcher ──────────────────────────────────────────
+# lib/fs-watcher.py watches file_change trigger paths and file watcher
+# paths with inotify and queues coalesced changes per trigger/watcher.
+# Without it (or for paths it cannot watch) the checks fall back to
+# hashing the tree on every call.
+
+fs_watcher() {
+    case "${1:-status}" in
+        start)
+            if python3 "$FS_WATCHER" status >/dev/null 2>&1; then
+                echo "File watcher already running (PID: $(cat "$FS_WATCHER_PID" 2>/dev/null))"
+                return 0
+            fi
+            AUTONOMY_DIR="$AUTONOMY_DIR" nohup python3 "$FS_WATCHER" serve >> "$AUTONOMY_DIR/logs/fs-watcher.log" 2>&1 &
+            local i
+            for i in 1 2 3 4 5 6 7 8 9 10; do
+                python3 "$FS_WATCHER" status >/dev/null 2>&1 && break
+                sleep 0.2
+            done
+            if python3 "$FS_WATCHER" status >/dev/null 2>&1; then
+                echo "File watcher started (PID: $(cat "$FS_WATCHER_PID" 2>/dev/null))"
+            else
+                echo "ERROR: File watcher failed to start — check logs/fs-watcher.log"
+                return 1
+            fi
+            ;;
+        stop)
+            local pid
+            pid=$(cat "$FS_WATCHER_PID" 2>/dev/null)
+            if [[ -n "$pid" ]] && kill -0 "$pid" 2>/dev/null; then
+                kill "$pid" 2>/dev/null
+                local i
+                for i in 1 2 3 4 5 6 7 8 9 10; do
+                    kill -0 "$pid" 2>/dev/null || break
+                    sleep 0.2
+                done
+                echo "File watcher stopped"
+            else
+                echo "File watcher not running"
+            fi
+            rm -f "$FS_WATCHER_PID" "$STATE_DIR/fs-watcher.json"
+            ;;
+        status)
+            python3 "$FS_WATCHER" status
+            ;;
+        *)
+            echo "Usage: event-triggers.sh watch {start|stop|status}"
+            return 1
+            ;;
+    esac
+}
+
 # Check git triggers
+# All triggers share one read of the workspace's refs (lib/git-refs.py
+# reads .git directly, no git processes). Each branch that moved since
+# the last check fires every trigger whose pattern matches its name.
 check_git_triggers() {
     init_triggers
-    local triggers
-    triggers=$(jq '[.triggers[] | select(.type == "git_push" and .enabled == true)]' "$TRIGGERS_FILE")
-    local count
-    count=$(echo "$triggers" | jq 'length')
+    jq -e '[.triggers[] | select(.type == "git_push" and .enabled == true)] | length > 0' \
+        "$TRIGGERS_FILE" >/dev/null 2>&1 || return 0
 
     local workspace
     workspace=$(jq -r '.workstation.workspace // ""' "$CONFIG_FILE" 2>/dev/null)
-    [[ -z "$workspace" || ! -d "$workspace/.git" ]] && return
-
-    for ((i = 0; i < count; i++)); do
-        local name condition
-        name=$(echo "$triggers" | jq -r ".[$i].name")
-        condition=$(echo "$triggers" | jq -r ".[$i].condition")  # Branch pattern
-
-        local current_hash
-        current_hash=$(git -C "$workspace" rev-parse HEAD 2>/dev/null)
-
-        local hash_file="$STATE_DIR/trigger_checksums/git_${name}.hash"
-        local previous_hash=""
-        [[ -f "$hash_file" ]] && previous_hash=$(cat "$hash_file")
-
-        if [[ "$current_hash" != "$previous_hash" ]]; then
-            echo "$current_hash" > "$hash_file"
-            local branch
-            branch=$(git -C "$workspace" rev-parse --abbrev-ref HEAD 2>/dev/null)
-            if [[ -n "$previous_hash" ]] && echo "$branch" | grep -q "$condition"; then
-                fire_trigger "$name" "New commit on $branch: $current_hash"
-            fi
-        fi
-    done
+    [[ -z "$workspace" || ! -e "$workspace/.git" ]] && return
+
+    local changes
+    changes=$(python3 "$GIT_REFS" scan "$workspace" 2>/dev/null)
+    [[ -z "$changes" || "$changes" == "[]" ]] && return
+
+    # Remote-tracking branches (origin/main) only match a condition that
+    # names one (contains a "/"): pushing a commit would otherwise fire
+    # a "main" trigger a second time for the same commit
+    local name ref event
+    while IFS=$'\t' read -r name ref event; do
+        [[ -n "$name" ]] && fire_trigger "$name" "$event" "$ref"
+    done < <(jq -r --argjson changes "$changes" '
+        .triggers[] | select(.type == "git_push" and .enabled == true) | . as $t |
+        $changes[] | select(.kind != "deleted") |
+        select((.ref | startswith("refs/remotes/") | not) or ($t.condition | contains("/"))) |
+        select(try (.branch | test($t.condition)) catch false) |
+        [$t.name, .ref,
+         (if .kind == "created" then "New branch \(.branch) at \(.new[0:12])"
+          elif .kind == "rewrite" then "History rewritten on \(.branch): \(.old[0:12]) → \(.new[0:12]) (\(.reason))"
+          elif .kind == "fast-forward" then "New commits on \(.branch): \(.old[0:12])..\(.new[0:12])"
+          else "\(.branch) moved: \(.old[0:12]) → \(.new[0:12])" end)] | @tsv' "$TRIGGERS_FILE")
 }
 
-# Check schedule triggers (cron-like, simplified)
+# Check schedule triggers and workstation schedules
+# lib/scheduler.py owns the timing (cron and "every" specs, catch-up,
+# next fire times); each fire it reports carries its slot, which goes
+# into the task id, so a fire repeated after a crash creates nothing new.
 check_schedule_triggers() {
     init_triggers
-    local triggers
-    triggers=$(jq '[.triggers[] | select(.type == "schedule" and .enabled == true)]' "$TRIGGERS_FILE")
-    local count
-    count=$(echo "$triggers" | jq 'length')
+    local fires
+    fires=$(python3 "$SCHEDULER" due 2>/dev/null)
+    [[ -z "$fires" || "$fires" == "[]" ]] && return 0
+
+    local kind key name slot event task acks=()
+    while IFS=$'\t' read -r kind key name slot event task; do
+        local task_id
+        task_id=$(echo "${kind}-${name}" | tr '[:upper:]' '[:lower:]' | sed 's/[^a-z0-9-]/-/g' | cut -c1-48)-$slot
+        if [[ "$kind" == "trigger" ]]; then
+            fire_trigger "$name" "$event" "" "$task_id"
+        else
+            fire_schedule "$task" "$event" "$task_id"
+        fi && acks+=("$key@$slot")
+    done < <(echo "$fires" | jq -r '.[] | [.kind, .key, .name, .slot,
+        ("Schedule: \(.spec) at \(.slot | strflocaltime("%Y-%m-%d %H:%M"))" +
+         (if .missed > 0 then " (\(.missed) missed run\(if .missed > 1 then "s" else "" end))" else "" end)),
+        (.task // "")] | @tsv')
+
+    [[ ${#acks[@]} -gt 0 ]] && python3 "$SCHEDULER" ack "${acks[@]}"
+    return 0
+}
 
-    local current_hour current_min
-    current_hour=$(date +%H)
-    current_min=$(date +%M)
+# Create the task for a workstation schedule (autonomy schedule add)
+# fire_schedule <task> <event_data> <task_id>
+fire_schedule() {
+    local task="$1" event_data="$2" task_id="$3"
+    [[ -f "$TASKS_DIR/${task_id}.json" ]] && return 0
 
-    for ((i = 0; i < count; i++)); do
-        local name condition
-        name=$(echo "$triggers" | jq -r ".[$i].name")
-        condition=$(echo "$triggers" | jq -r ".[$i].condition")  # Format: "HH:MM" or "daily" or "hourly"
-
-        local should_fire=false
-        case "$condition" in
-            daily)
-                [[ "$current_hour" == "09" && "$current_min" -lt 10 ]] && should_fire=true
-                ;;
-            hourly)
-                [[ "$current_min" -lt 10 ]] && should_fire=true
-                ;;
-            *)
-                # HH:MM format
-                local target_hour target_min
-                target_hour=$(echo "$condition" | cut -d: -f1)
-                target_min=$(echo "$condition" | cut -d: -f2)
-                [[ "$current_hour" == "$target_hour" && "$current_min" -ge "$target_min" && "$current_min" -lt $((target_min + 10)) ]] && should_fire=true
-                ;;
-        esac
+    jq -n --arg id "$task_id" --arg desc "$task (Event: $event_data)" --arg task "$task" \
+        --arg ts "$(date -Iseconds)" \
+        '{
+            id: $id,
+            name: $id,
+            description: $desc,
+            status: "pending",
+            priority: "medium",
+            source: ("schedule:" + $task),
+            created_at: $ts,
+            attempts: 0,
+            progress: 0,
+            subtasks: [],
+            tags: ["scheduled"]
+        }' > "$TASKS_DIR/${task_id}.json"
 
-        [[ "$should_fire" == "true" ]] && fire_trigger "$name" "Schedule: $condition"
-    done
+    local tmp="${CONFIG_FILE}.tmp.$$"
+    jq --arg task "$task" --arg ts "$(date -Iseconds)" \
+        '(.workstation.schedules[]? | select(.task == $task)) |= (.last_run = $ts)' \
+        "$CONFIG_FILE" > "$tmp" && mv "$tmp" "$CONFIG_FILE"
+
+    _trigger_log INFO "Schedule fired: $task → created task $task_id"
+    echo "Schedule fired: $task → $task_id"
+}
+
+# Create the tasks for debounce windows that have settled since their
+# last event (lib/trigger-windows.py applies merges into open tasks itself)
+flush_trigger_windows() {
+    [[ -f "$STATE_DIR/trigger-windows.json" ]] || return 0
+    local decisions
+    decisions=$(python3 "$TRIGGER_WINDOWS" due 2>/dev/null)
+    [[ -z "$decisions" || "$decisions" == "[]" ]] && return 0
+
+    local action name key event coalesced
+    while IFS= read -r -d '' action && IFS= read -r -d '' name && IFS= read -r -d '' key &&
+          IFS= read -r -d '' event && IFS= read -r -d '' coalesced; do
+        if [[ "$action" == "fire" ]]; then
+            _trigger_task "$name" "$event" "$key" "" "$coalesced"
+        else
+            _trigger_log INFO "Coalesced trigger $name events into task $event"
+            echo "Trigger coalesced: $name → $event"
+        fi
+    done < <(echo "$decisions" | jq -j '.[] | .action, "\u0000", .trigger, "\u0000", .key, "\u0000",
+        (.event // .task), "\u0000", (.coalesced // null | tojson), "\u0000"')
 }
 
 # Run all trigger checks
@@ -285,6 +513,7 @@ check_all() {
     check_file_triggers
     check_git_triggers
     check_schedule_triggers
+    flush_trigger_windows
 }
 
 # ── Status ──────────────────────────────────────────────────
@@ -308,7 +537,7 @@ setup_defaults() {
 
     # Watch for git changes on main branch
     if [[ -d "$workspace/.git" ]]; then
-        register_trigger "git-main-push" "git_push" "main" \
+        register_trigger "git-main-push" "git_push" "^main$" \
             "New commits on main branch detected. Review changes and create follow-up tasks if needed." \
             "medium" 2>/dev/null
     fi
@@ -328,12 +557,18 @@ case "${1:-}" in
     unregister)   shift; unregister_trigger "$1" ;;
     list)         list_triggers ;;
     fire)         shift; fire_trigger "$@" ;;
+    fire_batch)   fire_batch ;;
+    tune)         shift; tune_trigger "$@" ;;
+    windows)      python3 "$TRIGGER_WINDOWS" list ;;
+    flush)        flush_trigger_windows ;;
     check)        check_all ;;
     check_files)  check_file_triggers ;;
     check_git)    check_git_triggers ;;
     check_sched)  check_schedule_triggers ;;
+    schedules)    python3 "$SCHEDULER" list ;;
     setup)        setup_defaults ;;
     status)       trigger_status ;;
+    watch)        shift; fs_watcher "$@" ;;
     *)
         echo "Event-Driven Task Triggering"
         echo "Usage: $0 <command> [args...]"
@@ -343,12 +578,19 @@ case "${1:-}" in
         echo "  unregister <name>           Remove a trigger"
         echo "  list                        List all triggers"
         echo "  fire <name> [event_data]    Manually fire a trigger"
+        echo "  fire_batch                  Fire a JSON array of queued webhook events (stdin)"
+        echo "  tune <name> <setting>=<n>   Set cooldown_seconds, debounce_seconds,"
+        echo "                              max_wait_seconds or max_pending_tasks"
+        echo "  windows                     Events held in debounce windows"
+        echo "  flush                       Fire debounce windows that have settled"
         echo "  check                       Check all triggers"
         echo "  check_files                 Check file change triggers"
         echo "  check_git                   Check git triggers"
-        echo "  check_sched                 Check schedule triggers"
+        echo "  check_sched                 Check schedule triggers and schedules"
+        echo "  schedules                   Schedules with their next fire times"
         echo "  setup                       Setup default triggers"
         echo "  status                      Full status JSON"
+        echo "  watch {start|stop|status}   Manage the inotify change watcher"
         echo ""
         echo "Trigger types: file_change, git_push, schedule, webhook, pattern"
         ;;
@@ -9,6 +9,7 @@ CONFIG_FILE="$AUTONOMY_DIR/config.json"
 TASKS_DIR="$AUTONOMY_DIR/tasks"
 STATE_DIR="$AUTONOMY_DIR/state"
 EXEC_STATE_DIR="$STATE_DIR/execution"
+EXEC_STEP_LOG_DIR="$AUTONOMY_DIR/logs/steps"
 
 mkdir -p "$EXEC_STATE_DIR" "$AUTONOMY_DIR/logs"
 
@@ -58,6 +59,9 @@ save_exec_state() {
     local task_id="$1"
     local state="$2"
     echo "$state" | jq . > "$EXEC_STATE_DIR/${task_id}.json"
+    [[ -n "${AGENT_ID:-}" ]] && _publish_progress "$(echo "$state" |
+        jq -c '{phase, step: .current_step, steps: (.plan_steps // [] | length)} | with_entries(select(.value != null))')"
+    return 0
 }
 
 update_task_progress() {
@@ -72,6 +76,8 @@ update_task_progress() {
     jq --argjson p "$progress" --arg d "$detail" \
         '.progress = $p | .progress_detail = $d' \
         "$task_file" > "$tmp" && mv "$tmp" "$task_file"
+    [[ -n "${AGENT_ID:-}" ]] && _publish_progress "$(jq -nc --argjson p "$progress" --arg d "$detail" '{percent: $p, message: $d}')"
+    return 0
 }
 
 update_task_status() {
@@ -81,8 +87,43 @@ update_task_status() {
 
     [[ -f "$task_file" ]] || return 1
 
+    # Same per-task lock lib/trigger-windows.py takes to fold events in
     local tmp="${task_file}.tmp.$$"
-    jq --arg s "$status" '.status = $s' "$task_file" > "$tmp" && mv "$tmp" "$task_file"
+    mkdir -p "$STATE_DIR/task-locks"
+    (
+        flock 9
+        jq --arg s "$status" '.status = $s' "$task_file" > "$tmp" && mv "$tmp" "$task_file"
+    ) 9> "$STATE_DIR/task-locks/${task_id}.lock"
+}
+
+# ── Prompt Prefix ───────────────────────────────────────────
+# Every engine prompt shares one stable system prompt (role, workspace,
+# memory, hard limits) so providers can serve it from their prompt cache;
+# only the phase- and task-specific text goes in the user prompt. Built
+# once per process into EXEC_SYSTEM_PROMPT.
+
+EXEC_SYSTEM_PROMPT=""
+
+_exec_system_prompt() {
+    [[ -n "$EXEC_SYSTEM_PROMPT" ]] && return 0
+
+    local workspace memory limits
+    workspace=$(bash "$SCRIPT_DIR/workspace-scanner.sh" oneliner 2>/dev/null)
+    memory=$(bash "$SCRIPT_DIR/memory.sh" summary 2>/dev/null)
+    limits=$(jq -r '.agentic_config.hard_limits // {} | to_entries[] | "- \(.key): \(.value)"' "$CONFIG_FILE" 2>/dev/null)
+
+    EXEC_SYSTEM_PROMPT="You are the execution engine of an autonomous coding agent. You plan tasks as small verifiable steps, run them with terminal commands in the workspace, and fix what fails verification.
+
+Workspace:
+${workspace:-unknown}
+
+Memory:
+${memory:-No persistent memories yet.}
+
+Hard limits:
+${limits:-none}
+
+Follow the response format each request asks for exactly. Never run destructive commands outside the workspace."
 }
 
 # ── Phase 1: ANALYZE ────────────────────────────────────────
@@ -122,12 +163,17 @@ $subtasks"
     prompt="$prompt
 
 Respond ONLY with a JSON array of steps. Each step:
-{\"action\": \"description of what to do\", \"commands\": [\"cmd1\", \"cmd2\"], \"verify\": \"command that returns 0 if step succeeded\"}
+{\"action\": \"description of what to do\", \"commands\": [\"cmd1\", \"cmd2\"], \"verify\": \"command that returns 0 if step succeeded\", \"depends_on\": [0]}
+
+depends_on lists the indices (0-based) of earlier steps that must finish first; use [] for steps that can start right away, so independent steps run in parallel. Omit it to run after the previous step.
+Optionally add \"verify_paths\": [\"dir\", \"file\"] naming what the verify command depends on, so an unchanged result can be reused.
 
 Return ONLY valid JSON. No markdown, no explanation."
 
     local analysis_result
-    analysis_result=$(ai_call "$prompt" 2>/dev/null)
+    # Stop streaming as soon as a complete JSON step array has arrived
+    _exec_system_prompt
+    analysis_result=$(AI_CALL_TYPE=analyze AI_STOP_ON_JSON=1 ai_call "$EXEC_SYSTEM_PROMPT" "$prompt" 2>/dev/null)
 
     if [[ -z "$analysis_result" ]]; then
         _exec_log ERROR "AI analysis returned empty for $task_id"
@@ -162,76 +208,232 @@ Return ONLY valid JSON. No markdown, no explanation."
 # ── Phase 2: EXECUTE ────────────────────────────────────────
 # Run each step's commands
 
-phase_execute() {
-    local task_id="$1"
-    local exec_state step_count current_step
-
-    exec_state=$(get_exec_state "$task_id")
-    step_count=$(echo "$exec_state" | jq '.plan_steps | length')
-    current_step=$(echo "$exec_state" | jq '.current_step')
+# Steps run in plan order unless they say otherwise: a step without
+# depends_on waits for the step before it, while depends_on lists the
+# indices of the steps it needs ([] = start right away). Ready steps run
+# concurrently, up to execution.max_parallel_steps (default 4), each with
+# its own output capture. A failing step stops the run unless it is marked
+# "optional": true; steps still running are cancelled and the rest skipped.
+# Step output streams to logs/steps/<task>/step-<n>.log; the execution
+# state keeps only a head/tail excerpt, byte and line counts and the path.
+# Every command is metered by ai_terminal: each step result carries its
+# commands' measurements and their rollup, and all of a task's commands
+# (execute, verify and fix) are appended to state/execution/<task>.resources.jsonl,
+# which is summed into the task's .resources and feeds `stats`.
+
+_exec_max_parallel() {
+    local n
+    n=$(jq -r '.execution.max_parallel_steps // 4' "$CONFIG_FILE" 2>/dev/null)
+    [[ "$n" =~ ^[1-9][0-9]*$ ]] || n=4
+    echo "$n"
+}
 
-    if [[ "$current_step" -ge "$step_count" ]]; then
-        _exec_log INFO "All steps executed for $task_id, moving to verify"
-        exec_state=$(echo "$exec_state" | jq '.phase = "verifying"')
-        save_exec_state "$task_id" "$exec_state"
-        return 0
-    fi
+# _exec_resource_rollup [file...] — sum metered commands (JSON lines)
+_exec_resource_rollup() {
+    cat "$@" 2>/dev/null | jq -sc '{
+        commands: length,
+        wall_ms: (map(.wall_ms // 0) | add // 0),
+        user_ms: (map(.user_ms // 0) | add // 0),
+        sys_ms: (map(.sys_ms // 0) | add // 0),
+        max_rss_kb: (map(.max_rss_kb // 0) | max // 0),
+        read_bytes: (map(.read_bytes // 0) | add // 0),
+        write_bytes: (map(.write_bytes // 0) | add // 0),
+        failed: (map(select(.exit_code != 0)) | length),
+        signals: (map(.signal | select(. != null)) | unique)
+    }'
+}
 
+# _exec_run_step <step_json> <log_file> — run one plan step
+_exec_run_step() {
+    local step_json="$1" log_file="$2"
     local step_action step_commands
-    step_action=$(echo "$exec_state" | jq -r ".plan_steps[$current_step].action")
-    step_commands=$(echo "$exec_state" | jq -r ".plan_steps[$current_step].commands // [] | .[]")
-
-    local progress=$(( 20 + (current_step * 50 / step_count) ))
-    update_task_progress "$task_id" "$progress" "Executing step $((current_step + 1))/$step_count: $step_action"
-    _exec_log INFO "Executing step $((current_step + 1))/$step_count for $task_id: $step_action"
-
-    local step_result=""
-    local step_success=true
-
-    if [[ -n "$step_commands" ]]; then
-        while IFS= read -r cmd; do
-            [[ -z "$cmd" ]] && continue
-            _exec_log INFO "Running command: $cmd"
-
-            local output
-            output=$(ai_terminal "$cmd" 2>&1)
-            local exit_code=$?
-            step_result="${step_result}$ $cmd\n${output}\n"
+    step_action=$(echo "$step_json" | jq -r '.action')
+    step_commands=$(echo "$step_json" | jq -r '.commands // [] | .[]')
 
-            if [[ $exit_code -ne 0 ]]; then
-                _exec_log WARN "Command failed (exit $exit_code): $cmd"
-                step_success=false
-                break
-            fi
-        done <<< "$step_commands"
-    else
+    if [[ -z "$step_commands" ]]; then
         # No commands — ask AI to execute the step
         local execute_prompt="Execute this step for the current task. Use terminal commands.
 Step: $step_action
 Respond with the commands you ran and their results. Be concise."
 
-        step_result=$(ai_call "$execute_prompt" 2>/dev/null)
+        AI_NO_CACHE=1 ai_call "$EXEC_SYSTEM_PROMPT" "$execute_prompt" 2>/dev/null >> "$log_file"
+        return 0
     fi
 
-    # Record step result
-    local result_entry
-    result_entry=$(jq -n \
-        --arg action "$step_action" \
-        --arg result "$step_result" \
-        --argjson success "$step_success" \
-        --argjson step "$current_step" \
-        '{step: $step, action: $action, result: $result, success: $success, at: "'"$(date -Iseconds)"'"}')
-
-    exec_state=$(echo "$exec_state" | jq --argjson entry "$result_entry" \
-        '.step_results += [$entry] | .current_step += 1')
-
-    # If all steps done, move to verify
-    local new_step=$((current_step + 1))
-    if [[ "$new_step" -ge "$step_count" ]]; then
-        exec_state=$(echo "$exec_state" | jq '.phase = "verifying"')
-    fi
+    local cmd exit_code
+    while IFS= read -r cmd; do
+        [[ -z "$cmd" ]] && continue
+        _exec_log INFO "Running command: $cmd"
+
+        printf '$ %s\n' "$cmd" >> "$log_file"
+        ai_terminal "$cmd" 30 "$log_file" > /dev/null
+        exit_code=$?
+
+        if [[ $exit_code -ne 0 ]]; then
+            _exec_log WARN "Command failed (exit $exit_code): $cmd"
+            return 1
+        fi
+    done <<< "$step_commands"
+    return 0
+}
+
+phase_execute() {
+    local task_id="$1"
+    local exec_state step_count
+
+    exec_state=$(get_exec_state "$task_id")
+    step_count=$(echo "$exec_state" | jq '.plan_steps | length')
+
+    local -a status=() deps=() optional=() reason=()
+    local i dep_list opt
+    while IFS=$'\t' read -r i dep_list opt; do
+        deps[$i]="${dep_list//-/}"
+        optional[$i]="$opt"
+        status[$i]=pending
+    done < <(echo "$exec_state" | jq -r '.plan_steps | to_entries[]
+        | [.key,
+           (if (.value | has("depends_on")) then (.value.depends_on // [] | map(select(type == "number") | tostring) | join(",") | if . == "" then "-" else . end)
+            elif .key > 0 then "\(.key - 1)" else "-" end),
+           (.value.optional == true)] | @tsv')
+    # Resume: steps that already succeeded are not run again
+    for i in $(echo "$exec_state" | jq -r '.step_results[] | select(.success == true) | .step'); do
+        status[$i]=ok
+    done
 
+    local max_jobs
+    max_jobs=$(_exec_max_parallel)
+    _exec_system_prompt
+
+    local dir phase_started log_dir="$EXEC_STEP_LOG_DIR/$task_id"
+    dir=$(mktemp -d)
+    mkdir -p "$log_dir"
+    phase_started=$(date +%s%N)
+    local -A pids=() started=()
+    local running=0 done_count=0 failing=false ready dep
+    while :; do
+        for ((i = 0; i < step_count; i++)); do
+            [[ "${status[$i]}" == "pending" ]] || continue
+            ready=true
+            for dep in ${deps[$i]//,/ }; do
+                case "${status[$dep]:-missing}" in
+                    ok) ;;
+                    pending|running) ready=false ;;
+                    *) ready=skip ;;
+                esac
+            done
+            if [[ "$failing" == "true" ]]; then
+                status[$i]=skipped
+                reason[$i]="skipped: run stopped after a step failed"
+                continue
+            elif [[ "$ready" == "skip" ]]; then
+                status[$i]=skipped
+                reason[$i]="skipped: depends on a step that did not succeed"
+                continue
+            fi
+            [[ "$ready" == "true" ]] && (( running < max_jobs )) || continue
+
+            local step_json
+            step_json=$(echo "$exec_state" | jq -c ".plan_steps[$i]")
+            _exec_log INFO "Executing step $((i + 1))/$step_count for $task_id: $(echo "$step_json" | jq -r '.action')"
+            : > "$log_dir/step-$i.log"
+            ( AI_RESOURCE_FILE="$dir/$i.res" _exec_run_step "$step_json" "$log_dir/step-$i.log"
+              echo $? > "$dir/$i.rc" ) >> "$log_dir/step-$i.log" 2>&1 &
+            pids[$i]=$!
+            started[$i]=$(date +%s%N)
+            status[$i]=running
+            running=$((running + 1))
+        done
+        (( running == 0 )) && break
+
+        wait -n 2>/dev/null
+        for i in "${!pids[@]}"; do
+            [[ "${status[$i]}" == "running" && -f "$dir/$i.rc" ]] || continue
+            echo $(( ($(date +%s%N) - ${started[$i]}) / 1000000 )) > "$dir/$i.ms"
+            running=$((running - 1))
+            done_count=$((done_count + 1))
+            if [[ "$(cat "$dir/$i.rc")" == "0" ]]; then
+                status[$i]=ok
+            else
+                status[$i]=failed
+                if [[ "${optional[$i]}" != "true" && "$failing" != "true" ]]; then
+                    _exec_log WARN "Step $((i + 1)) failed for $task_id — cancelling remaining steps"
+                    failing=true
+                fi
+            fi
+            update_task_progress "$task_id" $(( 20 + (done_count * 50 / step_count) )) \
+                "Executed $done_count/$step_count steps"
+        done
+
+        if [[ "$failing" == "true" ]]; then
+            for i in "${!pids[@]}"; do
+                [[ "${status[$i]}" == "running" ]] || continue
+                _kill_tree "${pids[$i]}"
+                status[$i]=cancelled
+                running=$((running - 1))
+            done
+        fi
+    done
+    wait 2>/dev/null
+    # Anything still pending waits on itself or a later step
+    for ((i = 0; i < step_count; i++)); do
+        [[ "${status[$i]}" == "pending" ]] || continue
+        status[$i]=skipped
+        reason[$i]="skipped: dependencies can never be met"
+    done
+
+    # Merge this run's results in step order
+    local entries="[]" now task_res="$EXEC_STATE_DIR/${task_id}.resources.jsonl"
+    now=$(date -Iseconds)
+    for ((i = 0; i < step_count; i++)); do
+        case "${status[$i]}" in
+            ok|failed|skipped|cancelled) ;;
+            *) continue ;;
+        esac
+        [[ "${status[$i]}" == "ok" && -z "${pids[$i]:-}" ]] && continue
+        local result="" ms=0 log="" lines=0 bytes=0 commands="[]" resources="{}"
+        [[ -f "$dir/$i.ms" ]] && ms=$(cat "$dir/$i.ms")
+        if [[ -s "$dir/$i.res" ]]; then
+            commands=$(jq -sc 'map(del(.timestamp, .task))' "$dir/$i.res")
+            resources=$(_exec_resource_rollup "$dir/$i.res")
+            jq -c --argjson step "$i" '. + {step: $step}' "$dir/$i.res" >> "$task_res"
+        fi
+        if [[ "${status[$i]}" == "skipped" ]]; then
+            result="${reason[$i]}"
+        else
+            log="$log_dir/step-$i.log"
+            result=$(_output_excerpt "$log")
+            read -r lines bytes < <(wc -l -c < "$log")
+        fi
+        entries=$(echo "$entries" | jq \
+            --argjson step "$i" \
+            --arg result "$result" \
+            --arg status "${status[$i]}" \
+            --argjson ms "$ms" \
+            --arg log "$log" \
+            --argjson lines "${lines:-0}" \
+            --argjson bytes "${bytes:-0}" \
+            --argjson commands "$commands" \
+            --argjson resources "$resources" \
+            --arg at "$now" \
+            --argjson plan "$(echo "$exec_state" | jq -c ".plan_steps[$i]")" \
+            '. + [{step: $step, action: $plan.action, result: $result, success: ($status == "ok"),
+                   status: $status, duration_ms: $ms, at: $at}
+                  + (if $log != "" then {log: $log, output_bytes: $bytes, output_lines: $lines} else {} end)
+                  + (if $commands != [] then {commands: $commands, resources: $resources} else {} end)]')
+    done
+    rm -rf "$dir"
+
+    exec_state=$(echo "$exec_state" | jq --argjson new "$entries" --argjson n "$step_count" \
+        --argjson ms $(( ($(date +%s%N) - phase_started) / 1000000 )) \
+        --argjson res "$(_exec_resource_rollup "$task_res")" '
+        ($new | map(.step)) as $rerun
+        | .step_results = ([.step_results[] | select(.step as $s | $rerun | index($s) | not)] + $new | sort_by(.step))
+        | .current_step = $n
+        | .resources = $res
+        | .execute_ms = $ms
+        | .phase = "verifying"')
     save_exec_state "$task_id" "$exec_state"
+    _exec_log INFO "All steps executed for $task_id, moving to verify"
     return 0
 }
 
@@ -251,6 +453,11 @@ phase_verify() {
     local all_passed=true
     local verification_results="[]"
 
+    # Paths a verify command depends on: the step's verify_paths, else
+    # verification.cache.paths, else the whole workspace
+    local default_paths
+    default_paths=$(jq -c '.verification.cache.paths // []' "$CONFIG_FILE" 2>/dev/null)
+
     for ((i = 0; i < step_count; i++)); do
         local verify_cmd
         verify_cmd=$(echo "$exec_state" | jq -r ".plan_steps[$i].verify // \"\"")
@@ -261,21 +468,19 @@ phase_verify() {
             continue
         fi
 
-        local verify_output
-        verify_output=$(ai_terminal "$verify_cmd" 2>&1)
+        local verify_paths=() run
+        mapfile -t verify_paths < <(echo "$exec_state" | jq -r --argjson d "${default_paths:-[]}" \
+            ".plan_steps[$i].verify_paths // \$d | .[]")
+        run=$(ai_verify_command "$verify_cmd" 30 "${verify_paths[@]}")
         local verify_exit=$?
 
+        verification_results=$(echo "$verification_results" | jq --argjson run "$run" --argjson i "$i" \
+            '. + [{step: $i, passed: ($run.exit_code == 0), output: $run.output, cached: $run.cached}]')
         if [[ $verify_exit -eq 0 ]]; then
-            verification_results=$(echo "$verification_results" | jq \
-                --arg out "$verify_output" \
-                ". + [{\"step\": $i, \"passed\": true, \"output\": \$out}]")
-            _exec_log INFO "Step $i verification passed"
+            _exec_log INFO "Step $i verification passed$([[ "$(echo "$run" | jq -r '.cached')" == "true" ]] && echo " (cached)")"
         else
             all_passed=false
-            verification_results=$(echo "$verification_results" | jq \
-                --arg out "$verify_output" \
-                ". + [{\"step\": $i, \"passed\": false, \"output\": \$out}]")
-            _exec_log WARN "Step $i verification failed: $verify_output"
+            _exec_log WARN "Step $i verification failed: $(echo "$run" | jq -r '.output')"
         fi
     done
 
@@ -347,7 +552,8 @@ Identify what went wrong and fix it. Respond with commands to run.
 Format: one command per line, no markdown."
 
     local fix_response
-    fix_response=$(ai_call "$fix_prompt" 2>/dev/null)
+    _exec_system_prompt
+    fix_response=$(AI_NO_CACHE=1 ai_call "$EXEC_SYSTEM_PROMPT" "$fix_prompt" 2>/dev/null)
 
     if [[ -n "$fix_response" ]]; then
         # Extract and run fix commands
@@ -500,6 +706,8 @@ execute_task() {
 
     _exec_log INFO "Starting closed-loop execution for task: $task_id"
     update_task_status "$task_id" "ai_processing"
+    export AI_TASK="$task_id"
+    export AI_RESOURCE_FILE="$EXEC_STATE_DIR/${task_id}.resources.jsonl"
 
     # Verification-Driven: ensure criteria exist before executing
     if [[ -f "$AUTONOMY_DIR/lib/verification-driven.sh" ]]; then
@@ -546,6 +754,11 @@ execute_task() {
         save_exec_state "$task_id" "$exec_state"
     fi
 
+    # Verify and fix commands count toward the task's resources too
+    local exec_state
+    exec_state=$(get_exec_state "$task_id" | jq --argjson res "$(_exec_resource_rollup "$AI_RESOURCE_FILE")" '.resources = $res')
+    save_exec_state "$task_id" "$exec_state"
+
     # Phase 5: Complete/Fail
     phase_complete "$task_id"
 }
@@ -585,12 +798,41 @@ list_executions() {
     echo "$results" | jq .
 }
 
+# ── Command resource report ─────────────────────────────────
+# execution_stats [limit] — most expensive commands across all tasks,
+# grouped by command line and ranked by total wall time
+
+execution_stats() {
+    local limit="${1:-10}"
+    [[ "$limit" =~ ^[0-9]+$ ]] || limit=10
+    cat "$EXEC_STATE_DIR"/*.resources.jsonl 2>/dev/null | jq -s --argjson n "$limit" '
+        {
+            commands_run: length,
+            tasks: (map(.task) | unique | length),
+            top: (group_by(.command) | map({
+                command: .[0].command,
+                runs: length,
+                tasks: (map(.task) | unique),
+                wall_ms: (map(.wall_ms // 0) | add),
+                avg_wall_ms: ((map(.wall_ms // 0) | add) / length | floor),
+                max_wall_ms: (map(.wall_ms // 0) | max),
+                cpu_ms: (map((.user_ms // 0) + (.sys_ms // 0)) | add),
+                max_rss_kb: (map(.max_rss_kb // 0) | max),
+                read_bytes: (map(.read_bytes // 0) | add),
+                write_bytes: (map(.write_bytes // 0) | add),
+                failures: (map(select(.exit_code != 0)) | length),
+                signals: (map(.signal | select(. != null)) | unique)
+            }) | sort_by(-.wall_ms) | .[:$n])
+        }'
+}
+
 # ── CLI ─────────────────────────────────────────────────────
 
 case "${1:-}" in
     execute)  execute_task "$2" "$3" ;;
     status)   execution_status "$2" ;;
     list)     list_executions ;;
+    stats)    execution_stats "$2" ;;
     *)
         echo "Closed-Loop Execution Engine"
         echo "Usage: $0 <command> [args...]"
@@ -599,5 +841,6 @@ case "${1:-}" in
         echo "  execute <task_id> [max_iter]  - Run full execution loop"
         echo "  status <task_id>              - Check execution status"
         echo "  list                          - List all executions"
+        echo "  stats [limit]                 - Most expensive commands across tasks"
         ;;
 esac
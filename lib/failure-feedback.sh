@@ -119,7 +119,7 @@ Line 2: Root cause (one sentence)
 Line 3: Prevention (one sentence)"
 
         local ai_result
-        ai_result=$(bash "$AUTONOMY_DIR/lib/ai-engine.sh" call "Analyze failure" "$prompt" 2>/dev/null)
+        ai_result=$(AI_CALL_TYPE=failure bash "$AUTONOMY_DIR/lib/ai-engine.sh" call "Analyze failure" "$prompt" 2>/dev/null)
 
         if [[ -n "$ai_result" ]]; then
             category=$(echo "$ai_result" | head -1 | tr -d '[:space:]' | tr '[:upper:]' '[:lower:]')
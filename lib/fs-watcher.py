@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""Resident file watcher — inotify-backed change queue for triggers and watchers.
+
+Watches the path of every enabled file_change trigger (state/triggers.json)
+and file watcher (state/watchers.json) through the kernel's inotify
+interface, called via ctypes: directories recursively, single files through
+their parent directory so editors' replace-by-rename is seen. Events are
+coalesced until the tree has been quiet for FS_WATCHER_QUIET seconds (or
+FS_WATCHER_MAX_DELAY after the first one) and appended as one JSON line
+per batch to state/fs-events/<key>.jsonl, where the key is
+trigger:<name> or watcher:<name>. check_file_triggers and watcher_check
+drain their own queue with `take` instead of re-hashing the tree.
+
+state/fs-watcher.json lists the keys being watched. A key whose path could
+not be watched (missing, or the inotify watch limit was reached) or whose
+events were lost to a kernel queue overflow is left to the checksum poll,
+as is the first check after a key starts being watched: nothing was
+queued for changes made before then.
+
+Usage:
+    fs-watcher.py serve                       Run in the foreground
+    fs-watcher.py status                      Print the watch table
+    fs-watcher.py take <key>                  Print the paths changed since the
+                                              last take; exit 2 to ask for a poll
+    fs-watcher.py wait <prefix> [--timeout N] Block until a queue matching
+                                              prefix has events, or N seconds
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import json
+import os
+import re
+import select
+import signal
+import struct
+import sys
+import time
+
+AUTONOMY_DIR = os.environ.get("AUTONOMY_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATE_DIR = f"{AUTONOMY_DIR}/state"
+TRIGGERS_FILE = f"{STATE_DIR}/triggers.json"
+WATCHERS_FILE = f"{STATE_DIR}/watchers.json"
+QUEUE_DIR = f"{STATE_DIR}/fs-events"
+STATUS_FILE = f"{STATE_DIR}/fs-watcher.json"
+PID_FILE = f"{STATE_DIR}/fs-watcher.pid"
+WAKE_FILE = f"{STATE_DIR}/daemon.wake"
+
+QUIET = float(os.environ.get("FS_WATCHER_QUIET", "0.5"))
+MAX_DELAY = float(os.environ.get("FS_WATCHER_MAX_DELAY", "5"))
+RELOAD_INTERVAL = 1.0
+MAX_BATCH_PATHS = 500
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Files this process writes itself; a watch over state/ must not echo them
+OWN_FILES = (QUEUE_DIR + "/", STATUS_FILE, PID_FILE, WAKE_FILE)
+
+
+class Inotify:
+    """Thin ctypes wrapper over inotify_init1/inotify_add_watch and read(2)."""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read(self):
+        """Return the pending events as (wd, mask, name) tuples."""
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+                offset += EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path, data):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def queue_path(key):
+    return f"{QUEUE_DIR}/{re.sub(r'[^A-Za-z0-9._-]', '_', key)}.jsonl"
+
+
+def append_record(key, record):
+    """Append one line to a key's queue, under the lock `take` renames it with."""
+    path = queue_path(key)
+    line = (json.dumps(record) + "\n").encode()
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # `take` may have claimed the file between open and lock
+            try:
+                current = os.stat(path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(fd).st_ino:
+                os.write(fd, line)
+                return
+        finally:
+            os.close(fd)
+
+
+def registrations():
+    """Map each watch key to the absolute path it covers."""
+    keys = {}
+    triggers = read_json(TRIGGERS_FILE, {})
+    for t in triggers.get("triggers", []) if isinstance(triggers, dict) else []:
+        if t.get("type") == "file_change" and t.get("enabled") is not False and t.get("condition"):
+            keys[f"trigger:{t['name']}"] = os.path.abspath(os.path.join(AUTONOMY_DIR, t["condition"]))
+    watchers = read_json(WATCHERS_FILE, [])
+    for w in watchers if isinstance(watchers, list) else []:
+        if w.get("enabled") is not False and w.get("path"):
+            keys[f"watcher:{w['name']}"] = os.path.abspath(os.path.join(AUTONOMY_DIR, w["path"]))
+    return keys
+
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class Watcher:
+    def __init__(self):
+        self.inotify = None
+        self.roots = {}      # key -> {path, file, ok, error}
+        self.dirs = {}       # wd -> directory
+        self.wds = {}        # directory -> wd
+        self.pending = {}    # key -> set of changed paths
+        self.first_event = self.last_event = 0.0
+        self.sources = None
+        self.stats = {"events": 0, "batches": 0, "overflows": 0, "rebuilds": 0}
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    # ── Watch table ──────────────────────────────────────────
+
+    def rebuild(self, keys):
+        """Start over with a fresh inotify instance covering `keys`."""
+        self.flush(force=True)
+        if self.inotify:
+            self.inotify.close()
+        self.inotify = Inotify()
+        self.dirs, self.wds = {}, {}
+        self.roots = {key: {"path": path, "file": False, "ok": False, "error": None}
+                      for key, path in keys.items()}
+        for key in self.roots:
+            self.attach(key)
+        self.stats["rebuilds"] += 1
+        self.write_status()
+
+    def attach(self, key):
+        root = self.roots[key]
+        path = root["path"]
+        root["file"] = os.path.exists(path) and not os.path.isdir(path)
+        try:
+            if not os.path.exists(path):
+                raise OSError(errno.ENOENT, "path does not exist", path)
+            if root["file"]:
+                self.watch_dir(os.path.dirname(path))
+            else:
+                self.watch_tree(path)
+            root["ok"], root["error"] = True, None
+            # Whatever happened while unwatched (or before a baseline was
+            # taken) is only visible to a poll
+            append_record(key, {"ts": time.time(), "rescan": True})
+        except OSError as e:
+            root["ok"] = False
+            root["error"] = "inotify watch limit reached" if e.errno == errno.ENOSPC else e.strerror
+
+    def watch_dir(self, directory):
+        if directory in self.wds:
+            return
+        wd = self.inotify.add(directory)
+        self.dirs[wd] = directory
+        self.wds[directory] = wd
+
+    def watch_tree(self, top):
+        """Watch top and every directory below it; return the files found."""
+        found = []
+        for directory, subdirs, files in os.walk(top):
+            try:
+                self.watch_dir(directory)
+            except OSError as e:
+                if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                    subdirs[:] = []
+                    continue
+                raise
+            found.extend(os.path.join(directory, f) for f in files)
+        return found
+
+    def keys_for(self, path):
+        for key, root in self.roots.items():
+            if not root["ok"]:
+                continue
+            if path == root["path"] or (not root["file"] and path.startswith(root["path"] + "/")):
+                yield key
+
+    # ── Events ───────────────────────────────────────────────
+
+    def handle(self, events):
+        now = time.monotonic()
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # The kernel dropped events: nobody can trust their queue now
+                self.stats["overflows"] += 1
+                for key, root in self.roots.items():
+                    if root["ok"]:
+                        append_record(key, {"ts": time.time(), "rescan": True})
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                self.wds.pop(directory, None)
+                for key, root in self.roots.items():
+                    if root["ok"] and directory in (root["path"], os.path.dirname(root["path"])):
+                        # Root gone: report it and fall back until it reappears
+                        self.pending.setdefault(key, set()).add(root["path"])
+                        root["ok"], root["error"] = False, "path removed"
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if path.startswith(OWN_FILES):
+                continue
+            changed = [path]
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and any(self.keys_for(path)):
+                # Files can land in a new directory before its watch exists
+                try:
+                    changed.extend(self.watch_tree(path))
+                except OSError as e:
+                    self.fail_watch(e)
+            matched = False
+            for key in self.keys_for(path):
+                self.pending.setdefault(key, set()).update(changed)
+                matched = True
+            if matched:
+                self.stats["events"] += 1
+                if not self.first_event:
+                    self.first_event = now
+                self.last_event = now
+
+    def fail_watch(self, error):
+        """A new directory could not be watched: hand its keys back to polling."""
+        message = "inotify watch limit reached" if error.errno == errno.ENOSPC else error.strerror
+        for key, root in self.roots.items():
+            if root["ok"] and not root["file"] and error.filename and error.filename.startswith(root["path"]):
+                root["ok"], root["error"] = False, message
+                append_record(key, {"ts": time.time(), "rescan": True})
+
+    def flush(self, force=False):
+        if not self.pending:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_event < QUIET and now - self.first_event < MAX_DELAY:
+            return
+        woke = False
+        for key, paths in self.pending.items():
+            ordered = sorted(paths)
+            record = {"ts": time.time(), "count": len(ordered), "paths": ordered[:MAX_BATCH_PATHS]}
+            append_record(key, record)
+            woke = woke or key.startswith("trigger:")
+            self.stats["batches"] += 1
+        self.pending = {}
+        self.first_event = self.last_event = 0.0
+        if woke:
+            # Cut the daemon's sleep short so the trigger fires now
+            with open(WAKE_FILE, "w") as f:
+                f.write("file change\n")
+        self.write_status()
+
+    def write_status(self):
+        write_json(STATUS_FILE, {
+            "pid": os.getpid(),
+            "backend": "inotify",
+            "started": self.started,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "directories": len(self.dirs),
+            "watches": {key: {k: root[k] for k in ("path", "ok", "error")} for key, root in self.roots.items()},
+            **self.stats,
+        })
+
+    # ── Main loop ────────────────────────────────────────────
+
+    def poll_registrations(self):
+        """Rebuild when triggers or watchers change, or a missing root appears."""
+        sources = (mtime(TRIGGERS_FILE), mtime(WATCHERS_FILE))
+        if sources != self.sources:
+            self.sources = sources
+            keys = registrations()
+            if keys != {k: r["path"] for k, r in self.roots.items()}:
+                self.rebuild(keys)
+                return
+        retry = [k for k, r in self.roots.items() if not r["ok"] and os.path.exists(r["path"])]
+        if retry:
+            for key in retry:
+                self.attach(key)
+            self.write_status()
+
+    def serve(self):
+        os.makedirs(QUEUE_DIR, exist_ok=True)
+        with open(PID_FILE, "w") as f:
+            f.write(str(os.getpid()))
+        running = True
+
+        def stop(signum, frame):
+            nonlocal running
+            running = False
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.rebuild(registrations())
+        self.sources = (mtime(TRIGGERS_FILE), mtime(WATCHERS_FILE))
+        print(f"fs-watcher: watching {len(self.roots)} path(s) in {len(self.dirs)} directories", flush=True)
+
+        next_reload = time.monotonic() + RELOAD_INTERVAL
+        while running:
+            timeout = RELOAD_INTERVAL
+            if self.pending:
+                timeout = min(timeout, QUIET)
+            try:
+                ready, _, _ = select.select([self.inotify.fd], [], [], timeout)
+            except InterruptedError:
+                continue
+            if ready:
+                self.handle(self.inotify.read())
+            self.flush()
+            if time.monotonic() >= next_reload:
+                self.poll_registrations()
+                next_reload = time.monotonic() + RELOAD_INTERVAL
+
+        self.flush(force=True)
+        try:
+            if read_json(STATUS_FILE, {}).get("pid") == os.getpid():
+                os.unlink(STATUS_FILE)
+            os.unlink(PID_FILE)
+        except OSError:
+            pass
+
+
+# ── Client commands ──────────────────────────────────────────
+
+def live_status():
+    """The status table, or None when no watcher process is running."""
+    status = read_json(STATUS_FILE, {})
+    pid = status.get("pid")
+    if not pid:
+        return None
+    try:
+        os.kill(pid, 0)
+    except (ProcessLookupError, PermissionError):
+        return None
+    return status
+
+
+def take(key):
+    status = live_status()
+    if not status or not status.get("watches", {}).get(key, {}).get("ok"):
+        return 2
+    path = queue_path(key)
+    claim = f"{path}.{os.getpid()}"
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return 0
+    try:
+        # Under the writer's lock so no batch lands in the claimed file late
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.rename(path, claim)
+    finally:
+        os.close(fd)
+    paths, rescan = {}, False
+    with open(claim) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            rescan = rescan or bool(record.get("rescan"))
+            for p in record.get("paths", []):
+                paths.setdefault(p, None)
+    os.unlink(claim)
+    if rescan:
+        return 2
+    for p in paths:
+        print(p)
+    return 0
+
+
+def pending_queues(prefix):
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", prefix)
+    try:
+        return [e for e in os.scandir(QUEUE_DIR)
+                if e.name.startswith(name) and e.name.endswith(".jsonl") and e.stat().st_size > 0]
+    except FileNotFoundError:
+        return []
+
+
+def wait(prefix, timeout):
+    """Return once a queue matching prefix has events or timeout has passed."""
+    if pending_queues(prefix):
+        return 0
+    if not live_status():
+        time.sleep(timeout)
+        return 0
+    inotify = Inotify()
+    try:
+        inotify.add(QUEUE_DIR, IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_TO | IN_ONLYDIR)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return 0
+            ready, _, _ = select.select([inotify.fd], [], [], remaining)
+            if ready:
+                inotify.read()
+                if pending_queues(prefix):
+                    return 0
+    finally:
+        inotify.close()
+
+
+def main():
+    args = sys.argv[1:]
+    command = args[0] if args else "status"
+    if command == "serve":
+        Watcher().serve()
+        return 0
+    if command == "status":
+        status = live_status()
+        print(json.dumps(status or {"running": False}, indent=2))
+        return 0 if status else 1
+    if command == "take" and len(args) == 2:
+        return take(args[1])
+    if command == "wait" and len(args) >= 2:
+        timeout = 30.0
+        if "--timeout" in args[2:]:
+            i = args.index("--timeout")
+            timeout = float(args[i + 1]) if i + 1 < len(args) else timeout
+        return wait(args[1], timeout)
+    sys.stderr.write(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Read a repository's branch refs straight from .git and report what moved.
+
+No git process is run: HEAD, loose refs under refs/heads and refs/remotes
+and packed-refs are read directly (loose refs win over packed ones, as in
+git). Every ref is compared with the SHA it had at the previous scan,
+kept in state/git-refs.json, and the ref's reflog tells how it moved: the
+reflog entries leading from the last-seen SHA to the current one are
+checked for history rewrites (reset, rebase, amend, forced update).
+
+Prints a JSON array of changes, one per ref:
+
+    {ref, branch, old, new, kind, reason, head}
+
+kind is created, fast-forward, rewrite, deleted, or unknown (the reflog
+does not cover the move, e.g. a bare repository updated by push).
+branch is the short name (main, origin/main); head marks the branch
+HEAD points at. The first scan of a repository records it and reports
+nothing.
+
+Usage: git-refs.py scan <workspace>
+"""
+
+import json
+import os
+import sys
+
+AUTONOMY_DIR = os.environ.get("AUTONOMY_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATE_FILE = f"{AUTONOMY_DIR}/state/git-refs.json"
+
+WATCHED = ("refs/heads/", "refs/remotes/")
+# Reflog messages of moves that can drop commits
+REWRITES = ("reset:", "rebase", "commit (amend)", "forced-update", "filter-branch")
+
+
+def read_first_line(path):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return ""
+
+
+def git_dirs(workspace):
+    """Return (git dir, common dir) for a checkout, a linked worktree or a bare repo."""
+    dot_git = os.path.join(workspace, ".git")
+    if os.path.isdir(dot_git):
+        gitdir = dot_git
+    elif os.path.isfile(dot_git):
+        # Linked worktree: ".git" names the real git dir
+        line = read_first_line(dot_git)
+        if not line.startswith("gitdir:"):
+            return None, None
+        gitdir = os.path.normpath(os.path.join(workspace, line[7:].strip()))
+    elif os.path.isfile(os.path.join(workspace, "HEAD")) and os.path.isdir(os.path.join(workspace, "refs")):
+        gitdir = workspace
+    else:
+        return None, None
+    common = read_first_line(os.path.join(gitdir, "commondir"))
+    return gitdir, os.path.normpath(os.path.join(gitdir, common)) if common else gitdir
+
+
+def read_refs(common):
+    refs = {}
+    try:
+        with open(os.path.join(common, "packed-refs")) as f:
+            for line in f:
+                if line.startswith(("#", "^")):
+                    continue
+                parts = line.split()
+                if len(parts) == 2 and parts[1].startswith(WATCHED):
+                    refs[parts[1]] = parts[0]
+    except OSError:
+        pass
+    for top in WATCHED:
+        base = os.path.join(common, top)
+        for directory, _, names in os.walk(base):
+            for name in names:
+                path = os.path.join(directory, name)
+                sha = read_first_line(path)
+                # Skip symbolic refs (origin/HEAD) and half-written files
+                if len(sha) in (40, 64) and not name.endswith(".lock"):
+                    refs[os.path.relpath(path, common).replace(os.sep, "/")] = sha
+    return refs
+
+
+def read_head(gitdir):
+    """Return (branch ref or None, detached sha or None)."""
+    head = read_first_line(os.path.join(gitdir, "HEAD"))
+    if head.startswith("ref:"):
+        return head[4:].strip(), None
+    return None, head or None
+
+
+def short_name(ref):
+    for top in WATCHED:
+        if ref.startswith(top):
+            return ref[len(top):]
+    return ref
+
+
+def classify(common, ref, old, new):
+    """Use the ref's reflog to tell how it moved from old to new."""
+    entries = []
+    try:
+        with open(os.path.join(common, "logs", ref), errors="replace") as f:
+            for line in f:
+                head, _, message = line.rstrip("\n").partition("\t")
+                parts = head.split(" ", 2)
+                if len(parts) >= 2:
+                    entries.append((parts[0], parts[1], message))
+    except OSError:
+        return "unknown", ""
+    # Walk back from the newest entry that produced `new` to the one that left `old`
+    for end in range(len(entries) - 1, -1, -1):
+        if entries[end][1] == new:
+            break
+    else:
+        return "unknown", ""
+    chain = []
+    i = end
+    while True:
+        chain.append(entries[i])
+        if entries[i][0] == old:
+            break
+        if i == 0 or entries[i - 1][1] != entries[i][0]:
+            return "unknown", entries[end][2]
+        i -= 1
+    chain.reverse()
+    for k, (before, _, message) in enumerate(chain):
+        if not (message.startswith(REWRITES) or "forced-update" in message):
+            continue
+        # Amending a commit made since the last scan keeps its parent,
+        # which already descends from old; anything else may drop commits
+        if message.startswith("commit (amend)") and before != old and not chain[k - 1][2].startswith(REWRITES):
+            continue
+        return "rewrite", message
+    return "fast-forward", entries[end][2]
+
+
+def scan(workspace):
+    workspace = os.path.abspath(workspace)
+    gitdir, common = git_dirs(workspace)
+    if not gitdir:
+        return []
+    refs = read_refs(common)
+    head_ref, detached = read_head(gitdir)
+    if detached:
+        refs["HEAD"] = detached
+
+    try:
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    seen = state.get(workspace)
+
+    changes = []
+    if seen is not None:
+        for ref in sorted(set(seen) | set(refs)):
+            old, new = seen.get(ref), refs.get(ref)
+            if old == new:
+                continue
+            if old is None:
+                kind, reason = "created", ""
+            elif new is None:
+                kind, reason = "deleted", ""
+            else:
+                kind, reason = classify(common, ref, old, new)
+            changes.append({"ref": ref, "branch": short_name(ref), "old": old, "new": new,
+                            "kind": kind, "reason": reason, "head": ref == head_ref})
+
+    if seen != refs:
+        state[workspace] = refs
+        tmp = f"{STATE_FILE}.tmp.{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, STATE_FILE)
+    return changes
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "scan":
+        print(json.dumps(scan(sys.argv[2])))
+        return 0
+    sys.stderr.write(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -175,9 +175,89 @@ build() {
     local level
     level=$(get_config '.agentic_config.autonomy_level // "semi-autonomous"')
 
-    # ── Write HEARTBEAT.md ──────────────────────────────────
+    # Cross-repository context
+    local repo_line=""
+    if [[ -f "$AUTONOMY_DIR/lib/repos.sh" ]]; then
+        repo_line=$(bash "$AUTONOMY_DIR/lib/repos.sh" oneliner 2>/dev/null)
+        [[ "$repo_line" == *"no cross-repo"* ]] && repo_line=""
+    fi
+
+    # Prompt evolution performance
+    local perf_line=""
+    if [[ -f "$AUTONOMY_DIR/lib/prompt-evolution.sh" ]]; then
+        perf_line=$(bash "$AUTONOMY_DIR/lib/prompt-evolution.sh" oneliner 2>/dev/null)
+        [[ "$perf_line" == *"0/100"* ]] && perf_line=""
+    fi
+
+    # Skill acquisition stats — expose full skill data to AI
+    local skill_summary=""
+    if [[ -f "$AUTONOMY_DIR/lib/skill-acquisition.sh" ]]; then
+        local skill_count
+        skill_count=$(jq '.skills | length' "$AUTONOMY_DIR/state/skills.json" 2>/dev/null || echo 0)
+        if [[ "$skill_count" -gt 0 ]]; then
+            skill_summary=$(bash "$AUTONOMY_DIR/lib/skill-acquisition.sh" oneliner 2>/dev/null)
+        fi
+    fi
+
+    [[ "$memory_summary" == "No persistent memories yet." ]] && memory_summary=""
+
+    pack_context
+
+    _write_heartbeat "$HEARTBEAT_FILE"
+    echo "$HEARTBEAT_FILE"
+}
+
+# ── Context packing ─────────────────────────────────────────
+
+# Fit the variable sections gathered by build() into the heartbeat token
+# ceiling (lib/context-packer.sh). Works on build()'s locals in place.
+pack_context() {
+    local packer="$AUTONOMY_DIR/lib/context-packer.sh"
+    [[ -f "$packer" ]] || return 0
+
+    # Fixed instructions: render the file with every variable section empty
+    local reserved
+    reserved=$(
+        current_desc="" subtasks="" journal_summary="" workspace_line="" memory_summary=""
+        agents_summary="" repo_line="" perf_line="" skill_summary=""
+        _write_heartbeat /dev/stdout | bash "$packer" estimate
+    )
+
+    local pack_file packed
+    pack_file=$(mktemp)
+    rm -f "$pack_file"
+    echo "$current_desc"    | bash "$packer" add "$pack_file" description 1 400 head
+    echo "$subtasks"        | bash "$packer" add "$pack_file" subtasks 1 500 head
+    echo "$budget_line"     | bash "$packer" add "$pack_file" budget 0
+    echo "$journal_summary" | bash "$packer" add "$pack_file" journal 2 800 tail
+    echo "$workspace_line"  | bash "$packer" add "$pack_file" workspace 3 200 head
+    echo "$memory_summary"  | bash "$packer" add "$pack_file" memory 3 600 head
+    echo "$agents_summary"  | bash "$packer" add "$pack_file" agents 4 300 head
+    echo "$skill_summary"   | bash "$packer" add "$pack_file" skills 5 400 head
+    echo "$repo_line"       | bash "$packer" add "$pack_file" repos 5 150 head
+    echo "$perf_line"       | bash "$packer" add "$pack_file" performance 6 100 head
+    packed=$(bash "$packer" pack "$pack_file" heartbeat "$reserved")
+    rm -f "$pack_file"
+    [[ -n "$packed" && "$packed" != "{}" ]] || return 0
+
+    current_desc=$(echo "$packed" | jq -r '.description')
+    subtasks=$(echo "$packed" | jq -r '.subtasks')
+    journal_summary=$(echo "$packed" | jq -r '.journal')
+    workspace_line=$(echo "$packed" | jq -r '.workspace')
+    memory_summary=$(echo "$packed" | jq -r '.memory')
+    agents_summary=$(echo "$packed" | jq -r '.agents')
+    skill_summary=$(echo "$packed" | jq -r '.skills')
+    repo_line=$(echo "$packed" | jq -r '.repos')
+    perf_line=$(echo "$packed" | jq -r '.performance')
+}
+
+# ── Write HEARTBEAT.md ──────────────────────────────────────
+
+# Render HEARTBEAT.md to $1 from the variables gathered by build()
+_write_heartbeat() {
+    local out="$1"
 
-    cat > "$HEARTBEAT_FILE" << HEARTBEAT_EOF
+    cat > "$out" << HEARTBEAT_EOF
 # HEARTBEAT.md — Agentic Autonomy System v2.1
 
 > **Generated:** $(date -Iseconds)
@@ -192,7 +272,7 @@ HEARTBEAT_EOF
 
     # Task section — adapt based on whether there IS a task
     if [[ -n "$current_task" ]]; then
-        cat >> "$HEARTBEAT_FILE" << TASK_EOF
+        cat >> "$out" << TASK_EOF
 
 **Task:** \`$current_task\`
 **Description:** $current_desc
@@ -202,15 +282,15 @@ TASK_EOF
 
         # Subtask plan if any
         if [[ -n "$subtasks" ]]; then
-            echo "### Subtask Plan" >> "$HEARTBEAT_FILE"
-            echo '```' >> "$HEARTBEAT_FILE"
-            echo "$subtasks" >> "$HEARTBEAT_FILE"
-            echo '```' >> "$HEARTBEAT_FILE"
-            echo "" >> "$HEARTBEAT_FILE"
-            echo "Work through these subtasks in order. Check off each one as you complete it." >> "$HEARTBEAT_FILE"
+            echo "### Subtask Plan" >> "$out"
+            echo '```' >> "$out"
+            echo "$subtasks" >> "$out"
+            echo '```' >> "$out"
+            echo "" >> "$out"
+            echo "Work through these subtasks in order. Check off each one as you complete it." >> "$out"
         else
             # Task decomposition instructions
-            cat >> "$HEARTBEAT_FILE" << DECOMPOSE_EOF
+            cat >> "$out" << DECOMPOSE_EOF
 ### Step 1: Plan Before You Build
 
 **Before writing any code**, break this task into 2-5 concrete subtasks.
@@ -225,7 +305,7 @@ Then work through each subtask. This prevents scope creep and endless building.
 DECOMPOSE_EOF
         fi
     else
-        cat >> "$HEARTBEAT_FILE" << NOTASK_EOF
+        cat >> "$out" << NOTASK_EOF
 
 **No task assigned.** Nothing in the queue needs attention.
 
@@ -240,7 +320,7 @@ NOTASK_EOF
     fi
 
     # Session history
-    cat >> "$HEARTBEAT_FILE" << JOURNAL_EOF
+    cat >> "$out" << JOURNAL_EOF
 
 ---
 
@@ -252,7 +332,7 @@ JOURNAL_EOF
 
     # Workspace context
     if [[ -n "$workspace_line" ]]; then
-        cat >> "$HEARTBEAT_FILE" << WS_EOF
+        cat >> "$out" << WS_EOF
 ## Workspace Context
 
 $workspace_line
@@ -261,7 +341,7 @@ WS_EOF
     fi
 
     # Token budget
-    cat >> "$HEARTBEAT_FILE" << BUDGET_EOF
+    cat >> "$out" << BUDGET_EOF
 ## Token Budget
 
 $budget_line
@@ -269,11 +349,8 @@ $budget_line
 BUDGET_EOF
 
     # Cross-repository context
-    if [[ -f "$AUTONOMY_DIR/lib/repos.sh" ]]; then
-        local repo_line
-        repo_line=$(bash "$AUTONOMY_DIR/lib/repos.sh" oneliner 2>/dev/null)
-        if [[ -n "$repo_line" && "$repo_line" != *"no cross-repo"* ]]; then
-            cat >> "$HEARTBEAT_FILE" << REPO_EOF
+    if [[ -n "$repo_line" ]]; then
+        cat >> "$out" << REPO_EOF
 ## Cross-Repository
 
 $repo_line
@@ -282,12 +359,11 @@ To switch repos: \`bash $AUTONOMY_DIR/lib/repos.sh switch <name>\`
 To rotate: \`bash $AUTONOMY_DIR/lib/repos.sh rotate\`
 
 REPO_EOF
-        fi
     fi
 
     # Persistent memory
-    if [[ -n "$memory_summary" && "$memory_summary" != "No persistent memories yet." ]]; then
-        cat >> "$HEARTBEAT_FILE" << MEMORY_EOF
+    if [[ -n "$memory_summary" ]]; then
+        cat >> "$out" << MEMORY_EOF
 ## Persistent Memory
 
 $memory_summary
@@ -299,7 +375,7 @@ MEMORY_EOF
     fi
 
     # Sub-agents
-    cat >> "$HEARTBEAT_FILE" << AGENTS_EOF
+    cat >> "$out" << AGENTS_EOF
 ## Sub-Agents
 
 $agents_summary
@@ -310,22 +386,18 @@ To spawn a parallel sub-agent: \`bash $AUTONOMY_DIR/lib/sub-agents.sh spawn_para
 AGENTS_EOF
 
     # Prompt evolution performance
-    if [[ -f "$AUTONOMY_DIR/lib/prompt-evolution.sh" ]]; then
-        local perf_line
-        perf_line=$(bash "$AUTONOMY_DIR/lib/prompt-evolution.sh" oneliner 2>/dev/null)
-        if [[ -n "$perf_line" && "$perf_line" != *"0/100"* ]]; then
-            cat >> "$HEARTBEAT_FILE" << PERF_EOF
+    if [[ -n "$perf_line" ]]; then
+        cat >> "$out" << PERF_EOF
 ## Performance Tracking
 
 $perf_line
 
 PERF_EOF
-        fi
     fi
 
     # AI capabilities
     if [[ "$ai_configured" == "true" ]]; then
-        cat >> "$HEARTBEAT_FILE" << AI_EOF
+        cat >> "$out" << AI_EOF
 ## AI Capabilities (Active)
 
 You have access to these AI-powered tools:
@@ -341,7 +413,7 @@ AI_EOF
     fi
 
     # New Capabilities
-    cat >> "$HEARTBEAT_FILE" << CAPABILITIES_EOF
+    cat >> "$out" << CAPABILITIES_EOF
 ## System Capabilities
 
 ### VM Integration (Full System Access)
@@ -400,14 +472,9 @@ AI_EOF
 
 CAPABILITIES_EOF
 
-    # Skill acquisition stats — expose full skill data to AI
-    if [[ -f "$AUTONOMY_DIR/lib/skill-acquisition.sh" ]]; then
-        local skill_count
-        skill_count=$(jq '.skills | length' "$AUTONOMY_DIR/state/skills.json" 2>/dev/null || echo 0)
-        if [[ "$skill_count" -gt 0 ]]; then
-            local skill_summary
-            skill_summary=$(bash "$AUTONOMY_DIR/lib/skill-acquisition.sh" oneliner 2>/dev/null)
-            cat >> "$HEARTBEAT_FILE" << SKILL_EOF
+    # Learned skills
+    if [[ -n "$skill_summary" ]]; then
+        cat >> "$out" << SKILL_EOF
 ## Learned Skills & Capabilities
 $skill_summary
 
@@ -415,11 +482,10 @@ Use \`bash $AUTONOMY_DIR/lib/skill-acquisition.sh generate "<description>"\` to
 Use \`bash $AUTONOMY_DIR/lib/skill-acquisition.sh list\` to see full skill inventory.
 
 SKILL_EOF
-        fi
     fi
 
     # Hard limits & rules
-    cat >> "$HEARTBEAT_FILE" << RULES_EOF
+    cat >> "$out" << RULES_EOF
 ---
 
 ## Hard Limits (Always Respect)
@@ -481,8 +547,6 @@ Respond with: **HEARTBEAT_OK**
 Do NOT invent work. Do NOT build things nobody asked for. Wait for the next task.
 
 RULES_EOF
-
-    echo "$HEARTBEAT_FILE"
 }
 
 # ── CLI ─────────────────────────────────────────────────────
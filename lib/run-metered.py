@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Run a command and report the resources it used.
+
+The command inherits stdin/stdout/stderr and runs in its own session,
+so a timeout stops everything it started. When it exits, its rusage
+(covering every descendant it waited for) is written as JSON:
+
+    {wall_ms, user_ms, sys_ms, max_rss_kb, read_bytes, write_bytes,
+     exit_code, signal, timed_out}
+
+read_bytes/write_bytes are block-device I/O (ru_inblock/ru_oublock x 512);
+reads served from the page cache do not count. The kernel carries peak
+RSS across exec, so max_rss_kb never reads below this launcher's own
+footprint (~10 MB). Exit status follows timeout(1): 124 after a
+timeout, 128+N when killed by signal N.
+
+Usage: run-metered.py [--timeout SECONDS] [--metrics FILE] -- command [args...]
+"""
+
+import json
+import os
+import signal
+import sys
+import time
+
+# Seconds between SIGTERM and SIGKILL once the timeout fires
+KILL_GRACE = 2
+
+
+def signal_name(sig):
+    """SIGTERM for 15; realtime signals other than SIGRTMIN/SIGRTMAX have no
+    enum member, so they come out as SIG<n>."""
+    try:
+        return signal.Signals(sig).name
+    except ValueError:
+        return f"SIG{sig}"
+
+
+def parse_args(argv):
+    opts = {"timeout": 0, "metrics": None}
+    i = 0
+    while i < len(argv) and argv[i] != "--":
+        if argv[i] in ("--timeout", "--metrics") and i + 1 < len(argv):
+            opts[argv[i][2:]] = argv[i + 1]
+            i += 1
+        i += 1
+    return opts, argv[i + 1:]
+
+
+def main():
+    opts, command = parse_args(sys.argv[1:])
+    if not command:
+        sys.stderr.write(__doc__)
+        return 2
+    try:
+        timeout = float(opts["timeout"] or 0)
+    except ValueError:
+        timeout = 0
+
+    started = time.monotonic()
+    try:
+        # posix_spawn keeps the launcher small: the child starts out
+        # sharing this interpreter's memory, which sets its RSS floor
+        pid = os.posix_spawnp(command[0], command, os.environ, setsid=True)
+    except OSError as e:
+        sys.stderr.write(f"{command[0]}: {e.strerror}\n")
+        return 127
+
+    timed_out = False
+
+    def on_timeout(signum, frame):
+        nonlocal timed_out
+        if timed_out:
+            os.killpg(pid, signal.SIGKILL)
+            return
+        timed_out = True
+        os.killpg(pid, signal.SIGTERM)
+        signal.alarm(KILL_GRACE)
+
+    def forward(signum, frame):
+        try:
+            os.killpg(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    signal.signal(signal.SIGALRM, on_timeout)
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    if timeout > 0:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    while True:
+        try:
+            _, status, usage = os.wait4(pid, 0)
+            break
+        except InterruptedError:
+            continue
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    wall = time.monotonic() - started
+
+    sig = os.WTERMSIG(status) if os.WIFSIGNALED(status) else 0
+    exit_code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 128 + sig
+    if timed_out:
+        exit_code = 124
+
+    if opts["metrics"]:
+        metrics = {
+            "wall_ms": int(wall * 1000),
+            "user_ms": int(usage.ru_utime * 1000),
+            "sys_ms": int(usage.ru_stime * 1000),
+            "max_rss_kb": usage.ru_maxrss,
+            "read_bytes": usage.ru_inblock * 512,
+            "write_bytes": usage.ru_oublock * 512,
+            "exit_code": exit_code,
+            "signal": signal_name(sig) if sig else None,
+            "timed_out": timed_out,
+        }
+        with open(opts["metrics"], "w") as f:
+            json.dump(metrics, f)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
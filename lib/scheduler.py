@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""Schedule engine for schedule triggers and workstation schedules.
+
+Sources: every enabled trigger of type "schedule" in state/triggers.json
+(its condition is the spec) and every entry of workstation.schedules in
+config.json (its interval is the spec). A spec is one of:
+
+    */15 9-17 * * mon-fri   standard 5-field cron (minute hour dom month dow,
+                            names, ranges, steps, lists; dom and dow OR-ed
+                            when both are restricted, as in cron)
+    @hourly @daily ...      the usual cron macros
+    every 30m / 30m         fixed interval (s, m, h, d)
+    daily, hourly, HH:MM    the older trigger conditions (daily = 09:00)
+
+Cron is evaluated in local time. state/schedules.json keeps one entry per
+schedule, with its next fire time and a min-heap of (next, key) so the
+earliest schedule is always heap[0]; the epoch of that next fire is also
+written to state/schedule.next for the daemon to sleep against.
+
+A run of `due` moves every schedule whose time has come to its next
+future slot and queues the slot(s) it owes as pending. The catch-up
+policy (scheduler.catch_up in config.json, or catch_up on the trigger or
+schedule) decides what a schedule owes after missed runs:
+
+    once  fire the latest missed slot, once (default)
+    all   fire every missed slot, up to MAX_CATCH_UP
+    skip  fire only if the latest slot is within scheduler.grace_seconds
+
+Pending fires are printed by every `due` until acknowledged with `ack`.
+Callers make firing idempotent per slot (task ids carry the slot), so a
+crash between firing and ack repeats nothing and loses nothing.
+
+Usage:
+    scheduler.py due                 Print pending fires as a JSON array
+    scheduler.py ack <key>@<slot>... Record fires as done
+    scheduler.py next                Print the epoch of the next fire
+    scheduler.py list                Print every schedule with its next fire
+    scheduler.py check <spec>        Validate a spec; print its next fire
+"""
+
+import calendar
+import fcntl
+import hashlib
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+AUTONOMY_DIR = os.environ.get("AUTONOMY_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATE_DIR = f"{AUTONOMY_DIR}/state"
+CONFIG_FILE = f"{AUTONOMY_DIR}/config.json"
+TRIGGERS_FILE = f"{STATE_DIR}/triggers.json"
+STATE_FILE = f"{STATE_DIR}/schedules.json"
+NEXT_FILE = f"{STATE_DIR}/schedule.next"
+LOCK_FILE = f"{STATE_DIR}/.schedules.lock"
+
+MAX_CATCH_UP = 24
+DEFAULT_GRACE = 300
+POLICIES = ("once", "all", "skip")
+
+MACROS = {
+    "@yearly": "0 0 1 1 *", "@annually": "0 0 1 1 *", "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0", "@daily": "0 0 * * *", "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *", "daily": "0 9 * * *", "hourly": "0 * * * *",
+}
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+MONTHS = {m.lower(): i for i, m in enumerate(calendar.month_abbr) if m}
+DAYS = {d.lower(): (i + 1) % 7 for i, d in enumerate(calendar.day_abbr)}
+
+
+# ── Specs ────────────────────────────────────────────────────
+
+def parse_field(text, lo, hi, names=None):
+    values = set()
+    for part in text.lower().split(","):
+        body, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f"bad step in {part!r}")
+        if body == "*":
+            start, end = lo, hi
+        else:
+            first, _, last = body.partition("-")
+            start = names[first] if names and first in names else int(first)
+            end = (names[last] if names and last in names else int(last)) if last else (hi if step > 1 else start)
+        if not lo <= start <= hi or not lo <= end <= hi or start > end:
+            raise ValueError(f"{part!r} out of range {lo}-{hi}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"expected 5 fields, got {len(fields)}")
+        self.minutes = parse_field(fields[0], 0, 59)
+        self.hours = parse_field(fields[1], 0, 23)
+        self.days = parse_field(fields[2], 1, 31)
+        self.months = parse_field(fields[3], 1, 12, MONTHS)
+        self.weekdays = {d % 7 for d in parse_field(fields[4], 0, 7, DAYS)}
+        self.dom_any = fields[2] == "*"
+        self.dow_any = fields[4] == "*"
+
+    def day_matches(self, t):
+        dom = t.day in self.days
+        dow = (t.weekday() + 1) % 7 in self.weekdays
+        if self.dom_any or self.dow_any:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, ts, anchor=None):
+        """The first matching minute after ts (cron times ignore anchor)."""
+        t = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Coarse-to-fine: skip whole months, days and hours that cannot match
+        for _ in range(20000):
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self.day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return int(t.timestamp())
+        raise ValueError("no matching time within reach")
+
+
+class Every:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def next_after(self, ts, anchor=None):
+        """The first time after ts, keeping in step with anchor when given."""
+        if anchor is None:
+            return int(ts) + self.seconds
+        return anchor + ((int(ts) - anchor) // self.seconds + 1) * self.seconds
+
+
+def parse_spec(spec):
+    text = str(spec).strip().lower()
+    m = re.fullmatch(r"(?:every\s+)?(\d+)\s*([smhd])", text)
+    if m:
+        seconds = int(m.group(1)) * UNITS[m.group(2)]
+        if seconds <= 0:
+            raise ValueError("interval must be positive")
+        return Every(seconds)
+    m = re.fullmatch(r"(\d{1,2}):(\d{2})", text)
+    if m:
+        return Cron(f"{int(m.group(2))} {int(m.group(1))} * * *")
+    return Cron(MACROS.get(text, text))
+
+
+# ── Registry ─────────────────────────────────────────────────
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def sources():
+    """Map each schedule key to {spec, kind, name, task, catch_up}."""
+    config = read_json(CONFIG_FILE, {})
+    default_policy = (config.get("scheduler") or {}).get("catch_up", "once")
+    found = {}
+    triggers = read_json(TRIGGERS_FILE, {})
+    for t in triggers.get("triggers", []) if isinstance(triggers, dict) else []:
+        if t.get("type") == "schedule" and t.get("enabled") is not False and t.get("condition"):
+            found[f"trigger:{t['name']}"] = {
+                "spec": t["condition"], "kind": "trigger", "name": t["name"],
+                "catch_up": t.get("catch_up", default_policy)}
+    for s in (config.get("workstation") or {}).get("schedules") or []:
+        if not isinstance(s, dict) or not s.get("interval") or not s.get("task"):
+            continue
+        # Schedules have no id; task text and creation time identify one
+        ident = hashlib.sha1(f"{s['task']}\0{s.get('created', '')}".encode()).hexdigest()[:12]
+        found[f"schedule:{ident}"] = {
+            "spec": s["interval"], "kind": "schedule", "name": ident, "task": s["task"],
+            "created": s.get("created"), "catch_up": s.get("catch_up", default_policy)}
+    return found, int((config.get("scheduler") or {}).get("grace_seconds", DEFAULT_GRACE))
+
+
+class Schedules:
+    def __init__(self):
+        state = read_json(STATE_FILE, {})
+        self.entries = state.get("entries", {})
+        self.heap = [tuple(item) for item in state.get("heap", [])]
+
+    def save(self):
+        tmp = f"{STATE_FILE}.tmp.{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump({"entries": self.entries, "heap": self.heap}, f)
+        os.replace(tmp, STATE_FILE)
+        if self.heap:
+            with open(f"{NEXT_FILE}.tmp", "w") as f:
+                f.write(f"{self.heap[0][0]}\n")
+            os.replace(f"{NEXT_FILE}.tmp", NEXT_FILE)
+        elif os.path.exists(NEXT_FILE):
+            os.unlink(NEXT_FILE)
+
+    def sync(self, now):
+        """Bring the entries in line with the registered schedules."""
+        found, self.grace = sources()
+        changed = False
+        for key in list(self.entries):
+            if key not in found:
+                del self.entries[key]
+                changed = True
+        for key, src in found.items():
+            entry = self.entries.get(key)
+            if entry and entry.get("spec") == src["spec"] and entry.get("next"):
+                entry.update({k: v for k, v in src.items() if k != "spec"})
+                continue
+            try:
+                first = parse_spec(src["spec"]).next_after(now)
+            except ValueError as e:
+                if not entry or entry.get("error") != str(e):
+                    self.entries[key] = dict(src, next=None, error=str(e), pending=[], fired=0)
+                    changed = True
+                continue
+            # New or changed: nothing is owed for the time before it existed
+            self.entries[key] = dict(src, next=first, error=None,
+                                     pending=(entry or {}).get("pending", []),
+                                     fired=(entry or {}).get("fired", 0),
+                                     last_slot=(entry or {}).get("last_slot"))
+            changed = True
+        if changed or len(self.heap) != sum(1 for e in self.entries.values() if e.get("next")):
+            self.heap = [(e["next"], key) for key, e in self.entries.items() if e.get("next")]
+            heapq.heapify(self.heap)
+            changed = True
+        return changed
+
+    def advance(self, now):
+        """Pop every schedule that is due and queue what it owes."""
+        fired = False
+        while self.heap and self.heap[0][0] <= now:
+            slot, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if not entry or entry.get("next") != slot:
+                continue
+            rule = parse_spec(entry["spec"])
+            slots = [slot]
+            following = rule.next_after(slot)
+            while following <= now and len(slots) < MAX_CATCH_UP:
+                slots.append(following)
+                following = rule.next_after(following)
+            if following <= now:
+                # Too far behind to list every slot: resume from now
+                following = rule.next_after(now, anchor=slot)
+            missed = len(slots) - 1
+            policy = entry.get("catch_up") if entry.get("catch_up") in POLICIES else "once"
+            if policy == "all":
+                owed = slots[-MAX_CATCH_UP:]
+            elif policy == "skip" and now - slots[-1] > self.grace:
+                owed = []
+            else:
+                owed = slots[-1:]
+            for s in owed:
+                entry["pending"].append({"slot": s, "missed": missed if policy != "all" else 0})
+            entry["next"] = following
+            entry["skipped"] = entry.get("skipped", 0) + len(slots) - len(owed)
+            heapq.heappush(self.heap, (entry["next"], key))
+            fired = True
+        return fired
+
+    def pending(self):
+        out = []
+        for key, entry in self.entries.items():
+            for p in entry.get("pending", []):
+                out.append({"key": key, "kind": entry["kind"], "name": entry["name"],
+                            "task": entry.get("task"), "spec": entry["spec"],
+                            "slot": p["slot"], "missed": p["missed"]})
+        return sorted(out, key=lambda f: (f["slot"], f["key"]))
+
+    def ack(self, key, slot, now):
+        entry = self.entries.get(key)
+        if not entry:
+            return
+        before = len(entry.get("pending", []))
+        entry["pending"] = [p for p in entry.get("pending", []) if p["slot"] != slot]
+        if len(entry["pending"]) < before:
+            entry["fired"] = entry.get("fired", 0) + 1
+            entry["last_slot"] = max(slot, entry.get("last_slot") or 0)
+            entry["last_fired"] = now
+
+
+def locked(fn):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return fn()
+
+
+def main():
+    args = sys.argv[1:]
+    command = args[0] if args else "list"
+    now = int(time.time())
+
+    if command == "due":
+        def run():
+            s = Schedules()
+            if s.sync(now) | s.advance(now):
+                s.save()
+            return s.pending()
+        print(json.dumps(locked(run)))
+        return 0
+
+    if command == "ack" and len(args) > 1:
+        def run():
+            s = Schedules()
+            for item in args[1:]:
+                key, _, slot = item.rpartition("@")
+                if key and slot.isdigit():
+                    s.ack(key, int(slot), now)
+            s.save()
+        locked(run)
+        return 0
+
+    if command == "next":
+        def run():
+            s = Schedules()
+            if s.sync(now):
+                s.save()
+            return s.heap[0][0] if s.heap else None
+        due = locked(run)
+        if due is None:
+            return 1
+        print(due)
+        return 0
+
+    if command == "check" and len(args) == 2:
+        try:
+            first = parse_spec(args[1]).next_after(now)
+        except ValueError as e:
+            sys.stderr.write(f"Invalid schedule {args[1]!r}: {e}\n")
+            return 1
+        print(first)
+        return 0
+
+    if command == "list":
+        def run():
+            s = Schedules()
+            if s.sync(now):
+                s.save()
+            return s.entries
+        entries = locked(run)
+        print(json.dumps([dict(key=k, **{f: e.get(f) for f in ("kind", "name", "task", "spec", "catch_up",
+                                                                "next", "last_slot", "fired", "skipped", "error")})
+                          for k, e in sorted(entries.items(), key=lambda kv: kv[1].get("next") or 0)], indent=2))
+        return 0
+
+    sys.stderr.write(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -289,7 +289,7 @@ Line 2: DESCRIPTION (one sentence)
 Line 3+: The bash commands for the run() function body (one per line, no function wrapper)"
 
     local result
-    result=$(bash "$AUTONOMY_DIR/lib/ai-engine.sh" call "Generate a tool" "$prompt" 2>/dev/null)
+    result=$(AI_CALL_TYPE=skill bash "$AUTONOMY_DIR/lib/ai-engine.sh" call "Generate a tool" "$prompt" 2>/dev/null)
 
     if [[ -z "$result" ]]; then
         echo "AI failed to generate tool"
@@ -0,0 +1,73 @@
+#!/bin/bash
+# Parallel sub-agent worker — one attempt at a sub-agent's task.
+# Run by the agent supervisor (lib/agent-supervisor.py), which owns the
+# process group, timeout and retries, and reports the final outcome via
+# `sub-agents.sh job_done`. Exit 0 on success, 1 to have the attempt
+# retried, 3 for a merge conflict (final: the branch is kept for review).
+# Progress goes to the supervisor as events on $AGENT_EVENT_SOCK.
+#
+# Usage: sub-agent-worker.sh <ipc_dir>
+
+AGENT_IPC_DIR="$1"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+AUTONOMY_DIR="$(dirname "$SCRIPT_DIR")"
+SUB_AGENTS="$SCRIPT_DIR/sub-agents.sh"
+
+AGENT_ID=$(jq -r '.id' "$AGENT_IPC_DIR/manifest.json" 2>/dev/null)
+AGENT_NAME=$(jq -r '.name' "$AGENT_IPC_DIR/manifest.json" 2>/dev/null)
+[[ -n "$AGENT_ID" && -n "$AGENT_NAME" ]] || { echo "No manifest in $AGENT_IPC_DIR"; exit 1; }
+
+# Publish a progress event for this agent: publish <phase> [message]
+publish() {
+    [[ -S "${AGENT_EVENT_SOCK:-}" ]] || return 0
+    jq -nc --arg agent "$AGENT_ID" --arg phase "$1" --arg message "${2:-}" \
+        '{agent: $agent, phase: $phase} + (if $message != "" then {message: $message} else {} end)' |
+        curl -sf --max-time 2 --unix-socket "$AGENT_EVENT_SOCK" -H 'Content-Type: application/json' \
+            --data-binary @- http://localhost/events >/dev/null 2>&1 || true
+}
+
+echo "Worker started at $(date -Iseconds) (pid $$)"
+publish started
+rm -f "$AGENT_IPC_DIR/reason"
+bash "$SUB_AGENTS" start "$AGENT_NAME" >/dev/null 2>&1
+
+# Each attempt starts from a fresh worktree of the current HEAD
+WORKSPACE=""
+if bash "$SUB_AGENTS" worktree_create "$AGENT_ID" >/dev/null 2>&1; then
+    WORKSPACE=$(jq -r '.workspace // empty' "$AGENT_IPC_DIR/manifest.json")
+    export AUTONOMY_WORKSPACE="$WORKSPACE"
+fi
+
+TASK_FILE="$AUTONOMY_DIR/tasks/${AGENT_NAME}.json"
+if [[ -f "$TASK_FILE" && -f "$SCRIPT_DIR/execution-engine.sh" ]]; then
+    publish executing
+    bash "$SCRIPT_DIR/execution-engine.sh" execute "$AGENT_NAME" 2>&1
+    EXIT_CODE=$?
+elif [[ -f "$TASK_FILE" && -f "$SCRIPT_DIR/ai-engine.sh" ]]; then
+    publish analyzing
+    bash "$SCRIPT_DIR/ai-engine.sh" process "$TASK_FILE" 2>&1
+    EXIT_CODE=$?
+else
+    publish no_engine "No task file or engine for $AGENT_NAME"
+    EXIT_CODE=1
+fi
+
+if [[ $EXIT_CODE -ne 0 ]]; then
+    echo "Parallel execution failed (exit $EXIT_CODE)" > "$AGENT_IPC_DIR/reason"
+    [[ -n "$WORKSPACE" ]] && bash "$SUB_AGENTS" worktree_remove "$AGENT_ID" >/dev/null 2>&1
+    echo "Worker finished at $(date -Iseconds) with exit code $EXIT_CODE"
+    exit 1
+fi
+
+# Bring the worktree's changes back into the main checkout
+if [[ -n "$WORKSPACE" ]]; then
+    publish merging
+    if ! MERGE_OUT=$(bash "$SUB_AGENTS" worktree_merge "$AGENT_ID" 2>&1); then
+        echo "$MERGE_OUT" | tee "$AGENT_IPC_DIR/reason"
+        exit 3
+    fi
+    echo "$MERGE_OUT"
+fi
+
+echo "Worker finished at $(date -Iseconds) with exit code 0"
+exit 0
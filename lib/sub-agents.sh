@@ -1,7 +1,8 @@
 #!/bin/bash
 # Sub-Agent Scheduling System
 # Breaks tasks into parallel subtasks and manages their lifecycle.
-# Each sub-agent is a lightweight task tracked in state/sub_agents.json.
+# Each sub-agent is a lightweight task tracked in an append-only ledger
+# with its current state materialized in state/sub_agents.json.
 # Respects the max_sub_agents limit from config.
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
@@ -27,16 +28,105 @@ _max_agents() {
 }
 
 # ── State Management ─────────────────────────────────────────
+# Lifecycle changes are appended to state/sub-agents-ledger.log, one JSON
+# event per line in a single O_APPEND write, so concurrent workers never
+# lose an update and take no lock to record one. state/sub_agents.json is
+# the view materialized from the ledger: readers fold in only the lines
+# appended since its ledger_offset, and state/sub_agents.active caches
+# the active count against that offset. Once an hour the fold drops
+# agents that finished more than sub_agents.retain_hours ago (default
+# 168) from the view; the ledger keeps their history.
+
+AGENTS_LEDGER="$STATE_DIR/sub-agents-ledger.log"
+AGENTS_ACTIVE="$STATE_DIR/sub_agents.active"
+AGENTS_LOCK="$STATE_DIR/.sub-agents.lock"
+# Characters of a description or result kept in a ledger line
+AGENTS_FIELD_MAX=1500
+
+_agents_ledger_size() {
+    stat -c %s "$AGENTS_LEDGER" 2>/dev/null || echo 0
+}
+
+# _agents_append <event_json> — one atomic ledger line
+_agents_append() {
+    [[ -n "$1" ]] || return 1
+    printf '%s\n' "$1" >> "$AGENTS_LEDGER"
+}
+
+# Fold ledger lines appended since the view was last written into it
+_agents_sync() {
+    local size count offset=""
+    size=$(_agents_ledger_size)
+    [[ -f "$AGENTS_ACTIVE" ]] && read -r count offset < "$AGENTS_ACTIVE"
+    [[ -f "$AGENTS_FILE" && "$offset" == "$size" ]] && return 0
+    (
+        flock 9
+        if [[ ! -f "$AGENTS_FILE" ]]; then
+            echo '{"agents":[],"completed":[],"stats":{"total_spawned":0,"total_completed":0,"active":0},"ledger_offset":0}' > "$AGENTS_FILE"
+        fi
+        local view_offset retain tmp="${AGENTS_FILE}.tmp.$$"
+        view_offset=$(jq -r '.ledger_offset // 0' "$AGENTS_FILE" 2>/dev/null)
+        [[ "$view_offset" =~ ^[0-9]+$ ]] || view_offset=0
+        size=$(_agents_ledger_size)
+        # Ledger removed or truncated: start over from its beginning
+        (( size < view_offset )) && view_offset=0
+        retain=$(_get_config '.sub_agents.retain_hours // 168')
+        [[ "$retain" =~ ^[0-9]+$ ]] || retain=168
+
+        tail -c +$((view_offset + 1)) "$AGENTS_LEDGER" 2>/dev/null | head -c $((size - view_offset)) |
+            jq -nR --slurpfile v "$AGENTS_FILE" --argjson o "$size" --argjson retain "$((retain * 3600))" '
+            def is_key($k): .id == $k or .name == $k;
+            def finished_epoch: (.completed // .created // "") | sub("[+-][0-9]{2}:[0-9]{2}$"; "")
+                | (strptime("%Y-%m-%dT%H:%M:%S") | mktime)? // 0;
+            reduce (inputs | fromjson? | objects) as $e ($v[0];
+                if $e.op == "spawn" then
+                    if any(.agents[]; .id == $e.id) then . else
+                        .agents += [{id: $e.id, parent_task: $e.parent, name: $e.name,
+                                     description: $e.description, priority: $e.priority,
+                                     status: "pending", created: $e.at, started: null,
+                                     completed: null, result: null, evidence: []}]
+                        | .stats.total_spawned += 1
+                    end
+                elif $e.op == "start" then
+                    (.agents[] | select(is_key($e.key))) |= (.status = "active" | .started = $e.at)
+                elif $e.op == "complete" then
+                    [.agents[] | select(is_key($e.key))
+                     | .status = "completed" | .completed = $e.at | .result = $e.result
+                     | .evidence = ($e.evidence // [])] as $done
+                    | .completed += $done
+                    | .agents |= map(select(is_key($e.key) | not))
+                    | .stats.total_completed += ($done | length)
+                elif $e.op == "fail" then
+                    (.agents[] | select(is_key($e.key))) |=
+                        (.status = "failed" | .completed = ($e.at // .completed) | .result = $e.result)
+                else . end)
+            | .ledger_offset = $o
+            | if now - (.compacted // 0) >= 3600 then
+                (now - $retain) as $cutoff
+                | .compacted = (now | floor)
+                | .completed |= map(select(finished_epoch >= $cutoff))
+                | .agents |= map(select(.status != "failed" or finished_epoch >= $cutoff))
+              else . end
+            | .stats.active = ([.agents[] | select(.status == "active" or .status == "pending")] | length)' \
+            > "$tmp" && mv "$tmp" "$AGENTS_FILE" || { rm -f "$tmp"; exit 1; }
+        jq -r '"\(.stats.active) \(.ledger_offset)"' "$AGENTS_FILE" > "$AGENTS_ACTIVE.tmp.$$" &&
+            mv "$AGENTS_ACTIVE.tmp.$$" "$AGENTS_ACTIVE"
+    ) 9>"$AGENTS_LOCK"
+}
 
 _ensure_state() {
-    if [[ ! -f "$AGENTS_FILE" ]]; then
-        echo '{"agents":[],"completed":[],"stats":{"total_spawned":0,"total_completed":0}}' > "$AGENTS_FILE"
-    fi
+    _agents_sync
 }
 
+# Active and pending agents: one small read while the view is current
 _active_count() {
-    _ensure_state
-    jq '[.agents[] | select(.status == "active" or .status == "pending")] | length' "$AGENTS_FILE" 2>/dev/null || echo 0
+    local count="" offset=""
+    [[ -f "$AGENTS_ACTIVE" ]] && read -r count offset < "$AGENTS_ACTIVE"
+    if [[ "$offset" != "$(_agents_ledger_size)" ]]; then
+        _agents_sync
+        read -r count offset < "$AGENTS_ACTIVE" 2>/dev/null
+    fi
+    echo "${count:-0}"
 }
 
 # ── OpenClaw Sessions Bridge ─────────────────────────────────
@@ -100,6 +190,17 @@ spawn() {
         return 1
     fi
 
+    _register_agent "$parent" "$name" "$desc" "$priority"
+}
+
+# _register_agent <parent_task> <agent_name> <description> <priority>
+# Records the sub-agent and its task file
+_register_agent() {
+    local parent="$1" name="$2" desc="$3" priority="$4"
+    local active max
+    active=$(_active_count)
+    max=$(_max_agents)
+
     # Check for duplicate
     local existing
     existing=$(jq -r --arg n "$name" '[.agents[] | select(.name == $n and (.status == "active" or .status == "pending"))] | length' "$AGENTS_FILE" 2>/dev/null)
@@ -110,23 +211,10 @@ spawn() {
 
     # Create the sub-agent entry
     local agent_id="sa-$(date +%s)-$$"
-    local tmp="${AGENTS_FILE}.tmp.$$"
-    jq --arg id "$agent_id" --arg parent "$parent" --arg name "$name" \
-        --arg desc "$desc" --arg prio "$priority" --arg ts "$(date -Iseconds)" \
-        '.agents += [{
-            id: $id,
-            parent_task: $parent,
-            name: $name,
-            description: $desc,
-            priority: $prio,
-            status: "pending",
-            created: $ts,
-            started: null,
-            completed: null,
-            result: null,
-            evidence: []
-        }] | .stats.total_spawned += 1' \
-        "$AGENTS_FILE" > "$tmp" && mv "$tmp" "$AGENTS_FILE"
+    _agents_append "$(jq -nc --arg id "$agent_id" --arg parent "$parent" --arg name "$name" \
+        --arg desc "$desc" --arg prio "$priority" --arg ts "$(date -Iseconds)" --argjson max "$AGENTS_FIELD_MAX" \
+        '{op: "spawn", id: $id, parent: $parent, name: $name, description: $desc[0:$max],
+          priority: $prio, at: $ts}')" || return 1
 
     # Also create a real task file so the daemon can flag it
     local task_file="$TASKS_DIR/${name}.json"
@@ -153,6 +241,9 @@ spawn() {
     jq -n --arg ts "$(date -Iseconds)" --arg id "$agent_id" --arg name "$name" --arg parent "$parent" \
         '{timestamp:$ts, action:"agent_spawned", agent_id:$id, name:$name, parent:$parent}' >> "$AGENT_LOG" 2>/dev/null
 
+    _agent_event "$agent_id" "$(jq -nc --arg name "$name" --arg parent "$parent" \
+        '{name: $name, parent: $parent, status: "pending"}')"
+
     echo "Spawned sub-agent: $name (id: $agent_id, $((active+1))/$max slots used)"
 
     # Attempt to bridge to OpenClaw native session for cross-session visibility
@@ -167,11 +258,8 @@ spawn() {
 # start <agent_id_or_name>
 start_agent() {
     local key="$1"
-    _ensure_state
-    local tmp="${AGENTS_FILE}.tmp.$$"
-    jq --arg k "$key" --arg ts "$(date -Iseconds)" \
-        '(.agents[] | select(.id == $k or .name == $k)) |= (.status = "active" | .started = $ts)' \
-        "$AGENTS_FILE" > "$tmp" && mv "$tmp" "$AGENTS_FILE"
+    _agents_append "$(jq -nc --arg k "$key" --arg ts "$(date -Iseconds)" '{op: "start", key: $k, at: $ts}')"
+    _agent_event "$key" '{"status":"active"}'
     echo "Sub-agent started: $key"
 }
 
@@ -180,39 +268,17 @@ complete_agent() {
     local key="$1"
     local result="$2"
     shift 2
-    local evidence_items=("$@")
-
-    _ensure_state
 
-    # Build evidence array
-    local ev_json="[]"
-    if [[ ${#evidence_items[@]} -gt 0 ]]; then
-        ev_json="["
-        local first=true
-        for item in "${evidence_items[@]}"; do
-            $first || ev_json+=","
-            ev_json+="$(jq -n --arg e "$item" '$e')"
-            first=false
-        done
-        ev_json+="]"
-    fi
-
-    local tmp="${AGENTS_FILE}.tmp.$$"
-    jq --arg k "$key" --arg ts "$(date -Iseconds)" --arg res "$result" --argjson ev "$ev_json" \
-        '(.agents[] | select(.id == $k or .name == $k)) |=
-            (.status = "completed" | .completed = $ts | .result = $res | .evidence = $ev)
-        | .stats.total_completed += 1' \
-        "$AGENTS_FILE" > "$tmp" && mv "$tmp" "$AGENTS_FILE"
-
-    # Archive to completed array
-    jq --arg k "$key" \
-        '.completed += [.agents[] | select(.id == $k or .name == $k)] |
-         .agents = [.agents[] | select(.id != $k and .name != $k)]' \
-        "$AGENTS_FILE" > "$tmp" && mv "$tmp" "$AGENTS_FILE"
+    # Remaining arguments are evidence; the fold archives the agent to
+    # the completed array
+    _agents_append "$(jq -nc --arg k "$key" --arg ts "$(date -Iseconds)" --arg res "$result" \
+        --argjson max "$AGENTS_FIELD_MAX" \
+        '{op: "complete", key: $k, at: $ts, result: $res[0:$max], evidence: $ARGS.positional}' --args "$@")"
 
     # Log
     jq -n --arg ts "$(date -Iseconds)" --arg key "$key" --arg res "$result" \
         '{timestamp:$ts, action:"agent_completed", agent:$key, result:$res}' >> "$AGENT_LOG" 2>/dev/null
+    _agent_event "$key" '{"status":"completed","percent":100}'
 
     echo "Sub-agent completed: $key"
 
@@ -224,15 +290,12 @@ complete_agent() {
 fail_agent() {
     local key="$1"
     local reason="$2"
-    _ensure_state
-    local tmp="${AGENTS_FILE}.tmp.$$"
-    jq --arg k "$key" --arg ts "$(date -Iseconds)" --arg r "$reason" \
-        '(.agents[] | select(.id == $k or .name == $k)) |=
-            (.status = "failed" | .completed = $ts | .result = ("FAILED: " + $r))' \
-        "$AGENTS_FILE" > "$tmp" && mv "$tmp" "$AGENTS_FILE"
+    _agents_append "$(jq -nc --arg k "$key" --arg ts "$(date -Iseconds)" --arg r "$reason" --argjson max "$AGENTS_FIELD_MAX" \
+        '{op: "fail", key: $k, at: $ts, result: ("FAILED: " + $r)[0:$max]}')"
 
     jq -n --arg ts "$(date -Iseconds)" --arg key "$key" --arg reason "$reason" \
         '{timestamp:$ts, action:"agent_failed", agent:$key, reason:$reason}' >> "$AGENT_LOG" 2>/dev/null
+    _agent_event "$key" "$(jq -nc --arg r "$reason" '{status: "failed", message: $r}')"
 
     echo "Sub-agent failed: $key — $reason"
 }
@@ -281,8 +344,11 @@ status() {
     local active max
     active=$(_active_count)
     max=$(_max_agents)
-    jq --argjson act "$active" --argjson max "$max" \
-        '.stats + {active_agents: $act, max_agents: $max, available_slots: ($max - $act)}' \
+    local sup
+    sup=$(_supervisor_request GET /status)
+    [[ -n "$sup" ]] || sup='{"running": false}'
+    jq --argjson act "$active" --argjson max "$max" --argjson sup "$sup" \
+        '(.stats | del(.active)) + {active_agents: $act, max_agents: $max, available_slots: ($max - $act), supervisor: $sup}' \
         "$AGENTS_FILE" 2>/dev/null
 }
 
@@ -307,30 +373,256 @@ cleanup() {
     local now
     now=$(date +%s)
     # Agents active for over 2 hours are stale
-    local tmp="${AGENTS_FILE}.tmp.$$"
-    jq --argjson now "$now" '
-        .agents = [.agents[] |
-            if (.status == "active" and .started != null) then
-                ((.started | sub("\\+.*";"") | strptime("%Y-%m-%dT%H:%M:%S") | mktime) as $start |
-                if ($now - $start > 7200) then .status = "failed" | .result = "TIMEOUT: exceeded 2 hour limit"
-                else . end)
-            else . end
-        ]' "$AGENTS_FILE" > "$tmp" 2>/dev/null && mv "$tmp" "$AGENTS_FILE"
+    jq -c --argjson now "$now" '
+        .agents[] | select(.status == "active" and .started != null)
+        | select(($now - (.started | sub("\\+.*";"") | strptime("%Y-%m-%dT%H:%M:%S") | mktime)) > 7200)
+        | {op: "fail", key: .id, result: "TIMEOUT: exceeded 2 hour limit"}' "$AGENTS_FILE" 2>/dev/null |
+        while IFS= read -r event; do _agents_append "$event"; done
 
-    # Also clean up stale parallel agent PIDs
+    # Reconcile parallel agents with the supervisor
     _parallel_cleanup
     echo "Cleanup complete"
 }
 
 # ── Real Parallel Execution ─────────────────────────────────
-# Spawns actual background processes that run their own AI calls
-# Uses file-based IPC via state/parallel_agents/
+# Parallel agents are worker processes that run their own AI calls,
+# scheduled by the agent supervisor (below). Each has a directory under
+# state/parallel_agents/<id>/ (manifest, reason, worker.log) while it is
+# unfinished; progress goes to the supervisor as events. A finished
+# agent's directory is compacted into one line of
+# state/parallel_agents.jsonl.
 
 PARALLEL_DIR="$STATE_DIR/parallel_agents"
+PARALLEL_SUMMARIES="$STATE_DIR/parallel_agents.jsonl"
+# Bytes of worker.log kept in an agent's summary record
+PARALLEL_LOG_TAIL=4000
+WORKTREES_DIR="$STATE_DIR/worktrees"
 mkdir -p "$PARALLEL_DIR"
 
+# ── Worktree Isolation ──────────────────────────────────────
+# In a git repository each parallel agent works in its own worktree on a
+# scratch branch (agent/<id>), sharing the object store, so agents never
+# edit the same checkout. When the agent finishes, its changes are
+# committed, rebased onto the current HEAD and fast-forwarded in; a
+# conflict leaves the branch in place for a human and fails the agent.
+# sub_agents.isolation = "shared" runs every agent in the main checkout.
+
+_worktree_enabled() {
+    [[ "$(_get_config '.sub_agents.isolation // "worktree"')" == "worktree" ]] \
+        && git -C "$AUTONOMY_DIR" rev-parse --verify -q HEAD >/dev/null 2>&1
+}
+
+# _agent_git <dir> <args...> — git in dir, with a fallback identity for
+# the commits agents make
+_agent_git() {
+    local dir="$1"
+    shift
+    if git -C "$dir" config user.email >/dev/null 2>&1; then
+        git -C "$dir" "$@"
+    else
+        git -C "$dir" -c user.name="autonomy" -c user.email="autonomy@localhost" "$@"
+    fi
+}
+
+# worktree_create <agent_id> — check out HEAD on agent/<id> in a new
+# worktree and record it in the agent's manifest. Returns 1 when
+# isolation is off or there is no repository to branch from.
+worktree_create() {
+    local agent_id="$1"
+    local manifest="$PARALLEL_DIR/$agent_id/manifest.json"
+    local wt="$WORKTREES_DIR/$agent_id" branch="agent/$agent_id" base prefix
+
+    _worktree_enabled || return 1
+    base=$(git -C "$AUTONOMY_DIR" rev-parse --verify -q HEAD) || return 1
+    # A previous attempt's worktree is stale by now
+    worktree_remove "$agent_id"
+    prefix=$(git -C "$AUTONOMY_DIR" rev-parse --show-prefix)
+    mkdir -p "$WORKTREES_DIR"
+    git -C "$AUTONOMY_DIR" worktree add -q -b "$branch" "$wt" "$base" >/dev/null 2>&1 || return 1
+
+    jq --arg wt "$wt" --arg branch "$branch" --arg base "$base" --arg ws "$wt/${prefix%/}" \
+        '. + {worktree: $wt, branch: $branch, base: $base, workspace: ($ws | rtrimstr("/"))}' \
+        "$manifest" > "$manifest.tmp" && mv "$manifest.tmp" "$manifest"
+    echo "$wt"
+}
+
+# worktree_remove <agent_id> [keep_branch] — drop the worktree and,
+# unless keep_branch is "true", its branch
+worktree_remove() {
+    local agent_id="$1" keep_branch="${2:-false}"
+    [[ "$keep_branch" == "true" ]] || keep_branch=false
+    local wt="$WORKTREES_DIR/$agent_id" branch="agent/$agent_id"
+    git -C "$AUTONOMY_DIR" worktree remove --force "$wt" >/dev/null 2>&1 || rm -rf "$wt"
+    git -C "$AUTONOMY_DIR" worktree prune >/dev/null 2>&1
+    [[ "$keep_branch" == "true" ]] || git -C "$AUTONOMY_DIR" branch -D "$branch" >/dev/null 2>&1
+
+    local manifest="$PARALLEL_DIR/$agent_id/manifest.json"
+    if [[ -f "$manifest" ]]; then
+        jq --argjson keep "$keep_branch" 'del(.worktree, .workspace) | if $keep then . else del(.branch) end' \
+            "$manifest" > "$manifest.tmp" && mv "$manifest.tmp" "$manifest"
+    fi
+    return 0
+}
+
+# _worktree_integrate <worktree> <branch> — rebase the branch onto HEAD
+# and fast-forward the main checkout. Prints "<outcome>\t<files>" where
+# outcome is merged, empty or conflict. Callers hold the merge lock.
+_worktree_integrate() {
+    local wt="$1" branch="$2" target files
+    target=$(git -C "$AUTONOMY_DIR" rev-parse HEAD)
+
+    if [[ "$(git -C "$wt" rev-list --count "$target..HEAD")" == "0" ]]; then
+        printf 'empty\t\n'
+        return
+    fi
+    if ! _agent_git "$wt" rebase -q "$target" >/dev/null 2>&1; then
+        files=$(git -C "$wt" diff --name-only --diff-filter=U | paste -sd' ')
+        git -C "$wt" rebase --abort >/dev/null 2>&1
+        printf 'conflict\t%s\n' "$files"
+        return
+    fi
+    if ! git -C "$AUTONOMY_DIR" merge -q --ff-only "$branch" >/dev/null 2>&1; then
+        # Local edits in the main checkout are in the way
+        files=$(comm -12 \
+            <(git -C "$AUTONOMY_DIR" diff --name-only "$target" "$branch" 2>/dev/null | sort) \
+            <(git -C "$AUTONOMY_DIR" status --porcelain --untracked-files=all | cut -c4- | sort) | paste -sd' ')
+        printf 'conflict\t%s\n' "$files"
+        return
+    fi
+    printf 'merged\t\n'
+}
+
+# worktree_merge <agent_id> — commit what the agent left in its worktree,
+# bring it back into the main checkout and clean up. Returns 1 on conflict.
+worktree_merge() {
+    local agent_id="$1"
+    local manifest="$PARALLEL_DIR/$agent_id/manifest.json"
+    local wt branch name desc
+    wt=$(jq -r '.worktree // empty' "$manifest" 2>/dev/null)
+    branch=$(jq -r '.branch // empty' "$manifest" 2>/dev/null)
+    name=$(jq -r '.name // empty' "$manifest" 2>/dev/null)
+    desc=$(jq -r '.description // empty' "$manifest" 2>/dev/null)
+    [[ -n "$wt" && -d "$wt" ]] || { echo "No worktree for $agent_id"; return 1; }
+
+    if [[ -n "$(git -C "$wt" status --porcelain)" ]]; then
+        _agent_git "$wt" add -A >/dev/null 2>&1
+        _agent_git "$wt" commit -q -m "sub-agent $name: $desc" >/dev/null 2>&1
+    fi
+
+    local outcome files
+    IFS=$'\t' read -r outcome files < <(
+        { flock 9; _worktree_integrate "$wt" "$branch"; } 9> "$WORKTREES_DIR/.merge.lock")
+
+    if [[ "$outcome" == "conflict" ]]; then
+        worktree_remove "$agent_id" true
+    else
+        worktree_remove "$agent_id"
+    fi
+
+    jq --arg m "$outcome" --arg f "$files" \
+        '.merge = $m | .conflicts = ($f | split(" ") | map(select(. != "")))' \
+        "$manifest" > "$manifest.tmp" && mv "$manifest.tmp" "$manifest"
+    jq -n --arg ts "$(date -Iseconds)" --arg id "$agent_id" --arg m "$outcome" --arg f "$files" --arg b "$branch" \
+        '{timestamp:$ts, action:"worktree_merge", agent_id:$id, outcome:$m, branch:$b}
+         + (if $f != "" then {conflicts:($f | split(" "))} else {} end)' >> "$AGENT_LOG" 2>/dev/null
+
+    case "$outcome" in
+        merged)   echo "Merged $branch" ;;
+        empty)    echo "No changes from $agent_id" ;;
+        *)        echo "Merge conflict in: ${files:-working tree} (changes kept on $branch)"; return 1 ;;
+    esac
+}
+
+# ── Agent Supervisor ────────────────────────────────────────
+# Parallel agents run as jobs of lib/agent-supervisor.py: a resident
+# process with max_sub_agents worker slots and a persistent queue
+# (state/agent-jobs.json). It reaps workers, kills the process group of
+# one that overruns sub_agents.timeout_seconds (default 7200), and
+# retries failures sub_agents.max_retries times (default 2) with
+# backoff from sub_agents.retry_backoff_seconds (default 30).
+
+AGENT_SUPERVISOR_SOCK="$STATE_DIR/agent-supervisor.sock"
+AGENT_SUPERVISOR_PID="$STATE_DIR/agent-supervisor.pid"
+AGENT_JOBS_FILE="$STATE_DIR/agent-jobs.json"
+
+# _supervisor_request <method> <path> [json_body] — prints the response
+_supervisor_request() {
+    local method="$1" path="$2" body="${3:-}"
+    [[ -S "$AGENT_SUPERVISOR_SOCK" ]] || return 1
+    local args=(-sf --max-time 10 --unix-socket "$AGENT_SUPERVISOR_SOCK" -X "$method")
+    [[ -n "$body" ]] && args+=(-H "Content-Type: application/json" --data-binary "$body")
+    curl "${args[@]}" "http://agent-supervisor$path" 2>/dev/null
+}
+
+# _agent_event <agent_id|name> <event_json> — publish a progress event to
+# the supervisor's live view; a no-op when it is not running
+_agent_event() {
+    [[ -S "$AGENT_SUPERVISOR_SOCK" ]] || return 0
+    local agent_id
+    _agents_sync
+    agent_id=$(jq -r --arg k "$1" '[(.agents + .completed)[] | select(.id == $k or .name == $k) | .id] | last // $k' \
+        "$AGENTS_FILE" 2>/dev/null)
+    _supervisor_request POST /events "$(echo "$2" | jq -c --arg a "${agent_id:-$1}" '. + {agent: $a}')" >/dev/null || true
+}
+
+# supervisor {start|stop|status}
+supervisor() {
+    case "${1:-status}" in
+        start)
+            if python3 "$SCRIPT_DIR/agent-supervisor.py" status --socket "$AGENT_SUPERVISOR_SOCK" >/dev/null 2>&1; then
+                echo "Agent supervisor already running (PID: $(cat "$AGENT_SUPERVISOR_PID" 2>/dev/null))"
+                return 0
+            fi
+            # It seeds its live view from sub_agents.json
+            _agents_sync
+            AUTONOMY_DIR="$AUTONOMY_DIR" \
+            AGENT_SUPERVISOR_SLOTS="$(_max_agents)" \
+            AGENT_SUPERVISOR_TIMEOUT="$(_get_config '.sub_agents.timeout_seconds // 7200')" \
+            AGENT_SUPERVISOR_RETRIES="$(_get_config '.sub_agents.max_retries // 2')" \
+            AGENT_SUPERVISOR_RETRY_BASE="$(_get_config '.sub_agents.retry_backoff_seconds // 30')" \
+                nohup python3 "$SCRIPT_DIR/agent-supervisor.py" serve --socket "$AGENT_SUPERVISOR_SOCK" \
+                >> "$LOGS_DIR/agent-supervisor.log" 2>&1 < /dev/null &
+            local i
+            for i in 1 2 3 4 5 6 7 8 9 10; do
+                [[ -S "$AGENT_SUPERVISOR_SOCK" ]] && break
+                sleep 0.2
+            done
+            if [[ -S "$AGENT_SUPERVISOR_SOCK" ]]; then
+                echo "Agent supervisor started (PID: $(cat "$AGENT_SUPERVISOR_PID" 2>/dev/null))"
+            else
+                echo "ERROR: Agent supervisor failed to start — check logs/agent-supervisor.log"
+                return 1
+            fi
+            ;;
+        stop)
+            local pid i
+            pid=$(cat "$AGENT_SUPERVISOR_PID" 2>/dev/null)
+            if [[ -n "$pid" ]] && kill -0 "$pid" 2>/dev/null; then
+                kill "$pid" 2>/dev/null
+                # Running jobs are stopped and queued again before it exits
+                for i in $(seq 1 50); do
+                    kill -0 "$pid" 2>/dev/null || break
+                    sleep 0.2
+                done
+                echo "Agent supervisor stopped"
+            else
+                echo "Agent supervisor not running"
+            fi
+            rm -f "$AGENT_SUPERVISOR_SOCK" "$AGENT_SUPERVISOR_PID"
+            ;;
+        status)
+            python3 "$SCRIPT_DIR/agent-supervisor.py" status --socket "$AGENT_SUPERVISOR_SOCK"
+            ;;
+        *)
+            echo "Usage: sub-agents.sh supervisor {start|stop|status}"
+            return 1
+            ;;
+    esac
+}
+
 # spawn_parallel <parent_task> <agent_name> <description> [priority]
-# Creates a real background bash process with its own execution engine
+# Registers the agent and queues a worker (lib/sub-agent-worker.sh) with
+# the supervisor. Agents beyond the pool size wait in the queue.
 spawn_parallel() {
     local parent="$1"
     local name="$2"
@@ -343,155 +635,247 @@ spawn_parallel() {
     }
 
     _ensure_state
-
-    # Check limit
-    local active max
-    active=$(_active_count)
-    max=$(_max_agents)
-    if [[ "$active" -ge "$max" ]]; then
-        echo "LIMIT_REACHED: $active/$max sub-agents active."
-        return 1
-    fi
-
-    # First spawn normally to register in state
-    spawn "$parent" "$name" "$desc" "$priority" || return 1
+    supervisor start >/dev/null || { echo "ERROR: Agent supervisor unavailable"; return 1; }
+    _register_agent "$parent" "$name" "$desc" "$priority" || return 1
 
     local agent_id
+    _agents_sync
     agent_id=$(jq -r --arg n "$name" '.agents[] | select(.name == $n) | .id' "$AGENTS_FILE" 2>/dev/null | tail -1)
 
-    # Create IPC directory for this agent
+    # IPC directory for this agent: manifest, reason, worker.log
     local ipc_dir="$PARALLEL_DIR/$agent_id"
     mkdir -p "$ipc_dir"
-
-    # Write agent manifest
     jq -n \
         --arg id "$agent_id" \
         --arg name "$name" \
         --arg desc "$desc" \
         --arg parent "$parent" \
         --arg ts "$(date -Iseconds)" \
-        '{id: $id, name: $name, description: $desc, parent: $parent, started: $ts, status: "running", pid: null}' \
+        '{id: $id, name: $name, description: $desc, parent: $parent, started: $ts, status: "queued"}' \
         > "$ipc_dir/manifest.json"
 
-    # Create the worker script
-    cat > "$ipc_dir/worker.sh" << 'WORKER_EOF'
-#!/bin/bash
-# Parallel agent worker — runs independently
-AGENT_IPC_DIR="$1"
-AUTONOMY_DIR="$2"
-AGENT_NAME="$3"
-
-exec > "$AGENT_IPC_DIR/stdout.log" 2> "$AGENT_IPC_DIR/stderr.log"
-
-echo "Worker started at $(date -Iseconds)" > "$AGENT_IPC_DIR/status"
-
-# Mark started
-if [[ -f "$AUTONOMY_DIR/lib/sub-agents.sh" ]]; then
-    bash "$AUTONOMY_DIR/lib/sub-agents.sh" start "$AGENT_NAME" 2>/dev/null
-fi
-
-# Use execution engine if available
-TASK_FILE="$AUTONOMY_DIR/tasks/${AGENT_NAME}.json"
-if [[ -f "$TASK_FILE" && -f "$AUTONOMY_DIR/lib/execution-engine.sh" ]]; then
-    echo "executing" > "$AGENT_IPC_DIR/status"
-    bash "$AUTONOMY_DIR/lib/execution-engine.sh" execute "$AGENT_NAME" 2>&1
-    EXIT_CODE=$?
-else
-    # Fallback: use ai-engine to analyze
-    if [[ -f "$TASK_FILE" && -f "$AUTONOMY_DIR/lib/ai-engine.sh" ]]; then
-        echo "analyzing" > "$AGENT_IPC_DIR/status"
-        bash "$AUTONOMY_DIR/lib/ai-engine.sh" process "$TASK_FILE" 2>&1
-        EXIT_CODE=$?
-    else
-        echo "no_engine" > "$AGENT_IPC_DIR/status"
-        EXIT_CODE=1
+    local job resp
+    job=$(jq -n \
+        --arg id "$agent_id" --arg name "$name" --arg prio "$priority" \
+        --arg worker "$SCRIPT_DIR/sub-agent-worker.sh" --arg sub "$SCRIPT_DIR/sub-agents.sh" \
+        --arg ipc "$ipc_dir" --arg cwd "$AUTONOMY_DIR" \
+        '{id: $id, name: $name, priority: $prio, cwd: $cwd,
+          command: ["bash", $worker, $ipc], log: ($ipc + "/worker.log"),
+          no_retry: [3], on_done: ["bash", $sub, "job_done", $name]}')
+    if ! resp=$(_supervisor_request POST /jobs "$job"); then
+        fail_agent "$name" "Supervisor rejected the job" >/dev/null
+        echo "ERROR: Could not queue $name with the agent supervisor"
+        return 1
     fi
-fi
-
-# Report result
-if [[ $EXIT_CODE -eq 0 ]]; then
-    echo "completed" > "$AGENT_IPC_DIR/status"
-    bash "$AUTONOMY_DIR/lib/sub-agents.sh" complete "$AGENT_NAME" "Parallel execution completed successfully" 2>/dev/null
-else
-    echo "failed" > "$AGENT_IPC_DIR/status"
-    bash "$AUTONOMY_DIR/lib/sub-agents.sh" fail "$AGENT_NAME" "Parallel execution failed (exit $EXIT_CODE)" 2>/dev/null
-fi
 
-echo "Worker finished at $(date -Iseconds) with exit code $EXIT_CODE" >> "$AGENT_IPC_DIR/stdout.log"
-WORKER_EOF
+    jq -n --arg ts "$(date -Iseconds)" --arg id "$agent_id" --arg name "$name" \
+        '{timestamp:$ts, action:"parallel_queued", agent_id:$id, name:$name}' >> "$AGENT_LOG" 2>/dev/null
 
-    chmod +x "$ipc_dir/worker.sh"
+    echo "Parallel agent queued: $name (job: $agent_id, IPC: $ipc_dir)"
+}
 
-    # Launch background worker
-    bash "$ipc_dir/worker.sh" "$ipc_dir" "$AUTONOMY_DIR" "$name" &
-    local worker_pid=$!
+# job_done <agent_name> — supervisor callback once an agent's job is
+# finished for good (AGENT_JOB_ID/STATUS/REASON in the environment)
+job_done() {
+    local name="$1" agent_id="${AGENT_JOB_ID:-}"
+    local ipc_dir="$PARALLEL_DIR/$agent_id" reason=""
+    [[ -n "$name" && -n "$agent_id" ]] || { echo "Usage: AGENT_JOB_ID=... sub-agents.sh job_done <agent_name>"; return 1; }
 
-    # Record PID
-    jq --argjson pid "$worker_pid" '.pid = $pid' "$ipc_dir/manifest.json" > "$ipc_dir/manifest.json.tmp" \
-        && mv "$ipc_dir/manifest.json.tmp" "$ipc_dir/manifest.json"
+    # Timed-out or killed workers leave their worktree behind
+    [[ -d "$WORKTREES_DIR/$agent_id" ]] && worktree_remove "$agent_id"
 
-    jq -n --arg ts "$(date -Iseconds)" --arg id "$agent_id" --arg name "$name" --argjson pid "$worker_pid" \
-        '{timestamp:$ts, action:"parallel_spawned", agent_id:$id, name:$name, pid:$pid}' >> "$AGENT_LOG" 2>/dev/null
+    if [[ "${AGENT_JOB_STATUS:-}" != "completed" ]]; then
+        reason=$(cat "$ipc_dir/reason" 2>/dev/null)
+        [[ -n "$reason" && "${AGENT_JOB_EXIT:-}" =~ ^(1|3)$ ]] || reason="${AGENT_JOB_REASON:-${AGENT_JOB_STATUS:-failed}}"
+    fi
+    # Summarize first: the status change below can resolve a join that
+    # reads the summary
+    _parallel_compact "$agent_id" "$reason"
+    if [[ "${AGENT_JOB_STATUS:-}" == "completed" ]]; then
+        complete_agent "$name" "Parallel execution completed successfully"
+    else
+        fail_agent "$name" "$reason"
+    fi
+}
 
-    echo "Parallel agent launched: $name (PID: $worker_pid, IPC: $ipc_dir)"
+# _parallel_compact <agent_id> [reason] — fold a finished agent's IPC
+# directory and last progress into one summary line, then remove it
+_parallel_compact() {
+    local agent_id="$1" reason="${2:-}" ipc_dir="$PARALLEL_DIR/$1"
+    [[ -f "$ipc_dir/manifest.json" ]] || return 0
+
+    local progress
+    progress=$(_supervisor_request GET "/jobs/$agent_id" | jq -c '.progress // {}' 2>/dev/null)
+    [[ -n "$progress" ]] || progress="{}"
+
+    jq -c --arg ts "$(date -Iseconds)" --arg status "${AGENT_JOB_STATUS:-failed}" \
+        --arg exit "${AGENT_JOB_EXIT:-}" --arg reason "$reason" \
+        --arg attempts "${AGENT_JOB_ATTEMPTS:-}" --argjson p "$progress" \
+        --arg log "$(tail -c "$PARALLEL_LOG_TAIL" "$ipc_dir/worker.log" 2>/dev/null)" \
+        '. + {status: $status, finished: $ts,
+              exit_code: ($exit | tonumber? // null), attempts: ($attempts | tonumber? // null),
+              reason: (if $reason != "" then $reason else null end),
+              phase: $p.phase, tokens: ($p.tokens // 0), log_tail: $log}' \
+        "$ipc_dir/manifest.json" >> "$PARALLEL_SUMMARIES" 2>/dev/null || return 1
+    rm -rf "$ipc_dir"
 }
 
-# Check status of parallel agents
+# Check status of parallel agents: live ones from the supervisor's view,
+# finished ones from their summary records
 parallel_status() {
-    local results="[]"
+    local live finished
+    live=$(_supervisor_request GET /agents | jq -c '[.agents[] | select(.status == "queued" or .status == "running")]' 2>/dev/null)
+    if [[ -z "$live" ]]; then
+        # Supervisor down: the queue file and manifests are all there is
+        local jobs
+        jobs=$(jq -c '.jobs' "$AGENT_JOBS_FILE" 2>/dev/null)
+        [[ -n "$jobs" ]] || jobs="[]"
+        live=$(cat "$PARALLEL_DIR"/*/manifest.json 2>/dev/null | jq -sc --argjson jobs "$jobs" \
+            'map(. as $m | ($jobs | map(select(.id == $m.id)) | .[0]) as $job
+                 | {id, name, parent, status: ($job.status // "unknown"), pid: $job.pid,
+                    attempts: ($job.attempts // 0), reason: $job.reason})')
+        [[ -n "$live" ]] || live="[]"
+    fi
+    finished=$(tail -n 20 "$PARALLEL_SUMMARIES" 2>/dev/null | jq -sc 'map(del(.log_tail))')
+    [[ -n "$finished" ]] || finished="[]"
+
+    jq -n --argjson live "$live" --argjson finished "$finished" \
+        '$live + ($finished | map(select(.id as $id | $live | all(.id != $id))))'
+}
+
+# Reconcile parallel agents with the supervisor: resume a persisted queue
+# whose supervisor has gone, fail and compact agents it has no job for and
+# drop worktrees nothing is using
+_parallel_cleanup() {
+    if [[ -f "$AGENT_JOBS_FILE" ]] && jq -e '.jobs | any(.status == "queued" or .status == "running")' "$AGENT_JOBS_FILE" >/dev/null 2>&1; then
+        supervisor start >/dev/null
+    fi
+    local jobs
+    jobs=$(_supervisor_request GET /jobs) || jobs=$(jq '.jobs' "$AGENT_JOBS_FILE" 2>/dev/null)
+    [[ -n "$jobs" ]] || jobs="[]"
+
+    # A directory that is still here belongs to an unfinished agent
     for d in "$PARALLEL_DIR"/*/; do
         [[ -d "$d" ]] || continue
         local manifest="$d/manifest.json"
         [[ -f "$manifest" ]] || continue
 
-        local agent_id agent_name pid status_text
+        local agent_id job_status
         agent_id=$(jq -r '.id' "$manifest")
-        agent_name=$(jq -r '.name' "$manifest")
-        pid=$(jq -r '.pid // 0' "$manifest")
+        job_status=$(echo "$jobs" | jq -r --arg id "$agent_id" 'map(select(.id == $id)) | .[0].status // "missing"')
 
-        if [[ -f "$d/status" ]]; then
-            status_text=$(cat "$d/status")
-        else
-            status_text="unknown"
+        if [[ "$job_status" == "missing" ]]; then
+            fail_agent "$(jq -r '.name' "$manifest")" "Worker job lost by the supervisor" 2>/dev/null
+            AGENT_JOB_STATUS=failed _parallel_compact "$agent_id" "Worker job lost by the supervisor"
         fi
-
-        local running=false
-        if [[ "$pid" -gt 0 ]] && kill -0 "$pid" 2>/dev/null; then
-            running=true
+        if [[ -d "$WORKTREES_DIR/$agent_id" && "$job_status" != "running" ]]; then
+            worktree_remove "$agent_id"
         fi
-
-        results=$(echo "$results" | jq \
-            --arg id "$agent_id" \
-            --arg name "$agent_name" \
-            --argjson pid "$pid" \
-            --arg status "$status_text" \
-            --argjson running "$running" \
-            '. + [{id: $id, name: $name, pid: $pid, status: $status, running: $running}]')
     done
-    echo "$results" | jq .
 }
 
-# Cleanup dead parallel agent processes
-_parallel_cleanup() {
-    for d in "$PARALLEL_DIR"/*/; do
-        [[ -d "$d" ]] || continue
-        local manifest="$d/manifest.json"
-        [[ -f "$manifest" ]] || continue
+# ── Fan-in Joins ────────────────────────────────────────────
+# A parent task that fans work out to sub-agents declares a join: a
+# barrier the supervisor checks as their statuses arrive. The parent
+# waits (status waiting_on_agents) until the barrier resolves, then
+# join_ready folds the children's results into one record on the parent
+# task, puts it back in the queue and wakes the daemon.
+
+# Characters of each child's result kept in the join record
+JOIN_RESULT_CHARS=500
+
+# _update_task <task_id> <jq args...> <filter> — rewrite tasks/<id>.json
+# under state/task-locks/<id>.lock, the lock the executor and
+# lib/trigger-windows.py take for the same file; fails if there is no task
+_update_task() {
+    local task_file="$TASKS_DIR/$1.json" lock="$STATE_DIR/task-locks/$1.lock"
+    shift
+    mkdir -p "$STATE_DIR/task-locks"
+    (
+        flock 9
+        [[ -f "$task_file" ]] || exit 1
+        local tmp="${task_file}.tmp.$$"
+        jq "$@" "$task_file" > "$tmp" && mv "$tmp" "$task_file"
+    ) 9> "$lock"
+}
 
-        local pid status_text
-        pid=$(jq -r '.pid // 0' "$manifest")
-        [[ -f "$d/status" ]] && status_text=$(cat "$d/status") || status_text="unknown"
-
-        # If process is dead and status isn't completed/failed, mark as failed
-        if [[ "$pid" -gt 0 ]] && ! kill -0 "$pid" 2>/dev/null; then
-            if [[ "$status_text" != "completed" && "$status_text" != "failed" ]]; then
-                echo "failed" > "$d/status"
-                local agent_name
-                agent_name=$(jq -r '.name' "$manifest")
-                fail_agent "$agent_name" "Worker process died unexpectedly" 2>/dev/null
-            fi
+# join <parent_task> [all|any|deadline|<k>] [deadline_seconds]
+join() {
+    local parent="$1" mode="${2:-all}" deadline="${3:-0}" k=0
+    [[ -z "$parent" ]] && {
+        echo "Usage: sub-agents.sh join <parent_task> [all|any|deadline|<k>] [deadline_seconds]"
+        return 1
+    }
+    [[ "$mode" =~ ^[0-9]+$ ]] && { k="$mode"; mode="quorum"; }
+    [[ "$deadline" =~ ^[0-9]+$ ]] || { echo "ERROR: deadline must be whole seconds"; return 1; }
+
+    _ensure_state
+    supervisor start >/dev/null || { echo "ERROR: Agent supervisor unavailable"; return 1; }
+
+    # Park the parent first: the join can resolve as soon as it is declared.
+    # The status it had is kept on the join in case the declaration fails.
+    local parked=false
+    _update_task "$parent" --arg mode "$mode" --argjson k "$k" --argjson d "$deadline" --arg ts "$(date -Iseconds)" \
+        '.join = {mode: $mode, k: $k, deadline_seconds: $d, declared: $ts, status: "waiting",
+                  prev_status: (.status // "pending")}
+         | .status = "waiting_on_agents"' && parked=true
+
+    local children spec resp
+    children=$(jq -c --arg p "$parent" \
+        '[(.agents + .completed)[] | select(.parent_task == $p) | {key: .id, value: .status}] | from_entries' \
+        "$AGENTS_FILE" 2>/dev/null)
+    [[ -n "$children" ]] || children='{}'
+    spec=$(jq -nc --arg p "$parent" --arg mode "$mode" --argjson k "$k" --argjson d "$deadline" \
+        --argjson children "$children" --arg sub "$SCRIPT_DIR/sub-agents.sh" \
+        --arg cwd "$AUTONOMY_DIR" --arg log "$LOGS_DIR/sub-agent-joins.log" \
+        '{parent: $p, mode: $mode, k: $k, deadline_seconds: $d, children: $children,
+          on_ready: ["bash", $sub, "join_ready", $p], cwd: $cwd, log: $log}')
+    if ! resp=$(_supervisor_request POST /joins "$spec"); then
+        if [[ "$parked" == "true" ]]; then
+            _update_task "$parent" '.status = (.join.prev_status // "pending") | del(.join)'
         fi
-    done
+        echo "ERROR: Could not declare a join for $parent (one may already be waiting)"
+        return 1
+    fi
+
+    jq -n --arg ts "$(date -Iseconds)" --arg parent "$parent" --arg mode "$mode" --argjson k "$k" --argjson d "$deadline" \
+        '{timestamp:$ts, action:"join_declared", parent:$parent, mode:$mode, k:$k, deadline_seconds:$d}' >> "$AGENT_LOG" 2>/dev/null
+    echo "Join declared for $parent: $(echo "$resp" | jq -r '"\(.id) (\(.mode)\(if .mode == "quorum" then " \(.k)" else "" end), \(.children | length) children)"')"
+}
+
+# join_ready <parent_task> — supervisor callback once a join resolves
+# (AGENT_JOIN_ID/STATUS in the environment)
+join_ready() {
+    local parent="$1" outcome="${AGENT_JOIN_STATUS:-met}"
+    [[ -z "$parent" ]] && { echo "Usage: AGENT_JOIN_ID=... sub-agents.sh join_ready <parent_task>"; return 1; }
+    _ensure_state
+
+    local join summaries record
+    join=$(_supervisor_request GET "/joins/${AGENT_JOIN_ID:-join-$parent}") || join='{}'
+    summaries=$(jq -sc --arg p "$parent" \
+        'map(select(.parent == $p)) | map({key: .id, value: ({tokens, exit_code, attempts, merge, conflicts}
+             | with_entries(select(.value != null)))}) | from_entries' "$PARALLEL_SUMMARIES" 2>/dev/null)
+    [[ -n "$summaries" ]] || summaries='{}'
+
+    record=$(jq -c --arg p "$parent" --arg outcome "$outcome" --arg ts "$(date -Iseconds)" \
+        --argjson join "$join" --argjson s "$summaries" --argjson n "$JOIN_RESULT_CHARS" \
+        '[(.agents + .completed)[] | select(.parent_task == $p)] | unique_by(.id)
+         | map({id, name, status, result: ((.result // "") | .[0:$n]), evidence: (.evidence // [] | length)}
+               + ($s[.id] // {})) as $children
+         | {id: $join.id, mode: $join.mode, k: $join.k, status: $outcome, declared: $join.declared, resolved: $ts,
+            counts: ($join.counts // {children: ($children | length)}),
+            tokens: ([$children[].tokens // 0] | add // 0),
+            children: $children}' "$AGENTS_FILE")
+
+    if _update_task "$parent" --argjson r "$record" \
+        '.join = $r | if .status == "waiting_on_agents" then .status = "pending" else . end'; then
+        # Cut the daemon's sleep short so the parent resumes now
+        echo "a sub-agent join resolved" > "$STATE_DIR/daemon.wake"
+    fi
+
+    jq -n --arg ts "$(date -Iseconds)" --arg parent "$parent" --arg outcome "$outcome" \
+        '{timestamp:$ts, action:"join_resolved", parent:$parent, status:$outcome}' >> "$AGENT_LOG" 2>/dev/null
+    echo "Join for $parent resolved: $outcome"
 }
 
 # ── CLI ──────────────────────────────────────────────────────
@@ -507,11 +891,18 @@ case "${1:-status}" in
     summary)         summary ;;
     cleanup)         cleanup ;;
     parallel_status) parallel_status ;;
+    supervisor)      shift; supervisor "$@" ;;
+    job_done)        shift; job_done "$1" ;;
+    join)            shift; join "$@" ;;
+    join_ready)      shift; join_ready "$1" ;;
+    worktree_create) shift; worktree_create "$1" ;;
+    worktree_merge)  shift; worktree_merge "$1" ;;
+    worktree_remove) shift; worktree_remove "$1" ;;
     *)
-        echo "Usage: sub-agents.sh {spawn|spawn_parallel|start|complete|fail|list|status|summary|cleanup|parallel_status}"
+        echo "Usage: sub-agents.sh {spawn|spawn_parallel|start|complete|fail|list|status|summary|cleanup|parallel_status|supervisor|job_done|join|join_ready|worktree_create|worktree_merge|worktree_remove}"
         echo ""
         echo "  spawn <parent> <name> <desc> [priority]           Create a sub-agent (sequential)"
-        echo "  spawn_parallel <parent> <name> <desc> [priority]  Create a truly parallel sub-agent"
+        echo "  spawn_parallel <parent> <name> <desc> [priority]  Queue a parallel sub-agent with the supervisor"
         echo "  start <id|name>                                    Mark agent as active"
         echo "  complete <id|name> <result> [evidence...]          Complete with result"
         echo "  fail <id|name> <reason>                            Mark as failed"
@@ -520,5 +911,12 @@ case "${1:-status}" in
         echo "  summary                                            One-liner for HEARTBEAT"
         echo "  cleanup                                            Clean stale agents"
         echo "  parallel_status                                    Status of parallel workers"
+        echo "  supervisor {start|stop|status}                     Manage the worker pool supervisor"
+        echo "  job_done <name>                                    Supervisor callback for a finished job"
+        echo "  join <parent> [all|any|deadline|<k>] [deadline_s]  Wait for the parent's sub-agents, then resume it"
+        echo "  join_ready <parent>                                Supervisor callback for a resolved join"
+        echo "  worktree_create <agent_id>                         Give an agent its own worktree"
+        echo "  worktree_merge <agent_id>                          Merge an agent's worktree back"
+        echo "  worktree_remove <agent_id>                         Discard an agent's worktree"
         ;;
 esac
@@ -2,12 +2,21 @@
 # Token Budget Guard Rails
 # Tracks daily token usage and enforces budget limits.
 # The AI sees remaining budget in HEARTBEAT.md and self-regulates.
+#
+# Usage is an append-only ledger (state/token-ledger.log), one line per
+# AI call: epoch, tokens, model, task, call type, prompt-cache read and
+# write tokens (already included in tokens), tab-separated. Each line
+# is a single O_APPEND write, so concurrent callers never lose counts.
+# state/token_usage.json caches today's rollup and the ledger offset it
+# has read up to; readers only fold in lines appended since then.
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 AUTONOMY_DIR="$(dirname "$SCRIPT_DIR")"
 CONFIG_FILE="$AUTONOMY_DIR/config.json"
 STATE_DIR="$AUTONOMY_DIR/state"
 TOKEN_FILE="$STATE_DIR/token_usage.json"
+TOKEN_LEDGER="$STATE_DIR/token-ledger.log"
+TOKEN_LOCK="$STATE_DIR/.token-budget.lock"
 
 mkdir -p "$STATE_DIR"
 
@@ -15,68 +24,113 @@ get_config() {
     jq -r "$1" "$CONFIG_FILE" 2>/dev/null
 }
 
-# ── Read / write token state ────────────────────────────────
+# ── Ledger and rollup ───────────────────────────────────────
 
 today_key() {
     date +%Y-%m-%d
 }
 
+_ledger_size() {
+    stat -c %s "${1:-$TOKEN_LEDGER}" 2>/dev/null || echo 0
+}
+
+fresh_state() {
+    jq -n --arg d "$(today_key)" --arg ts "$(date -Iseconds)" --argjson o "${1:-0}" \
+        '{date: $d, used: 0, sessions: 0, last_reset: $ts, ledger_offset: $o}'
+}
+
 load_state() {
     if [[ -f "$TOKEN_FILE" ]]; then
         cat "$TOKEN_FILE"
     else
-        echo '{"date":"'"$(today_key)"'","used":0,"sessions":0,"last_reset":"'"$(date -Iseconds)"'"}'
+        fresh_state 0
     fi
 }
 
 save_state() {
-    echo "$1" > "$TOKEN_FILE"
+    local tmp="${TOKEN_FILE}.tmp.$$"
+    echo "$1" > "$tmp" && mv "$tmp" "$TOKEN_FILE"
 }
 
-# Auto-reset at midnight (new day)
-maybe_reset() {
-    local state today day_in_state
-    state=$(load_state)
-    today=$(today_key)
-    day_in_state=$(echo "$state" | jq -r '.date // ""')
-
-    if [[ "$day_in_state" != "$today" ]]; then
-        local fresh='{"date":"'"$today"'","used":0,"sessions":0,"last_reset":"'"$(date -Iseconds)"'"}'
-        save_state "$fresh"
-        echo "$fresh"
-    else
+# append <tokens> [model] [task] [call_type] [cache_read] [cache_write]
+# — one atomic ledger line
+append_usage() {
+    local tokens="${1:-0}" model="${2:--}" task="${3:--}" call_type="${4:--}"
+    local cache_read="${5:-0}" cache_write="${6:-0}"
+    [[ "$tokens" =~ ^[0-9]+$ ]] || return 0
+    (( tokens > 0 )) || return 0
+    [[ "$cache_read" =~ ^[0-9]+$ ]] || cache_read=0
+    [[ "$cache_write" =~ ^[0-9]+$ ]] || cache_write=0
+    printf '%s\t%s\t%s\t%s\t%s\t%s\t%s\n' "$EPOCHSECONDS" "$tokens" \
+        "${model//[$'\t\n']/_}" "${task//[$'\t\n']/_}" "${call_type//[$'\t\n']/_}" \
+        "$cache_read" "$cache_write" >> "$TOKEN_LEDGER"
+}
+
+# _fold <state> <file> <from> <to> — add today's lines between two byte
+# offsets of a ledger file to a rollup
+_fold() {
+    local state="$1" file="$2" from="$3" to="$4" midnight add count cache_read cache_write
+    if (( to <= from )); then
         echo "$state"
+        return 0
     fi
+    midnight=$(date -d "$(today_key) 00:00" +%s)
+    read -r add count cache_read cache_write < <(tail -c +$((from + 1)) "$file" | head -c $((to - from)) |
+        awk -F'\t' -v m="$midnight" '$1 >= m { u += $2; n++; r += $6; w += $7 }
+            END { print u + 0, n + 0, r + 0, w + 0 }')
+    echo "$state" | jq --argjson a "${add:-0}" --argjson n "${count:-0}" \
+        --argjson r "${cache_read:-0}" --argjson w "${cache_write:-0}" --arg ts "$(date -Iseconds)" \
+        '.used += $a | .sessions += $n | .cache_read += $r | .cache_write += $w
+         | if $n > 0 then .last_activity = $ts else . end'
+}
+
+# Fold ledger lines appended since the last rollup into today's totals.
+# Resets at midnight (new day), rotating the ledger; prints the cached state.
+rollup() {
+    (
+        flock 9
+        local state today date used sessions offset size
+        state=$(load_state)
+        today=$(today_key)
+        IFS=$'\t' read -r date used sessions offset \
+            < <(echo "$state" | jq -r '[.date // "", .used // 0, .sessions // 0, .ledger_offset // 0] | @tsv')
+        [[ "$offset" =~ ^[0-9]+$ ]] || offset=0
+        size=$(_ledger_size)
+        # Ledger removed or truncated: start over from its beginning
+        (( size < offset )) && offset=0
+
+        if [[ "$date" != "$today" ]]; then
+            state=$(fresh_state "$offset")
+            if (( size > 0 )) && mv "$TOKEN_LEDGER" "$TOKEN_LEDGER.1" 2>/dev/null; then
+                # Lines past the offset were appended after midnight (or
+                # until the rename) and still count for today
+                state=$(_fold "$state" "$TOKEN_LEDGER.1" "$offset" "$(_ledger_size "$TOKEN_LEDGER.1")")
+                offset=0
+                size=$(_ledger_size)
+            fi
+        elif (( size == offset )); then
+            echo "$state"
+            return 0
+        fi
+
+        state=$(_fold "$state" "$TOKEN_LEDGER" "$offset" "$size" | jq --argjson o "$size" '.ledger_offset = $o')
+        save_state "$state"
+        echo "$state"
+    ) 9>"$TOKEN_LOCK"
 }
 
 # ── Public API ──────────────────────────────────────────────
 
-# Record tokens used (called after each AI heartbeat)
+# Record tokens used; prints today's total
 record_usage() {
-    local tokens="${1:-0}"
-    [[ "$tokens" =~ ^[0-9]+$ ]] || tokens=0
-
-    local state
-    state=$(maybe_reset)
-    local new_used new_sessions
-    new_used=$(echo "$state" | jq -r ".used + $tokens")
-    new_sessions=$(echo "$state" | jq -r ".sessions + 1")
-
-    state=$(echo "$state" | jq --argjson u "$new_used" --argjson s "$new_sessions" \
-        '.used = $u | .sessions = $s | .last_activity = "'"$(date -Iseconds)"'"')
-    save_state "$state"
-
-    # Also update config.json for backward compat
-    local tmp="${CONFIG_FILE}.tmp.$$"
-    jq --argjson t "$new_used" '.workstation.token_usage_today = $t' "$CONFIG_FILE" > "$tmp" 2>/dev/null && mv "$tmp" "$CONFIG_FILE"
-
-    echo "$new_used"
+    append_usage "$@"
+    rollup | jq -r '.used // 0'
 }
 
 # Get remaining budget
 remaining() {
     local state budget used
-    state=$(maybe_reset)
+    state=$(rollup)
     budget=$(get_config '.agentic_config.hard_limits.daily_token_budget // 50000')
     used=$(echo "$state" | jq -r '.used // 0')
     echo $((budget - used))
@@ -97,7 +151,7 @@ check_budget() {
 # Summary string for HEARTBEAT.md injection
 budget_summary() {
     local state budget used rem pct
-    state=$(maybe_reset)
+    state=$(rollup)
     budget=$(get_config '.agentic_config.hard_limits.daily_token_budget // 50000')
     used=$(echo "$state" | jq -r '.used // 0')
     rem=$((budget - used))
@@ -122,24 +176,27 @@ budget_summary() {
 # Full JSON state
 show_state() {
     local state budget
-    state=$(maybe_reset)
+    state=$(rollup)
     budget=$(get_config '.agentic_config.hard_limits.daily_token_budget // 50000')
     echo "$state" | jq --argjson b "$budget" '. + {budget: $b, remaining: ($b - .used)}'
 }
 
 # ── CLI ─────────────────────────────────────────────────────
 
+[[ "${BASH_SOURCE[0]}" == "$0" ]] || return 0
+
 case "${1:-summary}" in
-    record)   record_usage "$2" ;;
+    record)   shift; record_usage "$@" ;;
+    rollup)   rollup ;;
     remaining) remaining ;;
     check)    check_budget ;;
     summary)  budget_summary ;;
     state)    show_state ;;
     reset)
-        save_state '{"date":"'"$(today_key)"'","used":0,"sessions":0,"last_reset":"'"$(date -Iseconds)"'"}'
+        ( flock 9; save_state "$(fresh_state "$(_ledger_size)")" ) 9>"$TOKEN_LOCK"
         echo "Token budget reset for today"
         ;;
     *)
-        echo "Usage: token-budget.sh {record <n>|remaining|check|summary|state|reset}"
+        echo "Usage: token-budget.sh {record <n> [model] [task] [call_type] [cache_read] [cache_write]|rollup|remaining|check|summary|state|reset}"
         ;;
 esac
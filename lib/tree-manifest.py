@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Incremental Merkle manifest of a watched file or directory tree.
+
+The manifest (JSON, one per trigger or watcher under state/manifests/)
+keeps every file's stat signature and content hash, and one hash per
+directory over its children's names and hashes:
+
+    {"root": PATH, "kind": "dir"|"file"|"missing", "hash": ROOT_HASH,
+     "files": {REL: [size, mtime_ns, inode, sha1]},
+     "dirs":  {REL: sha1}}
+
+A check stats the tree and re-hashes only files whose (size, mtime_ns,
+inode) changed; directory hashes are recomputed only along the paths of
+changed entries. A tree with no changes costs one stat per entry and no
+write. Files modified within RACY_SECONDS of the check are stored with a
+zero mtime so the next check hashes them again — a second write within the
+same timestamp tick would otherwise go unseen.
+
+The paths that changed (added, modified or removed, content-wise) are
+printed one per line, absolute. The first check of a tree records it and
+prints nothing.
+
+Usage:
+    tree-manifest.py check <manifest> <path> [--paths -]
+        --paths -  only re-examine the paths listed on stdin (e.g. from
+                   fs-watcher.py take) instead of walking the whole tree
+    tree-manifest.py hash <manifest>    Print the recorded root hash
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+RACY_SECONDS = 2
+CHUNK = 1 << 20
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def parent(rel):
+    return rel.rsplit("/", 1)[0] if "/" in rel else ""
+
+
+def join(root, rel):
+    return f"{root}/{rel}" if rel else root
+
+
+def load(manifest, root):
+    try:
+        with open(manifest) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("root") != root:
+        return None
+    return data
+
+
+def save(manifest, data):
+    os.makedirs(os.path.dirname(manifest) or ".", exist_ok=True)
+    tmp = f"{manifest}.tmp.{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, manifest)
+
+
+class Scan:
+    """One pass over (part of) a tree against the previous manifest."""
+
+    def __init__(self, root, old):
+        self.root = root
+        self.old_files = old["files"] if old else {}
+        self.old_dirs = old["dirs"] if old else {}
+        self.files = dict(self.old_files)
+        self.dirs = dict(self.old_dirs)
+        self.changed = set()   # content changes, relative paths
+        self.dirty = set()     # directories whose hash must be recomputed
+        self.touched = False   # anything to write back
+        self.now_ns = time.time_ns()
+
+    def visit_file(self, rel, path, st=None):
+        try:
+            st = st or os.stat(path)
+        except OSError:
+            return self.forget(rel)
+        sig = [st.st_size, st.st_mtime_ns, st.st_ino]
+        prev = self.old_files.get(rel)
+        if prev and prev[:3] == sig:
+            return
+        try:
+            digest = file_hash(path)
+        except OSError:
+            return self.forget(rel)
+        if self.now_ns - st.st_mtime_ns < RACY_SECONDS * 10**9:
+            sig[1] = 0
+        self.files[rel] = sig + [digest]
+        self.touched = True
+        if not prev or prev[3] != digest:
+            self.changed.add(rel)
+            self.mark(parent(rel))
+
+    def visit_dir(self, rel, path):
+        """Walk a directory; return the relative paths seen under it."""
+        seen = {rel}
+        if rel not in self.dirs:
+            self.dirs[rel] = ""
+            self.mark(rel)
+            if rel:
+                self.changed.add(rel)
+        stack = [(rel, path)]
+        while stack:
+            base, directory = stack.pop()
+            prefix = base + "/" if base else ""
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                sub = prefix + entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    st = None if is_dir else entry.stat()
+                except OSError:
+                    continue
+                seen.add(sub)
+                if is_dir:
+                    if sub not in self.dirs:
+                        self.dirs[sub] = ""
+                        self.changed.add(sub)
+                        self.mark(sub)
+                    stack.append((sub, entry.path))
+                else:
+                    self.visit_file(sub, entry.path, st)
+        return seen
+
+    def forget(self, rel):
+        """Drop rel and everything under it from the manifest."""
+        prefix = rel + "/" if rel else ""
+        gone = [f for f in self.files if f == rel or f.startswith(prefix)]
+        gone += [d for d in self.dirs if (d == rel or d.startswith(prefix)) and d != ""]
+        for entry in gone:
+            self.files.pop(entry, None)
+            self.dirs.pop(entry, None)
+            self.changed.add(entry)
+        if gone:
+            self.touched = True
+            self.mark(parent(rel))
+
+    def mark(self, rel):
+        """Flag rel and its ancestors for rehashing."""
+        self.touched = True
+        while True:
+            if rel in self.dirty:
+                return
+            self.dirty.add(rel)
+            if not rel:
+                return
+            rel = parent(rel)
+
+    def ensure_parents(self, rel):
+        """Record directories above rel that the manifest has not seen."""
+        rel = parent(rel)
+        while rel and rel not in self.dirs:
+            self.dirs[rel] = ""
+            self.changed.add(rel)
+            self.mark(rel)
+            rel = parent(rel)
+
+    def drop_unseen(self, rel, seen):
+        """Forget entries under directory rel that the walk did not find."""
+        if not rel and len(seen) == len(self.files) + len(self.dirs):
+            return
+        prefix = rel + "/" if rel else ""
+        for entry in [e for e in list(self.files) + list(self.dirs)
+                      if e and e.startswith(prefix) and e not in seen]:
+            self.files.pop(entry, None)
+            self.dirs.pop(entry, None)
+            self.changed.add(entry)
+            self.mark(parent(entry))
+
+    def rehash(self):
+        """Recompute dirty directory hashes, deepest first."""
+        if not self.dirty:
+            return
+        children = {d: [] for d in self.dirty if d in self.dirs}
+        for rel, entry in self.files.items():
+            if rel and parent(rel) in children:
+                children[parent(rel)].append((rel.rsplit("/", 1)[-1], rel, True))
+        for rel in self.dirs:
+            if rel and parent(rel) in children:
+                children[parent(rel)].append((rel.rsplit("/", 1)[-1] + "/", rel, False))
+        for rel in sorted(children, key=lambda d: d.count("/") + bool(d), reverse=True):
+            h = hashlib.sha1()
+            for name, sub, is_file in sorted(children[rel]):
+                digest = self.files[sub][3] if is_file else self.dirs[sub]
+                h.update(f"{name}\0{digest}\n".encode())
+            self.dirs[rel] = h.hexdigest()
+
+
+def check(manifest, root, paths=None):
+    """Bring the manifest up to date; return the changed paths (None on first check)."""
+    root = os.path.abspath(root)
+    old = load(manifest, root)
+    kind = "dir" if os.path.isdir(root) else "file" if os.path.exists(root) else "missing"
+    if old and old.get("kind") != kind:
+        # Replaced by a different kind of entry: report the root, start over
+        old_changed = {""}
+        old = None
+    else:
+        old_changed = set()
+    scan = Scan(root, old)
+
+    if kind == "missing":
+        scan.forget("")
+        scan.dirs.pop("", None)
+    elif kind == "file":
+        scan.visit_file("", root)
+    elif paths is None or old is None:
+        scan.drop_unseen("", scan.visit_dir("", root))
+    else:
+        for path in paths:
+            rel = os.path.relpath(os.path.abspath(path), root)
+            if rel == "." or rel.startswith(".."):
+                rel = "" if rel == "." else None
+            if rel is None:
+                continue
+            if os.path.isdir(path):
+                scan.ensure_parents(rel)
+                scan.drop_unseen(rel, scan.visit_dir(rel, path))
+            elif os.path.exists(path):
+                scan.ensure_parents(rel)
+                scan.visit_file(rel, path)
+            else:
+                scan.forget(rel)
+    scan.rehash()
+
+    if scan.touched or old is None:
+        digest = scan.files[""][3] if kind == "file" and "" in scan.files else scan.dirs.get("", "")
+        save(manifest, {"root": root, "kind": kind, "hash": digest,
+                        "files": scan.files, "dirs": scan.dirs})
+    if old is None and not old_changed:
+        return None
+    return sorted(scan.changed | old_changed)
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == "check":
+        paths = None
+        if args[3:5] == ["--paths", "-"]:
+            paths = [line.rstrip("\n") for line in sys.stdin if line.strip()]
+        root = os.path.abspath(args[2])
+        for rel in check(args[1], root, paths) or []:
+            print(join(root, rel))
+        return 0
+    if len(args) == 2 and args[0] == "hash":
+        try:
+            with open(args[1]) as f:
+                print(json.load(f).get("hash", ""))
+        except (OSError, ValueError):
+            return 1
+        return 0
+    sys.stderr.write(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
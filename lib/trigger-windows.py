@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Debounce and coalescing windows for event triggers.
+
+Every event for a trigger (per cooldown key, e.g. a branch) joins an open
+window in state/trigger-windows.json instead of creating a task on the
+spot. A window settles once no event has arrived for the trigger's
+debounce_seconds (or max_wait_seconds after it opened, so a steady stream
+still gets through); then it becomes one task whose description lists
+every changed path and every distinct event folded into it.
+
+A settled window fires a new task unless:
+
+    the trigger is in cooldown   its events fold into the trigger's open
+                                 task for the same key, or wait for the
+                                 cooldown to end if there is none
+    max_pending_tasks are open   its events fold into the newest open task
+
+Open tasks are the trigger's tasks nobody has started (pending or
+needs_ai_attention). A trigger with debounce_seconds 0 (the default) fires
+at once when it can, as before. The earliest time a held window settles is
+written to state/triggers.next for the daemon to wake up for.
+
+Prints decisions as JSON: {"action": "fire", "trigger", "key", "event",
+"coalesced"} for the caller to turn into a task, {"action": "merge", ...,
+"task"} when the events were folded into an existing task, or
+{"action": "hold", ..., "events", "due"}.
+
+Usage:
+    trigger-windows.py add <trigger> <key> <event> [--paths -]
+        Record an event (changed paths on stdin with --paths -) and print
+        the decision for its window
+    trigger-windows.py due     Print decisions for every window that settled
+    trigger-windows.py list    Print the open windows
+"""
+
+import fcntl
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+AUTONOMY_DIR = os.environ.get("AUTONOMY_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATE_DIR = f"{AUTONOMY_DIR}/state"
+TASKS_DIR = f"{AUTONOMY_DIR}/tasks"
+TRIGGERS_FILE = f"{STATE_DIR}/triggers.json"
+STATE_FILE = f"{STATE_DIR}/trigger-windows.json"
+NEXT_FILE = f"{STATE_DIR}/triggers.next"
+LOCK_FILE = f"{STATE_DIR}/.trigger-windows.lock"
+TASK_LOCKS_DIR = f"{STATE_DIR}/task-locks"
+
+DEFAULT_COOLDOWN = 300
+DEFAULT_MAX_PENDING = 3
+OPEN_STATUSES = ("pending", "needs_ai_attention")
+MAX_PATHS = 500      # paths kept per window; the rest are only counted
+MAX_NOTES = 20       # distinct event texts kept per window
+LISTED_PATHS = 10    # paths spelled out in a task description
+LISTED_NOTES = 5     # event texts spelled out in a task description
+
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path, data):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def epoch(stamp):
+    try:
+        return datetime.fromisoformat(str(stamp).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0
+
+
+# ── Aggregation ──────────────────────────────────────────────
+
+def empty(key):
+    return {"key": key, "events": 0, "first": None, "last": None,
+            "notes": [], "more_notes": 0, "paths": [], "more_paths": 0}
+
+
+def fold(agg, events, first, last, notes, paths, more_notes=0, more_paths=0):
+    """Fold events (with their notes and paths) into an aggregate."""
+    agg["events"] += events
+    agg["first"] = min(t for t in (agg["first"], first) if t is not None)
+    agg["last"] = max(t for t in (agg["last"], last) if t is not None)
+    for note in notes:
+        if note and note not in agg["notes"]:
+            agg["notes"].append(note)
+    if len(agg["notes"]) > MAX_NOTES:
+        agg["more_notes"] += len(agg["notes"]) - MAX_NOTES
+        agg["notes"] = agg["notes"][-MAX_NOTES:]
+    agg["more_notes"] += more_notes
+    seen = set(agg["paths"])
+    for path in paths:
+        if path in seen:
+            continue
+        if len(agg["paths"]) >= MAX_PATHS:
+            agg["more_paths"] += 1
+            continue
+        seen.add(path)
+        agg["paths"].append(path)
+    agg["more_paths"] += more_paths
+    return agg
+
+
+def render(agg):
+    """The event text of a task description for an aggregate."""
+    notes = agg["notes"][-LISTED_NOTES:]
+    earlier = agg["more_notes"] + len(agg["notes"]) - len(notes)
+    text = "; ".join(notes)
+    if earlier:
+        text = f"{text}; +{earlier} earlier"
+    total = len(agg["paths"]) + agg["more_paths"]
+    if total:
+        listed = ", ".join(agg["paths"][:LISTED_PATHS])
+        text = f"{text} ({total} path{'s' if total != 1 else ''}: {listed}{', ...' if total > LISTED_PATHS else ''})"
+    if agg["events"] > 1:
+        span = int(agg["last"] - agg["first"])
+        text = f"{text} [{agg['events']} events coalesced over {span}s]"
+    return text
+
+
+# ── Decisions ────────────────────────────────────────────────
+
+def task_prefix(trigger):
+    """Task ids event-triggers.sh gives this trigger's tasks start with this."""
+    return re.sub(r"[^a-z0-9-]", "-", f"trigger-{trigger}-".lower())[:60]
+
+
+def open_tasks(trigger):
+    """The trigger's tasks nobody has started yet, oldest first."""
+    prefix = task_prefix(trigger)
+    found = []
+    try:
+        names = os.listdir(TASKS_DIR)
+    except OSError:
+        return found
+    for name in names:
+        if not name.startswith(prefix) or not name.endswith(".json"):
+            continue
+        task = read_json(os.path.join(TASKS_DIR, name), None)
+        if (isinstance(task, dict) and task.get("source") == f"trigger:{trigger}"
+                and task.get("status") in OPEN_STATUSES):
+            found.append(task)
+    return sorted(found, key=lambda t: (t.get("created_at") or "", t.get("id") or ""))
+
+
+def merge_into(task_id, trigger, window):
+    """Fold a window into an open task and rewrite its description.
+
+    The task is re-read under its lock (the one the executor takes to
+    claim it), so a task started since open_tasks() looked is left alone;
+    returns False then.
+    """
+    path = os.path.join(TASKS_DIR, f"{task_id}.json")
+    os.makedirs(TASK_LOCKS_DIR, exist_ok=True)
+    with open(os.path.join(TASK_LOCKS_DIR, f"{task_id}.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        task = read_json(path, None)
+        if not (isinstance(task, dict) and task.get("status") in OPEN_STATUSES
+                and isinstance(task.get("coalesced"), dict)):
+            return False
+        agg = task["coalesced"]
+        fold(agg, window["events"], window["first"], window["last"], window["notes"], window["paths"],
+             window["more_notes"], window["more_paths"])
+        task["description"] = f"{trigger.get('task_template', '')} (Event: {render(agg)})"
+        task["updated_at"] = datetime.now().astimezone().isoformat(timespec="seconds")
+        write_json(path, task)
+    return True
+
+
+def decide(window, trigger, now):
+    """Fire, merge or hold a window; merges are applied here."""
+    name, key = trigger["name"], window["key"]
+    debounce = float(trigger.get("debounce_seconds") or 0)
+    max_wait = float(trigger.get("max_wait_seconds") or max(60, 10 * debounce))
+    base = {"trigger": name, "key": key}
+
+    settles = min(window["last"] + debounce, window["first"] + max_wait)
+    if now < settles:
+        return dict(base, action="hold", events=window["events"], due=int(settles) + 1)
+
+    last_fired = (trigger.get("cooldowns") or {}).get(key) if key else trigger.get("last_fired")
+    cooldown_until = epoch(last_fired) + float(trigger.get("cooldown_seconds", DEFAULT_COOLDOWN)) \
+        if last_fired else 0
+    tasks = open_tasks(name)
+    # Only tasks created from a window carry the aggregate to fold into
+    mergeable = [t for t in tasks if isinstance(t.get("coalesced"), dict)]
+    same_key = [t for t in mergeable if t["coalesced"].get("key", "") == key]
+
+    if now < cooldown_until:
+        if not same_key:
+            return dict(base, action="hold", events=window["events"], due=int(cooldown_until) + 1)
+        target = same_key[-1]
+    elif mergeable and len(tasks) >= int(trigger.get("max_pending_tasks", DEFAULT_MAX_PENDING)):
+        target = (same_key or mergeable)[-1]
+    else:
+        return dict(base, action="fire", event=render(window),
+                    coalesced={k: window[k] for k in empty(key)})
+
+    if not merge_into(target["id"], trigger, window):
+        # Started meanwhile: decide again without it
+        return decide(window, trigger, now)
+    return dict(base, action="merge", task=target["id"], events=window["events"])
+
+
+class Windows:
+    def __init__(self):
+        self.windows = read_json(STATE_FILE, {}).get("windows", {})
+        triggers = read_json(TRIGGERS_FILE, {}).get("triggers", [])
+        self.triggers = {t.get("name"): t for t in triggers if t.get("enabled") is not False}
+
+    def save(self):
+        write_json(STATE_FILE, {"windows": self.windows})
+        due = [w["due"] for w in self.windows.values() if w.get("due")]
+        if due:
+            with open(f"{NEXT_FILE}.tmp", "w") as f:
+                f.write(f"{min(due)}\n")
+            os.replace(f"{NEXT_FILE}.tmp", NEXT_FILE)
+        elif os.path.exists(NEXT_FILE):
+            os.unlink(NEXT_FILE)
+
+    def settle(self, wid, now):
+        window = self.windows[wid]
+        trigger = self.triggers.get(window["trigger"])
+        if trigger is None:
+            del self.windows[wid]
+            return None
+        decision = decide(window, trigger, now)
+        if decision["action"] == "hold":
+            window["due"] = decision["due"]
+        else:
+            del self.windows[wid]
+        return decision
+
+    def add(self, name, key, note, paths, now):
+        wid = f"{name}\t{key}"
+        window = self.windows.get(wid) or dict(empty(key), trigger=name)
+        self.windows[wid] = fold(window, 1, now, now, [note], paths)
+        return self.settle(wid, now)
+
+    def due(self, now):
+        return [d for d in (self.settle(wid, now) for wid, w in list(self.windows.items())
+                            if not w.get("due") or w["due"] <= now)
+                if d and d["action"] != "hold"]
+
+
+def locked(fn):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return fn()
+
+
+def main():
+    args = sys.argv[1:]
+    now = time.time()
+
+    if len(args) >= 4 and args[0] == "add":
+        paths = []
+        if args[4:6] == ["--paths", "-"]:
+            paths = [line.rstrip("\n") for line in sys.stdin if line.strip()]
+
+        def run():
+            w = Windows()
+            if args[1] not in w.triggers:
+                return {"trigger": args[1], "key": args[2], "action": "none"}
+            decision = w.add(args[1], args[2], args[3], paths, now)
+            w.save()
+            return decision
+        print(json.dumps(locked(run)))
+        return 0
+
+    if args == ["due"]:
+        def run():
+            w = Windows()
+            if not w.windows:
+                return []
+            decisions = w.due(now)
+            w.save()
+            return decisions
+        print(json.dumps(locked(run)))
+        return 0
+
+    if args == ["list"]:
+        windows = read_json(STATE_FILE, {}).get("windows", {})
+        print(json.dumps([dict(w, event=render(w)) for w in windows.values()], indent=2))
+        return 0
+
+    sys.stderr.write(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,7 @@ CONFIG_FILE="$AUTONOMY_DIR/config.json"
 TASKS_DIR="$AUTONOMY_DIR/tasks"
 STATE_DIR="$AUTONOMY_DIR/state"
 VDD_LOG="$AUTONOMY_DIR/logs/verification.log"
+VDD_METRICS="$AUTONOMY_DIR/logs/verification-metrics.jsonl"
 
 mkdir -p "$STATE_DIR" "$AUTONOMY_DIR/logs"
 
@@ -55,7 +56,7 @@ Example: [\"File config.json exists and is valid JSON\", \"Running 'npm test' pa
 Return ONLY valid JSON."
 
         local ai_result
-        ai_result=$(bash "$AUTONOMY_DIR/lib/ai-engine.sh" call "Generate verification criteria" "$prompt" 2>/dev/null)
+        ai_result=$(AI_CALL_TYPE=criteria bash "$AUTONOMY_DIR/lib/ai-engine.sh" call "Generate verification criteria" "$prompt" 2>/dev/null)
 
         if [[ -n "$ai_result" ]]; then
             # Extract JSON array
@@ -139,9 +140,112 @@ generate_heuristic_criteria() {
 
 # ── Run Verification ───────────────────────────────────────
 
+# Verification mode: batch (one request for all criteria), parallel
+# (one request per criterion, bounded concurrency) or serial
+_vdd_mode() {
+    local mode
+    mode=$(jq -r '.verification.mode // "batch"' "$CONFIG_FILE" 2>/dev/null)
+    case "$mode" in
+        batch|parallel|serial) echo "$mode" ;;
+        *) echo "batch" ;;
+    esac
+}
+
+_vdd_max_parallel() {
+    local n
+    n=$(jq -r '.verification.max_parallel // 4' "$CONFIG_FILE" 2>/dev/null)
+    [[ "$n" =~ ^[1-9][0-9]*$ ]] || n=4
+    echo "$n"
+}
+
+_vdd_now_ms() {
+    echo $(( $(date +%s%N) / 1000000 ))
+}
+
+# Ask the AI about a single criterion; prints its "PASS — reason" answer
+_vdd_check_one() {
+    local criterion="$1" task_name="$2"
+
+    local check_prompt="Verify this criterion for the task. Check if it's met.
+Criterion: $criterion
+Task: $task_name
+
+Respond with ONLY: PASS or FAIL followed by a one-line explanation.
+Example: PASS — All tests pass with 0 failures"
+
+    AI_CALL_TYPE=verify AI_PRIORITY=background bash "$AUTONOMY_DIR/lib/ai-engine.sh" call "Verify criterion" "$check_prompt" 2>/dev/null
+}
+
+# Check the given criterion indices with one request each, at most
+# max_jobs at a time. Prints a JSON array of answers aligned with criteria
+# ("" for indices not checked).
+_vdd_check_parallel() {
+    local criteria="$1" task_name="$2" max_jobs="$3"
+    shift 3
+
+    local tmpdir
+    tmpdir=$(mktemp -d)
+    local i running=0
+    for i in "$@"; do
+        if (( running >= max_jobs )); then
+            wait -n
+            running=$((running - 1))
+        fi
+        _vdd_check_one "$(echo "$criteria" | jq -r ".[$i]")" "$task_name" > "$tmpdir/$i" &
+        running=$((running + 1))
+    done
+    wait
+
+    local count answers="[]"
+    count=$(echo "$criteria" | jq 'length')
+    for ((i = 0; i < count; i++)); do
+        answers=$(echo "$answers" | jq --arg a "$(cat "$tmpdir/$i" 2>/dev/null)" '. + [$a]')
+    done
+    rm -rf "$tmpdir"
+    echo "$answers"
+}
+
+# Check all criteria in one structured request. Prints a JSON array of
+# answers aligned with criteria; criteria the response skipped are "".
+_vdd_check_batch() {
+    local criteria="$1" task_name="$2"
+
+    local count numbered
+    count=$(echo "$criteria" | jq 'length')
+    numbered=$(echo "$criteria" | jq -r 'to_entries | map("\(.key + 1). \(.value)") | join("\n")')
+
+    local check_prompt="Verify each criterion for the task. Check if each one is met.
+Task: $task_name
+
+Criteria:
+$numbered
+
+Respond with ONLY a JSON array holding one object per criterion, in order:
+[{\"id\": 1, \"result\": \"PASS\", \"explanation\": \"All tests pass with 0 failures\"}]
+result must be PASS or FAIL; explanation is one line."
+
+    local raw extracted
+    raw=$(AI_CALL_TYPE=verify AI_PRIORITY=background AI_STOP_ON_JSON=1 bash "$AUTONOMY_DIR/lib/ai-engine.sh" call \
+        "Verify criteria" "$check_prompt" "$((256 + count * 80))" 2>/dev/null)
+    extracted=$(echo "$raw" | tr '\n' ' ' | grep -o '\[.*\]' | head -1)
+
+    if ! echo "$extracted" | jq -e 'type == "array"' >/dev/null 2>&1; then
+        jq -n --argjson n "$count" '[range(0; $n) | ""]'
+        return
+    fi
+
+    echo "$extracted" | jq --argjson n "$count" '
+        [range(0; $n) as $i
+         | (map(select(type == "object" and ((.id | tostring) == (($i + 1) | tostring)))) | first) as $r
+         | if $r and (($r.result // "") | ascii_upcase | test("^(PASS|FAIL)"))
+           then "\($r.result | ascii_upcase) — \($r.explanation // "")"
+           else "" end]'
+}
+
 # Verify a task against its criteria
 verify_task() {
     local task_id="$1"
+    local mode="${2:-$(_vdd_mode)}"
     local task_file="$TASKS_DIR/${task_id}.json"
 
     [[ -f "$task_file" ]] || { echo "Task not found: $task_id"; return 1; }
@@ -156,37 +260,60 @@ verify_task() {
         return 1
     fi
 
-    _vdd_log INFO "Verifying task $task_id against $count criteria"
+    _vdd_log INFO "Verifying task $task_id against $count criteria ($mode)"
+
+    local task_name started usage_file
+    task_name=$(jq -r '.name' "$task_file")
+    started=$(_vdd_now_ms)
+    usage_file=$(mktemp)
+
+    # Collect one "PASS/FAIL — reason" answer per criterion
+    local answers
+    answers=$(jq -n --argjson n "$count" '[range(0; $n) | ""]')
+    if [[ -f "$AUTONOMY_DIR/lib/ai-engine.sh" ]]; then
+        export AI_USAGE_FILE="$usage_file"
+        case "$mode" in
+            batch)
+                answers=$(_vdd_check_batch "$criteria" "$task_name")
+                # Fall back to single checks for anything the batch answer skipped
+                local missing
+                missing=$(echo "$answers" | jq -r 'to_entries[] | select(.value == "") | .key' | tr '\n' ' ')
+                if [[ -n "$missing" ]]; then
+                    _vdd_log WARN "Batch verification missed criteria [$missing]; checking them individually"
+                    local retried
+                    # shellcheck disable=SC2086
+                    retried=$(_vdd_check_parallel "$criteria" "$task_name" "$(_vdd_max_parallel)" $missing)
+                    answers=$(jq -n --argjson a "$answers" --argjson b "$retried" \
+                        '[range(0; $a | length) as $i | if $a[$i] == "" then $b[$i] else $a[$i] end]')
+                fi
+                ;;
+            parallel)
+                answers=$(_vdd_check_parallel "$criteria" "$task_name" "$(_vdd_max_parallel)" $(seq 0 $((count - 1))))
+                ;;
+            *)
+                answers=$(_vdd_check_parallel "$criteria" "$task_name" 1 $(seq 0 $((count - 1))))
+                ;;
+        esac
+        unset AI_USAGE_FILE
+    fi
 
     local results="[]"
     local all_passed=true
 
     for ((i = 0; i < count; i++)); do
-        local criterion
+        local criterion check_result
         criterion=$(echo "$criteria" | jq -r ".[$i]")
+        check_result=$(echo "$answers" | jq -r ".[$i] // \"\"")
 
-        # Ask AI to verify this criterion
         local passed=true
         local evidence="Manual check required"
 
-        if [[ -f "$AUTONOMY_DIR/lib/ai-engine.sh" ]]; then
-            local check_prompt="Verify this criterion for the task. Check if it's met.
-Criterion: $criterion
-Task: $(jq -r '.name' "$task_file")
-
-Respond with ONLY: PASS or FAIL followed by a one-line explanation.
-Example: PASS — All tests pass with 0 failures"
-
-            local check_result
-            check_result=$(bash "$AUTONOMY_DIR/lib/ai-engine.sh" call "Verify criterion" "$check_prompt" 2>/dev/null)
-
-            if echo "$check_result" | grep -qi '^FAIL'; then
-                passed=false
-                all_passed=false
-                evidence="$check_result"
-            elif echo "$check_result" | grep -qi '^PASS'; then
-                evidence="$check_result"
-            fi
+        if echo "$check_result" | grep -qi '^FAIL'; then
+            passed=false
+            all_passed=false
+            evidence="$check_result"
+        elif echo "$check_result" | grep -qi '^PASS'; then
+            evidence="$check_result"
         fi
 
         results=$(echo "$results" | jq \
@@ -196,17 +323,37 @@ Example: PASS — All tests pass with 0 failures"
             '. + [{"criterion": $criterion, "passed": $passed, "evidence": $evidence}]')
     done
 
-    # Update task with verification results
+    # Time and tokens spent, so verification modes can be compared
+    local duration_ms calls input_tokens output_tokens
+    duration_ms=$(( $(_vdd_now_ms) - started ))
+    read -r calls input_tokens output_tokens < <(awk '{c++; i+=$1; o+=$2} END {print c+0, i+0, o+0}' "$usage_file")
+    rm -f "$usage_file"
+
     local passed_count
     passed_count=$(echo "$results" | jq '[.[] | select(.passed == true)] | length')
 
+    local metrics
+    metrics=$(jq -n \
+        --arg mode "$mode" \
+        --argjson criteria "$count" \
+        --argjson passed "$passed_count" \
+        --argjson ms "$duration_ms" \
+        --argjson calls "$calls" \
+        --argjson in_tok "$input_tokens" \
+        --argjson out_tok "$output_tokens" \
+        '{mode:$mode, criteria:$criteria, passed:$passed, duration_ms:$ms, calls:$calls,
+          input_tokens:$in_tok, output_tokens:$out_tok, total_tokens:($in_tok+$out_tok)}')
+    echo "$metrics" | jq --arg ts "$(date -Iseconds)" --arg task "$task_id" \
+        '{timestamp:$ts, task:$task} + .' >> "$VDD_METRICS" 2>/dev/null
+
+    # Update task with verification results
     local tmp="${task_file}.tmp.$$"
     jq --argjson vr "$results" --arg vs "$(if [[ "$all_passed" == "true" ]]; then echo "passed"; else echo "failed"; fi)" \
-        --arg vt "$(date -Iseconds)" \
-        '.verification_results = $vr | .verification_status = $vs | .verified_at = $vt' \
+        --arg vt "$(date -Iseconds)" --argjson vm "$metrics" \
+        '.verification_results = $vr | .verification_status = $vs | .verified_at = $vt | .verification_metrics = $vm' \
         "$task_file" > "$tmp" && mv "$tmp" "$task_file"
 
-    _vdd_log INFO "Verification of $task_id: $passed_count/$count passed"
+    _vdd_log INFO "Verification of $task_id: $passed_count/$count passed ($mode, ${duration_ms}ms, $calls calls, $((input_tokens + output_tokens)) tokens)"
 
     if [[ "$all_passed" == "true" ]]; then
         echo "VERIFIED: All $count criteria passed for $task_id"
@@ -217,6 +364,21 @@ Example: PASS — All tests pass with 0 failures"
     fi
 }
 
+# Compare verification modes: runs, mean time and tokens per criterion
+vdd_metrics() {
+    [[ -f "$VDD_METRICS" ]] || { echo '{}'; return 0; }
+    jq -s 'group_by(.mode) | map({
+        key: .[0].mode,
+        value: {
+            runs: length,
+            avg_duration_ms: ((map(.duration_ms) | add) / length | floor),
+            avg_calls: ((map(.calls) | add) / length * 10 | round / 10),
+            avg_tokens: ((map(.total_tokens) | add) / length | floor),
+            tokens_per_criterion: ((map(.total_tokens) | add) / ([(map(.criteria) | add), 1] | max) | floor)
+        }
+    }) | from_entries' "$VDD_METRICS"
+}
+
 # ── Generate Verification Sub-Tasks ────────────────────────
 
 # Create sub-tasks for each unverified criterion
@@ -278,17 +440,19 @@ vdd_status() {
 
 case "${1:-}" in
     ensure)        shift; ensure_verification "$1" ;;
-    verify)        shift; verify_task "$1" ;;
+    verify)        shift; verify_task "$@" ;;
     fix_subtasks)  shift; create_verification_subtasks "$1" ;;
     status)        vdd_status ;;
+    metrics)       vdd_metrics ;;
     *)
         echo "Verification-Driven Development"
         echo "Usage: $0 <command> [args...]"
         echo ""
         echo "Commands:"
         echo "  ensure <task_id>       Generate verification criteria for a task"
-        echo "  verify <task_id>       Run verification against criteria"
+        echo "  verify <task_id> [mode] Run verification against criteria (batch|parallel|serial)"
         echo "  fix_subtasks <task_id> Create sub-tasks for failed verifications"
         echo "  status                 Verification status across all tasks"
+        echo "  metrics                Time and tokens per verification mode"
         ;;
 esac
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Mock AI provider for tests.
+
+Answers Anthropic (/v1/messages) and OpenAI-compatible (/v1/chat/completions)
+requests by echoing the last user message, with usage fields filled in.
+With "stream": true the reply is sent as SSE in small chunks; a prompt
+starting with "plan:" is answered with a JSON step array followed by a
+long tail, so tests can check that readers hang up early; a prompt
+containing "mock-plan:[...]" is answered with that JSON array. Verification
+prompts get PASS/FAIL verdicts (FAIL for criteria mentioning "broken").
+A prompt "flaky:<n>:..." is answered 429 (retry-after: 0) the first n
+times it is seen. Paths under /slow/ answer after 5s and paths under
+/down/ always answer 503, for failover and hedging tests. Anthropic system
+blocks marked with cache_control are treated as a prompt cache: the
+first request writes the prefix (cache_creation_input_tokens) and later
+ones read it (cache_read_input_tokens), at ~4 characters per token.
+GET /stats reports how many requests and TCP connections carrying them it
+has seen, so tests can tell pooled keep-alive traffic from one connection
+per call.
+
+Usage: mock_provider.py <port>
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+STATS = {"requests": 0, "connections": 0, "chunks_sent": 0, "rate_limited": 0}
+SEEN = {}
+PROMPT_CACHE = set()
+LOCK = threading.Lock()
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args): pass
+
+    def handle(self):
+        # Hedging tests hang up on slow requests; that is expected
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_json(self, data, status=200):
+        out = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with LOCK:
+                self.send_json(dict(STATS))
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with LOCK:
+            STATS["requests"] += 1
+            if not getattr(self, "counted", False):
+                STATS["connections"] += 1
+                self.counted = True
+        if self.path.startswith("/down/"):
+            self.send_json({"error": {"type": "overloaded_error"}}, 503)
+            return
+        if self.path.startswith("/slow/"):
+            time.sleep(5)
+
+        messages = body.get("messages", [])
+        content = messages[-1]["content"] if messages else ""
+        if isinstance(content, str) and content.startswith("flaky:"):
+            with LOCK:
+                SEEN[content] = SEEN.get(content, 0) + 1
+                limited = SEEN[content] <= int(content.split(":")[1])
+                if limited:
+                    STATS["rate_limited"] += 1
+            if limited:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", "application/json")
+                out = b'{"error": {"type": "rate_limit_error"}}'
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+                return
+        text = "echo:" + (content if isinstance(content, str) else json.dumps(content))
+        plan = re.search(r"mock-plan:(\[.*\])", content) if isinstance(content, str) else None
+        if plan:
+            text = plan.group(1)
+        elif isinstance(content, str) and content.startswith("plan:"):
+            text = '[{"action": "a", "commands": ["true"], "verify": "true"}] ' + "trailing words " * 200
+        elif isinstance(content, str) and content.startswith(("Verify this criterion", "Verify each criterion")):
+            text = self.verdicts(content)
+
+        if body.get("stream"):
+            self.send_stream(text, anthropic=self.path.endswith("/messages"), usage=self.anthropic_usage(body))
+            return
+
+        if self.path.endswith("/messages"):
+            self.send_json({
+                "content": [{"type": "text", "text": text}],
+                "usage": dict(self.anthropic_usage(body), output_tokens=5),
+            })
+        else:
+            self.send_json({
+                "choices": [{"message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+            })
+
+    @staticmethod
+    def anthropic_usage(body):
+        usage = {"input_tokens": 10}
+        system = body.get("system")
+        if not isinstance(system, list):
+            return usage
+        marked = [i for i, block in enumerate(system) if block.get("cache_control")]
+        if not marked:
+            return usage
+        prefix = "".join(block.get("text", "") for block in system[:marked[-1] + 1])
+        with LOCK:
+            hit = prefix in PROMPT_CACHE
+            PROMPT_CACHE.add(prefix)
+        usage["cache_read_input_tokens"] = len(prefix) // 4 if hit else 0
+        usage["cache_creation_input_tokens"] = 0 if hit else len(prefix) // 4
+        return usage
+
+    @staticmethod
+    def verdicts(prompt):
+        def verdict(criterion):
+            return "FAIL" if "broken" in criterion else "PASS"
+
+        if prompt.startswith("Verify this criterion"):
+            criterion = prompt.split("Criterion:", 1)[1].split("\n", 1)[0]
+            return f"{verdict(criterion)} — mock check"
+        criteria = re.findall(r"^(\d+)\. (.*)$", prompt, re.M)
+        return json.dumps([{"id": int(n), "result": verdict(c), "explanation": "mock check"}
+                           for n, c in criteria])
+
+    def send_stream(self, text, anthropic, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def emit(data, event=None):
+            frame = (f"event: {event}\n" if event else "") + f"data: {json.dumps(data) if not isinstance(data, str) else data}\n\n"
+            raw = frame.encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(raw), raw))
+            self.wfile.flush()
+
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        try:
+            if anthropic:
+                emit({"type": "message_start", "message": {"usage": usage}}, "message_start")
+            for chunk in chunks:
+                if anthropic:
+                    emit({"type": "content_block_delta", "delta": {"type": "text_delta", "text": chunk}}, "content_block_delta")
+                else:
+                    emit({"choices": [{"delta": {"content": chunk}}]})
+                with LOCK:
+                    STATS["chunks_sent"] += 1
+                time.sleep(0.005)
+            if anthropic:
+                emit({"type": "message_delta", "usage": {"output_tokens": 5}}, "message_delta")
+                emit({"type": "message_stop"}, "message_stop")
+            else:
+                emit({"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": 5}})
+                emit("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+if __name__ == "__main__":
+    Server(("127.0.0.1", int(sys.argv[1])), Handler).serve_forever()
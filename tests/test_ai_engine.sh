@@ -0,0 +1,876 @@
+#!/bin/bash
+# AI engine tests for autonomy skill
+# Tests: ai_call transport against a local mock provider
+
+# Don't use set -e here as it interferes with test assertions
+
+TEST_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+AUTONOMY_DIR="$(dirname "$TEST_DIR")"
+
+# Source utilities
+source "$TEST_DIR/test_utils.sh"
+
+# AI test state directory — a copy of lib/ so scripts resolve state here
+AI_TEST_STATE="$TEST_DIR/state/ai_test"
+MOCK_PORT=18795
+MOCK_PID=""
+
+# Keep git lookups (verification cache) inside the test copy, not this repo
+export GIT_CEILING_DIRECTORIES="$TEST_DIR/state"
+
+echo "Running AI Engine Tests"
+echo "======================="
+
+setup_ai_test() {
+    rm -rf "$AI_TEST_STATE"
+    mkdir -p "$AI_TEST_STATE/state" "$AI_TEST_STATE/logs" "$AI_TEST_STATE/tasks"
+    cp -r "$AUTONOMY_DIR/lib" "$AI_TEST_STATE/lib"
+
+    cat > "$AI_TEST_STATE/config.json" << EOF
+{
+  "ai": {
+    "provider": "anthropic",
+    "api_key": "test-key",
+    "api_url": "http://127.0.0.1:$MOCK_PORT/v1/messages",
+    "model": "mock-model"
+  },
+  "agentic_config": {
+    "hard_limits": { "daily_token_budget": 50000 }
+  }
+}
+EOF
+}
+
+start_mock_provider() {
+    python3 "$TEST_DIR/fixtures/mock_provider.py" "$MOCK_PORT" &
+    MOCK_PID=$!
+    local i
+    for i in 1 2 3 4 5 6 7 8 9 10; do
+        curl -s "http://127.0.0.1:$MOCK_PORT/stats" >/dev/null 2>&1 && return 0
+        sleep 0.2
+    done
+    return 1
+}
+
+stop_mock_provider() {
+    [[ -n "$MOCK_PID" ]] && kill "$MOCK_PID" 2>/dev/null
+    wait "$MOCK_PID" 2>/dev/null
+    MOCK_PID=""
+}
+
+ai_engine() {
+    bash "$AI_TEST_STATE/lib/ai-engine.sh" "$@"
+}
+
+mock_stat() {
+    curl -s "http://127.0.0.1:$MOCK_PORT/stats" | jq -r ".$1"
+}
+
+# ============================================================
+# Transport Tests
+# ============================================================
+
+test_ai_call_direct_curl() {
+    echo "  Testing ai_call without the resident client..."
+
+    setup_ai_test
+    local out
+    out=$(ai_engine call "sys" "hello")
+    assert_equals "echo:hello" "$out" "direct curl call returns provider text"
+}
+
+test_ai_client_reuses_connections() {
+    echo "  Testing resident AI client keep-alive pool..."
+
+    setup_ai_test
+    ai_engine client start >/dev/null
+    assert_true "$(test -S "$AI_TEST_STATE/state/ai-client.sock" && echo true || echo false)" "client socket created"
+
+    local before out
+    before=$(mock_stat connections)
+    out=$(ai_engine call "sys" "one")
+    ai_engine call "sys" "two" >/dev/null
+    ai_engine call "sys" "three" >/dev/null
+    assert_equals "echo:one" "$out" "pooled call returns provider text"
+    assert_equals "1" "$(( $(mock_stat connections) - before ))" "three calls share one upstream connection"
+    assert_equals "2" "$(ai_engine client status | jq -r '.connections_reused')" "client reports reused connections"
+
+    ai_engine client stop >/dev/null
+    assert_false "$(test -S "$AI_TEST_STATE/state/ai-client.sock" && echo true || echo false)" "client socket removed on stop"
+
+    out=$(ai_engine call "sys" "fallback")
+    assert_equals "echo:fallback" "$out" "falls back to curl when client is down"
+
+    # A crashed client leaves its socket file and pid behind
+    python3 -c "import socket, sys; socket.socket(socket.AF_UNIX).bind(sys.argv[1])" "$AI_TEST_STATE/state/ai-client.sock"
+    echo 999999 > "$AI_TEST_STATE/state/ai-client.pid"
+    before=$(mock_stat requests)
+    out=$(ai_engine call "sys" "stale")
+    assert_equals "echo:stale" "$out" "stale socket of a dead client is bypassed"
+    assert_equals "1" "$(( $(mock_stat requests) - before ))" "provider sees the call once"
+    assert_equals "false" "$(ai_engine status | jq -r '.client_running')" "status does not report a dead client as running"
+    ai_engine client start >/dev/null
+    assert_equals "true" "$(ai_engine client status | jq -r '.running')" "client restarts over a stale socket"
+    ai_engine client stop >/dev/null
+}
+
+test_ai_retries_rate_limits() {
+    echo "  Testing 429 retry with retry-after..."
+
+    setup_ai_test
+    local before out
+    before=$(mock_stat rate_limited)
+    out=$(ai_engine call "sys" "flaky:2:direct")
+    assert_equals "echo:flaky:2:direct" "$out" "direct curl retries past 429s"
+    assert_equals "2" "$(( $(mock_stat rate_limited) - before ))" "provider saw both rate-limited attempts"
+
+    # curl's own timeout leaves the request with the provider: no resend
+    local calls="$AI_TEST_STATE/curl-calls"
+    bash -c "source '$AI_TEST_STATE/lib/ai-engine.sh' >/dev/null
+        curl() { echo call >> '$calls'; printf '\n000'; return \${CURL_RC:-28}; }
+        _retry_delay() { echo 0; }
+        AI_RETRY_LIMIT=2 _ai_post http://127.0.0.1:1/v1/messages '{}' >/dev/null
+        CURL_RC=7 AI_RETRY_LIMIT=2 _ai_post http://127.0.0.1:1/v1/messages '{}' >/dev/null"
+    assert_equals "4" "$(wc -l < "$calls" | tr -d ' ')" "timeouts sent once, refused connections retried"
+
+    ai_engine client start >/dev/null
+    out=$(ai_engine call "sys" "flaky:2:pooled")
+    assert_equals "echo:flaky:2:pooled" "$out" "client retries past 429s"
+    local sched
+    sched=$(ai_engine client status | jq -c '.scheduler | {retries, rate_limited, lanes: (.queue_depth | keys)}')
+    assert_equals '{"retries":2,"rate_limited":2,"lanes":["background","interactive","normal"]}' "$sched" \
+        "client exposes retry and queue metrics"
+    ai_engine client stop >/dev/null
+}
+
+test_ai_scheduler_priority_lanes() {
+    echo "  Testing scheduler priority lanes and token rate..."
+
+    local order
+    order=$(python3 - "$AI_TEST_STATE/lib/ai-client.py" << 'EOF'
+import importlib.util, sys, threading, time
+spec = importlib.util.spec_from_file_location("ai_client", sys.argv[1])
+mod = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mod)
+
+sched = mod.Scheduler(max_concurrent=1)
+held = sched.acquire("api", "normal", 10)
+order = []
+
+def worker(lane):
+    ticket = sched.acquire("api", lane, 10)
+    order.append(lane)
+    sched.release(ticket)
+
+threads = []
+for lane in ("background", "normal", "interactive"):
+    t = threading.Thread(target=worker, args=(lane,))
+    t.start()
+    threads.append(t)
+    time.sleep(0.05)
+depth = sum(sched.snapshot()["queue_depth"].values())
+sched.release(held)
+for t in threads:
+    t.join()
+
+limited = mod.Scheduler(max_concurrent=4, tokens_per_minute=100)
+limited.acquire("api", "normal", 80)
+try:
+    limited.acquire("api", "normal", 80, timeout=0.2)
+    rate = "admitted"
+except mod.QueueTimeout:
+    rate = "held"
+print(",".join(order), depth, rate)
+EOF
+)
+    assert_equals "interactive,normal,background 3 held" "$order" "waiters served by lane; token rate holds excess"
+}
+
+# ============================================================
+# Provider Failover Tests
+# ============================================================
+
+set_providers() {
+    jq --argjson p "$1" '.ai.providers = $p' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" \
+        && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+}
+
+last_ai_log() {
+    jq -s -c ".[-1] | $1" "$AI_TEST_STATE/logs/ai-engine.jsonl"
+}
+
+test_ai_provider_failover() {
+    echo "  Testing provider failover and health ordering..."
+
+    setup_ai_test
+    local base="http://127.0.0.1:$MOCK_PORT"
+    set_providers "[{\"name\": \"down\", \"provider\": \"anthropic\", \"api_url\": \"$base/down/v1/messages\"},
+                    {\"name\": \"backup\", \"provider\": \"openai\", \"api_url\": \"$base/v1/chat/completions\"}]"
+
+    local out
+    out=$(ai_engine call "sys" "failover")
+    assert_equals "echo:failover" "$out" "request fails over to the next endpoint"
+    assert_equals '{"endpoint":"backup","attempts":2}' "$(last_ai_log '{endpoint, attempts}')" "AI log records serving endpoint"
+
+    ai_engine call "sys" "again" >/dev/null
+    assert_equals '{"endpoint":"backup","attempts":1}' "$(last_ai_log '{endpoint, attempts}')" "healthy endpoint is tried first"
+
+    local now
+    now=$(date +%s)
+    echo "$now down fail 5 default" >> "$AI_TEST_STATE/state/ai-health.log"
+    echo "$now down fail 5 default" >> "$AI_TEST_STATE/state/ai-health.log"
+    assert_equals '[{"name":"backup","cooldown":false},{"name":"down","cooldown":true}]' \
+        "$(ai_engine status | jq -c '[.endpoints[] | {name, cooldown}]')" "repeated failures put an endpoint in cooldown"
+}
+
+test_ai_hedged_request() {
+    echo "  Testing hedged requests..."
+
+    setup_ai_test
+    local base="http://127.0.0.1:$MOCK_PORT"
+    set_providers "[{\"name\": \"slow\", \"provider\": \"anthropic\", \"api_url\": \"$base/slow/v1/messages\"},
+                    {\"name\": \"fast\", \"provider\": \"anthropic\", \"api_url\": \"$base/v1/messages\"}]"
+    jq '.ai.hedge = {enabled: true, min_delay_ms: 100}' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" \
+        && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+
+    # History: the slow endpoint usually answers in ~150ms
+    local now i
+    now=$(date +%s)
+    for i in 1 2 3 4 5 6; do echo "$now slow ok 150 default"; done > "$AI_TEST_STATE/state/ai-health.log"
+
+    # The resident client cannot cancel a relayed request: legs go direct
+    ai_engine client start >/dev/null
+    local started out elapsed
+    started=$(date +%s%N)
+    out=$(ai_engine call "sys" "hedge me")
+    elapsed=$(( ($(date +%s%N) - started) / 1000000 ))
+    assert_equals "echo:hedge me" "$out" "hedged call returns the first answer"
+    assert_equals '{"endpoint":"fast","hedged":true}' "$(last_ai_log '{endpoint, hedged: .hedge.hedged}')" "hedge sent after p95 delay"
+    assert_true "$( (( elapsed < 4000 )) && echo true || echo false)" "slow endpoint did not hold the call (${elapsed}ms)"
+    assert_equals "0" "$(ai_engine client status | jq -r '.requests')" "hedge legs bypass the resident client"
+    assert_equals "2" "$(wc -l < "$AI_TEST_STATE/state/token-ledger.log" | tr -d ' ')" "cancelled leg is charged too"
+    ai_engine client stop >/dev/null
+
+    jq '.agentic_config.hard_limits.daily_token_budget = 0' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" \
+        && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+    for i in 1 2 3 4 5 6; do echo "$now slow ok 150 default"; done >> "$AI_TEST_STATE/state/ai-health.log"
+    for i in 1 2 3 4 5 6; do echo "$now fast ok 150 default"; done >> "$AI_TEST_STATE/state/ai-health.log"
+    ai_engine call "sys" "no budget" >/dev/null
+    assert_equals "null" "$(last_ai_log '.hedge')" "no hedge when the budget cannot cover it"
+}
+
+# ============================================================
+# Response Cache Tests
+# ============================================================
+
+test_ai_cache_hit_and_opt_out() {
+    echo "  Testing content-addressed response cache..."
+
+    setup_ai_test
+    jq '.ai.cache = {enabled: true, max_entries: 2}' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" \
+        && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+
+    local before out
+    before=$(mock_stat requests)
+    ai_engine call "sys" "cached prompt" >/dev/null
+    out=$(AI_CALL_TYPE=analyze ai_engine call "sys" "cached prompt")
+    assert_equals "echo:cached prompt" "$out" "cache hit returns stored response"
+    assert_equals "1" "$(( $(mock_stat requests) - before ))" "identical prompt reaches provider once"
+
+    before=$(mock_stat requests)
+    AI_NO_CACHE=1 ai_engine call "sys" "cached prompt" >/dev/null
+    assert_equals "1" "$(( $(mock_stat requests) - before ))" "AI_NO_CACHE bypasses the cache"
+
+    local stats
+    stats=$(ai_engine status | jq -c '.cache | {hits, misses, tokens_saved}')
+    assert_equals '{"hits":1,"misses":1,"tokens_saved":15}' "$stats" "status exposes cache counters"
+
+    ai_engine call "sys" "second" >/dev/null
+    ai_engine call "sys" "third" >/dev/null
+    assert_equals "2" "$(ai_engine cache stats | jq -r '.entries')" "LRU eviction honours max_entries"
+}
+
+test_ai_cache_verdicts_follow_workspace() {
+    echo "  Testing cached verdicts are keyed on workspace content..."
+
+    setup_ai_test
+    jq '.ai.cache = {enabled: true}' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" \
+        && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+    git -C "$AI_TEST_STATE" init -q
+    echo "v1" > "$AI_TEST_STATE/src.txt"
+
+    local before
+    before=$(mock_stat requests)
+    AI_CALL_TYPE=verify ai_engine call "sys" "is it done?" >/dev/null
+    AI_CALL_TYPE=verify ai_engine call "sys" "is it done?" >/dev/null
+    assert_equals "1" "$(( $(mock_stat requests) - before ))" "unchanged workspace reuses the verdict"
+
+    echo "v2" > "$AI_TEST_STATE/src.txt"
+    AI_CALL_TYPE=verify ai_engine call "sys" "is it done?" >/dev/null
+    assert_equals "2" "$(( $(mock_stat requests) - before ))" "workspace change re-asks the provider"
+}
+
+# ============================================================
+# Streaming Tests
+# ============================================================
+
+test_ai_prompt_prefix_cache() {
+    echo "  Testing prompt-prefix caching..."
+
+    setup_ai_test
+    jq '.ai.prompt_cache = {min_tokens: 50}' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" \
+        && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+    local prefix
+    prefix="Stable instructions $(printf 'workspace memory limits %.0s' {1..20})"
+
+    ai_engine call "$prefix" "first task" >/dev/null
+    assert_equals '{"r":0,"w":125,"t":140}' "$(last_ai_log '{r: .cache_read_tokens, w: .cache_write_tokens, t: .total}')" \
+        "first call writes the stable prefix"
+    AI_TASK=prefix-task ai_engine call "$prefix" "second task" >/dev/null
+    assert_equals '{"r":125,"w":0,"t":140}' "$(last_ai_log '{r: .cache_read_tokens, w: .cache_write_tokens, t: .total}')" \
+        "streamed call reads it from the cache"
+    assert_equals "125	0" "$(tail -1 "$AI_TEST_STATE/state/token-ledger.log" | cut -f6-)" "ledger records cache tokens"
+
+    ai_engine call "short prefix" "third task" >/dev/null
+    assert_equals '{"r":0,"w":0}' "$(last_ai_log '{r: .cache_read_tokens, w: .cache_write_tokens}')" \
+        "prefixes under min_tokens are not marked"
+}
+
+test_ai_call_streams_progress() {
+    echo "  Testing streamed responses and progress files..."
+
+    setup_ai_test
+    local out progress
+    out=$(AI_TASK=stream-task ai_engine call "sys" "streamed hello")
+    progress="$AI_TEST_STATE/state/ai_progress/stream-task.log"
+    assert_equals "echo:streamed hello" "$out" "streamed call returns full text"
+    assert_contains "$(cat "$progress" 2>/dev/null)" "echo:streamed hello" "deltas written to task progress file"
+    assert_true "$(jq -s '.[-1] | has("first_token_ms") and has("tokens_per_sec")' "$AI_TEST_STATE/logs/ai-engine.jsonl")" "AI log records first-token latency and throughput"
+
+    out=$(AI_TASK=stream-task AI_STOP_ON_JSON=1 ai_engine call "sys" "plan: steps")
+    assert_equals '[{"action": "a", "commands": ["true"], "verify": "true"}]' "$out" "early abort returns the complete plan array"
+    assert_true "$(jq -s '.[-1].aborted_early' "$AI_TEST_STATE/logs/ai-engine.jsonl")" "early abort recorded in AI log"
+
+    jq '.ai.stream = false' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" \
+        && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+    rm -f "$progress"
+    out=$(AI_TASK=stream-task ai_engine call "sys" "not streamed")
+    assert_equals "echo:not streamed" "$out" "ai.stream=false uses a buffered request"
+    assert_false "$(test -s "$progress" && echo true || echo false)" "no progress written when streaming is off"
+}
+
+# ============================================================
+# Context Packer Tests
+# ============================================================
+
+test_context_packer_ceiling() {
+    echo "  Testing token-budgeted context packing..."
+
+    setup_ai_test
+    jq '.context.ceilings.analyze = 560' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" \
+        && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+    local packer="$AI_TEST_STATE/lib/context-packer.sh"
+    local pack_file="$AI_TEST_STATE/state/pack.json"
+
+    echo "must keep" | bash "$packer" add "$pack_file" task 0
+    printf 'old entry\n%.0s' {1..300} | bash "$packer" add "$pack_file" journal 2 400 tail
+    printf 'memory %.0s' {1..400} | bash "$packer" add "$pack_file" memory 5
+    jq -n '{name: "t", evidence: [range(0; 50) | {cmd: "make test"}]}' \
+        | bash "$packer" add "$pack_file" task_json 3 100 json
+
+    local packed report
+    packed=$(bash "$packer" pack "$pack_file" analyze 100)
+    report=$(bash "$packer" report analyze)
+    assert_equals "must keep" "$(echo "$packed" | jq -r '.task')" "required section kept verbatim"
+    assert_true "$(echo "$report" | jq '.tokens_after <= (.ceiling - .reserved)')" "packed sections fit the configured ceiling"
+    assert_equals '["memory"]' "$(echo "$report" | jq -c '.dropped')" "least valuable section dropped first"
+    assert_equals "summarized" "$(echo "$report" | jq -r '.sections[] | select(.name == "task_json") | .action')" "task JSON summarized"
+    assert_equals "3" "$(echo "$packed" | jq -r '.task_json | fromjson | .evidence | length')" "summary keeps latest evidence"
+    assert_contains "$(echo "$packed" | jq -r '.journal')" "earlier tokens trimmed" "tail sections keep the newest text"
+}
+
+# ============================================================
+# Verification Tests
+# ============================================================
+
+write_verify_task() {
+    cat > "$AI_TEST_STATE/tasks/vdd-task.json" << 'EOF'
+{
+  "name": "vdd-task",
+  "verification_criteria": ["tests pass", "nothing is broken", "docs updated"]
+}
+EOF
+}
+
+test_verify_task_modes() {
+    echo "  Testing batched and parallel verification..."
+
+    setup_ai_test
+    write_verify_task
+    local vdd="$AI_TEST_STATE/lib/verification-driven.sh"
+    local task_file="$AI_TEST_STATE/tasks/vdd-task.json"
+
+    local before out
+    before=$(mock_stat requests)
+    out=$(bash "$vdd" verify vdd-task batch)
+    assert_contains "$out" "FAILED: 2/3" "batch mode reports per-criterion verdicts"
+    assert_equals "1" "$(( $(mock_stat requests) - before ))" "batch mode uses one request"
+    assert_equals "false" "$(jq -r '.verification_results[1].passed' "$task_file")" "failing criterion mapped by id"
+
+    before=$(mock_stat requests)
+    out=$(bash "$vdd" verify vdd-task parallel)
+    assert_contains "$out" "FAILED: 2/3" "parallel mode agrees with batch"
+    assert_equals "3" "$(( $(mock_stat requests) - before ))" "parallel mode uses one request per criterion"
+    assert_equals "3" "$(jq -r '.verification_metrics.calls' "$task_file")" "task records calls spent"
+    assert_equals "45" "$(jq -r '.verification_metrics.total_tokens' "$task_file")" "task records tokens spent"
+
+    local metrics
+    metrics=$(bash "$vdd" metrics | jq -c '{b: .batch.avg_tokens, p: .parallel.runs}')
+    assert_equals '{"b":15,"p":1}' "$metrics" "metrics compare modes"
+}
+
+# ============================================================
+# Execution Engine Tests
+# ============================================================
+
+test_parallel_plan_steps() {
+    echo "  Testing parallel execution of independent plan steps..."
+
+    setup_ai_test
+    local plan='[{"action": "a", "commands": ["sleep 2; echo out-a"], "verify": "true", "depends_on": []},
+                 {"action": "b", "commands": ["sleep 2; echo out-b"], "verify": "true", "depends_on": []},
+                 {"action": "c", "commands": ["sleep 2; echo out-c"], "verify": "true", "depends_on": []},
+                 {"action": "d", "commands": ["echo out-d"], "verify": "true", "depends_on": [0, 1, 2]}]'
+    jq -n --arg d "mock-plan:$(echo "$plan" | jq -c .)" '{id: "par-task", name: "par-task", description: $d, status: "pending"}' \
+        > "$AI_TEST_STATE/tasks/par-task.json"
+
+    bash "$AI_TEST_STATE/lib/execution-engine.sh" execute par-task >/dev/null 2>&1
+
+    local state="$AI_TEST_STATE/state/execution/par-task.json"
+    assert_equals "completed" "$(jq -r '.phase' "$state")" "parallel plan completes"
+    assert_equals "0,1,2,3" "$(jq -r '[.step_results[].step] | join(",")' "$state")" "results merged in step order"
+    assert_contains "$(jq -r '.step_results[3].result' "$state")" "out-d" "dependent step ran after its dependencies"
+    local wall
+    wall=$(jq -r '.execute_ms' "$state")
+    assert_true "$( (( wall < 5000 )) && echo true )" "independent steps overlap (${wall}ms for 3x2s)"
+}
+
+test_plan_step_fail_fast() {
+    echo "  Testing fail-fast on a failing plan step..."
+
+    setup_ai_test
+    echo '{"id": "ff-task", "name": "ff-task", "status": "pending"}' > "$AI_TEST_STATE/tasks/ff-task.json"
+    mkdir -p "$AI_TEST_STATE/state/execution"
+    jq -n '{task_id: "ff-task", phase: "executing", current_step: 0, step_results: [], fix_attempts: 0,
+            plan_steps: [
+              {action: "fails", commands: ["sleep 0.5; false"], depends_on: []},
+              {action: "slow", commands: ["sleep 15"], depends_on: []},
+              {action: "after slow", commands: ["true"], depends_on: [1]},
+              {action: "optional", commands: ["false"], depends_on: [], optional: true}]}' \
+        > "$AI_TEST_STATE/state/execution/ff-task.json"
+
+    local started elapsed
+    started=$(date +%s%N)
+    bash -c "source '$AI_TEST_STATE/lib/execution-engine.sh' >/dev/null; phase_execute ff-task" >/dev/null 2>&1
+    elapsed=$(( ($(date +%s%N) - started) / 1000000 ))
+
+    local state="$AI_TEST_STATE/state/execution/ff-task.json"
+    assert_equals "failed,cancelled,skipped,failed" "$(jq -r '[.step_results[].status] | join(",")' "$state")" \
+        "failure cancels running steps and skips the rest"
+    # The slow step sleeps 15s; well under that means it was cancelled
+    assert_true "$( (( elapsed < 8000 )) && echo true || echo false)" "run stops without waiting for the slow step (${elapsed}ms)"
+    assert_equals "verifying" "$(jq -r '.phase' "$state")" "execution hands over to verify"
+}
+
+test_step_output_capture() {
+    echo "  Testing bounded capture of step output..."
+
+    setup_ai_test
+    echo '{"id": "log-task", "name": "log-task", "status": "pending"}' > "$AI_TEST_STATE/tasks/log-task.json"
+    mkdir -p "$AI_TEST_STATE/state/execution"
+    jq -n '{task_id: "log-task", phase: "executing", current_step: 0, step_results: [], fix_attempts: 0,
+            plan_steps: [{action: "noisy build", commands: ["seq 1 200000", "echo build done"]}]}' \
+        > "$AI_TEST_STATE/state/execution/log-task.json"
+
+    bash -c "source '$AI_TEST_STATE/lib/execution-engine.sh' >/dev/null; phase_execute log-task" >/dev/null 2>&1
+
+    local state="$AI_TEST_STATE/state/execution/log-task.json"
+    local log="$AI_TEST_STATE/logs/steps/log-task/step-0.log"
+    assert_equals "200003" "$(jq -r '.step_results[0].output_lines' "$state")" "line count covers the full output"
+    assert_equals "$(wc -c < "$log" | tr -d ' ')" "$(jq -r '.step_results[0].output_bytes' "$state")" "byte count matches the step log"
+    assert_equals "$log" "$(jq -r '.step_results[0].log' "$state")" "state points at the step log"
+    assert_true "$( (( $(jq -r '.step_results[0].result | length' "$state") < 4200 )) && echo true )" "state keeps a bounded excerpt"
+    assert_contains "$(jq -r '.step_results[0].result' "$state")" "build done" "excerpt keeps the tail"
+}
+
+test_step_resource_accounting() {
+    echo "  Testing per-command resource accounting..."
+
+    setup_ai_test
+    mkdir -p "$AI_TEST_STATE/state/execution"
+    jq -n '{task_id: "res-task", phase: "executing", current_step: 0, step_results: [], fix_attempts: 0,
+            plan_steps: [{action: "slow", commands: ["sleep 0.5"]},
+                         {action: "busy", commands: ["python3 -c \"sum(range(4000000))\"", "head -c 2000000 /dev/zero > blob"]}]}' \
+        > "$AI_TEST_STATE/state/execution/res-task.json"
+
+    bash -c "export AI_TASK=res-task; source '$AI_TEST_STATE/lib/execution-engine.sh' >/dev/null; phase_execute res-task" >/dev/null 2>&1
+
+    local state="$AI_TEST_STATE/state/execution/res-task.json"
+    assert_true "$( (( $(jq '.step_results[0].resources.wall_ms' "$state") >= 500 )) && echo true )" "step records wall time"
+    assert_true "$( (( $(jq '.step_results[1].commands[0].user_ms' "$state") > 20 )) && echo true )" "command records CPU time"
+    assert_true "$( (( $(jq '.step_results[1].commands[1].write_bytes' "$state") >= 2000000 )) && echo true )" "command records bytes written"
+    assert_equals "3 false" "$(jq -r '"\(.resources.commands) \(.step_results[1].resources.max_rss_kb == 0)"' "$state")" "task rolls up every command"
+
+    bash -c "cd '$AI_TEST_STATE' && source lib/ai-engine.sh >/dev/null; AI_RESOURCE_FILE=state/execution/res-task.resources.jsonl ai_terminal 'kill -TERM \$\$'" >/dev/null 2>&1
+    local stats
+    stats=$(bash "$AI_TEST_STATE/lib/execution-engine.sh" stats 2 2>/dev/null)
+    assert_equals "sleep 0.5" "$(echo "$stats" | jq -r '.top[0].command')" "stats ranks commands by wall time"
+    assert_equals "2 4" "$(echo "$stats" | jq -r '"\(.top | length) \(.commands_run)"')" "stats honours the limit"
+    assert_equals "SIGTERM" "$(jq -r 'select(.command | startswith("kill")) | .signal' "$AI_TEST_STATE/state/execution/res-task.resources.jsonl")" "exit signal recorded"
+
+    local rc=0 rt
+    rt=$(kill -l RTMIN+6)
+    python3 "$AI_TEST_STATE/lib/run-metered.py" --metrics "$AI_TEST_STATE/rt.json" -- bash -c 'kill -s RTMIN+6 $$' || rc=$?
+    assert_equals "$(( 128 + rt )) SIG$rt" "$rc $(jq -r '.signal' "$AI_TEST_STATE/rt.json")" \
+        "realtime signal without a name is still reported"
+}
+
+test_verify_result_cache() {
+    echo "  Testing verification cache keyed on workspace content..."
+
+    setup_ai_test
+    git -C "$AI_TEST_STATE" init -q
+    echo "ok" > "$AI_TEST_STATE/src.txt"
+    echo '{"name": "cache-task", "status": "pending"}' > "$AI_TEST_STATE/tasks/cache-task.json"
+    local task_file="$AI_TEST_STATE/tasks/cache-task.json"
+    local runs="$AI_TEST_STATE/logs/verify-runs"
+    local check='echo run >> logs/verify-runs; grep -q ok src.txt'
+
+    ai_engine evidence cache-task "$check" >/dev/null
+    ai_engine evidence cache-task "$check" >/dev/null
+    assert_equals "1" "$(wc -l < "$runs" | tr -d ' ')" "unchanged workspace reuses the pass"
+    assert_equals "true true" "$(jq -r '.evidence[-1] | "\(.cached) \(.passed)"' "$task_file")" "evidence marks the reused pass"
+
+    echo "ok, edited" > "$AI_TEST_STATE/src.txt"
+    ai_engine evidence cache-task "$check" >/dev/null
+    assert_equals "2" "$(wc -l < "$runs" | tr -d ' ')" "file change invalidates the cached pass"
+
+    ai_engine evidence cache-task 'echo run >> logs/verify-runs; false' >/dev/null
+    ai_engine evidence cache-task 'echo run >> logs/verify-runs; false' >/dev/null
+    assert_equals "4" "$(wc -l < "$runs" | tr -d ' ')" "failures are never cached"
+    assert_equals "0" "$(find "$AI_TEST_STATE/.git/objects" -type f | wc -l | tr -d ' ')" \
+        "hashing writes no objects into the repository"
+
+    # Ignored files count only under paths named explicitly
+    local hash="source '$AI_TEST_STATE/lib/ai-engine.sh' >/dev/null; _workspace_hash"
+    echo "build/" > "$AI_TEST_STATE/.gitignore"
+    mkdir -p "$AI_TEST_STATE/build"
+    echo v1 > "$AI_TEST_STATE/build/out.bin"
+    local whole named
+    whole=$(bash -c "$hash")
+    named=$(bash -c "$hash build")
+    echo v2 > "$AI_TEST_STATE/build/out.bin"
+    assert_equals "$whole" "$(bash -c "$hash")" "ignored output left out of the workspace hash"
+    assert_not_contains "$(bash -c "$hash build")" "$named" "ignored output under a named path invalidates"
+
+    rm -rf "$AI_TEST_STATE/.git"
+    ai_engine evidence cache-task "$check" >/dev/null
+    ai_engine evidence cache-task "$check" >/dev/null
+    assert_equals "5" "$(wc -l < "$runs" | tr -d ' ')" "content hash works outside git"
+}
+
+test_sub_agent_worktrees() {
+    echo "  Testing isolated worktrees for parallel sub-agents..."
+
+    setup_ai_test
+    local repo="$AI_TEST_STATE" agents="$AI_TEST_STATE/state/parallel_agents"
+    printf 'one\ntwo\n' > "$repo/shared.txt"
+    git -C "$repo" init -q
+    git -C "$repo" add shared.txt lib config.json
+    git -C "$repo" -c user.name=t -c user.email=t@t commit -q -m base
+
+    local a
+    for a in sa-1 sa-2 sa-3; do
+        mkdir -p "$agents/$a"
+        jq -n --arg id "$a" '{id: $id, name: $id, description: "edit"}' > "$agents/$a/manifest.json"
+    done
+    local sub="source '$repo/lib/sub-agents.sh' >/dev/null"
+    bash -c "$sub; worktree_create sa-1; worktree_create sa-2; worktree_create sa-3" >/dev/null 2>&1
+
+    local wt1="$repo/state/worktrees/sa-1"
+    assert_equals "$(git -C "$repo" rev-parse --absolute-git-dir)" \
+        "$(cd "$wt1" && cd "$(git rev-parse --git-common-dir)" && pwd)" "worktrees share the object store"
+
+    AUTONOMY_WORKSPACE="$wt1" bash "$repo/lib/ai-engine.sh" terminal "echo new > added.txt" >/dev/null 2>&1
+    assert_equals "true false" "$([[ -f "$wt1/added.txt" ]] && echo true || echo false) $([[ -f "$repo/added.txt" ]] && echo true || echo false)" \
+        "commands run in the agent's worktree"
+    printf 'one\ntwo\nthree\n' > "$repo/state/worktrees/sa-2/shared.txt"
+    printf 'one\ntwo\nfour\n' > "$repo/state/worktrees/sa-3/shared.txt"
+
+    bash -c "$sub; worktree_merge sa-1 && worktree_merge sa-2" >/dev/null 2>&1
+    assert_equals "new three" "$(cat "$repo/added.txt") $(tail -1 "$repo/shared.txt")" "changes from both agents merged back"
+    assert_equals "false" "$([[ -d "$wt1" ]] && echo true || echo false)$(git -C "$repo" branch --list 'agent/sa-1')" "worktree and branch cleaned up"
+
+    bash -c "$sub; worktree_merge sa-3" >/dev/null 2>&1
+    local rc=$?
+    assert_equals "1 conflict shared.txt" "$rc $(jq -r '"\(.merge) \(.conflicts | join(" "))"' "$agents/sa-3/manifest.json")" "overlapping edit reported as a conflict"
+    assert_equals "three" "$(tail -1 "$repo/shared.txt")" "conflict leaves the main checkout alone"
+    assert_equals "agent/sa-3" "$(git -C "$repo" branch --list 'agent/sa-3' | tr -d ' *')" "conflicting branch kept for review"
+}
+
+test_agent_supervisor() {
+    echo "  Testing the sub-agent supervisor pool..."
+
+    setup_ai_test
+    jq '.global_config.max_sub_agents = 2 | .sub_agents.retry_backoff_seconds = 0.2' \
+        "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" && mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+    local sub="$AI_TEST_STATE/lib/sub-agents.sh" sock="$AI_TEST_STATE/state/agent-supervisor.sock"
+    submit() { curl -s --unix-socket "$sock" -X POST -H "Content-Type: application/json" --data-binary "$1" http://supervisor/jobs >/dev/null; }
+    job() { curl -s --unix-socket "$sock" "http://supervisor/jobs/$1"; }
+    bash "$sub" supervisor start >/dev/null
+
+    local i
+    for i in 1 2 3; do submit "{\"id\": \"sleep-$i\", \"command\": [\"sleep\", \"1\"]}"; done
+    sleep 0.5
+    assert_equals "2 1" "$(bash "$sub" status | jq -r '"\(.supervisor.busy) \(.supervisor.queued)"')" "pool runs two jobs and queues the third"
+
+    submit "{\"id\": \"hung\", \"cwd\": \"$AI_TEST_STATE\", \"timeout\": 1, \"max_retries\": 0,
+             \"command\": [\"bash\", \"-c\", \"sleep 60 & echo \$! > hung-child.pid; wait\"],
+             \"on_done\": [\"bash\", \"-c\", \"echo \$AGENT_JOB_STATUS: \$AGENT_JOB_REASON > hung-done\"]}"
+    submit "{\"id\": \"flaky\", \"cwd\": \"$AI_TEST_STATE\", \"max_retries\": 2,
+             \"command\": [\"bash\", \"-c\", \"[ -f flaky-ran ] || { touch flaky-ran; exit 1; }\"]}"
+    sleep 4
+    assert_equals "failed: timed out after 1s" "$(cat "$AI_TEST_STATE/hung-done" 2>/dev/null)" "timeout reported to on_done"
+    assert_equals "false" "$(kill -0 "$(cat "$AI_TEST_STATE/hung-child.pid")" 2>/dev/null && echo true || echo false)" "timeout kills the whole process group"
+    assert_equals "completed 2 exit 1" "$(job flaky | jq -r '"\(.status) \(.attempts) \(.history[0].reason)"')" "failed job retried after backoff"
+
+    local rt
+    rt=$(kill -l RTMIN+6)
+    submit "{\"id\": \"rt\", \"max_retries\": 0, \"command\": [\"bash\", \"-c\", \"kill -s RTMIN+6 \$\$\"]}"
+    submit '{"id": "after-rt", "command": ["true"]}'
+    sleep 1
+    assert_equals "killed by SIG$rt completed" "$(job rt | jq -r '.reason') $(job after-rt | jq -r '.status')" \
+        "job killed by a realtime signal is reaped and the pool keeps going"
+
+    submit "{\"id\": \"resume\", \"cwd\": \"$AI_TEST_STATE\", \"command\": [\"bash\", \"-c\", \"sleep 1; echo done > resumed\"]}"
+    sleep 0.3
+    bash "$sub" supervisor stop >/dev/null
+    assert_equals "queued" "$(jq -r '.jobs[] | select(.id == "resume") | .status' "$AI_TEST_STATE/state/agent-jobs.json")" "stopped job goes back on the queue"
+    bash "$sub" supervisor start >/dev/null
+    sleep 2
+    assert_equals "done completed" "$(cat "$AI_TEST_STATE/resumed" 2>/dev/null) $(job resume | jq -r '.status')" "restarted supervisor resumes the queue"
+    bash "$sub" supervisor stop >/dev/null
+}
+
+test_agent_progress_events() {
+    echo "  Testing live sub-agent progress over the supervisor socket..."
+
+    setup_ai_test
+    local sub="$AI_TEST_STATE/lib/sub-agents.sh" sock="$AI_TEST_STATE/state/agent-supervisor.sock"
+    agents() { curl -s --unix-socket "$sock" http://supervisor/agents; }
+    bash "$sub" supervisor start >/dev/null
+    bash "$sub" spawn parent-task live "Report progress" >/dev/null
+    local id
+    id=$(bash "$sub" list all | jq -r '.[0].id')
+
+    # The job publishes a phase, then spends tokens on two AI calls
+    cat > "$AI_TEST_STATE/progress-job.sh" << 'EOF'
+curl -s --unix-socket "$AGENT_EVENT_SOCK" -H 'Content-Type: application/json' \
+    -d "{\"agent\": \"$AGENT_ID\", \"phase\": \"executing\", \"percent\": 40}" http://supervisor/events >/dev/null
+bash lib/ai-engine.sh call sys "progress one" >/dev/null
+bash lib/ai-engine.sh call sys "progress two" >/dev/null
+echo "worker output" && touch progress-ready
+while [ ! -f progress-release ]; do sleep 0.1; done
+EOF
+    mkdir -p "$AI_TEST_STATE/state/parallel_agents/$id"
+    jq -n --arg id "$id" '{id: $id, name: "live", parent: "parent-task", status: "queued"}' \
+        > "$AI_TEST_STATE/state/parallel_agents/$id/manifest.json"
+    curl -s --unix-socket "$sock" -X POST -H "Content-Type: application/json" http://supervisor/jobs \
+        --data-binary "{\"id\": \"$id\", \"name\": \"live\", \"cwd\": \"$AI_TEST_STATE\",
+                        \"log\": \"$AI_TEST_STATE/state/parallel_agents/$id/worker.log\",
+                        \"command\": [\"bash\", \"progress-job.sh\"]}" >/dev/null
+    local i
+    for i in $(seq 1 50); do [[ -f "$AI_TEST_STATE/progress-ready" ]] && break; sleep 0.2; done
+
+    assert_equals "running executing 40 30" \
+        "$(agents | jq -r --arg id "$id" '.agents[] | select(.id == $id) | "\(.status) \(.phase) \(.percent) \(.tokens)"')" \
+        "live view folds in phase, percent and tokens"
+    assert_equals "1 active live 40" \
+        "$(AUTONOMY_DIR="$AI_TEST_STATE" PYTHONDONTWRITEBYTECODE=1 python3 -c "import sys; sys.path.insert(0, '$AUTONOMY_DIR'); import web_ui, json; print(json.dumps(web_ui.read_live_agents()))" |
+            jq -r '"\(.active_agents) \(.agents[0].status) \(.agents[0].name) \(.agents[0].percent)"')" \
+        "/api/sub-agents served from the supervisor view"
+
+    touch "$AI_TEST_STATE/progress-release"
+    for i in $(seq 1 25); do
+        [[ "$(curl -s --unix-socket "$sock" "http://supervisor/jobs/$id" | jq -r '.status')" == "completed" ]] && break
+        sleep 0.2
+    done
+    AGENT_JOB_ID="$id" AGENT_JOB_STATUS=completed AGENT_JOB_EXIT=0 AGENT_JOB_ATTEMPTS=1 bash "$sub" job_done live >/dev/null
+    assert_equals "false" "$([[ -d "$AI_TEST_STATE/state/parallel_agents/$id" ]] && echo true || echo false)" "finished IPC directory removed"
+    assert_equals "completed 1 30 executing true" \
+        "$(jq -r '"\(.status) \(.attempts) \(.tokens) \(.phase) \(.log_tail | contains("worker output"))"' "$AI_TEST_STATE/state/parallel_agents.jsonl")" \
+        "compacted into one summary record"
+    assert_equals "1 1" "$(agents | jq -r '"\(.counters.agents) \(.counters.agents_completed)"')" "completion counted once per agent"
+    assert_equals "completed" "$(bash "$sub" parallel_status | jq -r --arg id "$id" '.[] | select(.id == $id) | .status')" \
+        "parallel_status reads the summary"
+    bash "$sub" supervisor stop >/dev/null
+}
+
+test_sub_agent_joins() {
+    echo "  Testing fan-in joins over sub-agents..."
+
+    setup_ai_test
+    local sub="$AI_TEST_STATE/lib/sub-agents.sh" tasks="$AI_TEST_STATE/tasks"
+    task_field() { jq -r "$2" "$tasks/$1.json"; }
+    wait_for_task() {
+        local i
+        for i in $(seq 1 25); do [[ "$(task_field "$1" '.status')" == "$2" ]] && return; sleep 0.2; done
+    }
+    bash "$sub" supervisor start >/dev/null
+
+    echo '{"name": "fanout", "status": "pending"}' > "$tasks/fanout.json"
+    local c
+    for c in c1 c2 c3; do bash "$sub" spawn fanout "$c" "Part $c" >/dev/null; done
+    bash "$sub" join fanout 2 >/dev/null
+    bash "$sub" complete c1 "first part done" >/dev/null
+    bash "$sub" fail c2 "broken" >/dev/null
+    sleep 0.5
+    assert_equals "waiting_on_agents" "$(task_field fanout '.status')" "parent waits until the quorum is reached"
+    assert_false "$(bash "$sub" join fanout >/dev/null && echo true || echo false)" "second join for a waiting parent rejected"
+
+    # The executor holds the parent's task lock: the join waits for it
+    mkdir -p "$AI_TEST_STATE/state/task-locks"
+    flock "$AI_TEST_STATE/state/task-locks/fanout.lock" sleep 1.5 &
+    local holder=$! completer
+    sleep 0.2
+    bash "$sub" complete c3 "third part done" >/dev/null &
+    completer=$!
+    sleep 0.8
+    assert_equals "waiting_on_agents" "$(task_field fanout '.status')" "join rewrite waits for the task lock"
+    wait "$holder" "$completer"
+    wait_for_task fanout pending
+    assert_equals "pending met 2 1" "$(task_field fanout '"\(.status) \(.join.status) \(.join.counts.completed) \(.join.counts.failed)"')" \
+        "quorum resolves the join and requeues the parent"
+    assert_equals "first part done|FAILED: broken|third part done" \
+        "$(task_field fanout '.join.children | sort_by(.name) | map(.result) | join("|")')" "child results aggregated on the parent"
+    assert_true "$([[ -f "$AI_TEST_STATE/state/daemon.wake" ]] && echo true)" "daemon woken when the join resolves"
+
+    echo '{"name": "slow", "status": "pending"}' > "$tasks/slow.json"
+    bash "$sub" spawn slow s1 "Never finishes" >/dev/null
+    bash "$sub" join slow all 1 >/dev/null
+    wait_for_task slow pending
+    assert_equals "deadline 1 pending" "$(task_field slow '"\(.join.status) \(.join.counts.unfinished) \(.join.children[0].status)"')" \
+        "deadline resolves with unfinished children"
+    bash "$sub" supervisor stop >/dev/null
+}
+
+test_sub_agent_registry() {
+    echo "  Testing the append-only sub-agent registry..."
+
+    setup_ai_test
+    jq '.global_config.max_sub_agents = 20' "$AI_TEST_STATE/config.json" > "$AI_TEST_STATE/config.tmp" &&
+        mv "$AI_TEST_STATE/config.tmp" "$AI_TEST_STATE/config.json"
+    local sub="$AI_TEST_STATE/lib/sub-agents.sh" state="$AI_TEST_STATE/state"
+    local i pids=()
+    for i in $(seq 1 8); do bash "$sub" spawn reg "agent-$i" "Part $i" >/dev/null & pids+=($!); done
+    wait "${pids[@]}"
+    pids=()
+    for i in $(seq 1 8); do
+        if (( i <= 5 )); then bash "$sub" complete "agent-$i" "done $i" "ev-$i" >/dev/null & else bash "$sub" start "agent-$i" >/dev/null & fi
+        pids+=($!)
+    done
+    wait "${pids[@]}"
+
+    assert_equals "16" "$(wc -l < "$state/sub-agents-ledger.log" | tr -d ' ')" "every lifecycle change appends one ledger line"
+    assert_equals "8 5 3" "$(bash "$sub" status | jq -r '"\(.total_spawned) \(.total_completed) \(.active_agents)"')" \
+        "no concurrent update lost"
+    assert_equals "ev-2" "$(jq -r '.completed[] | select(.name == "agent-2") | .evidence[0]' "$state/sub_agents.json")" \
+        "completed agents archived with evidence"
+    assert_equals "3 $(stat -c %s "$state/sub-agents-ledger.log")" "$(cat "$state/sub_agents.active")" \
+        "active count cached against the ledger offset"
+
+    bash "$sub" fail agent-6 "gave up" >/dev/null
+    assert_equals "2" "$(bash -c "source '$sub' >/dev/null; _active_count")" "active count folds in new lines"
+
+    # Finished long ago: dropped from the view at the next compaction
+    jq '.completed[0].completed = "2020-01-01T00:00:00+00:00" | .compacted = 0' "$state/sub_agents.json" > "$state/view.tmp" &&
+        mv "$state/view.tmp" "$state/sub_agents.json"
+    bash "$sub" start agent-7 >/dev/null
+    assert_equals "4 8" "$(bash "$sub" list completed | jq -r 'length') $(bash "$sub" status | jq -r '.total_spawned')" \
+        "compaction drops long-finished agents and keeps the stats"
+}
+
+test_token_ledger_concurrent_calls() {
+    echo "  Testing append-only token ledger..."
+
+    setup_ai_test
+    cp "$AI_TEST_STATE/config.json" "$AI_TEST_STATE/config.before"
+
+    local i pids=()
+    for i in 1 2 3 4 5 6 7 8; do
+        AI_TASK=ledger-task AI_CALL_TYPE=analyze ai_engine call "sys" "ledger $i" >/dev/null &
+        pids+=($!)
+    done
+    wait "${pids[@]}"
+
+    local budget="$AI_TEST_STATE/lib/token-budget.sh"
+    local ledger="$AI_TEST_STATE/state/token-ledger.log"
+    assert_equals "8" "$(wc -l < "$ledger" | tr -d ' ')" "every concurrent call appends a ledger line"
+    assert_equals "15	mock-model	ledger-task	analyze" "$(head -1 "$ledger" | cut -f2-5)" "ledger line carries tokens, model, task and type"
+    assert_equals "OK:49880" "$(bash "$budget" check)" "check_budget rolls up all concurrent calls"
+    cmp -s "$AI_TEST_STATE/config.json" "$AI_TEST_STATE/config.before"
+    assert_true "$?" "config.json is not rewritten"
+
+    bash "$budget" record 20 manual >/dev/null
+    assert_equals "140" "$(jq -r '.used' "$AI_TEST_STATE/state/token_usage.json")" "rollup folds in only new lines"
+
+    # A new day moves the ledger aside, keeping lines written since midnight
+    local size
+    size=$(stat -c %s "$ledger")
+    printf '%s\t7\tmock-model\t-\t-\t0\t0\n' "$EPOCHSECONDS" >> "$ledger"
+    jq --argjson s "$size" '.date = "2000-01-01" | .ledger_offset = $s' "$AI_TEST_STATE/state/token_usage.json" > "$AI_TEST_STATE/state/usage.tmp" \
+        && mv "$AI_TEST_STATE/state/usage.tmp" "$AI_TEST_STATE/state/token_usage.json"
+    assert_equals "7 0" "$(bash "$budget" state | jq -r '"\(.used) \(.ledger_offset)"')" "day rollover keeps today's lines"
+    assert_equals "false 10" "$([[ -f "$ledger" ]] && echo true || echo false) $(wc -l < "$ledger.1" | tr -d ' ')" \
+        "day rollover rotates the ledger"
+    ai_engine call "sys" "after rotation" >/dev/null
+    assert_equals "22" "$(bash "$budget" state | jq -r '.used')" "calls after rotation land in the new ledger"
+}
+
+# ============================================================
+# Run all tests
+# ============================================================
+
+if ! start_mock_provider; then
+    skip_test "AI engine tests" "mock provider failed to start"
+    exit 0
+fi
+
+test_ai_call_direct_curl
+test_ai_client_reuses_connections
+test_ai_retries_rate_limits
+test_ai_scheduler_priority_lanes
+test_ai_provider_failover
+test_ai_hedged_request
+test_ai_cache_hit_and_opt_out
+test_ai_cache_verdicts_follow_workspace
+test_ai_prompt_prefix_cache
+test_ai_call_streams_progress
+test_context_packer_ceiling
+test_verify_task_modes
+test_parallel_plan_steps
+test_plan_step_fail_fast
+test_step_output_capture
+test_step_resource_accounting
+test_verify_result_cache
+test_sub_agent_worktrees
+test_agent_supervisor
+test_agent_progress_events
+test_sub_agent_joins
+test_sub_agent_registry
+test_token_ledger_concurrent_calls
+
+stop_mock_provider
+rm -rf "$AI_TEST_STATE"
+
+report_suite_results "AI Engine Tests"
@@ -480,6 +480,97 @@ test_api_error_handling() {
     assert_contains "$response" "error" "complete on nonexistent task returns error"
 }
 
+# ============================================================
+# Metrics Series Tests
+# ============================================================
+
+test_api_metrics_series_lttb() {
+    echo "  Testing LTTB downsampling for /api/metrics/series..."
+
+    local result
+    result=$(cd "$AUTONOMY_DIR" && AUTONOMY_DIR="$API_TEST_STATE" python3 -c '
+import web_ui
+pts = [(i, (i * 7919) % 101) for i in range(5000)]
+out = web_ui.lttb_downsample(pts, 100)
+print(len(out), out[0] == pts[0], out[-1] == pts[-1], web_ui.parse_window("30d"))
+' 2>&1)
+    assert_equals "100 True True 2592000" "$result" "LTTB keeps endpoints and hits max_points"
+
+    result=$(cd "$AUTONOMY_DIR" && AUTONOMY_DIR="$API_TEST_STATE" python3 -c '
+import web_ui
+print(len(web_ui.lttb_downsample([(0, 1), (1, 2)], 100)))
+' 2>&1)
+    assert_equals "2" "$result" "short series returned unchanged"
+
+    mkdir -p "$API_TEST_STATE/logs"
+    printf '%s\n' \
+        '{"timestamp":"2026-01-01T00:00:00Z","model":"m","input_tokens":100,"output_tokens":50,"total":150}' \
+        '{"timestamp":"2026-01-01T00:01:00Z","action":"evidence_gathered","passed":2,"total":3}' \
+        > "$API_TEST_STATE/logs/ai-engine.jsonl"
+    result=$(cd "$AUTONOMY_DIR" && AUTONOMY_DIR="$API_TEST_STATE" python3 -c '
+import web_ui
+print([v for _, v in web_ui.load_series("tokens", 0)])
+' 2>&1)
+    assert_equals "[150]" "$result" "token series counts provider calls only"
+}
+
+test_api_step_log_paging() {
+    echo "  Testing step log paging for /api/execution/step-log..."
+
+    mkdir -p "$API_TEST_STATE/logs/steps/build"
+    seq 1 5000 > "$API_TEST_STATE/logs/steps/build/step-2.log"
+
+    local result
+    result=$(cd "$AUTONOMY_DIR" && AUTONOMY_DIR="$API_TEST_STATE" python3 -c '
+import web_ui
+first = web_ui.read_step_log("build", 2, 0, 10)
+rest = web_ui.read_step_log("build", 2, first["next_offset"], 10**9)
+last = web_ui.read_step_log("build", 2, -5, 100)
+print(repr(first["content"]), first["eof"], rest["eof"], len(first["content"] + rest["content"]) == rest["size"], repr(last["content"]))
+print(web_ui.read_step_log("../build", 9))
+' 2>&1)
+    assert_equals "'1\n2\n3\n4\n5\n' False True True '5000\n'
+None" "$result" "pages cover the whole log, tail via negative offset"
+}
+
+test_api_webhook_queue() {
+    echo "  Testing the webhook queue behind /api/webhook..."
+
+    setup_api_test
+    cp -r "$AUTONOMY_DIR/lib" "$API_TEST_STATE/"
+    bash "$API_TEST_STATE/lib/event-triggers.sh" register ci webhook ci "CI event" >/dev/null
+    jq '.triggers[0].cooldown_seconds = 0' "$API_TEST_STATE/state/triggers.json" > "$API_TEST_STATE/state/t.tmp" &&
+        mv "$API_TEST_STATE/state/t.tmp" "$API_TEST_STATE/state/triggers.json"
+
+    local result
+    result=$(cd "$AUTONOMY_DIR" && AUTONOMY_DIR="$API_TEST_STATE" PYTHONDONTWRITEBYTECODE=1 python3 -c '
+import web_ui
+q = web_ui.WebhookQueue(max_depth=3, batch_size=2)
+first, _ = q.enqueue("ci", "push one", "delivery-1")
+again, dup = q.enqueue("ci", "push one", "delivery-1")
+q.enqueue("ci", {"ref": "main"})
+q.enqueue("ci", "push three")
+print(first == again, dup, q.enqueue("ci", "overflow") == (None, False), q.status()["depth"])
+
+# A restart picks the spool back up and still knows the delivery keys
+q = web_ui.WebhookQueue(max_depth=3, batch_size=2)
+print(q.status()["depth"], q.enqueue("ci", "push one", "delivery-1") == (first, True))
+print(q.process_batch(), q.process_batch(), q.process_batch())
+done = q.status(first)
+print(done["state"], done["ok"], q.status()["depth"], q.status()["counters"]["processed"])
+q = web_ui.WebhookQueue()
+print(q.enqueue("ci", "push one", "delivery-1") == (first, True))
+' 2>&1)
+    assert_equals "True True True 3
+3 True
+2 1 0
+processed True 0 3
+True" "$result" "events spooled in order, deduplicated, bounded and resumed"
+    assert_equals "3" "$(ls "$API_TEST_STATE"/tasks | grep -c '^trigger-ci')" "one task per event, duplicates dropped"
+    assert_contains "$(jq -r '.description' "$API_TEST_STATE"/tasks/trigger-ci*.json)" '{"ref":"main"}' \
+        "structured event data passed through as JSON"
+}
+
 # ============================================================
 # Run all tests
 # ============================================================
@@ -501,6 +592,9 @@ test_api_post_trigger
 test_api_delete_task
 test_api_delete_not_found
 test_api_error_handling
+test_api_metrics_series_lttb
+test_api_step_log_paging
+test_api_webhook_queue
 
 # Cleanup
 rm -rf "$API_TEST_STATE"
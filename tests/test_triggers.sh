@@ -0,0 +1,354 @@
+#!/bin/bash
+# Trigger tests for autonomy skill
+# Tests: file watchers, tree manifests, git ref triggers, schedules and trigger windows
+
+# Don't use set -e here as it interferes with test assertions
+
+TEST_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+AUTONOMY_DIR="$(dirname "$TEST_DIR")"
+
+# Source utilities
+source "$TEST_DIR/test_utils.sh"
+
+# Trigger test state directory — a copy of lib/ so scripts resolve state here
+TRIGGER_TEST_STATE="$TEST_DIR/state/trigger_test"
+
+# Keep git lookups inside the test copy, not this repo
+export GIT_CEILING_DIRECTORIES="$TEST_DIR/state"
+
+echo "Running Trigger Tests"
+echo "====================="
+
+setup_trigger_test() {
+    rm -rf "$TRIGGER_TEST_STATE"
+    mkdir -p "$TRIGGER_TEST_STATE/state" "$TRIGGER_TEST_STATE/logs" "$TRIGGER_TEST_STATE/tasks"
+    cp -r "$AUTONOMY_DIR/lib" "$TRIGGER_TEST_STATE/lib"
+    echo '{}' > "$TRIGGER_TEST_STATE/config.json"
+}
+
+test_fs_watcher_events() {
+    echo "  Testing inotify change queue for triggers and watchers..."
+
+    setup_trigger_test
+    mkdir -p "$TRIGGER_TEST_STATE/capabilities" "$TRIGGER_TEST_STATE/watched/sub"
+    cp "$AUTONOMY_DIR/capabilities/file-watcher.sh" "$TRIGGER_TEST_STATE/capabilities/"
+    local triggers="$TRIGGER_TEST_STATE/lib/event-triggers.sh" watcher="$TRIGGER_TEST_STATE/capabilities/file-watcher.sh"
+    local fsw="$TRIGGER_TEST_STATE/lib/fs-watcher.py" state="$TRIGGER_TEST_STATE/state" dir="$TRIGGER_TEST_STATE/watched"
+    echo one > "$dir/sub/a.txt"
+    echo cfg > "$dir/settings.conf"
+    bash "$triggers" register docs file_change "$dir" "Docs changed" >/dev/null
+    bash "$watcher" add "$dir/settings.conf" "echo acted >> '$TRIGGER_TEST_STATE/acted'" cfg >/dev/null
+    bash "$triggers" check_files >/dev/null
+
+    FS_WATCHER_QUIET=0.3 bash "$triggers" watch start >/dev/null
+    assert_equals "true true" "$(jq -r '[.watches["trigger:docs"].ok, .watches["watcher:cfg"].ok] | join(" ")' "$state/fs-watcher.json")" \
+        "trigger and watcher paths watched"
+
+    mkdir "$dir/sub/new"
+    echo two > "$dir/sub/new/b.txt"
+    echo more >> "$dir/sub/a.txt"
+    sleep 1.2
+    assert_equals "1 true" "$(jq -s 'map(select(.paths)) | "\(length) \(.[0].paths | index("'"$dir/sub/new/b.txt"'") != null)"' -r "$state/fs-events/trigger_docs.jsonl")" \
+        "changes coalesced into one batch with the new directory's files"
+    assert_equals "file change" "$(cat "$state/daemon.wake" 2>/dev/null)" "daemon woken by a trigger batch"
+
+    bash "$triggers" check_files >/dev/null
+    assert_contains "$(jq -r '.description' "$TRIGGER_TEST_STATE"/tasks/trigger-docs-*.json 2>/dev/null)" "sub/new/b.txt" \
+        "trigger fires with the changed paths"
+    echo stale > "$state/manifests/trigger-docs.json"
+    bash "$triggers" check_files >/dev/null
+    assert_equals "stale" "$(cat "$state/manifests/trigger-docs.json")" "empty queue skips the hash"
+
+    echo changed > "$dir/settings.conf"
+    sleep 1
+    bash "$watcher" check >/dev/null
+    assert_equals "acted" "$(cat "$TRIGGER_TEST_STATE/acted" 2>/dev/null)" "watcher action runs from its queue"
+
+    echo '{"rescan": true}' >> "$state/fs-events/watcher_cfg.jsonl"
+    python3 "$fsw" take watcher:cfg
+    assert_equals "2" "$?" "overflowed queue asks for a poll"
+
+    mkdir -p "$TRIGGER_TEST_STATE/notes"
+    echo one > "$TRIGGER_TEST_STATE/notes/n.txt"
+    bash "$triggers" register notes file_change "$TRIGGER_TEST_STATE/notes" "Notes changed" >/dev/null
+    sleep 1.5
+    bash "$triggers" check_files >/dev/null
+    echo two > "$TRIGGER_TEST_STATE/notes/n.txt"
+    sleep 1
+    bash "$triggers" check_files >/dev/null
+    assert_equals "1" "$(ls "$TRIGGER_TEST_STATE"/tasks/trigger-notes-*.json 2>/dev/null | wc -l | tr -d ' ')" \
+        "trigger registered under a running watcher fires on its first edit"
+
+    bash "$triggers" watch stop >/dev/null
+    echo again > "$dir/settings.conf"
+    bash "$watcher" check >/dev/null
+    assert_equals "2" "$(wc -l < "$TRIGGER_TEST_STATE/acted" | tr -d ' ')" "checksum poll takes over without the watcher"
+
+    rm -f "$TRIGGER_TEST_STATE"/tasks/trigger-docs-*.json
+    bash "$triggers" tune docs cooldown_seconds=0 >/dev/null
+    echo offline > "$dir/sub/a.txt"
+    FS_WATCHER_QUIET=0.3 bash "$triggers" watch start >/dev/null
+    bash "$triggers" check_files >/dev/null
+    assert_contains "$(jq -r '.description' "$TRIGGER_TEST_STATE"/tasks/trigger-docs-*.json 2>/dev/null)" "sub/a.txt" \
+        "change made while the watcher was down is seen after restart"
+    bash "$triggers" watch stop >/dev/null
+}
+
+test_tree_manifest_changes() {
+    echo "  Testing incremental tree manifests for polled paths..."
+
+    setup_trigger_test
+    mkdir -p "$TRIGGER_TEST_STATE/capabilities" "$TRIGGER_TEST_STATE/tree/a/b" "$TRIGGER_TEST_STATE/tree/c"
+    cp "$AUTONOMY_DIR/capabilities/file-watcher.sh" "$TRIGGER_TEST_STATE/capabilities/"
+    local triggers="$TRIGGER_TEST_STATE/lib/event-triggers.sh" watcher="$TRIGGER_TEST_STATE/capabilities/file-watcher.sh"
+    local manifest="$TRIGGER_TEST_STATE/lib/tree-manifest.py" tree="$TRIGGER_TEST_STATE/tree" i
+    for i in 1 2 3 4 5; do echo "file $i" > "$tree/a/b/f$i"; echo "other $i" > "$tree/c/g$i"; done
+    echo top > "$tree/top.txt"
+    # Old enough that their mtimes are trusted without a second hash
+    find "$tree" -exec touch -d "1 minute ago" {} +
+
+    bash "$triggers" register tree file_change "$tree" "Tree changed" >/dev/null
+    bash "$triggers" check_files >/dev/null
+    local m="$TRIGGER_TEST_STATE/state/manifests/trigger-tree.json"
+    local before
+    before=$(stat -c %Y.%s "$m")
+    sleep 1
+    bash "$triggers" check_files >/dev/null
+    assert_equals "$before" "$(stat -c %Y.%s "$m")" "unchanged tree leaves the manifest alone"
+
+    echo edited > "$tree/a/b/f2"
+    echo new > "$tree/c/g9"
+    rm "$tree/top.txt"
+    touch -d "1 minute ago" "$tree/a/b/f2" "$tree/c/g9"
+    touch "$tree/c/g1"
+    bash "$triggers" check_files >/dev/null
+    assert_contains "$(jq -r '.description' "$TRIGGER_TEST_STATE"/tasks/trigger-tree-*.json 2>/dev/null)" \
+        "3 paths: $tree/a/b/f2, $tree/c/g9, $tree/top.txt" "exactly the changed paths reported"
+    assert_equals "$(python3 "$manifest" hash "$m")" \
+        "$(python3 "$manifest" check "$TRIGGER_TEST_STATE/fresh.json" "$tree"; python3 "$manifest" hash "$TRIGGER_TEST_STATE/fresh.json")" \
+        "incremental root hash matches a full rebuild"
+    echo edited again > "$tree/a/b/f2"
+    echo stray > "$tree/c/g8"
+    assert_equals "$tree/a/b/f2" "$(echo "$tree/a/b/f2" | python3 "$manifest" check "$m" "$tree" --paths -)" \
+        "queued paths re-examined without a walk"
+
+    bash "$watcher" add "$tree/c" "echo acted" cwatch >/dev/null
+    echo changed > "$tree/c/g3"
+    assert_contains "$(bash "$watcher" check)" "$tree/c/g3" "watcher reports the changed file"
+    assert_equals "$(python3 "$manifest" hash "$TRIGGER_TEST_STATE/state/manifests/watcher-cwatch.json")" \
+        "$(jq -r '.[0].checksum' "$TRIGGER_TEST_STATE/state/watchers.json")" "watcher checksum is the manifest root hash"
+}
+
+test_git_ref_triggers() {
+    echo "  Testing git triggers read from refs and reflogs..."
+
+    setup_trigger_test
+    local ws="$TRIGGER_TEST_STATE/ws" triggers="$TRIGGER_TEST_STATE/lib/event-triggers.sh"
+    local g=(git -C "$ws" -c user.email=t@t -c user.name=t)
+    git init -q -b main "$ws"
+    "${g[@]}" commit -q --allow-empty -m one
+    "${g[@]}" branch feature
+    "${g[@]}" branch docs
+    "${g[@]}" update-ref refs/remotes/origin/main "$("${g[@]}" rev-parse HEAD)"
+    "${g[@]}" pack-refs --all
+    jq --arg ws "$ws" '.workstation.workspace = $ws' "$TRIGGER_TEST_STATE/config.json" > "$TRIGGER_TEST_STATE/config.tmp" &&
+        mv "$TRIGGER_TEST_STATE/config.tmp" "$TRIGGER_TEST_STATE/config.json"
+    bash "$triggers" register code git_push 'main|feature' "Review pushed code" >/dev/null
+    bash "$triggers" register upstream git_push '^origin/main$' "Review upstream" >/dev/null
+    bash "$triggers" check_git >/dev/null
+    assert_equals "4" "$(jq --arg ws "$ws" '.[$ws] | length' "$TRIGGER_TEST_STATE/state/git-refs.json")" \
+        "packed refs recorded on the first check"
+
+    # Checked out main, then pushed; feature and docs move without HEAD
+    "${g[@]}" commit -q --allow-empty -m two
+    "${g[@]}" update-ref refs/remotes/origin/main "$("${g[@]}" rev-parse HEAD)" -m "update by push"
+    "${g[@]}" update-ref refs/heads/feature "$("${g[@]}" rev-parse HEAD)" -m "push: update"
+    "${g[@]}" update-ref refs/heads/docs "$("${g[@]}" rev-parse HEAD)"
+    bash "$triggers" check_git >/dev/null
+    local descriptions
+    descriptions=$(jq -r '.description' "$TRIGGER_TEST_STATE"/tasks/trigger-code-*.json | sort)
+    assert_equals "2" "$(echo "$descriptions" | grep -c "New commits on")" "one firing per matching branch in one cycle"
+    assert_contains "$descriptions" "New commits on feature" "branch other than HEAD seen"
+    assert_not_contains "$descriptions" "docs" "non-matching branch ignored"
+    assert_not_contains "$descriptions" "origin/main" "pushed commit does not fire a local-branch trigger twice"
+    assert_contains "$(jq -r '.description' "$TRIGGER_TEST_STATE"/tasks/trigger-upstream-*.json 2>/dev/null)" \
+        "New commits on origin/main" "condition naming a remote branch matches it"
+
+    jq '.triggers[0].cooldowns = {}' "$TRIGGER_TEST_STATE/state/triggers.json" > "$TRIGGER_TEST_STATE/state/t.tmp" &&
+        mv "$TRIGGER_TEST_STATE/state/t.tmp" "$TRIGGER_TEST_STATE/state/triggers.json"
+    "${g[@]}" commit -q --allow-empty -m three
+    "${g[@]}" commit -q --amend --allow-empty -m three-b
+    bash "$triggers" check_git >/dev/null
+    assert_equals "2" "$(jq -r '.description' "$TRIGGER_TEST_STATE"/tasks/*.json | grep -c "New commits on main")" \
+        "amending a new commit counts as a fast-forward"
+
+    jq '.triggers[0].cooldowns = {}' "$TRIGGER_TEST_STATE/state/triggers.json" > "$TRIGGER_TEST_STATE/state/t.tmp" &&
+        mv "$TRIGGER_TEST_STATE/state/t.tmp" "$TRIGGER_TEST_STATE/state/triggers.json"
+    "${g[@]}" reset -q --hard HEAD~2
+    bash "$triggers" check_git >/dev/null
+    assert_contains "$(jq -r '.description' "$TRIGGER_TEST_STATE"/tasks/*.json)" "History rewritten on main" \
+        "reset reported as a rewrite"
+}
+
+test_schedule_engine() {
+    echo "  Testing the schedule engine..."
+
+    setup_trigger_test
+    local sched="$TRIGGER_TEST_STATE/lib/scheduler.py" triggers="$TRIGGER_TEST_STATE/lib/event-triggers.sh"
+    local now
+    now=$(date +%s)
+
+    assert_true "$(python3 "$sched" check '*/15 9-17 * * mon-fri' >/dev/null && echo true || echo false)" "cron spec accepted"
+    assert_true "$(python3 "$sched" check '61 * * * *' 2>/dev/null && echo false || echo true)" "out-of-range minute rejected"
+    assert_true "$(python3 "$sched" check 'sometimes' 2>/dev/null && echo false || echo true)" "unknown spec rejected"
+    local next
+    next=$(python3 "$sched" check "every 10m")
+    assert_true "$( (( next - now >= 600 && next - $(date +%s) <= 600 )) && echo true || echo false)" \
+        "interval spec runs one interval from now"
+    next=$(python3 "$sched" check "@hourly")
+    assert_equals "00" "$(date -d "@$next" +%M)" "@hourly lands on the hour"
+
+    bash "$triggers" register nightly schedule "0 3 * * *" "Nightly cleanup" >/dev/null
+    jq '.workstation.schedules = [{"interval": "2m", "task": "Tidy up", "last_run": null, "created": "t0"}]' \
+        "$TRIGGER_TEST_STATE/config.json" > "$TRIGGER_TEST_STATE/config.tmp" && mv "$TRIGGER_TEST_STATE/config.tmp" "$TRIGGER_TEST_STATE/config.json"
+    bash "$triggers" check_sched >/dev/null
+    assert_equals "0" "$(ls "$TRIGGER_TEST_STATE/tasks" | wc -l)" "nothing owed for time before a schedule existed"
+    assert_true "$(test -s "$TRIGGER_TEST_STATE/state/schedule.next" && echo true || echo false)" "next fire time published for the daemon"
+
+    # Pretend the daemon was down: the interval schedule missed 5 slots
+    local key
+    key=$(jq -r '.entries | keys[] | select(startswith("schedule:"))' "$TRIGGER_TEST_STATE/state/schedules.json")
+    jq --arg k "$key" --argjson t "$((now - 600))" \
+        '.entries[$k].next = $t | .heap = [.entries | to_entries[] | [.value.next, .key]] | .heap |= sort' \
+        "$TRIGGER_TEST_STATE/state/schedules.json" > "$TRIGGER_TEST_STATE/state/s.tmp" && mv "$TRIGGER_TEST_STATE/state/s.tmp" "$TRIGGER_TEST_STATE/state/schedules.json"
+    bash "$triggers" check_sched >/dev/null
+    bash "$triggers" check_sched >/dev/null
+    assert_equals "1" "$(ls "$TRIGGER_TEST_STATE/tasks" | wc -l)" "missed runs caught up once, exactly once"
+    assert_contains "$(jq -r '.description' "$TRIGGER_TEST_STATE"/tasks/*.json)" "(5 missed runs)" "missed runs reported"
+    assert_true "$(jq '.workstation.schedules[0].last_run != null' "$TRIGGER_TEST_STATE/config.json")" \
+        "schedule last_run recorded"
+
+    # A fire that was not acknowledged (crash) is repeated without a duplicate task
+    jq --arg k "$key" --argjson t "$((now - 120))" '.entries[$k].pending = [{slot: $t, missed: 0}]' \
+        "$TRIGGER_TEST_STATE/state/schedules.json" > "$TRIGGER_TEST_STATE/state/s.tmp" && mv "$TRIGGER_TEST_STATE/state/s.tmp" "$TRIGGER_TEST_STATE/state/schedules.json"
+    local id
+    id=$(jq -r '.id' "$TRIGGER_TEST_STATE"/tasks/*.json | sed 's/-[0-9]*$//')
+    jq -n --arg id "$id-$((now - 120))" '{id: $id}' > "$TRIGGER_TEST_STATE/tasks/$id-$((now - 120)).json"
+    bash "$triggers" check_sched >/dev/null
+    assert_equals "2" "$(ls "$TRIGGER_TEST_STATE/tasks" | wc -l)" "re-delivered slot creates nothing new"
+    assert_equals "0" "$(jq --arg k "$key" '.entries[$k].pending | length' "$TRIGGER_TEST_STATE/state/schedules.json")" \
+        "re-delivered slot acknowledged"
+
+    # catch_up policies on the trigger: all fires each missed slot, skip drops stale ones
+    rm -f "$TRIGGER_TEST_STATE"/tasks/*.json
+    jq '.scheduler.grace_seconds = 0' "$TRIGGER_TEST_STATE/config.json" > "$TRIGGER_TEST_STATE/config.tmp" &&
+        mv "$TRIGGER_TEST_STATE/config.tmp" "$TRIGGER_TEST_STATE/config.json"
+    jq '.triggers[0].catch_up = "skip"' "$TRIGGER_TEST_STATE/state/triggers.json" > "$TRIGGER_TEST_STATE/state/t.tmp" &&
+        mv "$TRIGGER_TEST_STATE/state/t.tmp" "$TRIGGER_TEST_STATE/state/triggers.json"
+    jq --argjson t "$((now - 3 * 86400))" \
+        '.entries["trigger:nightly"].next = $t | .heap = [.entries | to_entries[] | [.value.next, .key]] | .heap |= sort' \
+        "$TRIGGER_TEST_STATE/state/schedules.json" > "$TRIGGER_TEST_STATE/state/s.tmp" && mv "$TRIGGER_TEST_STATE/state/s.tmp" "$TRIGGER_TEST_STATE/state/schedules.json"
+    bash "$triggers" check_sched >/dev/null
+    assert_equals "0" "$(ls "$TRIGGER_TEST_STATE/tasks" | grep -c nightly)" "skip policy drops stale runs"
+
+    jq '.triggers[0].catch_up = "all"' "$TRIGGER_TEST_STATE/state/triggers.json" > "$TRIGGER_TEST_STATE/state/t.tmp" &&
+        mv "$TRIGGER_TEST_STATE/state/t.tmp" "$TRIGGER_TEST_STATE/state/triggers.json"
+    jq --argjson t "$((now - 3 * 86400))" \
+        '.entries["trigger:nightly"].next = $t | .heap = [.entries | to_entries[] | [.value.next, .key]] | .heap |= sort' \
+        "$TRIGGER_TEST_STATE/state/schedules.json" > "$TRIGGER_TEST_STATE/state/s.tmp" && mv "$TRIGGER_TEST_STATE/state/s.tmp" "$TRIGGER_TEST_STATE/state/schedules.json"
+    bash "$triggers" check_sched >/dev/null
+    assert_true "$( (( $(ls "$TRIGGER_TEST_STATE/tasks" | grep -c nightly) >= 3 )) && echo true || echo false)" "all policy fires every missed run"
+    assert_equals "$(jq -r '.heap[0][0]' "$TRIGGER_TEST_STATE/state/schedules.json")" \
+        "$(cat "$TRIGGER_TEST_STATE/state/schedule.next")" "schedule.next tracks the earliest schedule"
+
+}
+
+test_trigger_windows() {
+    echo "  Testing debounce and coalescing windows for triggers..."
+
+    setup_trigger_test
+    local triggers="$TRIGGER_TEST_STATE/lib/event-triggers.sh" src="$TRIGGER_TEST_STATE/src" i
+    bash "$triggers" register build file_change "$src" "Rebuild" >/dev/null
+    bash "$triggers" tune build debounce_seconds=1 cooldown_seconds=0 >/dev/null
+    for i in 1 2 3; do
+        bash "$triggers" fire build "File changed: $src" "" "" "$(printf '%s\n' "$src/f$i" "$src/shared")" >/dev/null
+    done
+    assert_equals "0" "$(ls "$TRIGGER_TEST_STATE/tasks" | wc -l)" "events held until the trigger goes quiet"
+    assert_true "$(test -s "$TRIGGER_TEST_STATE/state/triggers.next" && echo true || echo false)" \
+        "settle time published for the daemon"
+    sleep 2
+    bash "$triggers" check >/dev/null
+    assert_equals "1" "$(ls "$TRIGGER_TEST_STATE/tasks" | wc -l)" "a burst becomes one task"
+    local task
+    task=$(ls "$TRIGGER_TEST_STATE"/tasks/*.json)
+    assert_contains "$(jq -r '.description' "$task")" \
+        "(4 paths: $src/f1, $src/shared, $src/f2, $src/f3) [3 events coalesced" "task lists every changed path"
+
+    # In cooldown, events join the open task instead of being dropped
+    bash "$triggers" tune build debounce_seconds=0 cooldown_seconds=300 >/dev/null
+    bash "$triggers" fire build "File changed: $src" "" "" "$src/late" >/dev/null
+    assert_equals "1" "$(ls "$TRIGGER_TEST_STATE/tasks" | wc -l)" "cooldown folds events into the open task"
+    assert_equals "4 5" "$(jq -r '"\(.coalesced.events) \(.coalesced.paths | length)"' "$task")" \
+        "open task carries the later event"
+
+    # Once the task is taken, cooldown holds new events for the next task
+    jq '.status = "completed"' "$task" > "$task.tmp" && mv "$task.tmp" "$task"
+    assert_contains "$(bash "$triggers" fire build "webhook 0")" "Trigger held" "held while in cooldown"
+
+    # No more than max_pending_tasks open tasks per trigger
+    bash "$triggers" tune build cooldown_seconds=0 max_pending_tasks=2 >/dev/null
+    for i in 1 2 3 4; do bash "$triggers" fire build "webhook $i" >/dev/null; done
+    assert_equals "2" "$(jq -s '[.[] | select(.status == "pending")] | length' "$TRIGGER_TEST_STATE"/tasks/*.json)" \
+        "open tasks capped per trigger"
+    assert_equals "5" "$(jq -s '[.[] | select(.status == "pending") | .coalesced.events] | add' "$TRIGGER_TEST_STATE"/tasks/*.json)" \
+        "no event lost at the cap"
+
+    # A task claimed while an event was being folded into it is left alone
+    local newest
+    newest=$(jq -rs '[.[] | select(.status == "pending")] | sort_by(.created_at, .id) | .[-1].id' "$TRIGGER_TEST_STATE"/tasks/*.json)
+    for task in "$TRIGGER_TEST_STATE"/tasks/*.json; do
+        [[ "$task" == */"$newest.json" ]] || { jq '.status = "completed"' "$task" > "$task.tmp" && mv "$task.tmp" "$task"; }
+    done
+    bash "$triggers" tune build max_pending_tasks=1 >/dev/null
+    task="$TRIGGER_TEST_STATE/tasks/$newest.json"
+    mkdir -p "$TRIGGER_TEST_STATE/state/task-locks"
+    (
+        flock 9
+        sleep 1
+        jq '.status = "ai_processing"' "$task" > "$task.tmp" && mv "$task.tmp" "$task"
+    ) 9> "$TRIGGER_TEST_STATE/state/task-locks/$newest.lock" &
+    local holder=$!
+    sleep 0.3
+    bash "$triggers" fire build "webhook raced" >/dev/null
+    wait "$holder"
+    assert_not_contains "$(jq -r '.description' "$task")" "webhook raced" "claimed task not rewritten"
+    assert_contains "$(jq -r 'select(.status == "pending") | .description' "$TRIGGER_TEST_STATE"/tasks/*.json)" "webhook raced" \
+        "event goes to a new task instead"
+
+    # Concurrent fires in the same second keep every task and every count
+    bash "$triggers" register burst webhook ci "Burst" >/dev/null
+    bash "$triggers" tune burst cooldown_seconds=0 max_pending_tasks=100 >/dev/null
+    local pids=()
+    for i in 1 2 3 4 5 6; do
+        bash "$triggers" fire burst "burst $i" >/dev/null &
+        pids+=($!)
+    done
+    wait "${pids[@]}"
+    assert_equals "6" "$(ls "$TRIGGER_TEST_STATE"/tasks/trigger-burst-*.json | wc -l | tr -d ' ')" "no task overwritten"
+    assert_equals "6" "$(jq '.triggers[] | select(.name == "burst") | .fire_count' "$TRIGGER_TEST_STATE/state/triggers.json")" \
+        "no fire count lost"
+}
+
+# ============================================================
+# Run all tests
+# ============================================================
+
+test_fs_watcher_events
+test_tree_manifest_changes
+test_git_ref_triggers
+test_schedule_engine
+test_trigger_windows
+
+rm -rf "$TRIGGER_TEST_STATE"
+
+report_suite_results "Trigger Tests"
@@ -1,16 +1,21 @@
 #!/usr/bin/env python3
 """rar-file/autonomy Dashboard with Heartbeat Timer"""
 
+import http.client
 import json
 import os
 import signal
+import socket
 import subprocess
 import sys
 import threading
+import time
 import html as html_module
+from collections import OrderedDict
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from socketserver import ThreadingMixIn
 from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
 
 AUTONOMY_DIR = os.environ.get("AUTONOMY_DIR", os.path.dirname(os.path.abspath(__file__)))
 CONFIG_FILE = f"{AUTONOMY_DIR}/config.json"
@@ -23,6 +28,512 @@ class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
     allow_reuse_address = True
 
+
+# ── Chart series (downsampled) ───────────────────────────────
+
+# Series name -> (log file, extractor). Extractors turn one JSONL entry into
+# a y value, or None to skip it.
+SERIES_SOURCES = {
+    # Only provider calls carry token counts; other actions in the same log
+    # (e.g. evidence_gathered) use "total" for something else
+    "tokens": (f"{LOGS_DIR}/ai-engine.jsonl",
+               lambda e: e.get("total") if "input_tokens" in e or "output_tokens" in e else None),
+    "activity": (f"{LOGS_DIR}/agentic.jsonl", lambda e: 1),
+}
+SERIES_CACHE_MAX = 32
+_series_cache = OrderedDict()
+_series_cache_lock = threading.Lock()
+
+
+def parse_window(value, default=86400):
+    """Parse a window like '30d', '24h', '90m' or '3600' into seconds"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    value = (value or "").strip().lower()
+    try:
+        if value and value[-1] in units:
+            return max(60, int(value[:-1]) * units[value[-1]])
+        return max(60, int(value)) if value else default
+    except ValueError:
+        return default
+
+
+def lttb_downsample(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of [(x, y), ...] sorted by x"""
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average point of the next bucket is the third triangle vertex
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_len = avg_end - avg_start
+        avg_x = sum(p[0] for p in points[avg_start:avg_end]) / avg_len
+        avg_y = sum(p[1] for p in points[avg_start:avg_end]) / avg_len
+
+        ax, ay = points[a]
+        best, best_area = int(i * every) + 1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def iter_json_log(path):
+    """Yield JSON objects from a log of concatenated entries.
+
+    Bash writers append `jq -n` output, which may be pretty-printed across
+    several lines, so entries are decoded back to back rather than per line.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        content = f.read()
+    pos, end = 0, len(content)
+    while pos < end:
+        while pos < end and content[pos].isspace():
+            pos += 1
+        if pos >= end:
+            break
+        try:
+            entry, pos = decoder.raw_decode(content, pos)
+        except ValueError:
+            nl = content.find('\n', pos)
+            pos = end if nl < 0 else nl + 1
+            continue
+        if isinstance(entry, dict):
+            yield entry
+
+
+def load_series(name, since):
+    """Read (epoch, value) points for a series from its JSONL log, oldest first"""
+    log_file, extract = SERIES_SOURCES[name]
+    points = []
+    if not os.path.exists(log_file):
+        return points
+    for entry in iter_json_log(log_file):
+        try:
+            ts = datetime.fromisoformat(entry["timestamp"].replace('Z', '+00:00')).timestamp()
+        except Exception:
+            continue
+        if ts < since:
+            continue
+        value = extract(entry)
+        if isinstance(value, (int, float)):
+            points.append((int(ts), value))
+    points.sort(key=lambda p: p[0])
+
+    # Event series are charted as counts per minute
+    if name == "activity":
+        buckets = OrderedDict()
+        for ts, value in points:
+            buckets[ts - ts % 60] = buckets.get(ts - ts % 60, 0) + value
+        points = list(buckets.items())
+    return points
+
+
+def downsampled_series(name, window, max_points):
+    """Downsample a series over the trailing window, caching repeat views.
+
+    The window end is rounded up to one bucket width so that repeated views
+    of the same window and resolution share a cache entry until either the
+    bucket rolls over or the underlying log changes.
+    """
+    log_file = SERIES_SOURCES[name][0]
+    try:
+        st = os.stat(log_file)
+        fingerprint = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        fingerprint = None
+
+    bucket = max(1, window // max_points)
+    end = (int(time.time()) // bucket + 1) * bucket
+    key = (name, window, max_points, end, fingerprint)
+
+    with _series_cache_lock:
+        if key in _series_cache:
+            _series_cache.move_to_end(key)
+            return _series_cache[key]
+
+    raw = load_series(name, end - window)
+    result = {
+        "series": name,
+        "window": window,
+        "start": end - window,
+        "end": end,
+        "raw_points": len(raw),
+        "points": [[x, y] for x, y in lttb_downsample(raw, max_points)],
+    }
+
+    with _series_cache_lock:
+        _series_cache[key] = result
+        while len(_series_cache) > SERIES_CACHE_MAX:
+            _series_cache.popitem(last=False)
+    return result
+
+
+def read_partial_output(task, limit=1500):
+    """Tail of the streamed AI output for a task (state/ai_progress/<task>.log)."""
+    if not task:
+        return ""
+    path = f"{AUTONOMY_DIR}/state/ai_progress/{os.path.basename(str(task))}.log"
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - limit))
+            return f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return ""
+
+
+def partial_output_logs(partial, count=3):
+    """Last few non-empty lines of partial output, escaped for the activity box."""
+    lines = [line.strip() for line in partial.splitlines() if line.strip()]
+    return [html_module.escape(line[-200:]) for line in lines[-count:]]
+
+
+STEP_LOG_PAGE_MAX = 1024 * 1024
+
+
+def read_step_log(task, step, offset=0, limit=65536):
+    """One page of an execution step's output log (logs/steps/<task>/step-<n>.log).
+
+    Returns None if the log does not exist. A negative offset counts back
+    from the end, so offset=-limit reads the last page.
+    """
+    path = f"{LOGS_DIR}/steps/{os.path.basename(str(task))}/step-{int(step)}.log"
+    limit = min(max(int(limit), 1), STEP_LOG_PAGE_MAX)
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = int(offset)
+            if offset < 0:
+                offset = max(0, size + offset)
+            offset = min(offset, size)
+            f.seek(offset)
+            data = f.read(limit)
+    except OSError:
+        return None
+    next_offset = offset + len(data)
+    return {
+        "task": task,
+        "step": int(step),
+        "offset": offset,
+        "next_offset": next_offset,
+        "size": size,
+        "eof": next_offset >= size,
+        "content": data.decode("utf-8", errors="replace"),
+    }
+
+
+def read_token_usage():
+    """Today's token usage from the ledger rollup (token-budget.sh state)."""
+    state = {"date": datetime.now().strftime("%Y-%m-%d"), "used": 0, "sessions": 0}
+    try:
+        result = subprocess.run(["bash", f"{AUTONOMY_DIR}/lib/token-budget.sh", "state"],
+                                capture_output=True, text=True, timeout=10)
+        state.update(json.loads(result.stdout))
+    except (OSError, subprocess.SubprocessError, ValueError):
+        pass
+    return state
+
+
+AGENT_SUPERVISOR_SOCK = f"{AUTONOMY_DIR}/state/agent-supervisor.sock"
+# Supervisor job states as sub-agents.sh names them
+AGENT_JOB_STATUS = {"running": "active", "queued": "pending"}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket."""
+
+    def __init__(self, path, timeout=2):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def read_live_agents():
+    """Sub-agent status from the agent supervisor's in-memory view.
+
+    Returns None when the supervisor is not running, so callers can fall
+    back to sub-agents.sh.
+    """
+    if not os.path.exists(AGENT_SUPERVISOR_SOCK):
+        return None
+    conn = UnixHTTPConnection(AGENT_SUPERVISOR_SOCK)
+    try:
+        conn.request("GET", "/agents")
+        resp = conn.getresponse()
+        if resp.status != 200:
+            return None
+        view = json.loads(resp.read())
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+    agents = []
+    for agent in view.get("agents", []):
+        status = AGENT_JOB_STATUS.get(agent.get("status"), agent.get("status"))
+        if status in ("active", "pending"):
+            agents.append(dict(agent, status=status, parent_task=agent.get("parent")))
+    active = sum(1 for a in agents if a["status"] == "active")
+    counters = view.get("counters", {})
+    return {
+        "active_agents": active,
+        "max_agents": view.get("slots", 3),
+        "available_slots": max(0, view.get("slots", 3) - active),
+        "total_spawned": counters.get("agents", 0),
+        "total_completed": counters.get("agents_completed", 0),
+        "agents": agents,
+        "supervisor": True,
+    }
+
+
+# ── Webhook queue ────────────────────────────────────────────
+
+WEBHOOK_DIR = f"{AUTONOMY_DIR}/state/webhooks"
+# Headers senders repeat when they redeliver the same event
+WEBHOOK_KEY_HEADERS = ("Idempotency-Key", "X-GitHub-Delivery", "X-Gitea-Delivery", "X-Gitlab-Event-UUID")
+
+
+class WebhookQueue:
+    """Durable, bounded spool of webhook events with a single consumer.
+
+    An accepted event is written to state/webhooks/queue/<id>.json before
+    the 202 goes out; ids carry the arrival time in nanoseconds, so they
+    sort in arrival order. One consumer thread drains the spool oldest
+    first, firing a whole batch through one `event-triggers.sh fire_batch`
+    run, and appends the outcomes to state/webhooks/processed.jsonl before
+    deleting the batch from the spool. A restart resumes where it stopped.
+
+    Idempotency keys of queued and recently processed events are kept, so
+    a redelivered event gets its original id back instead of firing again.
+    """
+
+    def __init__(self, base=WEBHOOK_DIR, max_depth=1000, batch_size=50, keep=2000):
+        self.spool = f"{base}/queue"
+        self.journal = f"{base}/processed.jsonl"
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.queue = []            # queued event ids, oldest first
+        self.keys = OrderedDict()  # idempotency key -> event id
+        self.done = OrderedDict()  # event id -> outcome, most recent last
+        self.journal_lines = 0
+        self.last_ns = 0
+        self.thread = None
+        self.counters = {"accepted": 0, "duplicates": 0, "rejected": 0,
+                         "processed": 0, "failed": 0, "batches": 0}
+        self.last_batch = None
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.spool, exist_ok=True)
+        if os.path.exists(self.journal):
+            with open(self.journal) as f:
+                for line in f:
+                    try:
+                        outcome = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.journal_lines += 1
+                    self._remember(outcome)
+        for name in sorted(os.listdir(self.spool)):
+            if not name.endswith(".json"):
+                continue
+            event_id = name[:-5]
+            if event_id in self.done:
+                # Processed, but the crash came before its spool file went
+                os.unlink(os.path.join(self.spool, name))
+                continue
+            try:
+                with open(os.path.join(self.spool, name)) as f:
+                    event = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self.queue.append(event_id)
+            if event.get("key"):
+                self.keys[event["key"]] = event_id
+        if self.queue:
+            self.last_ns = int(self.queue[-1].split("-")[1])
+
+    def _remember(self, outcome):
+        self.done[outcome["id"]] = outcome
+        if outcome.get("key"):
+            self.keys[outcome["key"]] = outcome["id"]
+        while len(self.done) > self.keep:
+            self.done.popitem(last=False)
+        while len(self.keys) > self.keep + self.max_depth:
+            self.keys.popitem(last=False)
+
+    def enqueue(self, trigger, data, key=None):
+        """Spool an event; return (event id, duplicate), or (None, False) when full."""
+        with self.lock:
+            if key and key in self.keys:
+                self.counters["duplicates"] += 1
+                return self.keys[key], True
+            if len(self.queue) >= self.max_depth:
+                self.counters["rejected"] += 1
+                return None, False
+            ns = max(time.time_ns(), self.last_ns + 1)
+            self.last_ns = ns
+            event_id = f"evt-{ns}"
+            path = os.path.join(self.spool, f"{event_id}.json")
+            with open(f"{path}.tmp", "w") as f:
+                json.dump({"id": event_id, "trigger": trigger, "data": data, "key": key,
+                           "received": ns / 1e9}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{path}.tmp", path)
+            self.queue.append(event_id)
+            if key:
+                self.keys[key] = event_id
+            self.counters["accepted"] += 1
+        self.wake.set()
+        return event_id, False
+
+    def process_batch(self):
+        """Fire the oldest queued events; return how many were handled."""
+        with self.lock:
+            ids = self.queue[:self.batch_size]
+        if not ids:
+            return 0
+        events = []
+        for event_id in ids:
+            try:
+                with open(os.path.join(self.spool, f"{event_id}.json")) as f:
+                    events.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        started = time.time()
+        results = {}
+        try:
+            result = subprocess.run(
+                ["bash", os.path.join(AUTONOMY_DIR, "lib", "event-triggers.sh"), "fire_batch"],
+                input=json.dumps(events), capture_output=True, text=True, timeout=60 + 5 * len(events))
+            for line in result.stdout.splitlines():
+                try:
+                    item = json.loads(line)
+                    results[item["id"]] = item
+                except (ValueError, KeyError, TypeError):
+                    continue
+            error = result.stderr.strip()[-200:] or f"fire_batch exited {result.returncode}"
+        except (OSError, subprocess.SubprocessError) as e:
+            error = str(e)
+        finished = time.time()
+
+        outcomes = []
+        for event in events:
+            item = results.get(event["id"], {"ok": False, "message": error})
+            outcomes.append({"id": event["id"], "trigger": event.get("trigger"), "key": event.get("key"),
+                             "received": event.get("received"), "processed": round(finished, 3),
+                             "ok": bool(item.get("ok")), "message": item.get("message", "")})
+        with open(self.journal, "a") as f:
+            for outcome in outcomes:
+                f.write(json.dumps(outcome) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        for event_id in ids:
+            try:
+                os.unlink(os.path.join(self.spool, f"{event_id}.json"))
+            except OSError:
+                pass
+
+        with self.lock:
+            del self.queue[:len(ids)]
+            for outcome in outcomes:
+                self._remember(outcome)
+            self.journal_lines += len(outcomes)
+            self.counters["batches"] += 1
+            self.counters["processed"] += sum(1 for o in outcomes if o["ok"])
+            self.counters["failed"] += sum(1 for o in outcomes if not o["ok"])
+            self.last_batch = {"size": len(ids), "at": round(finished, 3),
+                               "duration_ms": int((finished - started) * 1000)}
+            if self.journal_lines > 2 * self.keep:
+                self._compact()
+        return len(ids)
+
+    def _compact(self):
+        """Rewrite the journal down to the outcomes still remembered."""
+        tmp = f"{self.journal}.tmp"
+        with open(tmp, "w") as f:
+            for outcome in self.done.values():
+                f.write(json.dumps(outcome) + "\n")
+        os.replace(tmp, self.journal)
+        self.journal_lines = len(self.done)
+
+    def run(self):
+        while True:
+            self.wake.clear()
+            try:
+                handled = self.process_batch()
+            except Exception as e:
+                print(f"Webhook consumer error: {e}", file=sys.stderr)
+                handled = 0
+            if not handled:
+                self.wake.wait(5)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="webhook-consumer", daemon=True)
+            self.thread.start()
+
+    def status(self, event_id=None):
+        """Queue depth and lag, or where one event stands."""
+        now = time.time()
+        with self.lock:
+            if event_id:
+                if event_id in self.done:
+                    return dict(self.done[event_id], state="processed")
+                if event_id in self.queue:
+                    return {"id": event_id, "state": "queued", "position": self.queue.index(event_id) + 1}
+                return None
+            oldest = int(self.queue[0].split("-")[1]) / 1e9 if self.queue else None
+            recent = list(self.done.values())[-10:]
+            return {
+                "depth": len(self.queue),
+                "max_depth": self.max_depth,
+                "lag_seconds": round(now - oldest, 3) if oldest else 0,
+                "consumer_running": bool(self.thread and self.thread.is_alive()),
+                "counters": dict(self.counters),
+                "last_batch": self.last_batch,
+                # Time from arrival to processing, over the last few events
+                "recent_latency_seconds": round(max((o["processed"] - o["received"] for o in recent
+                                                     if o.get("received")), default=0), 3),
+                "recent": recent,
+            }
+
+
+_webhook_queue = None
+_webhook_queue_lock = threading.Lock()
+
+
+def webhook_queue():
+    """The process-wide webhook queue, sized from config.json's webhooks section."""
+    global _webhook_queue
+    with _webhook_queue_lock:
+        if _webhook_queue is None:
+            try:
+                with open(CONFIG_FILE) as f:
+                    settings = json.load(f).get("webhooks") or {}
+            except (OSError, ValueError, AttributeError):
+                settings = {}
+            _webhook_queue = WebhookQueue(max_depth=int(settings.get("queue_max", 1000)),
+                                          batch_size=int(settings.get("batch_size", 50)))
+        return _webhook_queue
+
 HTML_TEMPLATE = '''<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -2630,7 +3141,7 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
                 }
                 el.innerHTML = '<div class="task-list">' + agents.map(function(a) {
                     const statusColor = a.status === 'active' ? '#22c55e' : '#f59e0b';
-                    return '<div class="task-item"><div class="task-header"><span class="task-name">' + escapeHtml(a.name) + '</span><span class="task-status" style="background: ' + statusColor + '20; color: ' + statusColor + '; border: 1px solid ' + statusColor + '40;">' + a.status + '</span></div><div class="task-desc">Parent: ' + escapeHtml(a.parent_task || 'manual') + '</div></div>';
+                    return '<div class="task-item"><div class="task-header"><span class="task-name">' + escapeHtml(a.name) + '</span><span class="task-status" style="background: ' + statusColor + '20; color: ' + statusColor + '; border: 1px solid ' + statusColor + '40;">' + a.status + '</span></div><div class="task-desc">Parent: ' + escapeHtml(a.parent_task || 'manual') + (a.phase ? ' · ' + escapeHtml(a.phase) : '') + (a.percent != null ? ' · ' + a.percent + '%' : '') + '</div></div>';
                 }).join('') + '</div>';
             } catch(e) { console.log('Sub-agents load failed'); }
         }
@@ -3185,8 +3696,24 @@ METRICS_TEMPLATE = '''<!DOCTYPE html>
         </div>
     </div>
 
+    <div class="grid">
+        <div class="card" style="grid-column: span 2;">
+            <h3>Token Usage &mdash; Last 30 Days</h3>
+            <div class="chart-container">
+                <canvas id="tokenHistoryChart"></canvas>
+            </div>
+        </div>
+        <div class="card" style="grid-column: span 1;">
+            <h3>Activity &mdash; Last 24 Hours</h3>
+            <div class="chart-container">
+                <canvas id="activityChart"></canvas>
+            </div>
+        </div>
+    </div>
+
     <script>
         let taskChart = null;
+        const seriesCharts = {};
 
         async function loadMetrics() {
             try {
@@ -3214,11 +3741,79 @@ METRICS_TEMPLATE = '''<!DOCTYPE html>
 
                 // Update activity log
                 updateActivityLog(data.activity);
+
+                // Update history charts (server-side downsampled)
+                loadSeriesChart('tokenHistoryChart', 'tokens', '30d', '#ffc107');
+                loadSeriesChart('activityChart', 'activity', '24h', '#e94560');
             } catch (error) {
                 console.error('Failed to load metrics:', error);
             }
         }
 
+        // Fetch a series downsampled to roughly one point per 2px of chart width
+        async function loadSeriesChart(canvasId, series, windowSpec, color) {
+            const canvas = document.getElementById(canvasId);
+            const maxPoints = Math.max(50, Math.min(500, Math.floor((canvas.parentElement.clientWidth || 600) / 2)));
+            try {
+                const response = await fetch(`/api/metrics/series?series=${series}&window=${windowSpec}&max_points=${maxPoints}`);
+                const data = await response.json();
+                const points = (data.points || []).map(p => ({x: p[0], y: p[1]}));
+
+                if (seriesCharts[canvasId]) {
+                    const chart = seriesCharts[canvasId];
+                    chart.data.datasets[0].data = points;
+                    chart.options.scales.x.min = data.start;
+                    chart.options.scales.x.max = data.end;
+                    chart.update('none');
+                    return;
+                }
+
+                seriesCharts[canvasId] = new Chart(canvas.getContext('2d'), {
+                    type: 'line',
+                    data: {
+                        datasets: [{
+                            data: points,
+                            borderColor: color,
+                            backgroundColor: color + '33',
+                            borderWidth: 1.5,
+                            pointRadius: 0,
+                            fill: true
+                        }]
+                    },
+                    options: {
+                        responsive: true,
+                        maintainAspectRatio: false,
+                        parsing: false,
+                        normalized: true,
+                        animation: false,
+                        plugins: { legend: { display: false } },
+                        scales: {
+                            x: {
+                                type: 'linear',
+                                min: data.start,
+                                max: data.end,
+                                ticks: {
+                                    color: '#6b6b8a',
+                                    maxTicksLimit: 6,
+                                    callback: v => data.window > 86400
+                                        ? new Date(v * 1000).toLocaleDateString()
+                                        : new Date(v * 1000).toLocaleTimeString([], {hour: '2-digit', minute: '2-digit'})
+                                },
+                                grid: { color: 'rgba(255,255,255,0.05)' }
+                            },
+                            y: {
+                                beginAtZero: true,
+                                ticks: { color: '#6b6b8a' },
+                                grid: { color: 'rgba(255,255,255,0.05)' }
+                            }
+                        }
+                    }
+                });
+            } catch (error) {
+                console.error(`Failed to load ${series} series:`, error);
+            }
+        }
+
         function updateChart(tasks) {
             const ctx = document.getElementById('taskChart').getContext('2d');
             
@@ -3313,6 +3908,10 @@ class Handler(BaseHTTPRequestHandler):
             self.serve_tasks()
         elif self.path == "/api/metrics":
             self.serve_metrics()
+        elif self.path.startswith("/api/metrics/series"):
+            self.serve_metrics_series()
+        elif self.path.startswith("/api/execution/step-log"):
+            self.serve_step_log()
         elif self.path.startswith("/api/task/"):
             task_name = self.path.split("/")[-1]
             self.serve_task(task_name)
@@ -3344,6 +3943,8 @@ class Handler(BaseHTTPRequestHandler):
             self.serve_terminal_history()
         elif self.path == "/api/settings":
             self.serve_settings()
+        elif self.path.startswith("/api/webhook/status"):
+            self.serve_webhook_status()
         else:
             self.send_error(404)
       except Exception as e:
@@ -3535,6 +4136,7 @@ class Handler(BaseHTTPRequestHandler):
             if os.path.exists(needs_attention):
                 with open(needs_attention, 'r') as f:
                     attention = json.load(f)
+                    partial = read_partial_output(attention.get("task_name"))
                     self.send_json({
                         "status": "processing",
                         "task": attention.get("task_name"),
@@ -3543,7 +4145,8 @@ class Handler(BaseHTTPRequestHandler):
                         "updated_at": datetime.now().isoformat(),
                         "progress": 50,
                         "message": "AI is processing: " + attention.get("task_name", "task"),
-                        "logs": ["Task flagged for AI processing", "AI will start working soon..."]
+                        "partial_output": partial,
+                        "logs": partial_output_logs(partial) or ["Task flagged for AI processing", "AI will start working soon..."]
                     })
                 return
             
@@ -3554,6 +4157,10 @@ class Handler(BaseHTTPRequestHandler):
                     activity = json.load(f)
                     # Only return if actually processing
                     if activity.get("status") in ["processing", "working"]:
+                        partial = read_partial_output(activity.get("task"))
+                        if partial:
+                            activity["partial_output"] = partial
+                            activity["logs"] = partial_output_logs(partial)
                         self.send_json(activity)
                         return
             
@@ -3736,10 +4343,12 @@ class Handler(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_json({"success": False, "error": str(e)}, 500)
     
-    def send_json(self, data, status=200):
+    def send_json(self, data, status=200, headers=None):
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Access-Control-Allow-Origin", "*")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(json.dumps(data).encode())
     
@@ -3778,9 +4387,7 @@ class Handler(BaseHTTPRequestHandler):
                         pass
             
             # Get token usage estimate
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-            token_usage = config.get('workstation', {}).get('token_usage_today', 0)
+            token_usage = read_token_usage()["used"]
             
             # Check daemon status
             daemon_running = os.path.exists(f"{AUTONOMY_DIR}/state/daemon.pid")
@@ -3795,6 +4402,44 @@ class Handler(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_json({"error": str(e)}, 500)
 
+    def serve_metrics_series(self):
+        """Serve a time series downsampled with LTTB for charting"""
+        try:
+            query = parse_qs(urlparse(self.path).query)
+            name = query.get("series", ["tokens"])[0]
+            if name not in SERIES_SOURCES:
+                self.send_json({"error": f"Unknown series: {name}", "available": sorted(SERIES_SOURCES)}, 400)
+                return
+            window = parse_window(query.get("window", ["30d"])[0])
+            try:
+                max_points = int(query.get("max_points", ["200"])[0])
+            except ValueError:
+                max_points = 200
+            max_points = min(max(max_points, 3), 2000)
+            self.send_json(downsampled_series(name, window, max_points))
+        except Exception as e:
+            self.send_json({"error": str(e)}, 500)
+
+    def serve_step_log(self):
+        """Page through the full output log of one execution step"""
+        try:
+            query = parse_qs(urlparse(self.path).query)
+            task = query.get("task", [""])[0]
+            try:
+                step = int(query.get("step", [""])[0])
+                offset = int(query.get("offset", ["0"])[0])
+                limit = int(query.get("limit", ["65536"])[0])
+            except ValueError:
+                self.send_json({"error": "step, offset and limit must be integers"}, 400)
+                return
+            page = read_step_log(task, step, offset, limit) if task else None
+            if page is None:
+                self.send_json({"error": "Step log not found"}, 404)
+                return
+            self.send_json(page)
+        except Exception as e:
+            self.send_json({"error": str(e)}, 500)
+
     def serve_manifest(self):
         """Serve Web App Manifest for PWA"""
         manifest = {
@@ -3900,7 +4545,6 @@ class Handler(BaseHTTPRequestHandler):
     def serve_token_budget(self):
         """Serve token budget status"""
         try:
-            token_file = f"{AUTONOMY_DIR}/state/token_usage.json"
             budget = 50000
             
             # Get budget from config
@@ -3909,11 +4553,8 @@ class Handler(BaseHTTPRequestHandler):
                     config = json.load(f)
                 budget = config.get("agentic_config", {}).get("hard_limits", {}).get("daily_token_budget", 50000)
             
-            state = {"date": datetime.now().strftime("%Y-%m-%d"), "used": 0, "sessions": 0, "budget": budget}
-            if os.path.exists(token_file):
-                with open(token_file, 'r') as f:
-                    state = json.load(f)
-                state["budget"] = budget
+            state = read_token_usage()
+            state["budget"] = budget
             
             state["remaining"] = budget - state.get("used", 0)
             pct = int((state.get("used", 0) / budget * 100)) if budget > 0 else 0
@@ -4092,6 +4733,10 @@ class Handler(BaseHTTPRequestHandler):
 
     def serve_sub_agents(self):
         try:
+            live = read_live_agents()
+            if live is not None:
+                self.send_json(live)
+                return
             result = subprocess.run(["bash", f"{AUTONOMY_DIR}/lib/sub-agents.sh", "status"],
                                     capture_output=True, text=True, timeout=10)
             if result.returncode == 0 and result.stdout.strip():
@@ -4136,13 +4781,15 @@ class Handler(BaseHTTPRequestHandler):
             args = ["bash", f"{AUTONOMY_DIR}/lib/ai-engine.sh", "commit"]
             if message:
                 args.append(message)
-            result = subprocess.run(args, capture_output=True, text=True, timeout=30)
+            # Interactive lane: served ahead of queued background AI work
+            result = subprocess.run(args, capture_output=True, text=True, timeout=30,
+                                    env=dict(os.environ, AI_PRIORITY="interactive"))
             self.send_json({"success": result.returncode == 0, "output": result.stdout.strip()})
         except Exception as e:
             self.send_json({"success": False, "error": str(e)}, 500)
 
     def handle_webhook(self):
-        """Handle incoming webhook to fire event triggers"""
+        """Queue an incoming webhook for its event trigger; answer 202 with the event id"""
         try:
             content_len = int(self.headers.get("Content-Length", 0))
             body = json.loads(self.rfile.read(content_len)) if content_len > 0 else {}
@@ -4151,22 +4798,43 @@ class Handler(BaseHTTPRequestHandler):
             if not trigger_name:
                 self.send_json({"error": "trigger name required"}, 400)
                 return
-            trigger_script = os.path.join(AUTONOMY_DIR, "lib", "event-triggers.sh")
-            if not os.path.exists(trigger_script):
-                self.send_json({"error": "event-triggers.sh not found"}, 404)
+            try:
+                with open(f"{AUTONOMY_DIR}/state/triggers.json") as f:
+                    known = {t.get("name") for t in json.load(f).get("triggers", [])}
+            except (OSError, ValueError):
+                known = set()
+            if trigger_name not in known:
+                self.send_json({"success": False, "error": f"Trigger not found: {trigger_name}"}, 404)
+                return
+            key = body.get("idempotency_key") or next(
+                (self.headers[h] for h in WEBHOOK_KEY_HEADERS if self.headers.get(h)), None)
+            event_id, duplicate = webhook_queue().enqueue(trigger_name, event_data, key)
+            if event_id is None:
+                self.send_json({"success": False, "error": "webhook queue full"}, 503,
+                               headers={"Retry-After": "30"})
                 return
-            result = subprocess.run(
-                ["bash", trigger_script, "fire", trigger_name, str(event_data)],
-                capture_output=True, text=True, timeout=15
-            )
             self.send_json({
-                "success": result.returncode == 0,
-                "message": result.stdout.strip(),
-                "trigger": trigger_name
-            })
+                "success": True,
+                "event_id": event_id,
+                "duplicate": duplicate,
+                "trigger": trigger_name,
+                "status_url": f"/api/webhook/status?id={event_id}"
+            }, 200 if duplicate else 202)
         except Exception as e:
             self.send_json({"success": False, "error": str(e)}, 500)
 
+    def serve_webhook_status(self):
+        """Webhook queue depth and lag, or one event's state with ?id="""
+        try:
+            event_id = parse_qs(urlparse(self.path).query).get("id", [""])[0]
+            status = webhook_queue().status(event_id or None)
+            if status is None:
+                self.send_json({"error": f"Unknown event: {event_id}"}, 404)
+                return
+            self.send_json(status)
+        except Exception as e:
+            self.send_json({"error": str(e)}, 500)
+
     def handle_go(self):
         """Handle autonomy go from web UI"""
         try:
@@ -4306,6 +4974,9 @@ if __name__ == "__main__":
     signal.signal(signal.SIGTERM, _shutdown)
     signal.signal(signal.SIGINT, _shutdown)
 
+    # Single consumer for queued webhooks (resumes any left from last run)
+    webhook_queue().start()
+
     print(f"rar-file/autonomy dashboard at http://{bind_addr}:{port}")
     try:
         server.serve_forever()